@@ -5,20 +5,38 @@ Usage:
     ```sh
     TEST_NAME=example
     poetry run collect --test-name $TEST_NAME --utils cAdvisor,ftw,locust
+
+    # compare two revisions of the rules in interleaved blocks
+    poetry run collect --test-name $TEST_NAME --utils cAdvisor,locust --before $BEFORE_COMMIT --after $AFTER_COMMIT
+
+    # compare several WAFs under the same load, side by side
+    poetry run collect --test-name $TEST_NAME --utils cgroup,locust \
+        --waf-targets modsec2-apache=http://localhost:80,coraza-caddy=http://localhost:8083
+
+    # rank the rules by the cost they take, leaving them out one at a time
+    poetry run collect --test-name $TEST_NAME --utils locust --attribution 942100,942190,920
     ```
 """
 import argparse
+import asyncio
 import os
+import shlex
 import sys
 import time
 import subprocess
 import requests
-from typing import List
+from typing import Callable, List, Optional
 import docker
-from src.model import CollectCommandArg, UtilMapper
+import yaml
+from src.model import CollectCommandArg, CollectScheduler, PairedCollect, AttributionCollect, MatrixCollect, \
+    ResultCache, Util, UtilMapper, \
+    ChangeImpactIndex, read_rule_files, rule_digests, changed_rules, parse_waf_targets
 from src.type import UtilType
 from src.utils import logger
 
+# services of the WAFs run by docker-compose
+_COMPOSE_FILE = "./tests/docker-compose.yml"
+
 
 def get_test_command_arg(args: any) -> CollectCommandArg:
     """
@@ -36,6 +54,26 @@ def get_test_command_arg(args: any) -> CollectCommandArg:
     parser.add_argument('--mode', type=str, help='mode')
     parser.add_argument('--rules-dir', type=str, help='rules directory')
     parser.add_argument('--test-cases-dir', type=str, help='test cases directory')
+    parser.add_argument('--deadline', type=float, help='global deadline of the collect in seconds')
+    parser.add_argument('--workers', type=int, help='number of local locust workers')
+    parser.add_argument('--worker-endpoints', type=str, help='endpoints of remote locust workers')
+    parser.add_argument('--before', type=str, help='git revision of the rules before the change')
+    parser.add_argument('--after', type=str, help='git revision of the rules after the change')
+    parser.add_argument('--blocks', type=int, help='number of blocks of each revision in a paired collect')
+    parser.add_argument('--block-duration', type=float, help='seconds of load of each block')
+    parser.add_argument('--incremental', type=str, nargs='?', const='',
+                        help='only run the tests of the rules changed since a git revision (default: --before) '
+                             'or a directory of the rules')
+    parser.add_argument('--result-cache', action='store_true',
+                        help='reuse the raw data of a previous collect with the same inputs')
+    parser.add_argument('--host-tag', type=str, help='class of the host in the fingerprint of the result cache')
+    parser.add_argument('--request-table', type=str,
+                        help='request table replayed by the load generators (e.g., generated by --utils fuzz)')
+    parser.add_argument('--attribution', type=str,
+                        help='rule ids or families left out one at a time, e.g., 942100,920')
+    parser.add_argument('--waf-targets', type=parse_waf_targets,
+                        help='WAF containers and endpoints run side by side, '
+                             'e.g., modsec2-apache=http://localhost:80,coraza-caddy=http://localhost:8083')
 
     parsed_args = parser.parse_args(args)
 
@@ -47,7 +85,20 @@ def get_test_command_arg(args: any) -> CollectCommandArg:
         waf_endpoint=parsed_args.waf_endpoint,
         mode=parsed_args.mode,
         rules_dir=parsed_args.rules_dir,
-        test_cases_dir=parsed_args.test_cases_dir
+        test_cases_dir=parsed_args.test_cases_dir,
+        deadline=parsed_args.deadline,
+        workers=parsed_args.workers,
+        worker_endpoints=None if parsed_args.worker_endpoints is None else parsed_args.worker_endpoints.split(","),
+        before=parsed_args.before,
+        after=parsed_args.after,
+        blocks=parsed_args.blocks,
+        block_duration=parsed_args.block_duration,
+        incremental=parsed_args.incremental,
+        result_cache=parsed_args.result_cache,
+        host_tag=parsed_args.host_tag,
+        request_table=parsed_args.request_table,
+        attribution=None if parsed_args.attribution is None else parsed_args.attribution.split(","),
+        waf_targets=parsed_args.waf_targets
     )
 
 
@@ -113,36 +164,283 @@ def waf_server_is_up(waf_endpoint: str, modsec_version: str) -> bool:
     return False
 
 
-def runner(args: CollectCommandArg):
+def select_changed_tests(args: CollectCommandArg) -> int:
     """
-    run test cases for performance testing.
+    replace the test cases with the tests of the rules changed since `args.incremental`,
+    i.e., a corpus in the tmp directory with the test files of the changed rules.
+    The rules after the change are the `after` revision in a paired collect, otherwise the files in rules_dir.
 
     Args:
         args (CollectCommandArg): collect command arg
+
+    Returns:
+        int: number of test files selected
     """
+    base = args.incremental or args.before
+    if base is None:
+        logger.critical("--incremental requires a git revision (or directory) of the rules, or --before")
+        exit(1)
 
-    # start service with docker-compose
-    cmd = f"docker-compose -f ./tests/docker-compose.yml up -d {args.modsec_version}"
+    before = read_rule_files(base) if os.path.isdir(base) else read_rule_files(args.rules_dir, base)
+    after = read_rule_files(args.rules_dir, args.after if args.paired else None)
+    rule_ids = changed_rules(rule_digests(before), rule_digests(after))
 
-    subprocess.run(cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, capture_output=False)
+    corpus_dir = os.path.join(args.tmp_dir, "incremental_tests")
+    count = ChangeImpactIndex(args.test_cases_dir).write_corpus(rule_ids, corpus_dir)
+    logger.info(f"{len(rule_ids)} rules changed since {base}, {count} test files are selected")
 
-    # check it's up and running
-    if not waf_server_is_up(args.waf_endpoint, args.modsec_version):
-        logger.critical("WAF server is not up")
-        exit(1)
+    args.test_cases_dir = corpus_dir
+    return count
+
+
+def create_utils(args: CollectCommandArg) -> List[Util]:
+    """
+    create the utils selected in the collect command arg, unsupported utils are skipped
 
-    # run test cases
+    Args:
+        args (CollectCommandArg): collect command arg
+
+    Returns:
+        List[Util]: utils to run
+    """
+    utils: List[Util] = []
     for util in args.utils:
-        logger.info(f"Running Test case: {args.test_name} using {util}")
-        UtilMapper.get(UtilType(UtilType[util.upper()]))().collect(args)
+        util_type = util if isinstance(util, UtilType) else UtilType[util.upper()]
+        if util_type not in UtilMapper:
+            logger.warning(f"Util {util_type.name} is not supported yet, skipped")
+            continue
+        utils.append(UtilMapper[util_type]())
+    return utils
+
+
+def compose_image(service: str) -> Optional[str]:
+    """
+    get the image of a WAF service of the docker-compose file, so it is known before the WAF is started
+
+    Args:
+        service (str): service or container name
+
+    Returns:
+        Optional[str]: image name, None if it is not found
+    """
+    try:
+        with open(_COMPOSE_FILE, "r") as f:
+            services = (yaml.safe_load(f) or {}).get("services") or {}
+    except (OSError, yaml.YAMLError) as e:
+        logger.warning(f"Services of {_COMPOSE_FILE} are not read: {e!r}")
+        return None
 
-    # stop service with docker-compose
-    cmd = f"""
-    docker-compose -f ./tests/docker-compose.yml stop &&
-    docker-compose -f ./tests/docker-compose.yml down
+    for name, config in services.items():
+        if service in (name, (config or {}).get("container_name")):
+            return (config or {}).get("image")
+    logger.warning(f"Service {service} is not found in {_COMPOSE_FILE}")
+    return None
+
+
+def waf_image_digest(image: str) -> Optional[str]:
+    """
+    get the digest of a WAF image: the repository digest of the local image (its id if it was built locally),
+    or the digest in the registry if it is not pulled yet, so a cache entry is found before the WAF is started
+
+    Args:
+        image (str): image name
+
+    Returns:
+        Optional[str]: image digest, None if it is not found
+    """
+    try:
+        client = docker.from_env()
+        try:
+            local = client.images.get(image)
+            repo_digests = local.attrs.get("RepoDigests") or []
+            return repo_digests[0].split("@")[-1] if repo_digests else local.id
+        except docker.errors.ImageNotFound:
+            return client.images.get_registry_data(image).id
+    except Exception as e:
+        logger.warning(f"Image {image} is not found, the result cache ignores it: {e!r}")
+        return None
+
+
+def run_with_cache(args: CollectCommandArg, image: Optional[str | List[Optional[str]]], run: Callable[[], bool]):
+    """
+    run a collect, unless the result cache has fresh raw data of the same inputs (with --result-cache).
+    The raw data of a completed collect is stored in the result cache. The cache is looked up before `run`,
+    so a hit does not start the WAF.
+
+    Args:
+        args (CollectCommandArg): collect command arg
+        image (Optional[str | List[Optional[str]]]): WAF image (or the images of a WAF matrix),
+            its digest is part of the inputs. None without a WAF.
+        run (Callable[[], bool]): runs the collect, returns False if it is not completed
+    """
+    if not args.result_cache:
+        run()
+        return
+
+    cache = ResultCache()
+    if isinstance(image, list):
+        image_digest = ",".join(str(waf_image_digest(name) if name else None) for name in image)
+    else:
+        image_digest = waf_image_digest(image) if image is not None else None
+    fingerprint = cache.fingerprint(args, create_utils(args), image_digest, args.host_tag)
+    if cache.restore(fingerprint, args.raw_output):
+        logger.info(f"Test {args.test_name} is restored from the result cache ({fingerprint[:12]})")
+        return
+
+    if run():
+        cache.store(fingerprint, args.raw_output)
+
+
+def compose_runner(args: CollectCommandArg, run: Callable[[CollectCommandArg], bool]) -> bool:
+    """
+    start the WAF containers of `args.waf_targets` with docker-compose (the WAFs of a matrix are started together),
+    run a collect against them, and stop them.
+
+    Args:
+        args (CollectCommandArg): collect command arg
+        run (Callable[[CollectCommandArg], bool]): runs the collect, e.g., `single_runner`
+
+    Returns:
+        bool: False if the collect is not completed before the deadline
     """
+    names = [target.name for target in args.waf_targets]
+    cmd = f"docker-compose -f {_COMPOSE_FILE} up -d {' '.join(shlex.quote(name) for name in names)}"
+
     subprocess.run(cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, capture_output=False)
 
+    try:
+        # check they're up and running
+        for target in args.waf_targets:
+            if not waf_server_is_up(target.endpoint, target.name):
+                logger.critical(f"WAF server {target.name} is not up")
+                exit(1)
+
+        return run(args)
+    finally:
+        # stop service with docker-compose
+        cmd = f"""
+        docker-compose -f {_COMPOSE_FILE} stop &&
+        docker-compose -f {_COMPOSE_FILE} down
+        """
+        subprocess.run(cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, capture_output=False)
+
+
+def paired_runner(args: CollectCommandArg) -> bool:
+    """
+    run test cases against the rules before and after the change, in interleaved blocks.
+
+    Args:
+        args (CollectCommandArg): collect command arg
+
+    Returns:
+        bool: False if the collect is not completed before the deadline
+    """
+    logger.info(f"Running Test case: {args.test_name} on {args.before} and {args.after} in {args.blocks} blocks")
+    try:
+        completed = asyncio.run(PairedCollect(lambda: create_utils(args), args.deadline).run(args))
+    except ValueError as e:
+        # e.g., --rules-dir is not a git checkout, or a revision is not in it
+        logger.critical(str(e))
+        exit(1)
+    if not completed:
+        logger.warning(f"Test {args.test_name} is not completed before the deadline, the data is partial")
+        return False
+    return True
+
+
+def attribution_runner(args: CollectCommandArg) -> bool:
+    """
+    run test cases against the rules without each rule (or family) of `args.attribution`, next to all the rules.
+
+    Args:
+        args (CollectCommandArg): collect command arg
+
+    Returns:
+        bool: False if the collect is not completed before the deadline
+    """
+    logger.info(f"Running Test case: {args.test_name} leaving out {', '.join(args.attribution)}")
+    if not asyncio.run(AttributionCollect(lambda: create_utils(args), args.deadline).run(args)):
+        logger.warning(f"Test {args.test_name} is not completed before the deadline, the data is partial")
+        return False
+    return True
+
+
+def matrix_runner(args: CollectCommandArg) -> bool:
+    """
+    run test cases against the WAF targets side by side.
+
+    Args:
+        args (CollectCommandArg): collect command arg
+
+    Returns:
+        bool: False if the collect is not completed before the deadline
+    """
+    logger.info(f"Running Test case: {args.test_name} on {', '.join(target.name for target in args.waf_targets)}")
+    if not asyncio.run(MatrixCollect(lambda: create_utils(args), args.deadline).run(args)):
+        logger.warning(f"Test {args.test_name} is not completed before the deadline, the data is partial")
+        return False
+    return True
+
+
+def single_runner(args: CollectCommandArg) -> bool:
+    """
+    run test cases against the running WAF.
+
+    Args:
+        args (CollectCommandArg): collect command arg
+
+    Returns:
+        bool: False if the collect is not completed before the deadline
+    """
+    # run test cases, samplers run concurrently with the load generators
+    utils = create_utils(args)
+
+    logger.info(f"Running Test case: {args.test_name} using {', '.join(type(util).__name__ for util in utils)}")
+    if not asyncio.run(CollectScheduler(utils, args.deadline).run(args)):
+        logger.warning(f"Test {args.test_name} is not completed before the deadline, the data is partial")
+        return False
+    return True
+
+
+def runner(args: CollectCommandArg):
+    """
+    run test cases for performance testing.
+
+    Args:
+        args (CollectCommandArg): collect command arg
+    """
+    if args.attribution is not None and (args.before is not None or args.after is not None):
+        logger.critical("--attribution leaves the rules out of a single revision, it cannot be run with --before")
+        exit(1)
+
+    if args.matrix and (args.attribution is not None or args.before is not None or args.after is not None):
+        logger.critical("--waf-targets runs the rules as they are, it cannot be run with --attribution or --before")
+        exit(1)
+
+    if args.before is not None or args.after is not None:
+        if not args.paired:
+            logger.critical("Both --before and --after are required to compare two revisions of the rules")
+            exit(1)
+        run_with_cache(args, PairedCollect.waf_image, lambda: paired_runner(args))
+        return
+
+    if args.attribution is not None:
+        run_with_cache(args, AttributionCollect.waf_image, lambda: attribution_runner(args))
+        return
+
+    # offline utils (e.g., regex) run without the WAF
+    utils = create_utils(args)
+    if utils and not any(util.needs_waf for util in utils):
+        run_with_cache(args, None, lambda: single_runner(args))
+        return
+
+    # the images are read from the docker-compose file, so a cache hit does not start the WAFs
+    if args.matrix:
+        images = [compose_image(target.name) for target in args.waf_targets]
+        run_with_cache(args, images, lambda: compose_runner(args, matrix_runner))
+    else:
+        run_with_cache(args, compose_image(args.modsec_version), lambda: compose_runner(args, single_runner))
+
 
 def main(args: any = None):
     """
@@ -158,6 +456,11 @@ def main(args: any = None):
     # create folder
     init(command_args)
 
+    # select the tests of the changed rules
+    if command_args.incremental is not None and select_changed_tests(command_args) == 0:
+        logger.info(f"No test is affected by the changed rules, test {command_args.test_name} is skipped")
+        return
+
     # run tests
     runner(command_args)
 
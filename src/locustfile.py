@@ -0,0 +1,82 @@
+"""
+Module locustfile defines the locust user run by LocustUtil. The user replays the requests of a request table
+(see `src.utils.request_table`), whose path is given by the environment variable `CRS_REQUEST_TABLE`.
+
+Requests are named after their go-ftw test id, and the latency of each name is recorded in a LatencyHistogram:
+the workers send their histograms with each report, the master (or a standalone process) merges them and saves them to `CRS_LATENCY_FILE` on quit.
+
+Usage:
+    ```sh
+    CRS_REQUEST_TABLE=./tmp/example/requests.bin locust -f src/locustfile.py --host http://localhost:80
+    ```
+"""
+import os
+from locust import HttpUser, events, task
+from locust.runners import WorkerRunner
+from src.utils import LatencyHistogram, RequestTable
+from src.model.LocustUtil import latency_series
+
+# the table is mapped once per process, the pages are shared by all the users
+_table = RequestTable(os.environ["CRS_REQUEST_TABLE"])
+
+# latency (in microseconds) keyed by request name, a worker resets it after each report
+_latency: dict[str, LatencyHistogram] = {}
+
+
+@events.request.add_listener
+def _record_latency(name: str, response_time: float, **_):
+    histogram = _latency.get(name)
+    if histogram is None:
+        histogram = _latency[name] = LatencyHistogram()
+    histogram.record(int(response_time * 1000))
+
+
+@events.report_to_master.add_listener
+def _send_latency(data: dict, **_):
+    data["crs_latency"] = {name: [array.tolist() for array in histogram.to_sparse()]
+                           for name, histogram in _latency.items()}
+    _latency.clear()
+
+
+@events.worker_report.add_listener
+def _merge_latency(data: dict, **_):
+    for name, (indices, counts) in data.get("crs_latency", {}).items():
+        histogram = LatencyHistogram.from_sparse(indices, counts)
+        if name in _latency:
+            _latency[name].merge(histogram)
+        else:
+            _latency[name] = histogram
+
+
+@events.quitting.add_listener
+def _save_latency(environment, **_):
+    file_path = os.environ.get("CRS_LATENCY_FILE")
+    if file_path and not isinstance(environment.runner, WorkerRunner):
+        latency_series(_latency).save(file_path)
+
+
+class RequestTableUser(HttpUser):
+    """
+    RequestTableUser sends the requests of the table, picked at random proportionally to their weights.
+    """
+    # number of requests picked at a time
+    __batch_size: int = 256
+
+    def on_start(self):
+        self.__picks = iter(())
+
+    @task
+    def send(self):
+        idx = next(self.__picks, None)
+        if idx is None:
+            self.__picks = iter(_table.sample(self.__batch_size).tolist())
+            idx = next(self.__picks)
+
+        request = _table[idx]
+        # the stats are kept per go-ftw test id, rather than per url
+        with self.client.request(request.method, request.uri, name=request.name, headers=request.headers,
+                                 data=request.body, catch_response=True) as response:
+            # a blocked request (e.g., 403) is a success of the WAF, a transport error (e.g., a connection error
+            # or a timeout, status 0) keeps the failure of locust, as the failures of openLoop
+            if response.status_code:
+                response.success()
@@ -0,0 +1,227 @@
+"""
+Module AttributionCollect defines the AttributionCollect class, which attributes the cost of the WAF to its rules
+by leaving them out one at a time: a WAF container runs the rules without a rule (or a family of rules),
+next to a WAF container running all the rules, under the same load.
+"""
+import asyncio
+import json
+import os
+import re
+import shutil
+from typing import Callable, List, Optional
+from src.type import UtilRole
+from src.utils import logger
+from .ChangeImpact import read_rule_files, iter_rules
+from .CollectScheduler import CollectScheduler
+from .LocustUtil import LocustUtil
+from .PairedCollect import PairedCollect
+from .Util import Util, CollectCommandArg, ATTRIBUTION_MANIFEST, rule_family_of
+
+# file of the rules of a variant which removes the rules left out, it sorts after the files of CRS
+# (i.e., it is included after the rules are defined)
+_EXCLUSION_FILENAME = "ZZZ-LEAVE-ONE-OUT-EXCLUSION.conf"
+
+_RULE_ID = re.compile(r"^\d+$")
+
+
+class AttributionCollect(PairedCollect):
+    """
+    AttributionCollect runs a leave-one-out attribution: a variant of the rules is generated for each target
+    (i.e., a rule id, or a rule family such as `942`), which removes the target with `SecRuleRemoveById`.
+
+    The variants run in rounds on a pool of WAF containers, one per slot, on distinct ports and pinned to distinct
+    CPUs (`waf_cpus` each, the load generators keep `load_cpus` per slot). The pool is sized to the CPUs of the host,
+    and has two slots at least: the first slot of each round runs all the rules (i.e., the baseline of the round),
+    the other slots run the variants, and the same utils run against every slot in parallel. So a slow period
+    of the host hits the baseline and the variants of a round alike.
+
+    The raw data of the baseline of a round is stored in `<raw_output>/baseline/round-<n>/`, the data of the variant
+    of a target in `<raw_output>/without-<target>/`, and `attribution.json` maps each target to its round
+    (see `Util.parse_variants()`). The report ranks the targets by the throughput or latency they cost
+    (see `Util.attribution_text_report()`).
+
+    Args:
+        - `create_utils` (Callable[[], List[Util]]): creates the utils of a slot
+        - `deadline` (Optional[float], optional): global deadline in seconds. Defaults to None (no deadline).
+    """
+    create_utils: Callable[[], List[Util]]
+    deadline: Optional[float]
+
+    # first port of the pool, and CPUs of the WAF and of the load generators of each slot
+    base_port: int = 8090
+    waf_cpus: int = 1
+    load_cpus: int = 1
+
+    async def run(self, args: CollectCommandArg) -> bool:
+        """
+        run() generates the variants of `args.attribution`, and runs them in rounds along with the baseline.
+
+        Args:
+            args (CollectCommandArg): collect command arg, `attribution` is the list of rule ids and families
+
+        Returns:
+            bool: False if the deadline is reached before all the rounds complete
+        """
+        loop = asyncio.get_running_loop()
+        deadline_at = None if self.deadline is None else loop.time() + self.deadline
+
+        files = read_rule_files(args.rules_dir)
+        targets = leave_out_targets(args.attribution or [], {rule_id for rule_id, _ in iter_rules(files)})
+        if not targets:
+            logger.error(f"No rule of {args.attribution} is found in {args.rules_dir}, the attribution is skipped")
+            return True
+
+        rules_dirs = {target: os.path.join(args.tmp_dir, "attribution", target, "rules") for target in targets}
+        rules_dirs[None] = os.path.join(args.tmp_dir, "attribution", "baseline", "rules")
+        for target, rules_dir in rules_dirs.items():
+            self.write_variant(args.rules_dir, rules_dir, targets.get(target))
+
+        slots = self.pool_size(len(targets))
+        batches = [list(targets)[start:start + slots - 1] for start in range(0, len(targets), slots - 1)]
+        manifest = {"baselines": [], "variants": {}}
+        logger.info(f"Leaving out {len(targets)} targets in {len(batches)} rounds of {slots} WAF containers")
+
+        for round_idx, batch in enumerate(batches):
+            remaining = None if deadline_at is None else deadline_at - loop.time()
+            if remaining is not None and remaining <= 0:
+                logger.warning(f"Deadline ({self.deadline}s) reached, round {round_idx} is skipped")
+                return False
+
+            names = [f"baseline/round-{round_idx}"] + [f"without-{target}" for target in batch]
+            completed = await self.run_round(args, names, [rules_dirs[None]] + [rules_dirs[t] for t in batch],
+                                             remaining)
+
+            manifest["baselines"].append(names[0])
+            for target, name in zip(batch, names[1:]):
+                manifest["variants"][target] = {"round": round_idx, "raw_output": name, "removed": targets[target]}
+            with open(os.path.join(args.raw_output, ATTRIBUTION_MANIFEST), "w") as f:
+                json.dump(manifest, f, indent=2)
+
+            if not completed:
+                return False
+
+        return True
+
+    async def run_round(self, args: CollectCommandArg, names: List[str], rules_dirs: List[str],
+                        remaining: Optional[float]) -> bool:
+        """
+        run_round() starts a WAF container per variant of a round, runs the utils against all of them in parallel,
+        and stops the WAFs.
+
+        Args:
+            args (CollectCommandArg): collect command arg
+            names (List[str]): name of each variant, i.e., its raw output directory
+            rules_dirs (List[str]): rules of each variant
+            remaining (Optional[float]): seconds before the deadline
+
+        Returns:
+            bool: False if the deadline is reached before all the variants complete
+        """
+        # without utils, go-ftw is run as the load (see `CollectScheduler`)
+        utils = [self.create_utils() for _ in names]
+        needs_waf = any(not slot_utils or any(util.needs_waf for util in slot_utils) for slot_utils in utils)
+        containers = {}
+
+        try:
+            if needs_waf:
+                started = await asyncio.gather(*(
+                    asyncio.to_thread(self.start_slot, args, slot, rules_dir)
+                    for slot, rules_dir in enumerate(rules_dirs)
+                ))
+                containers = {slot: name for slot, name in enumerate(started) if name is not None}
+                if len(containers) != len(names):
+                    logger.critical(f"{len(names) - len(containers)} WAF containers of the attribution are not up")
+                    exit(1)
+
+            runs = []
+            for slot, name in enumerate(names):
+                slot_args = args.variant_args(name, self.slot_endpoint(slot), rules_dirs[slot])
+                slot_args.workers = self.load_cpus if args.workers is None else args.workers
+                os.makedirs(slot_args.raw_output, exist_ok=True)
+                os.makedirs(slot_args.tmp_dir, exist_ok=True)
+
+                for util in utils[slot]:
+                    if isinstance(util, LocustUtil):
+                        util.master_port = LocustUtil.master_port + slot
+                    if util.role == UtilRole.SAMPLER and slot in containers:
+                        util.waf_container_names = [containers[slot]]
+                        util.container_labels = {containers[slot]: name}
+                runs.append(CollectScheduler(utils[slot], remaining).run(slot_args))
+
+            logger.info(f"Running {', '.join(names)}")
+            return all(await asyncio.gather(*runs))
+        finally:
+            for container in containers.values():
+                await asyncio.to_thread(self.stop_waf, container)
+
+    def pool_size(self, targets: int) -> int:
+        """
+        pool_size() returns the number of slots of the pool: as many as the CPUs of the host allow,
+        two at least (the baseline and a variant), and no more than the targets and the baseline.
+        """
+        slots = (os.cpu_count() or 1) // (self.waf_cpus + self.load_cpus)
+        return max(2, min(slots, targets + 1))
+
+    def slot_endpoint(self, slot: int) -> str:
+        return f"http://localhost:{self.base_port + slot}"
+
+    def start_slot(self, args: CollectCommandArg, slot: int, rules_dir: str) -> Optional[str]:
+        """
+        start_slot() starts the WAF container of a slot, pinned to the CPUs of the slot.
+
+        Returns:
+            Optional[str]: container name, None if the WAF is not up
+        """
+        name = f"{args.test_name}-slot-{slot}"
+        first = (slot * self.waf_cpus) % (os.cpu_count() or 1)
+        cpuset = ",".join(str((first + cpu) % (os.cpu_count() or 1)) for cpu in range(self.waf_cpus))
+        return name if self.run_waf(name, self.base_port + slot, rules_dir, cpuset) else None
+
+    def write_variant(self, rules_dir: str, dest: str, removed: Optional[str]):
+        """
+        write_variant() copies the rules into a directory, and removes a range of rule ids after them.
+
+        Args:
+            rules_dir (str): directory of the rules
+            dest (str): destination directory, it is emptied first
+            removed (Optional[str]): argument of `SecRuleRemoveById` (e.g., `942100` or `942000-942999`),
+                None for the baseline
+        """
+        shutil.rmtree(dest, ignore_errors=True)
+        shutil.copytree(rules_dir, dest)
+        if removed is not None:
+            with open(os.path.join(dest, _EXCLUSION_FILENAME), "w") as f:
+                f.write(f"SecRuleRemoveById {removed}\n")
+
+
+def leave_out_targets(targets: List[str], rule_ids: set[str]) -> dict[str, str]:
+    """
+    leave_out_targets() returns the argument of `SecRuleRemoveById` for each target: the rule id itself,
+    or the range of ids of a rule family (i.e., a target of 3 digits, e.g., `942` is `942000-942999`).
+    A target without any rule in the rules is skipped.
+
+    Args:
+        targets (List[str]): rule ids and families
+        rule_ids (set[str]): ids of the rules
+
+    Raises:
+        ValueError: if a target is not a number
+
+    Returns:
+        dict[str, str]: argument of `SecRuleRemoveById`, keyed by target in the given order
+    """
+    res = {}
+    families = {rule_family_of(rule_id) for rule_id in rule_ids}
+    for target in dict.fromkeys(target.strip() for target in targets):
+        if not _RULE_ID.match(target):
+            raise ValueError(f"Invalid rule id or family to leave out: {target!r}")
+
+        if len(target) == 3:
+            if target in families:
+                res[target] = f"{target}000-{target}999"
+                continue
+        elif target in rule_ids:
+            res[target] = target
+            continue
+        logger.warning(f"No rule of {target} is found, it is not left out")
+    return res
@@ -2,16 +2,21 @@
 Module CAdvisorUtil defines the CAdvisorUtil class. CAdvisorUtil is a class for collecting and
 analyzing data from cAdvisor API.
 """
+import asyncio
 import json
 import time
 import subprocess
 import os
-from typing import Type, List
+from array import array
+from typing import Callable, Iterator, List, Optional, Type
 import docker
-import requests
-from src.type import Mode
-from src.utils import logger
-from .Util import Util, ParsedDataItem, CollectCommandArg, ReportCommandArg
+import numpy as np
+from src.type import Mode, UtilRole
+from src.utils import logger, AsyncHTTPClient, JsonlSpool, iter_jsonl, ticks
+from .Util import Util, MetricSeries, CollectCommandArg, ReportCommandArg
+from .DerivedMetrics import derive_resource_metrics
+from .LocustUtil import LocustUtil
+from .CollectScheduler import CollectScheduler
 
 
 class CAdvisorUtil(Util):
@@ -29,135 +34,230 @@ class CAdvisorUtil(Util):
 
     # @TODO: add to variables
     __cAdvisor_endpoint: str = "http://127.0.0.1:8080/api/v1.1/subcontainers/docker/"
-    __waf_container_name: str = "modsec2-apache"
     __cAdvisor_container_version: str = "v0.45.0"
-    raw_filename: str = "cAdvisor.json"
+    raw_filename: str = "cAdvisor.jsonl"
+    _legacy_raw_filename: Optional[str] = "cAdvisor.json"
+    threshold_filename: str = "cAdvisor.threshold.json"
+
+    # metrics parsed from each sample, loaded from corresponding field from cAdvisor API
+    # network and disk I/O are optional in the API, they are read as 0 if missing
+    _fields: dict[str, Callable[[dict], int]] = {
+        "cpu_total": lambda data: data["cpu"]["usage"]["total"],
+        "cpu_user": lambda data: data["cpu"]["usage"]["user"],
+        "cpu_system": lambda data: data["cpu"]["usage"]["system"],
+        "memory_usage": lambda data: data["memory"]["usage"],
+        "memory_cache": lambda data: data["memory"]["cache"],
+        "network_rx_bytes": lambda data: data.get("network", {}).get("rx_bytes", 0),
+        "network_tx_bytes": lambda data: data.get("network", {}).get("tx_bytes", 0),
+        "io_read_bytes": lambda data: _sum_diskio(data, "Read"),
+        "io_write_bytes": lambda data: _sum_diskio(data, "Write")
+    }
+
+    # metrics shown in the text report
+    _report_metrics: List[str] = [
+        "cpu_total", "cpu_user", "cpu_system", "memory_usage", "memory_cache",
+        "cpu_total_cores", "memory_usage_rate"
+    ]
+
+    role: UtilRole = UtilRole.SAMPLER
+
+    # containers sampled in parallel, each sample is labelled with its container name,
+    # empty samples the containers of the WAF targets of the collect (see `CollectCommandArg.waf_targets`)
+    waf_container_names: List[str]
+
+    # label of the samples of a container, if it is not the container name
+    # (e.g., the variant of the rules run by each WAF of a leave-one-out attribution)
+    container_labels: dict[str, str]
+
+    # cAdvisor API returns the 60 most recent samples,
+    # the de-duplication window only needs to cover them (per container)
+    __dedup_window: int = 120
+
+    # polling cadence in seconds, it must be shorter than the 60 samples kept by cAdvisor
+    sampling_interval: float = 5
+
+    def __init__(self):
+        self.waf_container_names = []
+        self.container_labels = {}
 
     def collect(self, args: CollectCommandArg):
+        """
+        collect() samples the WAF container while go-ftw is running.
+        When load generators are collected together, CollectScheduler runs this sampler during their load instead.
+        """
+        asyncio.run(CollectScheduler([self]).run(args))
+
+    async def prepare(self, args: CollectCommandArg):
         # start cAdvisor container
-        self.__start_cadvisor()
+        await asyncio.to_thread(self.__start_cadvisor)
 
-        # @TODO: better wrapping for different mode
-        ftw_util_path = './ftw' if args.mode == Mode.PIPELINE.value else 'go-ftw'
+        self.__urls = {
+            name: f"{self.__cAdvisor_endpoint}{self.__get_waf_container_id(name)}"
+            for name in self.container_names(args)
+        }
 
-        # start go-ftw in parallel
-        proc_ftw_data_collector = subprocess.Popen(
-            [f"{ftw_util_path} run -d {args.test_cases_dir} -o json"],
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-            )
+    def container_names(self, args: CollectCommandArg) -> List[str]:
+        """
+        container_names() returns the containers sampled in a collect, i.e., `waf_container_names`,
+        or the containers of the WAF targets of the collect.
+        """
+        return self.waf_container_names or [target.name for target in args.waf_targets]
 
-        data_list, timestamp_set = [], set()
-        url = f"{self.__cAdvisor_endpoint}{self.__get_waf_container_id()}"
+    async def run(self, args: CollectCommandArg, stop: asyncio.Event):
+        try:
+            with JsonlSpool(f"{args.raw_output}/{self.raw_filename}", self.__dedup_window * len(self.__urls)) as spool:
+                await self.sample(spool, self.__urls, stop)
+        finally:
+            self.__stop_cadvisor()
+
+    async def sample(self, spool: JsonlSpool, urls: dict[str, str], stop: asyncio.Event):
+        """
+        sample() polls cAdvisor API at a fixed cadence until `stop` is set, then polls once more
+        to collect the samples taken after the last tick. All the containers are polled concurrently,
+        over a pool of keep-alive connections.
 
-        # cAdvisor API sends 60 recent dataset,
-        # thus, the data requires to be filtered out duplicates
-        while proc_ftw_data_collector.poll() is not None:
-            self.fetch_data(data_list, timestamp_set, url)
-            time.sleep(10)
+        Args:
+            spool (JsonlSpool): spool of the raw data
+            urls (dict[str, str]): cAdvisor API url of each container, keyed by container name
+            stop (asyncio.Event): event to stop the sampling
+        """
+        async with AsyncHTTPClient(pool_size=len(urls)) as client:
+            async for _ in ticks(self.sampling_interval, stop):
+                await self.fetch_data(client, spool, urls)
 
-        self.fetch_data(data_list, timestamp_set, url)
-        self.save_json(f"{args.raw_output}/{self.raw_filename}", data_list)
-        self.__stop_cadvisor()
+            await self.fetch_data(client, spool, urls)
 
     def text_report(self, args: ReportCommandArg):
-        data = self.parse_data(f"{args.raw_output}/{self.raw_filename}")
+        states = self.parse_states(args.raw_output)
+        if states:
+            self.paired_text_report(args, states)
+            return
 
-        for matrix in ["cpu_total", "cpu_user", "cpu_system", "memory_usage", "memory_cache"]:
-            print(self.create_time_series_terminal_plot(matrix, data[matrix]))
+        data = self.parse_output(args.raw_output)
 
-        if not args.threshold_conf:
-            return
+        for matrix in self._report_metrics:
+            print(self.create_time_series_terminal_plot(matrix, data[matrix]))
 
-        thresholds = self._get_threshold(os.path.join(args.threshold_conf,
-                                                      "cAdvisor.threshold.json")
-                                         )
+        if "cpu_seconds_per_1k_requests" in data:
+            print(f"CPU seconds per 1k requests: {data['cpu_seconds_per_1k_requests'].values[0]:.4f}\n")
 
-        for threshold in thresholds:
-            threshold.inspect(data[threshold.metric_name])
+        self._report_thresholds(args, None, data)
 
     # @TODO: impl
     def figure_report(self, args: ReportCommandArg):
         pass
 
-    def parse_data(self, file_path: str)  -> dict[str, List[ParsedDataItem]]:
+    def parse_data(self, file_path: str, request_count: Optional[int] = None)  -> dict[str, MetricSeries]:
         """
-        parse_data() parses the data from cAdvisor API to ParseDataItem.
+        parse_data() parses the data from cAdvisor API to MetricSeries.
+        All the metrics parsed from the samples share the same keys (i.e., the timestamps of the samples),
+        the cumulative counters are also derived into rates (see `DerivedMetrics`).
 
         Args:
             file_path (str): path of the data file
+            request_count (Optional[int], optional): number of requests sent by load generators,
+                used for `cpu_seconds_per_1k_requests`. Defaults to None.
 
         Returns:
-            dict[str, List[ParsedDataItem]]: parsed data
+            dict[str, MetricSeries]: parsed data
         """
+        fields = self._fields
+        timestamps, containers, columns = [], [], {key: array("q") for key in fields}
+
+        # samples are streamed one by one, only the parsed fields are kept in memory
+        for data in self.__iter_raw_data(file_path):
+            timestamps.append(data["timestamp"])
+            containers.append(data.get("container"))
+            for key, fn in fields.items():
+                columns[key].append(fn(data))
+
+        timestamps = np.array(timestamps)
+
+        # samples are labelled with their container, so thresholds can filter a container by include_labels
+        labels = None
+        if any(containers):
+            labels = [[container] if container else [] for container in containers]
+
         res = {
-            "cpu_total": [],
-            "cpu_user": [],
-            "cpu_system": [],
-            "memory_usage": [],
-            "memory_cache": []
+            key: MetricSeries(timestamps, np.frombuffer(columns[key], dtype=np.int64), labels)
+            for key in fields
         }
+        res.update(derive_resource_metrics(res, request_count))
+        return res
 
-        with open(file_path, "r") as f:
-            raw_data = json.load(f)
+    def parse_output(self, raw_output: str) -> dict[str, MetricSeries]:
+        # the per-request cost is available when a load generator ran in the same run
+        request_count = LocustUtil().get_request_count(raw_output)
+        return self.parse_data(self._raw_file_path(raw_output), request_count)
 
-            for data in raw_data:
-                # load data from corresponding field from cAdvisor API
-                mp = {
-                    "cpu_total": data["cpu"]["usage"]["total"],
-                    "cpu_user": data["cpu"]["usage"]["user"],
-                    "cpu_system": data["cpu"]["usage"]["system"],
-                    "memory_usage": data["memory"]["usage"],
-                    "memory_cache": data["memory"]["cache"]
-                }
+    def _raw_file_path(self, raw_output: str) -> str:
+        """
+        _raw_file_path() returns the path of the raw data, falls back to the JSON file of previous versions.
+        """
+        file_path = f"{raw_output}/{self.raw_filename}"
+        if self._legacy_raw_filename is None or os.path.exists(file_path):
+            return file_path
+
+        legacy_file_path = f"{raw_output}/{self._legacy_raw_filename}"
+        return legacy_file_path if os.path.exists(legacy_file_path) else file_path
 
-                for key in mp:
-                    res[key].append(ParsedDataItem(data["timestamp"], mp[key]))
+    def __iter_raw_data(self, file_path: str) -> Iterator[dict]:
+        """
+        __iter_raw_data() iterates the samples of a raw data file.
+        Besides JSON Lines, it supports the JSON array written by previous versions (i.e., cAdvisor.json).
+        """
+        if not file_path.endswith(".json"):
+            return iter_jsonl(file_path)
 
+        with open(file_path, "r") as f:
+            raw_data = json.load(f)
         f.close()
-        return res
+        return iter(raw_data)
 
-    def fetch_data(self, data_list: list, timestamp_set: set, url: str):
+    async def fetch_data(self, client: AsyncHTTPClient, spool: JsonlSpool, urls: dict[str, str]):
         """
-        fetch_data() fetches data from cAdvisor API.
+        fetch_data() fetches data of every container from cAdvisor API concurrently,
+        and appends the new samples to the spool. A failed poll is logged and skipped,
+        the samples are still available in the next poll.
 
         Args:
-            data_list (list): data list to be appended
-            timestamp_set (set): set of timestamp of when the data is collected
-            url (str): cAdvisor API url
+            client (AsyncHTTPClient): http client
+            spool (JsonlSpool): spool of the raw data, samples are de-duplicated by container and timestamp
+            urls (dict[str, str]): cAdvisor API url of each container, keyed by container name
         """
-        try:
-            response = requests.post(url, timeout=15)
+        responses = await asyncio.gather(*[client.request("POST", url) for url in urls.values()],
+                                         return_exceptions=True)
 
-            if response.status_code != 200:
-                logger.error(f"Response status code is not 200: {response.status_code}")
-
-            for stats in response.json()[0]["stats"]:
-                timestamp = stats["timestamp"]
-                if timestamp in timestamp_set:
-                    continue
+        for name, response in zip(urls, responses):
+            if isinstance(response, Exception):
+                logger.error(f"Failed to fetch data of {name}: {response!r}")
+                continue
 
-                timestamp_set.add(timestamp)
-                data_list.append(stats)
+            if response.status != 200:
+                logger.error(f"Response status code is not 200: {response.status}")
+                continue
 
-            logger.info(f"Current data collected: {len(data_list)}")
+            for stats in response.json()[0]["stats"]:
+                stats["container"] = self.container_labels.get(name, name)
+                spool.append(stats, key=(name, stats["timestamp"]))
 
-        except Exception as e:
-            logger.error(e)
-            exit(1)
+        spool.flush()
+        logger.info(f"Current data collected: {spool.count}")
 
-    def __get_waf_container_id(self) -> str:
+    def __get_waf_container_id(self, name: str) -> str:
         """
         __get_waf_container_id() gets the id of container of the WAF,
         the id is used for cAdvisor API.
 
+        Args:
+            name (str): container name
+
         Returns:
             str: waf container id
         """
         try:
             client = docker.from_env()
-            container = client.containers.get(self.__waf_container_name)
+            container = client.containers.get(name)
             return container.id
         except Exception as e:
             logger.error(e)
@@ -245,3 +345,10 @@ class CAdvisorUtil(Util):
             bool: true if the container is healthy, false otherwise
         """
         return docker.from_env().api.inspect_container(name_or_id)["State"]["Status"] == 'running'
+
+
+def _sum_diskio(data: dict, op: str) -> int:
+    """
+    _sum_diskio() sums the bytes of an operation (e.g., Read, Write) over all the devices.
+    """
+    return sum(device["stats"].get(op, 0) for device in data.get("diskio", {}).get("io_service_bytes", []))
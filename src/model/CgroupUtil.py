@@ -0,0 +1,216 @@
+"""
+Module CgroupUtil defines the CgroupUtil class. CgroupUtil is a class for collecting resource usage
+of the WAF container directly from its cgroup v2 files, without running cAdvisor.
+"""
+import asyncio
+import glob
+import os
+from datetime import datetime, timezone
+from typing import List, Optional
+import docker
+from src.utils import logger, JsonlSpool, ticks
+from .CAdvisorUtil import CAdvisorUtil
+from .Util import CollectCommandArg
+
+
+class CgroupUtil(CAdvisorUtil):
+    """
+    CgroupUtil is a class for collecting resource usage from the cgroup v2 files of the WAF container
+    (i.e., `cpu.stat`, `memory.current`, `memory.stat` and `io.stat`) at sub-second intervals.
+    Compared with CAdvisorUtil, no privileged cAdvisor container is started.
+
+    The samples are stored in the same layout as cAdvisor API, so the metrics are the same as
+    CAdvisorUtil (e.g., `cpu_total` in nanoseconds), and `cAdvisor.threshold.json` applies to both utils.
+    Network I/O is read from procfs (i.e., `/proc/<pid>/net/dev` of a process in the cgroup).
+
+    Usage:
+
+    ```sh
+    TEST_NAME=example
+    poetry run collect --test-name $TEST_NAME --utils cgroup
+    poetry run report --test-name $TEST_NAME --utils cgroup --threshold-conf "./config"
+    ```
+    """
+    raw_filename: str = "cgroup.jsonl"
+    _legacy_raw_filename: Optional[str] = None
+
+    # mount point of the cgroup v2 hierarchy and procfs
+    cgroup_root: str = "/sys/fs/cgroup"
+    proc_root: str = "/proc"
+
+    # sampling cadence in seconds
+    sampling_interval: float = 0.2
+
+    async def prepare(self, args: CollectCommandArg):
+        self.__cgroup_dirs = {name: self.__get_cgroup_dir(name) for name in self.container_names(args)}
+
+    async def run(self, args: CollectCommandArg, stop: asyncio.Event):
+        with JsonlSpool(f"{args.raw_output}/{self.raw_filename}") as spool:
+            await self.sample(spool, self.__cgroup_dirs, stop)
+
+    async def sample(self, spool: JsonlSpool, cgroup_dirs: dict[str, str], stop: asyncio.Event):
+        """
+        sample() reads the cgroup files of every container at a fixed cadence until `stop` is set.
+
+        Args:
+            spool (JsonlSpool): spool of the raw data
+            cgroup_dirs (dict[str, str]): cgroup directory of each container, keyed by container name
+            stop (asyncio.Event): event to stop the sampling
+        """
+        async for _ in ticks(self.sampling_interval, stop):
+            for name, cgroup_dir in cgroup_dirs.items():
+                spool.append(read_cgroup_stats(cgroup_dir, self.container_labels.get(name, name), self.proc_root))
+            spool.flush()
+
+        for name, cgroup_dir in cgroup_dirs.items():
+            spool.append(read_cgroup_stats(cgroup_dir, self.container_labels.get(name, name), self.proc_root))
+        spool.flush()
+
+        logger.info(f"Current data collected: {spool.count}")
+
+    def __get_cgroup_dir(self, name: str) -> str:
+        """
+        __get_cgroup_dir() finds the cgroup directory of a container.
+
+        Args:
+            name (str): container name
+
+        Returns:
+            str: cgroup directory
+        """
+        try:
+            container_id = docker.from_env().containers.get(name).id
+        except Exception as e:
+            logger.error(e)
+            exit(1)
+
+        cgroup_dir = find_container_cgroup(container_id, self.cgroup_root)
+        if cgroup_dir is None:
+            logger.critical(f"cgroup v2 directory of container {name} is not found under {self.cgroup_root}")
+            exit(1)
+
+        return cgroup_dir
+
+
+def find_container_cgroup(container_id: str, cgroup_root: str = "/sys/fs/cgroup") -> Optional[str]:
+    """
+    find_container_cgroup() finds the cgroup directory of a docker container,
+    it supports both the systemd and the cgroupfs cgroup driver.
+
+    Args:
+        container_id (str): full id of the container
+        cgroup_root (str, optional): mount point of cgroup v2. Defaults to "/sys/fs/cgroup".
+
+    Returns:
+        Optional[str]: the directory, or None if it is not found
+    """
+    candidates: List[str] = [
+        os.path.join(cgroup_root, "system.slice", f"docker-{container_id}.scope"),
+        os.path.join(cgroup_root, "docker", container_id),
+    ]
+    candidates += glob.glob(os.path.join(cgroup_root, "**", f"*{container_id}*"), recursive=True)
+
+    for candidate in candidates:
+        if os.path.isfile(os.path.join(candidate, "cpu.stat")):
+            return candidate
+    return None
+
+
+def read_cgroup_stats(cgroup_dir: str, container: Optional[str] = None, proc_root: str = "/proc") -> dict:
+    """
+    read_cgroup_stats() reads a sample from cgroup v2 files, the sample has the same layout as cAdvisor API.
+    Missing files (e.g., the io controller is not enabled) are read as 0.
+
+    Args:
+        cgroup_dir (str): cgroup directory of the container
+        container (Optional[str], optional): container name attached to the sample. Defaults to None.
+        proc_root (str, optional): mount point of procfs, used for network I/O. Defaults to "/proc".
+
+    Returns:
+        dict: the sample
+    """
+    cpu = _read_flat_keyed(os.path.join(cgroup_dir, "cpu.stat"))
+    memory = _read_flat_keyed(os.path.join(cgroup_dir, "memory.stat"))
+    memory_current = _read_lines(os.path.join(cgroup_dir, "memory.current"))
+    io_service_bytes = []
+
+    # io.stat: one line per device, e.g., "8:0 rbytes=1 wbytes=2 rios=3 wios=4 dbytes=0 dios=0"
+    for line in _read_lines(os.path.join(cgroup_dir, "io.stat")):
+        device, *fields = line.split()
+        stats = dict(field.split("=", 1) for field in fields)
+        io_service_bytes.append({
+            "device": device,
+            "stats": {"Read": int(stats.get("rbytes", 0)), "Write": int(stats.get("wbytes", 0))}
+        })
+
+    rx_bytes, tx_bytes = _read_network_bytes(cgroup_dir, proc_root)
+
+    sample = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "cpu": {
+            # cpu.stat reports in microseconds, cAdvisor reports in nanoseconds
+            "usage": {
+                "total": cpu.get("usage_usec", 0) * 1000,
+                "user": cpu.get("user_usec", 0) * 1000,
+                "system": cpu.get("system_usec", 0) * 1000
+            }
+        },
+        "memory": {
+            "usage": int(memory_current[0]) if memory_current else 0,
+            "cache": memory.get("file", 0)
+        },
+        "network": {
+            "rx_bytes": rx_bytes,
+            "tx_bytes": tx_bytes
+        },
+        "diskio": {
+            "io_service_bytes": io_service_bytes
+        }
+    }
+
+    if container is not None:
+        sample["container"] = container
+    return sample
+
+
+def _read_network_bytes(cgroup_dir: str, proc_root: str) -> tuple[int, int]:
+    """
+    _read_network_bytes() reads the received/transmitted bytes of the network namespace of the container,
+    from `/proc/<pid>/net/dev` of the first process in the cgroup. The loopback interface is excluded.
+    """
+    procs = _read_lines(os.path.join(cgroup_dir, "cgroup.procs"))
+    if not procs:
+        return 0, 0
+
+    rx_bytes, tx_bytes = 0, 0
+
+    # the first 2 lines are headers, e.g., "  eth0: 1234 5 0 0 0 0 0 0 5678 6 0 0 0 0 0 0"
+    for line in _read_lines(os.path.join(proc_root, procs[0], "net", "dev"))[2:]:
+        interface, _, counters = line.partition(":")
+        if interface.strip() == "lo":
+            continue
+        counters = counters.split()
+        rx_bytes += int(counters[0])
+        tx_bytes += int(counters[8])
+
+    return rx_bytes, tx_bytes
+
+
+def _read_lines(file_path: str) -> List[str]:
+    try:
+        with open(file_path, "r") as f:
+            return f.read().splitlines()
+    except FileNotFoundError:
+        return []
+
+
+def _read_flat_keyed(file_path: str) -> dict[str, int]:
+    """
+    _read_flat_keyed() reads a flat-keyed cgroup file (e.g., cpu.stat), each line is "<key> <value>".
+    """
+    res = {}
+    for line in _read_lines(file_path):
+        key, _, value = line.partition(" ")
+        if value.strip().isdigit():
+            res[key] = int(value)
+    return res
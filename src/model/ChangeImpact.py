@@ -0,0 +1,207 @@
+"""
+Module ChangeImpact maps the rules in `rules_dir` to the go-ftw tests that exercise them, so a collect only runs
+the tests of the rules changed between two revisions of the rules (i.e., incremental testing).
+
+A rule is identified by the `id:` action of its `SecRule` (or `SecAction`) directive. The chained rules, and the
+directives updating a rule by id (e.g., `SecRuleUpdateTargetById`), are part of the rule. A rule changes when
+its text changes, or when a data file it reads (e.g., `@pmFromFile`) changes.
+"""
+import hashlib
+import io
+import os
+import re
+import shutil
+import subprocess
+import tarfile
+from typing import Iterable, Iterator, List, Optional
+from src.utils import logger
+from .FTWCorpusCache import FTWCorpusCache
+from .Util import rule_id_of, rule_family_of
+
+_CONTINUATION = re.compile(rb"\\\r?\n")
+_DIRECTIVE = re.compile(rb"^\s*(SecRule|SecAction)\b", re.IGNORECASE)
+_UPDATE_BY_ID = re.compile(rb"^\s*SecRule(?:UpdateTargetById|UpdateActionById|RemoveById)\s+(\d+)", re.IGNORECASE)
+_ACTIONS = re.compile(rb"\"((?:[^\"\\]|\\.)*)\"\s*$")
+_ID = re.compile(rb"\bid\s*:\s*'?(\d+)")
+_CHAIN = re.compile(rb"(?:^|,)\s*chain\s*(?:,|$)")
+_DATA_FILE = re.compile(rb"@\w+FromFile\s+([^\s\"]+)")
+
+
+def read_rule_files(rules_dir: str, revision: Optional[str] = None) -> dict[str, bytes]:
+    """
+    read_rule_files() reads the files of the rules, from the directory or from a git revision of it.
+
+    Args:
+        rules_dir (str): directory of the rules
+        revision (Optional[str], optional): git revision of the directory (e.g., a commit hash).
+            Defaults to None (the files in the directory).
+
+    Raises:
+        ValueError: if the revision cannot be read
+
+    Returns:
+        dict[str, bytes]: content of each file, keyed by its path relative to the directory
+    """
+    if revision is None:
+        res = {}
+        for root, _, files in os.walk(rules_dir):
+            for file_name in files:
+                file_path = os.path.join(root, file_name)
+                with open(file_path, "rb") as f:
+                    res[os.path.relpath(file_path, rules_dir)] = f.read()
+        return res
+
+    try:
+        # root of the repository and path of rules_dir in it, the archive only contains the rules
+        root, prefix = subprocess.run(["git", "-C", rules_dir, "rev-parse", "--show-toplevel", "--show-prefix"],
+                                      capture_output=True, text=True, check=True).stdout.split("\n")[:2]
+        archive = subprocess.run(["git", "-C", root, "archive", "--format=tar", f"{revision}:{prefix}"],
+                                 capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise ValueError(f"Failed to read the rules of {revision} from {rules_dir}: {e.stderr}") from e
+
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        return {os.path.normpath(member.name): tar.extractfile(member).read() for member in tar if member.isfile()}
+
+
+def rule_digests(files: dict[str, bytes]) -> dict[str, str]:
+    """
+    rule_digests() returns a digest of each rule in the `.conf` files, it changes when the rule changes.
+
+    Args:
+        files (dict[str, bytes]): files of the rules (see `read_rule_files()`)
+
+    Returns:
+        dict[str, str]: digest of each rule, keyed by rule id
+    """
+    texts: dict[str, List[bytes]] = {}
+    data_files = {os.path.basename(path): content for path, content in files.items()}
+
+    for rule_id, directive in iter_rules(files, updates=True):
+        parts = texts.setdefault(rule_id, [])
+        parts.append(directive)
+        parts += [b"%s:%s" % (name, data_files.get(name.decode(), b"")) for name in _DATA_FILE.findall(directive)]
+
+    return {rule_id: hashlib.sha256(b"\n".join(parts)).hexdigest() for rule_id, parts in texts.items()}
+
+
+def iter_rules(files: dict[str, bytes], updates: bool = False) -> Iterator[tuple[str, bytes]]:
+    """
+    iter_rules() iterates over the `SecRule` and `SecAction` directives in the `.conf` files (in sorted order),
+    with the id of their rule, i.e., the id of the chain head for a chained rule.
+
+    Args:
+        files (dict[str, bytes]): files of the rules (see `read_rule_files()`)
+        updates (bool, optional): also the directives updating a rule by id. Defaults to False.
+
+    Returns:
+        Iterator[tuple[str, bytes]]: rule id and directive (without the line continuations)
+    """
+    for path in sorted(path for path in files if path.endswith(".conf")):
+        chain_head = None
+        for directive in _directives(files[path]):
+            update = _UPDATE_BY_ID.match(directive)
+            if update is not None:
+                if updates:
+                    yield update.group(1).decode(), directive
+                continue
+
+            if not _DIRECTIVE.match(directive):
+                continue
+
+            actions = _ACTIONS.search(directive)
+            actions = actions.group(1) if actions else b""
+            rule_id = _ID.search(actions)
+            rule_id = rule_id.group(1).decode() if rule_id else chain_head
+            if rule_id is None:
+                continue
+
+            yield rule_id, directive
+            chain_head = rule_id if _CHAIN.search(actions) else None
+
+
+def changed_rules(before: dict[str, str], after: dict[str, str]) -> List[str]:
+    """
+    changed_rules() returns the ids of the rules added, removed or changed between two sets of rule digests.
+    """
+    return sorted(rule_id for rule_id in before.keys() | after.keys() if before.get(rule_id) != after.get(rule_id))
+
+
+class ChangeImpactIndex:
+    """
+    ChangeImpactIndex maps the rule ids to the go-ftw test files of a corpus (e.g., `tests/regression/tests`),
+    by the test ids in each file (e.g., `920170-1` tests the rule `920170`), and the rule families (e.g., `920`)
+    to the directories of their test files.
+
+    Args:
+        - `test_cases_dir` (str): directory of the go-ftw YAML files
+        - `cache` (Optional[FTWCorpusCache], optional): cache of the parsed files. Defaults to FTWCorpusCache().
+    """
+    test_cases_dir: str
+    test_files: dict[str, List[str]]
+    family_dirs: dict[str, List[str]]
+
+    def __init__(self, test_cases_dir: str, cache: Optional[FTWCorpusCache] = None):
+        self.test_cases_dir = test_cases_dir
+        self.test_files, self.family_dirs = {}, {}
+
+        for file_path, tests in (cache or FTWCorpusCache()).load(test_cases_dir).items():
+            for rule_id in dict.fromkeys(rule_id_of(str(test_title)) for test_title, _ in tests):
+                self.test_files.setdefault(rule_id, []).append(file_path)
+                family_dirs = self.family_dirs.setdefault(rule_family_of(rule_id), [])
+                if os.path.dirname(file_path) not in family_dirs:
+                    family_dirs.append(os.path.dirname(file_path))
+
+    def affected_test_files(self, rule_ids: Iterable[str]) -> List[str]:
+        """
+        affected_test_files() returns the test files of the rules. A rule without tests (e.g., a new rule)
+        falls back to the test files in the directories of its family.
+
+        Args:
+            rule_ids (Iterable[str]): ids of the changed rules
+
+        Returns:
+            List[str]: paths of the test files, in sorted order
+        """
+        res = set()
+        for rule_id in rule_ids:
+            if rule_id in self.test_files:
+                res.update(self.test_files[rule_id])
+                continue
+
+            family_dirs = self.family_dirs.get(rule_family_of(rule_id), [])
+            if family_dirs:
+                logger.info(f"Rule {rule_id} has no test, the tests of family {rule_family_of(rule_id)} are run")
+            res.update(file_path for files in self.test_files.values() for file_path in files
+                       if os.path.dirname(file_path) in family_dirs)
+        return sorted(res)
+
+    def write_corpus(self, rule_ids: Iterable[str], dest: str) -> int:
+        """
+        write_corpus() builds a corpus of the test files of the rules, with the layout of the full corpus,
+        so go-ftw and the load generators run it as `test_cases_dir`.
+
+        Args:
+            rule_ids (Iterable[str]): ids of the changed rules
+            dest (str): directory of the corpus, it is emptied first
+
+        Returns:
+            int: number of test files in the corpus
+        """
+        shutil.rmtree(dest, ignore_errors=True)
+        os.makedirs(dest)
+
+        file_paths = self.affected_test_files(rule_ids)
+        for file_path in file_paths:
+            target = os.path.join(dest, os.path.relpath(file_path, self.test_cases_dir))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(file_path, target)
+        return len(file_paths)
+
+
+def _directives(content: bytes) -> List[bytes]:
+    """
+    _directives() splits a config file into directives, joining the continued lines and dropping the comments.
+    """
+    lines = _CONTINUATION.sub(b" ", content).splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith(b"#")]
@@ -2,9 +2,11 @@
 Module CollectCommandArg is a class for storing the arguments for collect command,
 it is used when the user wants to collect data with any util.
 """
+import copy
 import os
 from typing import List, Optional
-from src.type import UtilType, Mode
+from src.type import UtilType, Mode, State
+from .WafTarget import WafTarget, DEFAULT_WAF_CONTAINER
 
 
 class CollectCommandArg:
@@ -14,13 +16,36 @@ class CollectCommandArg:
 
     Args:
         test_name (str): Name of the test
-        utils (Optional[List[UtilType]]): Utilities to be used for collecting data. Default: all
+        utils (Optional[List[UtilType]]): Utilities to be used for collecting data.
+            Default: `default_utils` (the offline utils and the sweeps are opt-in)
         raw_output (Optional[str]): Raw data output folder. Default: ./data
         output (Optional[str]): Report output folder. Default: ./report
         waf_endpoint (Optional[str]): WAF endpoint. Default: http://localhost:80
         mode (Optional[Mode]): mode for running the command. Default: cli
         rules_dir (Optional[str]): Directory containing WAF rules. Default: ./rules
         test_cases_dir (Optional[str]): Directory containing test cases. Default: ./tests/regression/tests
+        deadline (Optional[float]): Global deadline of the collect in seconds. Default: None (no deadline)
+        workers (Optional[int]): Number of local locust worker processes, 0 runs locust standalone.
+            Default: None (number of CPUs)
+        worker_endpoints (Optional[List[str]]): Endpoints of additional locust workers (e.g., ssh://user@host).
+            Default: none
+        before (Optional[str]): Git revision of the rules before the change, for a paired collect. Default: None
+        after (Optional[str]): Git revision of the rules after the change, for a paired collect. Default: None
+        blocks (Optional[int]): Number of blocks run for each revision of a paired collect. Default: 4
+        block_duration (Optional[float]): Seconds of load of each block (or run) of load generators.
+            Default: None (the default runtime of each load generator)
+        incremental (Optional[str]): Only run the tests of the rules changed since this git revision
+            (or directory) of the rules, an empty string is the `before` revision. Default: None (all the tests)
+        result_cache (Optional[bool]): Reuse the raw data of a previous collect with the same inputs
+            (see `ResultCache`). Default: False
+        host_tag (Optional[str]): Class of the host in the fingerprint of the result cache.
+            Default: None (`CRS_HOST_TAG`, or the machine, OS and CPUs)
+        request_table (Optional[str]): Request table replayed by the load generators instead of the requests
+            built from the test cases (e.g., a corpus generated by `FuzzUtil`). Default: None
+        attribution (Optional[List[str]]): Rule ids or families (e.g., 942100, 920) left out one at a time
+            for a leave-one-out attribution (see `AttributionCollect`). Default: None
+        waf_targets (Optional[List[WafTarget]]): WAFs run side by side, the same load is sent to each of them
+            (see `MatrixCollect`). Default: None (the `modsec2-apache` container at `waf_endpoint`)
     """
     test_name: str
     utils: List[UtilType]
@@ -30,12 +55,26 @@ class CollectCommandArg:
     mode: Mode
     rules_dir: str
     test_cases_dir: str
+    deadline: Optional[float]
+    workers: Optional[int]
+    worker_endpoints: List[str]
+    before: Optional[str]
+    after: Optional[str]
+    blocks: int
+    block_duration: Optional[float]
+    incremental: Optional[str]
+    result_cache: bool
+    host_tag: Optional[str]
+    request_table: Optional[str]
+    attribution: Optional[List[str]]
+    waf_targets: List[WafTarget]
 
     # auto-generated folder for storing temporary files
     tmp_dir: str = './tmp'
 
-    # @TODO: move to config
-    modsec_version: str = 'modsec2-apache'
+    # utils run alongside the load without skewing it, the others (e.g., regex, scaling, fuzz) saturate the CPUs
+    # or send their own requests, they are only run when selected
+    default_utils: List[UtilType] = [UtilType.FTW, UtilType.LOCUST, UtilType.CADVISOR]
 
     def __init__(self,
                  test_name: str,
@@ -45,16 +84,106 @@ class CollectCommandArg:
                  waf_endpoint: Optional[str],
                  mode: Optional[Mode],
                  rules_dir: Optional[str],
-                 test_cases_dir: Optional[str]
+                 test_cases_dir: Optional[str],
+                 deadline: Optional[float] = None,
+                 workers: Optional[int] = None,
+                 worker_endpoints: Optional[List[str]] = None,
+                 before: Optional[str] = None,
+                 after: Optional[str] = None,
+                 blocks: Optional[int] = None,
+                 block_duration: Optional[float] = None,
+                 incremental: Optional[str] = None,
+                 result_cache: Optional[bool] = None,
+                 host_tag: Optional[str] = None,
+                 request_table: Optional[str] = None,
+                 attribution: Optional[List[str]] = None,
+                 waf_targets: Optional[List[WafTarget]] = None
                  ):
         self.test_name = test_name
-        self.utils = utils if (utils is not None and len(utils)) else [util for util in UtilType]
+        self.utils = utils if (utils is not None and len(utils)) else list(self.default_utils)
         self.mode = mode if mode else Mode.CLI
 
         self.raw_output = f"{raw_output}/{self.test_name}" if raw_output else f"./data/{self.test_name}"
         self.output = f"{output}/{self.test_name}" if output else f"./report/{self.test_name}"
-        self.waf_endpoint = waf_endpoint if waf_endpoint else "http://localhost:80"
+        self.waf_endpoint = waf_endpoint if waf_endpoint else (
+            waf_targets[0].endpoint if waf_targets else "http://localhost:80")
         self.rules_dir = rules_dir if rules_dir else "./rules"
         self.test_cases_dir = test_cases_dir if test_cases_dir else "./tests/regression/tests"
+        self.deadline = deadline
+        self.workers = workers
+        self.worker_endpoints = worker_endpoints if worker_endpoints else []
+        self.before = before
+        self.after = after
+        self.blocks = blocks if blocks else 4
+        self.block_duration = block_duration
+        self.incremental = incremental
+        self.result_cache = bool(result_cache)
+        self.host_tag = host_tag
+        self.request_table = request_table
+        self.attribution = attribution if attribution else None
+        self.waf_targets = waf_targets if waf_targets else [WafTarget(DEFAULT_WAF_CONTAINER, self.waf_endpoint)]
 
         self.tmp_dir = os.path.join(self.tmp_dir, self.test_name)
+
+    @property
+    def modsec_version(self) -> str:
+        """
+        modsec_version is the container of the (first) WAF target, e.g., `modsec2-apache`.
+        """
+        return self.waf_targets[0].name
+
+    @property
+    def matrix(self) -> bool:
+        """
+        matrix is True if several WAFs are collected side by side in the same run.
+        """
+        return len(self.waf_targets) > 1
+
+    @property
+    def paired(self) -> bool:
+        """
+        paired is True if the rules before and after the change are collected in the same run.
+        """
+        return self.before is not None and self.after is not None
+
+    def block_args(self, state: State, block: int, waf_endpoint: str,
+                   rules_dir: Optional[str] = None) -> 'CollectCommandArg':
+        """
+        block_args() returns a copy of the args for a block of a paired collect, whose raw data is stored
+        in `<raw_output>/<state>/block-<block>` and sent to the WAF of the state.
+
+        Args:
+            state (State): revision of the rules
+            block (int): index of the block
+            waf_endpoint (str): endpoint of the WAF running the rules of the state
+            rules_dir (Optional[str], optional): rules of the state. Defaults to None (`rules_dir`).
+
+        Returns:
+            CollectCommandArg: args of the block
+        """
+        res = copy.copy(self)
+        res.raw_output = os.path.join(self.raw_output, state.value, f"block-{block}")
+        res.tmp_dir = os.path.join(self.tmp_dir, state.value)
+        res.waf_endpoint = waf_endpoint
+        res.rules_dir = rules_dir or self.rules_dir
+        return res
+
+    def variant_args(self, name: str, waf_endpoint: str, rules_dir: str) -> 'CollectCommandArg':
+        """
+        variant_args() returns a copy of the args for a variant of the rules (e.g., of a leave-one-out attribution),
+        whose raw data is stored in `<raw_output>/<name>` and sent to the WAF running the rules of the variant.
+
+        Args:
+            name (str): name of the variant, a relative path (e.g., `without-942100`)
+            waf_endpoint (str): endpoint of the WAF running the rules of the variant
+            rules_dir (str): rules of the variant
+
+        Returns:
+            CollectCommandArg: args of the variant
+        """
+        res = copy.copy(self)
+        res.raw_output = os.path.join(self.raw_output, name)
+        res.tmp_dir = os.path.join(self.tmp_dir, name)
+        res.waf_endpoint = waf_endpoint
+        res.rules_dir = rules_dir
+        return res
@@ -0,0 +1,99 @@
+"""
+Module CollectScheduler defines the CollectScheduler class, which runs the selected utils of a collect
+command concurrently, so the resource data of samplers covers exactly the load window.
+"""
+import asyncio
+from itertools import groupby
+from typing import Awaitable, Callable, List, Optional
+from src.type import UtilRole
+from src.utils import logger
+from .Util import Util, CollectCommandArg
+from .FTWUtil import FTWUtil
+
+
+class CollectScheduler:
+    """
+    CollectScheduler runs the utils of a collect command concurrently.
+
+    1. samplers (e.g., cAdvisor) are prepared, and then run as background tasks.
+    2. load generators (e.g., go-ftw, locust) run phase by phase (in ascending `phase`),
+       the load generators in the same phase run in parallel.
+    3. once all the phases complete, samplers are stopped and flush their data.
+
+    Everything is bounded by a global deadline. When it is reached, the running load generators are cancelled
+    (i.e., their subprocesses are killed) and samplers are stopped as usual.
+
+    If no load generator is selected, go-ftw is run as the load, without saving its output.
+    The load can be given instead of the phases (e.g., the loads against several WAFs, see `MatrixCollect`).
+
+    Args:
+        - `utils` (List[Util]): utils to run
+        - `deadline` (Optional[float], optional): global deadline in seconds. Defaults to None (no deadline).
+    """
+    utils: List[Util]
+    deadline: Optional[float]
+
+    def __init__(self, utils: List[Util], deadline: Optional[float] = None):
+        self.utils = utils
+        self.deadline = deadline
+
+    @property
+    def samplers(self) -> List[Util]:
+        return [util for util in self.utils if util.role == UtilRole.SAMPLER]
+
+    @property
+    def phases(self) -> List[List[Util]]:
+        loads = sorted((util for util in self.utils if util.role == UtilRole.LOAD), key=lambda util: util.phase)
+        return [list(phase) for _, phase in groupby(loads, key=lambda util: util.phase)]
+
+    async def run(self, args: CollectCommandArg, loads: Optional[Callable[[], Awaitable[bool]]] = None) -> bool:
+        """
+        run() runs all the utils.
+
+        Args:
+            args (CollectCommandArg): collect command arg
+            loads (Optional[Callable[[], Awaitable[bool]]], optional): runs the load instead of the phases of the
+                load generators, returns False if it is not completed. Defaults to None (the phases).
+
+        Returns:
+            bool: False if the deadline is reached before all the load generators complete
+        """
+        phases = self.phases
+        if not phases and loads is None:
+            load = FTWUtil()
+            load.save_output = False
+            phases = [[load]]
+
+        loop = asyncio.get_running_loop()
+        deadline_at = None if self.deadline is None else loop.time() + self.deadline
+        stop, sampler_tasks, completed = asyncio.Event(), [], True
+
+        try:
+            async with asyncio.timeout_at(deadline_at):
+                for sampler in self.samplers:
+                    await sampler.prepare(args)
+                    sampler_tasks.append(asyncio.create_task(sampler.run(args, stop)))
+
+                if loads is not None:
+                    completed = await loads()
+
+                for idx, phase in enumerate(phases if loads is None else []):
+                    logger.info(f"Running phase {idx}: {', '.join(type(util).__name__ for util in phase)}")
+                    async with asyncio.TaskGroup() as group:
+                        for util in phase:
+                            await util.prepare(args)
+                            group.create_task(util.run(args, stop))
+
+        except TimeoutError:
+            logger.warning(f"Deadline ({self.deadline}s) reached, the running load generators are cancelled")
+            completed = False
+
+        finally:
+            # samplers take a last sample and flush their data, even if the load failed
+            stop.set()
+            for sampler, result in zip(self.samplers,
+                                       await asyncio.gather(*sampler_tasks, return_exceptions=True)):
+                if isinstance(result, BaseException):
+                    logger.error(f"{type(sampler).__name__} failed: {result!r}")
+
+        return completed
@@ -0,0 +1,108 @@
+"""
+Module DerivedMetrics derives rate metrics from the cumulative counters of resource utils
+(i.e., CAdvisorUtil and CgroupUtil). cAdvisor reports CPU usage as a monotonic counter in nanoseconds,
+comparing those values says little about the load, while the rates (e.g., CPU cores used) do.
+
+Derived metrics:
+    - `cpu_total_cores`, `cpu_user_cores`, `cpu_system_cores`: CPU cores used in each interval
+    - `memory_usage_rate`: growth of memory usage in bytes per second
+    - `network_rx_rate`, `network_tx_rate`: network I/O in bytes per second
+    - `io_read_rate`, `io_write_rate`: disk I/O in bytes per second
+    - `cpu_seconds_per_1k_requests`: CPU time spent for 1,000 requests, if the request count is known
+"""
+from typing import Optional
+import numpy as np
+from src.utils.timeseries import to_epoch_seconds
+from .MetricSeries import MetricSeries
+
+
+# derived metric name: (source metric name, scale applied to the difference per second)
+RATE_METRICS: dict[str, tuple[str, float]] = {
+    "cpu_total_cores": ("cpu_total", 1e-9),
+    "cpu_user_cores": ("cpu_user", 1e-9),
+    "cpu_system_cores": ("cpu_system", 1e-9),
+    "memory_usage_rate": ("memory_usage", 1),
+    "network_rx_rate": ("network_rx_bytes", 1),
+    "network_tx_rate": ("network_tx_bytes", 1),
+    "io_read_rate": ("io_read_bytes", 1),
+    "io_write_rate": ("io_write_bytes", 1),
+}
+
+
+def derive_rate(series: MetricSeries, scale: float = 1, times: Optional[np.ndarray] = None) -> MetricSeries:
+    """
+    derive_rate() computes `scale * (v[i] - v[i - 1]) / (t[i] - t[i - 1])` of a cumulative counter.
+    Samples of different containers (i.e., different first label) are differentiated separately.
+    Each rate is keyed by the timestamp at the end of its interval.
+
+    Args:
+        series (MetricSeries): cumulative counter keyed by ISO 8601 timestamps
+        scale (float, optional): scale of the rate, e.g., 1e-9 converts nanoseconds per second to cores. Defaults to 1.
+        times (Optional[np.ndarray], optional): unix time of the keys, if it is already computed. Defaults to None.
+
+    Returns:
+        MetricSeries: rate series, it has one item less than the series for each container
+    """
+    index, dv, dt = _deltas(series, to_epoch_seconds(series.keys) if times is None else times)
+    return series.select(index).with_values(dv / dt * scale)
+
+
+def derive_resource_metrics(data: dict[str, MetricSeries],
+                            request_count: Optional[int] = None) -> dict[str, MetricSeries]:
+    """
+    derive_resource_metrics() derives the rate metrics (see `RATE_METRICS`) from the parsed data.
+
+    Args:
+        data (dict[str, MetricSeries]): parsed data of a resource util
+        request_count (Optional[int], optional): number of requests sent by load generators. Defaults to None.
+
+    Returns:
+        dict[str, MetricSeries]: derived metrics
+    """
+    res: dict[str, MetricSeries] = {}
+
+    # the metrics of a util share the same keys, the timestamps are parsed once
+    times_cache: dict[int, np.ndarray] = {}
+
+    def times_of(series: MetricSeries) -> np.ndarray:
+        if id(series.keys) not in times_cache:
+            times_cache[id(series.keys)] = to_epoch_seconds(series.keys)
+        return times_cache[id(series.keys)]
+
+    for name, (source, scale) in RATE_METRICS.items():
+        if source in data:
+            res[name] = derive_rate(data[source], scale, times_of(data[source]))
+
+    if request_count and "cpu_total" in data:
+        # CPU time consumed in the load window, summed over the containers
+        _, dv, _ = _deltas(data["cpu_total"], times_of(data["cpu_total"]))
+        cpu_seconds = dv.sum() * 1e-9
+        res["cpu_seconds_per_1k_requests"] = MetricSeries(["cpu_seconds_per_1k_requests"],
+                                                          [cpu_seconds / request_count * 1000])
+
+    return res
+
+
+def _deltas(series: MetricSeries, times: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    _deltas() computes the differences between consecutive samples of each container.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: index of the interval ends, value differences, time differences
+    """
+    # group by the first label (i.e., container), -1 for samples without labels
+    has_label = np.diff(series.label_offsets) > 0
+    group = np.full(len(series), -1, dtype=np.int64)
+    group[has_label] = series.label_codes[series.label_offsets[:-1][has_label]]
+
+    order = np.lexsort((times, group))
+    sorted_times, sorted_group = times[order], group[order]
+    sorted_values = series.values[order].astype(np.float64)
+
+    dt, dv = np.diff(sorted_times), np.diff(sorted_values)
+    valid = (sorted_group[1:] == sorted_group[:-1]) & (dt > 0)
+    index, dv, dt = order[1:][valid], dv[valid], dt[valid]
+
+    # restore the original order of the samples
+    original = np.argsort(index, kind="stable")
+    return index[original], dv[original], dt[original]
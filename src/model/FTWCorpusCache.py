@@ -0,0 +1,167 @@
+"""
+Module FTWCorpusCache defines the FTWCorpusCache class, a persistent cache of parsed go-ftw YAML files.
+"""
+import hashlib
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, List, Optional, Tuple
+from src.utils import logger
+from .FTWTestSchema import FTWTests, load_ftw_tests
+
+# a process parses at least this number of files, otherwise the pool costs more than it saves
+_MIN_FILES_PER_PROCESS = 16
+
+
+class FTWCorpusCache:
+    """
+    FTWCorpusCache caches the compact form of the go-ftw YAML files in a corpus (e.g., `tests/regression/tests`),
+    so only the files that changed since the last run are parsed again.
+
+    A cache file is kept per corpus directory. It stores an index keyed by file path, with the size,
+    the mtime and the content hash of each file, and the parsed tests (with their parse time) keyed by the content hash:
+    - an unchanged file (same size and mtime) is neither read nor parsed.
+    - a touched, moved or reverted file is read and hashed, and its tests are reused if the content is known.
+    - other files are parsed by a pool of processes, then the cache file is rewritten atomically.
+
+    Args:
+        - `cache_dir` (str, optional): directory of the cache files. Defaults to "./tmp/ftw_corpus_cache".
+    """
+    cache_dir: str
+
+    # parse time in seconds of each file loaded by the last `load()`, kept in the cache for cached files,
+    # so the pathological test files can be spotted on every run
+    parse_timings: dict[str, float]
+
+    # bumped when the compact form changes, older cache files are discarded
+    __version: int = 2
+
+    def __init__(self, cache_dir: str = "./tmp/ftw_corpus_cache"):
+        self.cache_dir = cache_dir
+        self.parse_timings = {}
+
+    def load(self, corpus_dir: str,
+             parse: Callable[[bytes], FTWTests] = load_ftw_tests,
+             processes: Optional[int] = None) -> dict[str, FTWTests]:
+        """
+        load() loads the tests of every file in a corpus, using the cache when possible.
+
+        Args:
+            corpus_dir (str): directory of the go-ftw YAML files
+            parse (Callable[[bytes], FTWTests], optional): parser of a file content. Defaults to load_ftw_tests.
+            processes (Optional[int], optional): number of processes parsing the files that are not cached,
+                see `parse_in_parallel()`. Defaults to None (number of CPUs).
+
+        Returns:
+            dict[str, FTWTests]: tests of each file, keyed by file path in sorted order
+        """
+        cache_path = self.cache_path(corpus_dir)
+        index, blobs = self.__read(cache_path)
+        new_index, misses = {}, {}
+
+        for file_path in _walk(corpus_dir):
+            stat = os.stat(file_path)
+            entry = index.get(file_path)
+
+            if entry is not None and entry[:2] == (stat.st_size, stat.st_mtime_ns) and entry[2] in blobs:
+                digest = entry[2]
+            else:
+                with open(file_path, "rb") as f:
+                    content = f.read()
+                digest = hashlib.sha256(content).hexdigest()
+                if digest not in blobs:
+                    misses[digest] = content
+
+            new_index[file_path] = (stat.st_size, stat.st_mtime_ns, digest)
+
+        blobs.update(zip(misses, parse_in_parallel(list(misses.values()), parse, processes)))
+
+        if new_index != index:
+            # only the tests of the current files are kept
+            self.__write(cache_path, new_index, {digest: blobs[digest] for _, _, digest in new_index.values()})
+
+        self.parse_timings = {file_path: blobs[digest][1] for file_path, (_, _, digest) in new_index.items()}
+        return {file_path: blobs[digest][0] for file_path, (_, _, digest) in new_index.items()}
+
+    def cache_path(self, corpus_dir: str) -> str:
+        """
+        cache_path() returns the path of the cache file of a corpus directory.
+        """
+        key = hashlib.sha256(os.path.abspath(corpus_dir).encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{key}.pickle")
+
+    def __read(self, cache_path: str) -> tuple[dict, dict]:
+        """
+        __read() reads the index and the tests from a cache file, a missing or invalid file is read as empty.
+        """
+        if not os.path.exists(cache_path):
+            return {}, {}
+
+        try:
+            with open(cache_path, "rb") as f:
+                version, index, blobs = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Invalid go-ftw corpus cache {cache_path} is discarded: {e!r}")
+            return {}, {}
+
+        if version != self.__version:
+            return {}, {}
+        return index, blobs
+
+    def __write(self, cache_path: str, index: dict, blobs: dict):
+        """
+        __write() writes a cache file atomically, so a concurrent reader never sees a partial file.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+
+        with open(tmp_path, "wb") as f:
+            pickle.dump((self.__version, index, blobs), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
+
+def parse_in_parallel(contents: List[bytes],
+                      parse: Callable[[bytes], FTWTests] = load_ftw_tests,
+                      processes: Optional[int] = None) -> List[Tuple[FTWTests, float]]:
+    """
+    parse_in_parallel() parses file contents in a pool of processes, the contents are sharded in contiguous chunks
+    and the results are returned in the order of `contents`. A few files are parsed in the current process,
+    where starting the pool costs more than parsing.
+
+    Args:
+        contents (List[bytes]): contents of the go-ftw YAML files
+        parse (Callable[[bytes], FTWTests], optional): picklable parser of a file content.
+            Defaults to load_ftw_tests.
+        processes (Optional[int], optional): number of processes. Defaults to None (number of CPUs).
+
+    Returns:
+        List[Tuple[FTWTests, float]]: tests and parse time in seconds of each content
+    """
+    processes = processes or os.cpu_count() or 1
+    parse_timed = partial(_parse_timed, parse)
+
+    if processes == 1 or len(contents) < _MIN_FILES_PER_PROCESS * 2:
+        return [parse_timed(content) for content in contents]
+
+    processes = min(processes, len(contents) // _MIN_FILES_PER_PROCESS)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(parse_timed, contents, chunksize=-(-len(contents) // (processes * 4))))
+
+
+def _parse_timed(parse: Callable[[bytes], FTWTests], content: bytes) -> Tuple[FTWTests, float]:
+    start = time.perf_counter()
+    tests = parse(content)
+    return tests, time.perf_counter() - start
+
+
+def _walk(corpus_dir: str) -> list[str]:
+    """
+    _walk() lists the files in a directory recursively, in a deterministic order.
+    """
+    res = []
+    for root, dirs, files in os.walk(corpus_dir):
+        dirs.sort()
+        res += [os.path.join(root, file_name) for file_name in sorted(files)]
+    return res
@@ -0,0 +1,90 @@
+"""
+Module FTWTestSchema defines the test cases parsed from go-ftw YAML files, and their compact form
+(i.e., plain tuples and dicts) which is stored by `FTWCorpusCache`.
+"""
+from typing import List, Tuple
+import yaml
+from src.utils import logger
+
+# compact form of a go-ftw YAML file: [(test_title, [stage input, ...]), ...]
+FTWTests = List[Tuple[str, List[dict]]]
+
+# the C loader of libyaml is ~10x faster than the pure-Python loader, when PyYAML is built with it
+_SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class _FTWTestInput:
+    """
+    _FTWTestInput is the input of a stage in a go-ftw test, unknown fields are kept as attributes.
+    """
+    method: str = "GET"
+    port: int = 80
+    headers: dict = {}
+    data: str = ""
+    uri: str = "/"
+
+    def __init__(self, dict: dict):
+        for k, v in dict.items():
+            setattr(self, k, v)
+
+        HTTP_METHOD_LIST = ["GET", "HEAD", "POST", "PUT", "DELETE"
+                            , "OPTIONS", "TRACE", "PATCH"]
+
+        if self.method not in HTTP_METHOD_LIST:
+            logger.warning(f"Invalid method in go-ftw yaml. Testcase: {self.method}, replace for 'GET to bypass'")
+            self.method = "GET"
+
+class _FTWTestSchema:
+    """
+    _FTWTestSchema is a go-ftw test, i.e., its title and the inputs of its stages.
+    """
+    test_title: str
+    stages: List[_FTWTestInput]
+
+    def __init__(self, test_title: str, stages: List[_FTWTestInput]):
+        self.test_title = test_title
+        self.stages = stages
+
+
+def load_ftw_tests(content: bytes | str) -> FTWTests:
+    """
+    load_ftw_tests() parses the content of a go-ftw YAML file into the compact form.
+
+    Args:
+        content (bytes | str): content of the YAML file
+
+    Returns:
+        FTWTests: title and stage inputs of each test
+    """
+    data = yaml.load(content, Loader=_SafeLoader)
+    return [
+        (test["test_title"], [stage["stage"]["input"] for stage in test["stages"]])
+        for test in data["tests"]
+    ]
+
+
+def to_ftw_test_schemas(tests: FTWTests, case_limit: float = 1e10) -> List[_FTWTestSchema]:
+    """
+    to_ftw_test_schemas() builds the test cases from the compact form, at most `case_limit` stages are kept.
+
+    Args:
+        tests (FTWTests): compact form of the tests
+        case_limit (float, optional): maximum number of stages. Defaults to 1e10.
+
+    Returns:
+        List[_FTWTestSchema]: the test cases
+    """
+    res, cnt = [], 0
+
+    for test_title, stages in tests:
+        inputs: List[_FTWTestInput] = []
+        for stage in stages:
+            inputs.append(_FTWTestInput(stage))
+            cnt += 1
+            if cnt >= case_limit:
+                break
+        res.append(_FTWTestSchema(test_title, inputs))
+        if cnt >= case_limit:
+            break
+
+    return res
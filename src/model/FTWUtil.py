@@ -1,13 +1,14 @@
 """
 Module FTWUtil is a class for collecting data from go-ftw, it utilizes the go-ftw for calling the testcases and parsing the data.
 """
-import subprocess
-import os
+import asyncio
 import json
-import time
-from typing import List
+import os
+from urllib.parse import urlsplit
+import numpy as np
+import yaml
 from src.type import Mode
-from .Util import ParsedDataItem, Util, ReportCommandArg, CollectCommandArg
+from .Util import ParsedDataItem, MetricSeries, Util, ReportCommandArg, CollectCommandArg, test_labels_of
 
 
 REPORT_PLAIN_TEXT_FORMAT: str = (
@@ -31,25 +32,77 @@ class FTWUtil(Util):
     """
 
     raw_filename: str = "ftw.json"
+    threshold_filename: str = "ftw.threshold.json"
+    comparison_metrics = {"runtime": "latency"}
+
+    # False when go-ftw is only used to apply load (e.g., for samplers)
+    save_output: bool = True
+
+    # go-ftw config, the destination of its tests is overridden with the WAF endpoint (see `write_config()`)
+    ftw_config: str = ".ftw.yaml"
+
+    # go-ftw requires time to spin up, otherwise the I/O might be timeout
+    spin_up_time: float = 5
 
     def collect(self, args: CollectCommandArg):
-        # go-ftw requires time to spin up, otherwise the I/O might be timeout
-        time.sleep(5)
+        asyncio.run(self.run(args, asyncio.Event()))
+
+    async def run(self, args: CollectCommandArg, stop: asyncio.Event):
+        await asyncio.sleep(self.spin_up_time)
 
         # @TODO: better wrapping for different mode
         ftw_util_path = './ftw' if args.mode == Mode.PIPELINE.value else 'go-ftw'
 
-        output_file = f"{args.raw_output}/{self.raw_filename}"
-        command = f'{ftw_util_path} run -d "{args.test_cases_dir}" -o json > "{output_file}"'
+        command = f'{ftw_util_path} run --config "{self.write_config(args)}" -d "{args.test_cases_dir}" -o json'
+
+        # @TODO: handle errors from go-ftw
+        if not self.save_output:
+            await self._run_command(command)
+            return
 
-        f = open(output_file, "w")
-        proc = subprocess.Popen([command], stdout=f, stderr=subprocess.PIPE, shell=True)
-        if proc.returncode != 0:
-            # @TODO: handle errors from go-ftw
-            print(proc.stderr.read().decode())
+        with open(f"{args.raw_output}/{self.raw_filename}", "w") as f:
+            await self._run_command(command, stdout=f)
         f.close()
 
+    def write_config(self, args: CollectCommandArg) -> str:
+        """
+        write_config() writes the go-ftw config of a run into `tmp_dir`: `ftw_config` (if any), whose `testoverride`
+        sends every test to `waf_endpoint`. Otherwise, go-ftw sends the tests to the destination of each test
+        (i.e., localhost:80), not to the WAF of the run (e.g., a block of a paired collect, or a WAF target).
+
+        Args:
+            args (CollectCommandArg): collect command arg
+
+        Returns:
+            str: path of the config
+        """
+        config = {}
+        if os.path.exists(self.ftw_config):
+            with open(self.ftw_config, "r") as f:
+                config = yaml.safe_load(f) or {}
+
+        url = urlsplit(args.waf_endpoint)
+        testoverride = config.get("testoverride") or {}
+        testoverride["input"] = {
+            **(testoverride.get("input") or {}),
+            "dest_addr": url.hostname,
+            "port": url.port or (443 if url.scheme == "https" else 80),
+            "protocol": url.scheme,
+        }
+        config["testoverride"] = testoverride
+
+        os.makedirs(args.tmp_dir, exist_ok=True)
+        path = os.path.join(args.tmp_dir, "ftw.yaml")
+        with open(path, "w") as f:
+            yaml.safe_dump(config, f)
+        return path
+
     def text_report(self, args: ReportCommandArg):
+        states = self.parse_states(args.raw_output)
+        if states:
+            self.paired_text_report(args, states)
+            return
+
         data = self.parse_data(f"{args.raw_output}/{self.raw_filename}")
 
         # generate report
@@ -64,26 +117,21 @@ class FTWUtil(Util):
 
         print(report)
 
-        if not args.threshold_conf:
-            return
-
-        thresholds = self._get_threshold(os.path.join(args.threshold_conf, "ftw.threshold.json"))
-
-        for threshold in thresholds:
-            threshold.inspect(data[threshold.metric_name])
+        self._report_thresholds(args, None, data)
 
     def figure_report(self, args: ReportCommandArg):
         pass
 
-    def parse_data(self, file_path: str) -> dict[str, List[ParsedDataItem]]:
+    def parse_data(self, file_path: str) -> dict[str, MetricSeries | ParsedDataItem]:
         """
-        parse_data parses the raw data from go-ftw into a dict of ParsedDataItem
+        parse_data parses the raw data from go-ftw into a dict of MetricSeries.
+        Single values (i.e., `run` and `totalTime`) are parsed into ParsedDataItem.
 
         Args:
             file_path (str): file path of the raw data
 
         Returns:
-            dict[str, List[ParsedDataItem]]: data parsed from the file
+            dict[str, MetricSeries | ParsedDataItem]: data parsed from the file
         """
         res = { "run": None, "success": [], "failed": [], "skipped": [], "runtime": [] }
 
@@ -91,10 +139,14 @@ class FTWUtil(Util):
             raw_data = json.load(f)
 
             res["run"] = ParsedDataItem('run', raw_data['run'], [])
-            res["success"] = [ParsedDataItem("caseID", rule, [rule]) for rule in raw_data["success"]]            
-            res["failed"] = [ParsedDataItem("caseID", rule, [rule]) for rule in raw_data["failed"]]
-            res["skipped"] = [ParsedDataItem("caseID", rule, [rule]) for rule in raw_data["skipped"]]
-            res["runtime"] = [ParsedDataItem(rule, raw_data["runtime"][rule], [rule, rule.split("-")[0]]) for rule in raw_data["runtime"]]
+            for status in ["success", "failed", "skipped"]:
+                rules = raw_data[status]
+                res[status] = MetricSeries(["caseID"] * len(rules), rules, [[rule] for rule in rules])
+
+            rules = list(raw_data["runtime"])
+            res["runtime"] = MetricSeries(rules,
+                                          np.fromiter(raw_data["runtime"].values(), dtype=np.float64, count=len(rules)),
+                                          [test_labels_of(rule) for rule in rules])
             res["totalTime"] = ParsedDataItem("TotalTime", raw_data["TotalTime"], [])
         f.close()
         return res
@@ -0,0 +1,345 @@
+"""
+Module FuzzUtil defines the FuzzUtil class, which generates a worst-case corpus from the go-ftw tests:
+their payloads are mutated to maximize the matching time of the `@rx` patterns of the rules,
+and the costliest variants are saved as a request table for the load generators.
+
+Usage:
+    ```sh
+    TEST_NAME=example
+    poetry run collect --test-name $TEST_NAME --utils fuzz --rules-dir ./rules
+    poetry run report --test-name $TEST_NAME --utils fuzz
+    # replay the worst-case corpus
+    poetry run collect --test-name $TEST_NAME-load --utils locust --request-table ./data/$TEST_NAME/fuzz_requests.bin
+    ```
+"""
+import asyncio
+import csv
+import multiprocessing
+import os
+import random
+import re
+import time
+from functools import partial
+from typing import List, Optional
+from urllib.parse import quote
+import numpy as np
+from astropy.table import Table
+from src.utils import logger, write_request_table
+from .FTWTestSchema import _FTWTestInput
+from .RegexProfilerUtil import compile_pattern, match_time, payloads_of, _engine
+from .ScalingSweepUtil import RegexScalingUtil, payload_size, _FIXED_HEADERS
+from .Util import ParsedDataItem, MetricSeries, Util, ReportCommandArg, CollectCommandArg, \
+    rule_family_of, table_request_of
+
+# pairs wrapped around a value by the nesting mutation
+_NESTING: List[tuple[str, str]] = [("(", ")"), ("[", "]"), ("{\"a\":", "}"), ("\"", "\""), ("'", "'"),
+                                   ("<a>", "</a>"), ("/*", "*/")]
+
+# characters kept as is in a mutated URI, the others are percent-encoded
+_URI_SAFE = "!#$%&'()*+,/:;=?@[]~"
+
+# words of a pattern (e.g., `union` of `union\s+select`), truncated into near-misses
+_PATTERN_WORD = re.compile(r"[A-Za-z]{3,}")
+
+_RAW_HEADER: List[str] = ["Rule ID", "Seed Cost", "Worst Cost", "Variants", "Generations", "Error"]
+
+
+class FuzzUtil(Util):
+    """
+    FuzzUtil searches, for each rule with `@rx` patterns, the variants of the stages of its go-ftw tests
+    (see `RegexScalingUtil.rule_stages()`) which take the longest to match its patterns.
+
+    The search is a genetic search per rule, in a pool of processes: the `population` costliest stages
+    are mutated (see `mutate_stage()`: encodings, repetition, nesting, and near-misses of the patterns),
+    the variants over `max_size` bytes are dropped, and the costliest stages are kept, until the budget
+    of the rule is spent. The `budget` (or `--block-duration`) in seconds is shared by the rules,
+    so the search takes about `budget` seconds.
+
+    The `keep` costliest variants of each rule are written to `fuzz_requests.bin`, a request table replayed
+    by the load generators with `--request-table`, named `<test id>-fuzz<n>` (e.g., `942100-1-fuzz0`).
+    The matching time (in microseconds) of the seeds and of the worst variant of each rule are written
+    to `fuzz_cost.csv`.
+    """
+    raw_filename: str = "fuzz_cost.csv"
+    request_table_filename: str = "fuzz_requests.bin"
+    threshold_filename: str = "fuzz.threshold.json"
+    needs_waf: bool = False
+
+    # seconds of the search, largest payload of a variant in bytes, and seed of the random generators
+    budget: float = 60
+    max_size: int = 4096
+    seed: int = 0
+
+    # stages kept in each generation, variants of each rule in the corpus, and seed stages of each rule
+    population: int = 8
+    keep: int = 3
+    seeds_per_rule: int = 4
+
+    # matches of each payload, number of processes (None is the number of CPUs), and rows in the text report
+    repeat: int = 5
+    processes: Optional[int] = None
+    report_limit: int = 20
+
+    def collect(self, args: CollectCommandArg):
+        asyncio.run(self.run(args, asyncio.Event()))
+
+    async def run(self, args: CollectCommandArg, stop: asyncio.Event):
+        sweep = RegexScalingUtil()
+        sweep.stages_per_rule = self.seeds_per_rule
+        stages = sweep.rule_stages(args)
+        if not stages:
+            logger.error(f"No @rx rule with test cases found in {args.rules_dir}, the fuzzing is skipped")
+            return
+
+        processes = self.processes or os.cpu_count() or 1
+        budget = (args.block_duration or self.budget) * min(processes, len(stages)) / len(stages)
+        items = [(rule_id, sweep.patterns[rule_id], rule_stages) for rule_id, rule_stages in stages.items()]
+        results = await self.search(items, budget)
+
+        requests, rows, unmutated = [], [], []
+        for rule_id, seed_cost, variants, generations, error in results:
+            # without a variant under `max_size` (e.g., the seeds of the size limit rules), the seed is the worst
+            if not variants and not error:
+                unmutated.append(rule_id)
+            rows.append((rule_id, seed_cost, variants[0][0] if variants else seed_cost, len(variants), generations,
+                         error))
+            requests += [table_request_of(f"{test_title}-fuzz{idx}", _FTWTestInput(stage))
+                         for idx, (_, test_title, stage) in enumerate(variants)]
+
+        count = write_request_table(os.path.join(args.raw_output, self.request_table_filename), requests)
+        write_fuzz_csv(os.path.join(args.raw_output, self.raw_filename), rows)
+        if unmutated:
+            logger.warning(f"No variant under {self.max_size} bytes of the rules {', '.join(unmutated)}, "
+                           f"their worst cost is the seed cost")
+        logger.info(f"{count} worst-case requests of {len(stages)} rules are generated")
+
+    async def search(self, items: List[tuple[str, List[str], List[tuple[str, dict]]]], budget: float) -> List[tuple]:
+        """
+        search() searches the costliest variants of each rule in a pool of processes. If the caller is cancelled
+        (e.g., the deadline is reached), the processes are terminated.
+
+        Args:
+            items (List[tuple[str, List[str], List[tuple[str, dict]]]]): rule id, patterns and seed stages
+                (with their test ids) of each rule
+            budget (float): seconds of the search of a rule
+
+        Returns:
+            List[tuple]: rule id, cost of the costliest seed, variants (cost, test id and stage, costliest first),
+                generations, and the compile error (empty if the patterns compile) of each rule
+        """
+        search = partial(_search_rule, budget=budget, repeat=self.repeat, population=self.population,
+                         keep=self.keep, max_size=self.max_size, seed=self.seed)
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            result = pool.map_async(search, items, chunksize=1)
+            while not result.ready():
+                await asyncio.sleep(0.05)
+            return result.get()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def text_report(self, args: ReportCommandArg):
+        states = self.parse_states(args.raw_output)
+        if states:
+            self.paired_text_report(args, states)
+            return
+
+        data = self.parse_data(os.path.join(args.raw_output, self.raw_filename))
+
+        amplification = data["amplification"]
+        order = np.argsort(amplification.values)[::-1][:self.report_limit]
+        output = Table()
+        output["Rule ID"] = amplification.keys[order]
+        for name, title in [("seed_cost", "Seed (us)"), ("worst_cost", "Worst (us)"),
+                            ("amplification", "Amplification"), ("generations", "Generations")]:
+            output[title] = [f"{'{0:.4f}'.format(value)}" for value in data[name].values[order].astype(float)]
+
+        print(self.color_text(f"Most amplified {len(order)} of {len(amplification)} rules", "white", True))
+        print(output)
+
+        self._report_thresholds(args, None, data)
+
+    def figure_report(self, args: ReportCommandArg):
+        pass
+
+    def parse_data(self, file_path: str) -> dict[str, MetricSeries | ParsedDataItem]:
+        """
+        parse_data() parses `fuzz_cost.csv` into a MetricSeries per column, keyed by rule id
+        and labelled by rule id and family. `amplification` is the worst cost over the seed cost.
+        The rules whose patterns do not compile, or without cost, are skipped.
+
+        Args:
+            file_path (str): file path of the raw data
+
+        Returns:
+            dict[str, MetricSeries | ParsedDataItem]: data parsed from the file
+        """
+        with open(file_path, "r", newline="") as f:
+            rows = [row for row in csv.DictReader(f) if not row["Error"]]
+        f.close()
+
+        skipped = [row["Rule ID"] for row in rows if not row["Seed Cost"] or not row["Worst Cost"]]
+        if skipped:
+            logger.warning(f"Rules without cost are skipped: {', '.join(skipped)}")
+            rows = [row for row in rows if row["Seed Cost"] and row["Worst Cost"]]
+
+        rule_ids = [row["Rule ID"] for row in rows]
+        labels = [[rule_id, rule_family_of(rule_id)] for rule_id in rule_ids]
+        seed_cost = np.array([row["Seed Cost"] for row in rows], dtype=np.float64)
+        worst_cost = np.array([row["Worst Cost"] for row in rows], dtype=np.float64)
+
+        return {
+            "seed_cost": MetricSeries(rule_ids, seed_cost, labels),
+            "worst_cost": MetricSeries(rule_ids, worst_cost, labels),
+            "amplification": MetricSeries(rule_ids, worst_cost / np.maximum(seed_cost, 1e-9), labels),
+            "generations": MetricSeries(rule_ids, np.array([row["Generations"] for row in rows], dtype=np.int64),
+                                        labels),
+        }
+
+
+def mutate_stage(stage: dict, compiled: List[any], rng: random.Random) -> dict:
+    """
+    mutate_stage() applies a random mutation to a random field of a go-ftw stage: the query string of the URI
+    (its path if it has no query string), the body, or the value of a header other than the routing ones.
+    The mutations are:
+    - an encoding: URL (once or twice), HTML entities, `\\xHH` escapes, or a random case of the letters.
+    - a repetition of a random slice of the value.
+    - a nesting of the value in brackets, quotes, tags, or comments.
+    - a near-miss of a pattern: its match in the value repeated without the last character (i.e., a match that
+      fails late), or a truncated word of the pattern inserted in the value.
+
+    Args:
+        stage (dict): stage input
+        compiled (List[any]): compiled patterns of the rule
+        rng (random.Random): random generator
+
+    Returns:
+        dict: the mutated stage input
+    """
+    fields = [("uri", None), ("data", None)] + [("headers", name) for name in (stage.get("headers") or {})
+                                                if str(name).lower() not in _FIXED_HEADERS]
+    field = rng.choice(fields)
+    value = _get_field(stage, field)
+    mutation = rng.choice([_encode, _repeat, _nest, _near_miss])
+    return _set_field(stage, field, mutation(value, compiled, rng))
+
+
+def write_fuzz_csv(file_path: str, rows: List[tuple]):
+    """
+    write_fuzz_csv() writes a row per rule, the costs are in microseconds.
+
+    Args:
+        file_path (str): path of the csv file
+        rows (List[tuple]): rule id, seed cost, worst cost, number of variants, generations and error of each rule
+    """
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(_RAW_HEADER)
+        writer.writerows(rows)
+    f.close()
+
+
+def _search_rule(item: tuple[str, List[str], List[tuple[str, dict]]], budget: float, repeat: int,
+                 population: int, keep: int, max_size: int, seed: int) -> tuple:
+    """
+    _search_rule() runs the genetic search of a rule, in a process of the pool. See `FuzzUtil.search()`.
+    """
+    rule_id, patterns, seeds = item
+    try:
+        compiled = [compile_pattern(pattern) for pattern in patterns]
+    except (_engine.error, ValueError) as e:
+        return rule_id, "", [], 0, str(e) or type(e).__name__
+
+    def cost(stage: dict) -> float:
+        return sum(match_time(compiled, payload, repeat) for payload in payloads_of(stage))
+
+    rng = random.Random(f"{seed}-{rule_id}")
+    candidates = [(cost(stage), test_title, stage) for test_title, stage in seeds]
+    seed_cost = max(candidate[0] for candidate in candidates)
+    seen = {repr(stage) for _, _, stage in candidates}
+    deadline, generations = time.monotonic() + budget, 0
+
+    while time.monotonic() < deadline:
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        candidates = candidates[:population]
+        for _, test_title, stage in list(candidates):
+            variant = mutate_stage(stage, compiled, rng)
+            if repr(variant) in seen or payload_size(variant) > max_size:
+                continue
+            seen.add(repr(variant))
+            candidates.append((cost(variant), test_title, variant))
+        generations += 1
+
+    # the seeds are already in the corpus of the tests, only the variants are kept
+    variants = sorted((candidate for candidate in candidates if repr(candidate[2]) not in
+                       {repr(stage) for _, stage in seeds}), key=lambda candidate: candidate[0], reverse=True)
+    return rule_id, seed_cost, variants[:keep], generations, ""
+
+
+def _get_field(stage: dict, field: tuple[str, Optional[str]]) -> str:
+    kind, name = field
+    if kind == "uri":
+        path, separator, query = str(stage.get("uri") or "/").partition("?")
+        return query if separator else path.lstrip("/")
+    if kind == "data":
+        data = stage.get("data") or ""
+        return data.decode(errors="replace") if isinstance(data, bytes) else str(data)
+    return str(stage["headers"][name])
+
+
+def _set_field(stage: dict, field: tuple[str, Optional[str]], value: str) -> dict:
+    kind, name = field
+    res = dict(stage)
+    if kind == "uri":
+        path, separator, _ = str(stage.get("uri") or "/").partition("?")
+        value = quote(value, safe=_URI_SAFE)
+        res["uri"] = f"{path}?{value}" if separator else f"/{value}"
+    elif kind == "data":
+        res["data"] = value
+    else:
+        # a header value is a single line of latin-1 characters
+        res["headers"] = {**stage["headers"], name: quote(value, safe=_URI_SAFE + " \"<>\\^`{|}")}
+    return res
+
+
+def _encode(value: str, compiled: List[any], rng: random.Random) -> str:
+    encoding = rng.randrange(5)
+    if encoding == 0:
+        return quote(value, safe="")
+    if encoding == 1:
+        return quote(quote(value, safe=""), safe="")
+    if encoding == 2:
+        return "".join(f"&#{ord(c)};" for c in value)
+    if encoding == 3:
+        return "".join(f"\\x{ord(c):02x}" if ord(c) < 256 else c for c in value)
+    return "".join(c.upper() if rng.random() < 0.5 else c.lower() for c in value)
+
+
+def _repeat(value: str, compiled: List[any], rng: random.Random) -> str:
+    if not value:
+        return value
+    start = rng.randrange(len(value))
+    end = rng.randint(start + 1, len(value))
+    return value[:end] + value[start:end] * rng.randint(1, 8) + value[end:]
+
+
+def _nest(value: str, compiled: List[any], rng: random.Random) -> str:
+    opening, closing = rng.choice(_NESTING)
+    depth = rng.randint(1, 4)
+    return opening * depth + value + closing * depth
+
+
+def _near_miss(value: str, compiled: List[any], rng: random.Random) -> str:
+    pattern = rng.choice(compiled)
+    match = pattern.search(value)
+    if match is not None and match.end() - match.start() > 1:
+        return value[:match.start()] + match.group()[:-1] * rng.randint(2, 16) + value[match.end():]
+
+    words = _PATTERN_WORD.findall(pattern.pattern)
+    if not words:
+        return value + value[-1:] * rng.randint(2, 16)
+    word = rng.choice(words)[:-1]
+    position = rng.randint(0, len(value))
+    return value[:position] + word * rng.randint(1, 8) + value[position:]
@@ -0,0 +1,285 @@
+"""
+Module HistogramSeries defines the HistogramSeries class, a columnar container of latency histograms
+(e.g., one per request name), which is stored next to the raw output and merged losslessly.
+"""
+from typing import Callable, Iterable, List, Optional
+import numpy as np
+from src.utils import LatencyHistogram
+from .MetricSeries import MetricSeries
+
+
+class HistogramSeries(MetricSeries):
+    """
+    HistogramSeries is a MetricSeries whose items are LatencyHistogram with the same layout.
+    The value of an item is its row, the non-empty buckets of all the rows are stored in flat arrays:
+    `bucket_offsets[i]:bucket_offsets[i + 1]` is the range of `bucket_indices` and `bucket_counts` of the i-th row.
+
+    Labels work as in MetricSeries (e.g., include_labels of a threshold), and the statistics
+    (i.e., `totals()`, `means()`, `quantiles()` and `ks_distances()`) are computed for all the rows at once.
+
+    Args:
+        - `keys` (Iterable[str]): keys of the histograms (e.g., request names)
+        - `histograms` (Iterable[LatencyHistogram]): histograms with the same layout
+        - `labels` (Iterable[Iterable[str]], optional): labels of each histogram. Defaults to None (no labels).
+    """
+    significant_digits: int
+    highest_value: int
+    bucket_indices: np.ndarray
+    bucket_counts: np.ndarray
+    bucket_offsets: np.ndarray
+
+    # version of the file layout, see `save()`
+    __version: int = 1
+
+    def __init__(self,
+                 keys: Iterable[str],
+                 histograms: Iterable[LatencyHistogram],
+                 labels: Optional[Iterable[Iterable[str]]] = None
+                 ):
+        keys, histograms = list(keys), list(histograms)
+        super().__init__(keys, np.arange(len(keys)), labels)
+
+        layout = histograms[0] if histograms else LatencyHistogram()
+        if any((h.significant_digits, h.highest_value) != (layout.significant_digits, layout.highest_value)
+               for h in histograms):
+            raise ValueError("histograms with different layouts cannot be stored in a series")
+
+        sparse = [histogram.to_sparse() for histogram in histograms]
+        self.__set_buckets(layout.significant_digits, layout.highest_value,
+                           np.concatenate([indices for indices, _ in sparse] + [np.array([], dtype=np.int64)]),
+                           np.concatenate([counts for _, counts in sparse] + [np.array([], dtype=np.int64)]),
+                           np.concatenate(([0], np.cumsum([len(indices) for indices, _ in sparse]))))
+
+    def __set_buckets(self, significant_digits: int, highest_value: int,
+                      indices: np.ndarray, counts: np.ndarray, offsets: np.ndarray):
+        self.significant_digits = significant_digits
+        self.highest_value = highest_value
+        self.bucket_indices = np.asarray(indices, dtype=np.int64)
+        self.bucket_counts = np.asarray(counts, dtype=np.int64)
+        self.bucket_offsets = np.asarray(offsets, dtype=np.int64)
+        self.__layout = LatencyHistogram(significant_digits, highest_value)
+
+    def histogram(self, row: int) -> LatencyHistogram:
+        """
+        histogram() returns the histogram of a row.
+        """
+        start, end = self.bucket_offsets[row], self.bucket_offsets[row + 1]
+        return LatencyHistogram.from_sparse(self.bucket_indices[start:end], self.bucket_counts[start:end],
+                                            self.significant_digits, self.highest_value)
+
+    def samples(self, row: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        samples() returns the values of a row as weighted samples, i.e., the middle of each non-empty bucket
+        and its count (e.g., for the tests of `src.utils.significance`).
+        """
+        start, end = self.bucket_offsets[row], self.bucket_offsets[row + 1]
+        indices = self.bucket_indices[start:end]
+        middles = (self.__layout.lowest_value_of(indices) + self.__layout.highest_value_of(indices)) / 2
+        return middles, self.bucket_counts[start:end]
+
+    def totals(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        totals() returns the number of values of each row (all rows by default).
+        """
+        cumsum = np.concatenate(([0], np.cumsum(self.bucket_counts)))
+        rows = self.__rows(rows)
+        return cumsum[self.bucket_offsets[rows + 1]] - cumsum[self.bucket_offsets[rows]]
+
+    def means(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        means() returns the mean of each row, each value is taken at the middle of its bucket.
+        """
+        layout = self.__layout
+        middles = (layout.lowest_value_of(self.bucket_indices) + layout.highest_value_of(self.bucket_indices)) / 2
+        cumsum = np.concatenate(([0], np.cumsum(middles * self.bucket_counts)))
+        rows = self.__rows(rows)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (cumsum[self.bucket_offsets[rows + 1]] - cumsum[self.bucket_offsets[rows]]) / self.totals(rows)
+
+    def quantiles(self, q: float, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        quantiles() returns the value at the quantile `q` (e.g., 0.999 for p99.9) of each row.
+        NaN is returned for an empty row.
+        """
+        rows = self.__rows(rows)
+        cumsum = np.cumsum(self.bucket_counts)
+        starts = self.bucket_offsets[rows]
+        base = np.where(starts > 0, cumsum[np.maximum(starts - 1, 0)], 0) if len(cumsum) else np.zeros(len(rows))
+        totals = self.totals(rows)
+
+        # the rank of the quantile in the global cumsum falls in the buckets of its row
+        ranks = base + np.maximum(np.ceil(q * totals), 1)
+        positions = np.minimum(np.searchsorted(cumsum, ranks), max(len(cumsum) - 1, 0))
+        res = self.__layout.highest_value_of(self.bucket_indices[positions]).astype(np.float64) \
+            if len(cumsum) else np.zeros(len(rows))
+        return np.where(totals > 0, res, np.nan)
+
+    def ks_distances(self, rows: np.ndarray, other: 'HistogramSeries', other_rows: np.ndarray) -> np.ndarray:
+        """
+        ks_distances() compares whole distributions: it returns the Kolmogorov-Smirnov distance
+        (i.e., the max. distance between the two CDFs, in [0, 1]) between each row and the paired row of `other`.
+        The distance is exact on the buckets, as both histograms have the same layout.
+
+        Args:
+            rows (np.ndarray): rows of this series
+            other (HistogramSeries): series to compare with
+            other_rows (np.ndarray): paired rows of `other`
+
+        Returns:
+            np.ndarray: distance of each pair, NaN if either row is empty
+        """
+        if (other.significant_digits, other.highest_value) != (self.significant_digits, self.highest_value):
+            raise ValueError("histograms with different layouts cannot be compared")
+
+        rows, other_rows = self.__rows(rows), other.__rows(other_rows)
+        pairs = np.arange(len(rows))
+        pair_a, bucket_a, count_a = self.__entries(rows, pairs)
+        pair_b, bucket_b, count_b = other.__entries(other_rows, pairs)
+
+        pair = np.concatenate((pair_a, pair_b))
+        bucket = np.concatenate((bucket_a, bucket_b))
+        weights_a = np.concatenate((count_a, np.zeros(len(count_b), dtype=np.int64)))
+        weights_b = np.concatenate((np.zeros(len(count_a), dtype=np.int64), count_b))
+
+        order = np.lexsort((bucket, pair))
+        pair, bucket = pair[order], bucket[order]
+        total_a, total_b = self.totals(rows), other.totals(other_rows)
+        res = np.zeros(len(pairs))
+
+        if len(pair):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                # CDF of each side within its pair, i.e., the global cumsum minus the totals of the previous pairs
+                cdf_a = (np.cumsum(weights_a[order]) - (np.cumsum(total_a) - total_a)[pair]) / total_a[pair]
+                cdf_b = (np.cumsum(weights_b[order]) - (np.cumsum(total_b) - total_b)[pair]) / total_b[pair]
+
+            # a bucket present in both sides is only complete at its last entry
+            last = np.ones(len(pair), dtype=bool)
+            last[:-1] = (pair[1:] != pair[:-1]) | (bucket[1:] != bucket[:-1])
+            np.maximum.at(res, pair[last], np.nan_to_num(np.abs(cdf_a - cdf_b)[last]))
+
+        return np.where((total_a > 0) & (total_b > 0), res, np.nan)
+
+    def rollup(self, group_of: Callable[[str], str]) -> 'HistogramSeries':
+        """
+        rollup() merges the histograms into groups (e.g., request names into rule ids), losslessly.
+
+        Args:
+            group_of (Callable[[str], str]): group of a key
+
+        Returns:
+            HistogramSeries: a histogram per group, labelled with the group
+        """
+        groups, group_idx = np.unique(np.array([group_of(str(key)) for key in self.keys], dtype=str),
+                                      return_inverse=True)
+        pair_group, bucket, count = self.__entries(np.arange(len(self)), group_idx)
+
+        width = self.__layout.bucket_count
+        merged, inverse = np.unique(pair_group * width + bucket, return_inverse=True)
+        counts = np.bincount(inverse, weights=count, minlength=len(merged)).astype(np.int64)
+        offsets = np.searchsorted(merged // width, np.arange(len(groups) + 1))
+
+        return self.__from_buckets(groups, [[group] for group in groups], merged % width, counts, offsets)
+
+    def merge(self, other: 'HistogramSeries') -> 'HistogramSeries':
+        """
+        merge() merges two series (e.g., from two workers or two runs), the histograms with the same key are added.
+        The labels of a key are taken from the first series having the key.
+        """
+        histograms: dict[str, LatencyHistogram] = {}
+        labels: dict[str, List[str]] = {}
+
+        for series in (self, other):
+            for row, key in enumerate(series.keys):
+                key = str(key)
+                if key in histograms:
+                    histograms[key].merge(series.histogram(row))
+                else:
+                    histograms[key], labels[key] = series.histogram(row), series.labels_of(row)
+
+        return HistogramSeries(list(histograms), list(histograms.values()), list(labels.values()))
+
+    def save(self, file_path: str):
+        """
+        save() saves the series in a compressed NumPy archive, the bucket indices are delta-encoded.
+        """
+        lengths = np.diff(self.bucket_offsets)
+        deltas = np.diff(self.bucket_indices, prepend=0)
+        starts = self.bucket_offsets[:-1][lengths > 0]
+        deltas[starts] = self.bucket_indices[starts]
+
+        with open(file_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                layout=np.array([self.__version, self.significant_digits, self.highest_value], dtype=np.int64),
+                keys=self.keys.astype(str),
+                label_vocab=np.array(self.label_vocab, dtype=str),
+                label_codes=self.label_codes,
+                label_offsets=self.label_offsets,
+                bucket_deltas=deltas.astype(np.uint32),
+                bucket_counts=self.bucket_counts,
+                bucket_offsets=self.bucket_offsets
+            )
+
+    @classmethod
+    def load(cls, file_path: str) -> 'HistogramSeries':
+        """
+        load() loads a series saved by `save()`.
+
+        Raises:
+            ValueError: if the file is saved by an unsupported version
+        """
+        with np.load(file_path, allow_pickle=False) as data:
+            version, significant_digits, highest_value = data["layout"].tolist()
+            if version != cls.__version:
+                raise ValueError(f"Unsupported histogram file version: {version}")
+
+            offsets = data["bucket_offsets"]
+            deltas = data["bucket_deltas"].astype(np.int64)
+            # the cumsum of the deltas restarts at each row
+            cumsum = np.cumsum(deltas)
+            indices = cumsum - (cumsum - deltas)[np.repeat(offsets[:-1], np.diff(offsets))]
+
+            res = cls.__new__(cls)
+            res.keys = data["keys"]
+            res.values = np.arange(len(res.keys))
+            res.label_vocab = data["label_vocab"].tolist()
+            res.label_codes = data["label_codes"]
+            res.label_offsets = data["label_offsets"]
+            res.__set_buckets(significant_digits, highest_value, indices, data["bucket_counts"], offsets)
+        return res
+
+    def select(self, mask_or_index: np.ndarray) -> 'HistogramSeries':
+        """
+        select() returns a new HistogramSeries with the histograms selected by a boolean mask or an index array.
+        """
+        index = np.arange(len(self))[mask_or_index]
+        selected = super().select(index)
+        _, bucket, count = self.__entries(index, np.arange(len(index)))
+        offsets = np.concatenate(([0], np.cumsum(self.bucket_offsets[index + 1] - self.bucket_offsets[index])))
+
+        res = HistogramSeries.__new__(HistogramSeries)
+        res.keys, res.values = selected.keys, np.arange(len(index))
+        res.label_vocab, res.label_codes, res.label_offsets = \
+            selected.label_vocab, selected.label_codes, selected.label_offsets
+        res.__set_buckets(self.significant_digits, self.highest_value, bucket, count, offsets)
+        return res
+
+    def __rows(self, rows: Optional[np.ndarray]) -> np.ndarray:
+        return np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.int64)
+
+    def __entries(self, rows: np.ndarray, tags: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        __entries() gathers the buckets of the rows, each bucket is tagged with the tag of its row.
+        """
+        starts, ends = self.bucket_offsets[rows], self.bucket_offsets[rows + 1]
+        lengths = ends - starts
+        gather = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths) \
+            + np.arange(lengths.sum())
+        return np.repeat(tags, lengths), self.bucket_indices[gather], self.bucket_counts[gather]
+
+    def __from_buckets(self, keys: Iterable[str], labels: Iterable[Iterable[str]],
+                       indices: np.ndarray, counts: np.ndarray, offsets: np.ndarray) -> 'HistogramSeries':
+        res = HistogramSeries.__new__(HistogramSeries)
+        MetricSeries.__init__(res, list(keys), np.arange(len(offsets) - 1), labels)
+        res.__set_buckets(self.significant_digits, self.highest_value, indices, counts, offsets)
+        return res
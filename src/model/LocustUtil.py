@@ -7,25 +7,61 @@ Usage:
     poetry run collect --test-name $TEST_NAME --utils locust
     poetry run report --test-name $TEST_NAME --utils locust
 """
-import subprocess
+import asyncio
 import os
 import csv
-from typing import List
-from .Util import Util, ParsedDataItem, CollectCommandArg, ReportCommandArg
+import shlex
+from typing import Optional
+from urllib.parse import urlsplit
+from src.type import State
+from src.utils import logger, LatencyHistogram
+from .Util import Util, MetricSeries, CollectCommandArg, ReportCommandArg, rule_id_of, rule_family_of, test_labels_of
+from .HistogramSeries import HistogramSeries
+
+_project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_locustfile = os.path.join(_project_root, "src", "locustfile.py")
+_LOCAL_WORKER = "local://"
+
+# quantiles of the latency printed by the report
+_REPORT_QUANTILES = {"p50": 0.5, "p99": 0.99, "p99.9": 0.999, "p99.99": 0.9999}
 
 
 class LocustUtil(Util):
     """
     LocustUtil is a class for collecting data from locust,
     it utilizes locust for calling the testcases and parsing the data.
-    The testcase is generated from go-ftw with changed rules.
+    The requests are built from the go-ftw test cases into a request table,
+    which is replayed by a generic locust user (see `src/locustfile.py`).
+
+    Since a locust process saturates one core, locust runs distributed by default:
+    a master, which merges the stats, and one worker process per core (see `CollectCommandArg.workers`).
+    Workers on other hosts are added by `CollectCommandArg.worker_endpoints` (e.g., `ssh://user@host`).
+
+    Each request is named after its go-ftw test id (e.g., `920170-1`), so the stats are kept per test
+    and labelled with the test id, rule id and rule family (see `parse_request_stats()`).
+    Besides the stats, the latency of each request name is recorded in a LatencyHistogram (in microseconds),
+    the histograms of the workers are merged by the master and saved next to the stats (see `parse_latency()`).
     """
-    __exec_filename: str = "exec.py"
+    raw_filename: str = "locust_stats.csv"
+    latency_filename: str = "locust_latency.npz"
+    threshold_filename: str = "locust.threshold.json"
+    comparison_metrics = {"req/sec": "throughput", "avg_resp_time": "latency"}
+    __request_table_filename: str = "requests.bin"
+
+    # users per worker process, locust spreads the users evenly over the workers
     __max_users = 100
     __spawn_rate = 100
     __runtime = 5
-    __test_case_per_file_limit = 100
-    __raw_file_name = "locust_stats.csv"
+
+    # port of the master, the locusts run in parallel (see `AttributionCollect`) have distinct ports
+    master_port: int = 5557
+
+    # seconds the master waits for all the workers to connect, and the workers wait for the master to stop them
+    __expect_workers_max_wait = 60
+    __worker_grace_period = 10
+
+    # locust executable
+    locust_bin: str = "locust"
     __data_schema = ['type', 'name', 'req_cnt', 'req_fail_cnt', 'median_resp_time', 'avg_resp_time',
                     'min_resp_time', 'max_resp_time', 'avg_content_size', 'req/sec', 'fail/sec',
                     'p50', 'p66', 'p75', 'p80', 'p90', 'p95', 'p98', 'p99', 'p99.9', 'p99.99', 'p100'
@@ -33,103 +69,262 @@ class LocustUtil(Util):
 
 
     def collect(self, args: CollectCommandArg):
-        self.__exec_filename =os.path.join(args.tmp_dir, self.__exec_filename)
-
-        # init template
-        self.__create_template(args)
-
-        command = (
-            f"locust -f '{self.__exec_filename}' \\"
-            f"--headless \\"
-            f"-u {self.__max_users} \\"
-            f"-r {self.__spawn_rate} \\"
-            f"--host={args.waf_endpoint} \\"
-            f"--csv={args.raw_output}/locust \\"
-            f"-t {self.__runtime}s"
+        asyncio.run(self.run(args, asyncio.Event()))
+
+    async def run(self, args: CollectCommandArg, stop: asyncio.Event):
+        self.__request_table_filename = os.path.join(args.tmp_dir, os.path.basename(self.__request_table_filename))
+
+        # init request table
+        if self._create_request_table(args, self.__request_table_filename) == 0:
+            logger.error(f"No test case found in {args.test_cases_dir}, locust is skipped")
+            return
+
+        local_workers = os.cpu_count() if args.workers is None else args.workers
+        endpoints = [_LOCAL_WORKER] * local_workers + list(args.worker_endpoints)
+
+        if not endpoints:
+            await self._run_command(self._master_command(args, 0))
+            return
+
+        # the master waits for all the workers to connect before ramping up the users
+        logger.info(f"Running locust with {len(endpoints)} workers ({local_workers} local)")
+        master = asyncio.create_task(self._run_command(self._master_command(args, len(endpoints))))
+        workers = [asyncio.create_task(self._run_command(self._worker_command(endpoint)))
+                   for endpoint in endpoints]
+
+        try:
+            await master
+            # workers quit once the master stops, the remaining ones are killed
+            await asyncio.wait(workers, timeout=self.__worker_grace_period)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def _master_command(self, args: CollectCommandArg, worker_count: int) -> str:
+        """
+        _master_command() returns the command of the locust master, which writes the stats merged from its workers.
+        Without workers, locust runs standalone (i.e., the users run in the master process).
+
+        Args:
+            args (CollectCommandArg): collect command arg
+            worker_count (int): number of workers to expect
+
+        Returns:
+            str: shell command
+        """
+        distributed = (
+            f"--master --master-bind-port {self.master_port} "
+            f"--expect-workers {worker_count} --expect-workers-max-wait {self.__expect_workers_max_wait} "
+        ) if worker_count else ""
+
+        latency_file = os.path.join(args.raw_output, self.latency_filename)
+
+        return (
+            f"CRS_LATENCY_FILE={shlex.quote(latency_file)} {self.__locust_command()} {distributed}"
+            f"--headless "
+            f"-u {self.__max_users * max(worker_count, 1)} "
+            f"-r {self.__spawn_rate} "
+            f"--host={args.waf_endpoint} "
+            f"--csv={args.raw_output}/locust "
+            f"-t {args.block_duration or self.__runtime}s"
         )
 
-        subprocess.run(command, shell=True, check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    def _worker_command(self, endpoint: str) -> str:
+        """
+        _worker_command() returns the command of a locust worker at an endpoint:
+        - `local://`: a worker process on this host.
+        - `ssh://[user@]host[:port]`: a worker process on a remote host, the request table is copied beforehand.
+          The project is expected at the same path on the remote host, and the worker connects back to the
+          address the ssh connection comes from.
+
+        Args:
+            endpoint (str): worker endpoint
+
+        Returns:
+            str: shell command
+        """
+        url = urlsplit(endpoint)
+        worker = f"--worker --master-port {self.master_port}"
+
+        if url.scheme == "local":
+            return f"{self.__locust_command()} {worker} --master-host 127.0.0.1"
+
+        if url.scheme != "ssh" or not url.hostname:
+            raise ValueError(f"Invalid locust worker endpoint: {endpoint}")
+
+        target = f"{url.username}@{url.hostname}" if url.username else url.hostname
+        port = url.port or 22
+        table = self.__request_table_filename
+        remote_command = (
+            f"cd {shlex.quote(_project_root)} && "
+            f"{self.__locust_command()} {worker} --master-host \"$(echo $SSH_CLIENT | cut -d' ' -f1)\""
+        )
+
+        return (
+            f"ssh -p {port} {target} {shlex.quote(f'mkdir -p {shlex.quote(os.path.dirname(table))}')} && "
+            f"scp -q -P {port} {shlex.quote(table)} {target}:{shlex.quote(table)} && "
+            f"ssh -p {port} {target} {shlex.quote(remote_command)}"
+        )
+
+    def __locust_command(self) -> str:
+        return (
+            f"CRS_REQUEST_TABLE={shlex.quote(self.__request_table_filename)} PYTHONPATH={shlex.quote(_project_root)} "
+            f"{self.locust_bin} -f {shlex.quote(_locustfile)}"
+        )
 
     def text_report(self, args: ReportCommandArg):
-        data = self.__parse_data(os.path.join(f"{args.raw_output}/{self.__raw_file_name}"))
+        states = self.parse_states(args.raw_output)
+        if states:
+            self.paired_text_report(args, states)
+            self.__print_latency(states[State.BEFORE], f"{State.BEFORE.value}: ")
+            self.__print_latency(states[State.AFTER], f"{State.AFTER.value}: ")
+            return
+
+        data = self.__parse_data(os.path.join(f"{args.raw_output}/{self.raw_filename}"))
         print(self.create_data_terminal_table(data, self.__data_schema[2:]))
 
+        output = self.parse_output(args.raw_output)
+        self.__print_latency(output)
+        self._report_thresholds(args, None, output)
+
+    def __print_latency(self, latency: dict[str, MetricSeries], title: str = ""):
+        """
+        __print_latency() prints the latency quantiles (in milliseconds), a row per rule family (or rule)
+        """
+        for metric_name in ("latency_by_family", "latency_by_rule"):
+            if metric_name not in latency:
+                continue
+            series = latency[metric_name]
+            groups = [str(key) for key in series.keys]
+            print(f"{title}{metric_name}")
+            print(self.create_data_terminal_table(
+                {name: MetricSeries(groups, series.quantiles(q) / 1000) for name, q in _REPORT_QUANTILES.items()},
+                groups
+            ))
+
     # @TODO: impl
     def figure_report(self, args: ReportCommandArg):
         pass
 
-    def __create_template(self, args: CollectCommandArg):
+    def parse_output(self, raw_output: str) -> dict[str, MetricSeries]:
         """
-        create_template() creates the template for locust testcases
-        @TODO: currently, it cannot detect whether the website should block (e.g., 405) or not,
-        because the origin implementation of go-ftw validate the TP/TN by checking logs
-        ideally, this should be validated using outputs
+        parse_output() returns the stats of each request name (see `parse_request_stats()`)
+        and the latency histograms (see `parse_latency()`) of a run.
         """
-        data = self._parse_ftw_test_file(args.test_cases_dir, self.__test_case_per_file_limit)
+        return {**self.parse_request_stats(raw_output), **self.parse_latency(raw_output)}
 
-        template = (
-            "from locust import HttpUser, task\n"
-            "\n"
-            "class AutomatedGenTest(HttpUser):\n"
-        )
+    def get_request_count(self, raw_output: str) -> Optional[int]:
+        """
+        get_request_count() returns the total number of requests sent by locust in a test.
 
-        # template case:
-        # @task
-        # def fn$test_title_$stage(self):
-        #     headers = $headers
-        #     data = '''$data'''
-
-        #     with self.client.$method("/", headers=headers, data=data, catch_response=True) as response:
-        #         try:
-        #             response.success()
-        #         except Exception as e:
-        #             response.failure(e)
-        fn_template = (
-            "\t@task\n"
-            "\tdef fn$test_title_$stage(self):\n"
-            "\t\theaders = $headers\n"
-            "\t\tdata = '''$data'''\n"
-            "\n"
-            "\t\twith self.client.$method('/', headers=headers, data=data, catch_response=True) as response:\n"
-            "\t\t\ttry:\n"
-            "\t\t\t\tresponse.success()\n"
-            "\t\t\texcept Exception as e:\n"
-            "\t\t\t\tresponse.failure(e)\n"
-            "\n"
-        )
+        Args:
+            raw_output (str): raw output directory of the test
+
+        Returns:
+            Optional[int]: number of requests, or None if locust did not run in the test
+        """
+        file_path = os.path.join(raw_output, self.raw_filename)
+        if not os.path.exists(file_path):
+            return None
+
+        aggregated = self.__parse_data(file_path).get("Aggregated")
+        if aggregated is None:
+            return None
+
+        return int(aggregated.values[list(aggregated.keys).index("req_cnt")])
+
+    def parse_latency(self, raw_output: str) -> dict[str, HistogramSeries]:
+        """
+        parse_latency() loads the latency histograms of a test, the metrics are:
+        - `latency`: a histogram per go-ftw test id, labelled with the test id, rule id and rule family
+        - `latency_by_rule`: the histograms merged by rule id, labelled with the rule id
+        - `latency_by_family`: the histograms merged by rule family (e.g., `920`), labelled with the family
+
+        Args:
+            raw_output (str): raw output directory of the test
+
+        Returns:
+            dict[str, HistogramSeries]: the histograms, empty if they were not recorded in the test
+        """
+        file_path = os.path.join(raw_output, self.latency_filename)
+        if not os.path.exists(file_path):
+            return {}
 
-        for d in data:
-            for i in range(0, len(d.stages)):
-                ctx = fn_template.replace("$test_title", d.test_title.replace("-", "_"))
-                ctx = ctx.replace("$stage", str(i))
-                ctx = ctx.replace("$headers", str(d.stages[i].headers))
-                ctx = ctx.replace("$method", d.stages[i].method.lower())
-                ctx = ctx.replace("$data", d.stages[i].data)
-                template += ctx
-        
-        with open(self.__exec_filename, "w") as file:
-            file.write(template)
-        file.close()
+        latency = HistogramSeries.load(file_path)
+        return {
+            "latency": latency,
+            "latency_by_rule": latency.rollup(rule_id_of),
+            "latency_by_family": latency.rollup(rule_family_of)
+        }
 
-    def __parse_data(self, file_path: str)  -> dict[str, List[ParsedDataItem]]:
+    def parse_request_stats(self, raw_output: str) -> dict[str, MetricSeries]:
         """
-        parse_data parses the raw data from locust into a dict of ParsedDataItem
+        parse_request_stats() parses the stats of each request name (i.e., go-ftw test id) into a MetricSeries
+        per column of the stats (e.g., `avg_resp_time`, `p99`), keyed by test id and labelled with
+        the test id, rule id and rule family. The aggregated row is skipped.
+
+        Args:
+            raw_output (str): raw output directory of the test
+
+        Returns:
+            dict[str, MetricSeries]: data keyed by column, empty if locust did not run in the test
+        """
+        file_path = os.path.join(raw_output, self.raw_filename)
+        if not os.path.exists(file_path):
+            return {}
+
+        with open(file_path, 'r') as f:
+            rows = list(csv.reader(f))[1:-1]
+        f.close()
+
+        names = [row[1] for row in rows]
+        labels = [test_labels_of(name) for name in names]
+        return {
+            column: MetricSeries(names, [_to_float(row[idx]) for row in rows], labels)
+            for idx, column in enumerate(self.__data_schema) if idx >= 2
+        }
+
+    def __parse_data(self, file_path: str)  -> dict[str, MetricSeries]:
+        """
+        parse_data parses the raw data from locust into a dict of MetricSeries,
+        the keys of each series are the columns of the stats (i.e., `__data_schema[2:]`)
 
         Args:
             file_path (str): file path of the raw data
 
         Returns:
-            dict[str, List[ParsedDataItem]]: data parsed from the file
+            dict[str, MetricSeries]: data parsed from the file
         """
-        res: dict[str, List[ParsedDataItem]] = {}
+        res: dict[str, MetricSeries] = {}
+        columns = self.__data_schema[2:]
 
         with open(file_path, 'r') as f:
             reader = csv.reader(f)
             data = list(reader)
 
             for i in range(1, len(data)):
-                # data "Aggregated" will be created as a col
-                req_type = "Aggregated" if i == len(data) - 1 else data[i][0]
-                res[req_type] = [ParsedDataItem(req_type, data[i][2:])]
+                # a row per request name (i.e., go-ftw test id), the last row is "Aggregated"
+                req_name = "Aggregated" if i == len(data) - 1 else data[i][1]
+                res[req_name] = MetricSeries(columns, [_to_float(value) for value in data[i][2:]])
         f.close()
         return res
+
+
+def latency_series(histograms: dict[str, LatencyHistogram]) -> HistogramSeries:
+    """
+    latency_series() creates a HistogramSeries from the histograms keyed by request name (i.e., go-ftw test id),
+    each histogram is labelled with the test id, rule id and rule family.
+    """
+    names = sorted(histograms)
+    return HistogramSeries(names, [histograms[name] for name in names], [test_labels_of(name) for name in names])
+
+def _to_float(value: str) -> float:
+    """
+    _to_float() converts a value of locust stats to float, locust writes `N/A` for missing percentiles
+    """
+    try:
+        return float(value)
+    except ValueError:
+        return float("nan")
+
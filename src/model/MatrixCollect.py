@@ -0,0 +1,119 @@
+"""
+Module MatrixCollect defines the MatrixCollect class, which collects several WAFs (e.g., ModSecurity 2,
+ModSecurity 3 and Coraza) side by side in the same run, so they are compared under the same conditions.
+"""
+import asyncio
+import json
+import os
+from typing import Callable, List, Optional
+import docker
+from src.type import UtilRole
+from src.utils import logger
+from .CollectScheduler import CollectScheduler
+from .LocustUtil import LocustUtil
+from .Util import Util, CollectCommandArg, MATRIX_MANIFEST
+
+
+class MatrixCollect:
+    """
+    MatrixCollect sends the same load to every WAF of `CollectCommandArg.waf_targets` in parallel.
+
+    Each WAF container is pinned to its own CPUs (see `cpusets()`, the load generators of each WAF keep
+    `load_cpus` of the host), so a WAF does not slow down the others.
+    The load generators of each WAF run with fresh util instances, their raw data is stored in
+    `<raw_output>/<container>/`. The samplers run once for all the WAFs, their samples are labelled
+    with the container (e.g., `include_labels` of a threshold selects a WAF), in `<raw_output>/`.
+
+    The targets are listed in `matrix.json`, the report compares the WAFs (see `Util.matrix_text_report()`).
+
+    Args:
+        - `create_utils` (Callable[[], List[Util]]): creates the utils of the collect
+        - `deadline` (Optional[float], optional): global deadline in seconds. Defaults to None (no deadline).
+    """
+    create_utils: Callable[[], List[Util]]
+    deadline: Optional[float]
+
+    # CPUs of the load generators of each WAF (e.g., the locust workers)
+    load_cpus: int = 1
+
+    def __init__(self, create_utils: Callable[[], List[Util]], deadline: Optional[float] = None):
+        self.create_utils = create_utils
+        self.deadline = deadline
+
+    async def run(self, args: CollectCommandArg) -> bool:
+        """
+        run() pins the WAFs to their CPUs, and runs the load against all of them in parallel, under the samplers.
+        The WAF containers are expected to be up.
+
+        Args:
+            args (CollectCommandArg): collect command arg
+
+        Returns:
+            bool: False if the deadline is reached before all the load generators complete
+        """
+        targets = args.waf_targets
+        cpusets = self.cpusets(len(targets))
+        for target, cpuset in zip(targets, cpusets):
+            await asyncio.to_thread(self.isolate, target.name, cpuset)
+
+        with open(os.path.join(args.raw_output, MATRIX_MANIFEST), "w") as f:
+            json.dump({"targets": [{"name": target.name, "endpoint": target.endpoint, "raw_output": target.name,
+                                    "cpuset": cpuset} for target, cpuset in zip(targets, cpusets)]}, f, indent=2)
+
+        samplers = [util for util in self.create_utils() if util.role == UtilRole.SAMPLER]
+        for sampler in samplers:
+            sampler.waf_container_names = [target.name for target in targets]
+
+        async def loads() -> bool:
+            runs = []
+            for slot, target in enumerate(targets):
+                target_args = args.variant_args(target.name, target.endpoint, args.rules_dir)
+                target_args.waf_targets = [target]
+                target_args.workers = self.load_cpus if args.workers is None else args.workers
+                os.makedirs(target_args.raw_output, exist_ok=True)
+                os.makedirs(target_args.tmp_dir, exist_ok=True)
+
+                # without load generators, go-ftw is run as the load of each WAF (see `CollectScheduler`)
+                utils = [util for util in self.create_utils() if util.role == UtilRole.LOAD]
+                for util in utils:
+                    if isinstance(util, LocustUtil):
+                        util.master_port = LocustUtil.master_port + slot
+                runs.append(CollectScheduler(utils).run(target_args))
+
+            logger.info(f"Running the load against {', '.join(target.name for target in targets)}")
+            return all(await asyncio.gather(*runs))
+
+        return await CollectScheduler(samplers, self.deadline).run(args, loads)
+
+    def cpusets(self, count: int) -> List[str]:
+        """
+        cpusets() shares out the CPUs of the host, but `load_cpus` per WAF, to the WAFs evenly.
+        A WAF gets one CPU at least (the CPUs are shared by several WAFs if there are more WAFs than CPUs).
+
+        Args:
+            count (int): number of WAFs
+
+        Returns:
+            List[str]: CPUs of each WAF, e.g., `0-1`
+        """
+        cpus = os.cpu_count() or 1
+        share = max(1, (cpus - count * self.load_cpus) // count)
+        res = []
+        for idx in range(count):
+            first = (idx * share) % cpus
+            res.append(str(first) if share == 1 else f"{first}-{min(first + share, cpus) - 1}")
+        return res
+
+    def isolate(self, name: str, cpuset: str):
+        """
+        isolate() pins a WAF container to its CPUs, a container which is not found (e.g., a WAF which is not run
+        in docker) is not pinned.
+
+        Args:
+            name (str): container name
+            cpuset (str): CPUs of the container, e.g., `0-1`
+        """
+        try:
+            docker.from_env().containers.get(name).update(cpuset_cpus=cpuset)
+        except Exception as e:
+            logger.warning(f"WAF {name} is not pinned to CPUs {cpuset}: {e!r}")
@@ -0,0 +1,169 @@
+"""
+Module MetricSeries defines the MetricSeries class, a compact columnar container for the data of a metric.
+"""
+from typing import Iterable, Iterator, List, Optional, Union
+import numpy as np
+from .ParsedDataItem import ParsedDataItem
+
+
+class MetricSeries:
+    """
+    MetricSeries is a columnar container for the data of a metric. It replaces a list of ParsedDataItem:
+    keys and values are stored in NumPy arrays, and labels are dictionary-encoded.
+    Each distinct label is stored once in `label_vocab`, the codes of all items are stored in one flat array,
+    and `label_offsets[i]:label_offsets[i + 1]` is the range of codes of the i-th item.
+
+    Iterating (or indexing) a MetricSeries yields ParsedDataItem, as a compatibility view for
+    the code that still works on items.
+
+    Args:
+        - `keys` (Iterable[any]): keys of the data items (e.g., timestamp, test id)
+        - `values` (Iterable[any]): values of the data items
+        - `labels` (Iterable[Iterable[str]], optional): labels of each data item. Defaults to None (no labels).
+    """
+    keys: np.ndarray
+    values: np.ndarray
+    label_vocab: List[str]
+    label_codes: np.ndarray
+    label_offsets: np.ndarray
+
+    def __init__(self,
+                 keys: Iterable[any],
+                 values: Iterable[any],
+                 labels: Optional[Iterable[Iterable[str]]] = None
+                 ):
+        self.keys = np.asarray(keys)
+        self.values = np.asarray(values)
+
+        if len(self.keys) != len(self.values):
+            raise ValueError("keys and values have different length")
+
+        vocab: dict[str, int] = {}
+        codes, offsets = [], [0]
+
+        if labels is None:
+            offsets = np.zeros(len(self.values) + 1, dtype=np.int64)
+        else:
+            for item_labels in labels:
+                # a set of labels, duplicated labels of an item are ignored
+                for label in dict.fromkeys(item_labels):
+                    codes.append(vocab.setdefault(label, len(vocab)))
+                offsets.append(len(codes))
+
+            if len(offsets) != len(self.values) + 1:
+                raise ValueError("labels and values have different length")
+
+        self.label_vocab = list(vocab)
+        self.label_codes = np.array(codes, dtype=np.int32)
+        self.label_offsets = np.asarray(offsets, dtype=np.int64)
+
+    @classmethod
+    def from_items(cls, items: Iterable[ParsedDataItem]) -> 'MetricSeries':
+        """
+        from_items() creates a MetricSeries from a list of ParsedDataItem.
+
+        Args:
+            items (Iterable[ParsedDataItem]): data items
+
+        Returns:
+            MetricSeries: columnar data
+        """
+        items = list(items)
+        return cls([item.key for item in items],
+                   [item.value for item in items],
+                   [item.labels for item in items])
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __iter__(self) -> Iterator[ParsedDataItem]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def __getitem__(self, idx: Union[int, slice, np.ndarray]) -> Union[ParsedDataItem, 'MetricSeries']:
+        if isinstance(idx, (int, np.integer)):
+            idx = range(len(self))[idx]
+            return ParsedDataItem(_to_python(self.keys[idx]), _to_python(self.values[idx]), self.labels_of(idx))
+        return self.select(np.arange(len(self))[idx])
+
+    def labels_of(self, idx: int) -> List[str]:
+        """
+        labels_of() decodes the labels of the idx-th data item.
+        """
+        codes = self.label_codes[self.label_offsets[idx]:self.label_offsets[idx + 1]]
+        return [self.label_vocab[code] for code in codes]
+
+    def label_mask(self, labels: Iterable[str]) -> np.ndarray:
+        """
+        label_mask() returns a boolean array, which is True for the items having any of the labels.
+
+        Args:
+            labels (Iterable[str]): labels to match
+
+        Returns:
+            np.ndarray: boolean mask with the same length as the series
+        """
+        labels = set(labels)
+        wanted = [code for code, label in enumerate(self.label_vocab) if label in labels]
+        hit = np.isin(self.label_codes, wanted)
+        cumsum = np.concatenate(([0], np.cumsum(hit)))
+        return (cumsum[self.label_offsets[1:]] - cumsum[self.label_offsets[:-1]]) > 0
+
+    @classmethod
+    def concat(cls, series: Iterable['MetricSeries']) -> 'MetricSeries':
+        """
+        concat() concatenates series (e.g., the same metric from several runs) into a new MetricSeries,
+        the label vocabularies are merged.
+        """
+        series = list(series)
+        vocab = list(dict.fromkeys(label for item in series for label in item.label_vocab))
+        index = {label: code for code, label in enumerate(vocab)}
+
+        res = MetricSeries.__new__(MetricSeries)
+        res.keys = np.concatenate([item.keys for item in series]) if series else np.array([])
+        res.values = np.concatenate([item.values for item in series]) if series else np.array([])
+        res.label_vocab = vocab
+        res.label_codes = np.concatenate(
+            [np.array([index[label] for label in item.label_vocab], dtype=np.int64)[item.label_codes]
+             for item in series] + [np.array([], dtype=np.int64)])
+        lengths = np.concatenate([np.diff(item.label_offsets) for item in series] + [np.array([], dtype=np.int64)])
+        res.label_offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        return res
+
+    def with_values(self, values: Iterable[any]) -> 'MetricSeries':
+        """
+        with_values() returns a new MetricSeries with the same keys and labels, but different values.
+        """
+        values = np.asarray(values)
+        if len(values) != len(self):
+            raise ValueError("keys and values have different length")
+
+        res = self.select(slice(None))
+        res.values = values
+        return res
+
+    def select(self, mask_or_index: np.ndarray) -> 'MetricSeries':
+        """
+        select() returns a new MetricSeries with the items selected by a boolean mask or an index array.
+        The label vocabulary is shared with the new series.
+        """
+        index = np.arange(len(self))[mask_or_index]
+        starts, ends = self.label_offsets[index], self.label_offsets[index + 1]
+        lengths = ends - starts
+
+        res = MetricSeries.__new__(MetricSeries)
+        res.keys = self.keys[index]
+        res.values = self.values[index]
+        res.label_vocab = self.label_vocab
+        res.label_offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        # gather the label codes of the selected items without a python loop
+        gather = np.repeat(starts - res.label_offsets[:-1], lengths) + np.arange(res.label_offsets[-1])
+        res.label_codes = self.label_codes[gather]
+        return res
+
+
+def _to_python(value: any) -> any:
+    """
+    _to_python() converts a NumPy scalar to the corresponding Python type.
+    """
+    return value.item() if isinstance(value, np.generic) else value
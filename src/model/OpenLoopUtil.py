@@ -0,0 +1,203 @@
+"""
+Module OpenLoopUtil defines the OpenLoopUtil class, an open-loop load generator which sends requests
+at a constant arrival rate, regardless of how fast the WAF responds.
+
+Usage:
+    ```sh
+    TEST_NAME=example
+    poetry run collect --test-name $TEST_NAME --utils openLoop
+    poetry run report --test-name $TEST_NAME --utils openLoop
+    ```
+"""
+import asyncio
+import csv
+import os
+from typing import List
+from src.utils import logger, AsyncHTTPClient, LatencyHistogram, RequestTable, TableRequest
+from .LocustUtil import LocustUtil, latency_series
+from .Util import CollectCommandArg
+
+# quantiles of the percentile columns of locust stats
+_STATS_QUANTILES: List[float] = [0.5, 0.66, 0.75, 0.8, 0.9, 0.95, 0.98, 0.99, 0.999, 0.9999, 1.0]
+_STATS_HEADER: List[str] = [
+    "Type", "Name", "Request Count", "Failure Count", "Median Response Time", "Average Response Time",
+    "Min Response Time", "Max Response Time", "Average Content Size", "Requests/s", "Failures/s",
+    "50%", "66%", "75%", "80%", "90%", "95%", "98%", "99%", "99.9%", "99.99%", "100%"
+]
+
+# headers computed by the http client, the values from the test cases would break the connection
+_CONNECTION_HEADERS = {"content-length", "transfer-encoding", "connection"}
+
+
+class RequestStats:
+    """
+    RequestStats is the stats of the requests with the same method and name. The latency (in microseconds)
+    is counted in a LatencyHistogram as each response comes, so memory is bounded by the buckets of
+    the histogram rather than growing with the number of requests.
+    """
+    count: int
+    failures: int
+    content_size: int
+    histogram: LatencyHistogram
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.content_size = 0
+        self.histogram = LatencyHistogram()
+
+    def record(self, latency: float, content_size: int, failed: bool):
+        self.count += 1
+        self.failures += failed
+        self.content_size += content_size
+        self.histogram.record(int(latency * 1e6))
+
+
+class OpenLoopUtil(LocustUtil):
+    """
+    OpenLoopUtil sends the requests built from the go-ftw test cases at a constant arrival rate.
+
+    Unlike the users of locust, which wait for a response before sending the next request
+    (i.e., the request rate drops when the WAF slows down), the n-th request is due at `start + n / rate`.
+    The latency is measured from this intended send time, so the time a request waits for a connection
+    is counted as well (i.e., no coordinated omission).
+
+    The stats are written in the layout of locust stats, so the report is the same as LocustUtil,
+    and the latency histograms are saved next to them (see `LocustUtil.parse_latency()`).
+    """
+    raw_filename: str = "openloop_stats.csv"
+    latency_filename: str = "openloop_latency.npz"
+    __request_table_filename: str = "openloop_requests.bin"
+
+    # requests per second, and duration of the test in seconds
+    rate: float = 100
+    duration: float = 30
+
+    # max. number of connections to the WAF, and timeout of a request in seconds
+    pool_size: int = 256
+    timeout: float = 15
+
+    async def run(self, args: CollectCommandArg, stop: asyncio.Event):
+        if args.block_duration:
+            self.duration = args.block_duration
+
+        table_path = os.path.join(args.tmp_dir, self.__request_table_filename)
+
+        if self._create_request_table(args, table_path) == 0:
+            logger.error(f"No test case found in {args.test_cases_dir}, the open-loop load is skipped")
+            return
+
+        table = RequestTable(table_path)
+        try:
+            stats = await self.send_requests(table, args.waf_endpoint.rstrip("/"))
+        finally:
+            table.close()
+
+        write_stats_csv(os.path.join(args.raw_output, self.raw_filename), stats, self.duration)
+        write_latency(os.path.join(args.raw_output, self.latency_filename), stats)
+
+    async def send_requests(self, table: RequestTable, endpoint: str) -> dict[tuple[str, str], RequestStats]:
+        """
+        send_requests() sends `rate * duration` requests picked from the table by weight, on a fixed schedule.
+        When the event loop falls behind, the overdue requests are sent at once.
+
+        Args:
+            table (RequestTable): requests to send
+            endpoint (str): WAF endpoint, e.g., http://localhost:80
+
+        Returns:
+            dict[tuple[str, str], RequestStats]: stats keyed by method and name
+        """
+        loop = asyncio.get_running_loop()
+        total = int(self.rate * self.duration)
+        picks = table.sample(total).tolist()
+        stats: dict[tuple[str, str], RequestStats] = {}
+        in_flight: set[asyncio.Task] = set()
+
+        async with AsyncHTTPClient(pool_size=self.pool_size, timeout=self.timeout) as client:
+            start, sent = loop.time(), 0
+
+            while sent < total:
+                due = min(total, int((loop.time() - start) * self.rate) + 1)
+                for idx in range(sent, due):
+                    task = asyncio.create_task(
+                        self.__send(client, endpoint, table[picks[idx]], start + idx / self.rate, stats))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                sent = due
+
+                if sent < total:
+                    await asyncio.sleep(max(start + sent / self.rate - loop.time(), 0))
+
+            await asyncio.gather(*in_flight)
+
+        return stats
+
+    async def __send(self, client: AsyncHTTPClient, endpoint: str, request: TableRequest, intended: float,
+                     stats: dict[tuple[str, str], RequestStats]):
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in _CONNECTION_HEADERS}
+        try:
+            response = await client.request(request.method, endpoint + request.uri, headers, request.body)
+            content_size, failed = len(response.body), False
+        except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+            logger.debug(f"Request {request.name} failed: {e!r}")
+            content_size, failed = 0, True
+
+        latency = asyncio.get_running_loop().time() - intended
+        stats.setdefault((request.method, request.name), RequestStats()).record(latency, content_size, failed)
+
+
+def write_stats_csv(file_path: str, stats: dict[tuple[str, str], RequestStats], duration: float):
+    """
+    write_stats_csv() writes the stats in the layout of `locust_stats.csv`, i.e., a row per method and name,
+    followed by the aggregated row. The response times are in milliseconds.
+
+    Args:
+        file_path (str): path of the csv file
+        stats (dict[tuple[str, str], RequestStats]): stats keyed by method and name
+        duration (float): duration of the test in seconds
+    """
+    rows, aggregated = [], LatencyHistogram()
+    count, failures, content_size = 0, 0, 0
+
+    for (method, name), item in sorted(stats.items()):
+        aggregated.merge(item.histogram)
+        count, failures, content_size = count + item.count, failures + item.failures, content_size + item.content_size
+        rows.append(_stats_row(method, name, item.count, item.failures, item.content_size, item.histogram, duration))
+    rows.append(_stats_row("", "Aggregated", count, failures, content_size, aggregated, duration))
+
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(_STATS_HEADER)
+        writer.writerows(rows)
+    f.close()
+
+
+def write_latency(file_path: str, stats: dict[tuple[str, str], RequestStats]):
+    """
+    write_latency() saves the latency histogram of each request name, the methods of a name are merged.
+
+    Args:
+        file_path (str): path of the histogram file
+        stats (dict[tuple[str, str], RequestStats]): stats keyed by method and name
+    """
+    histograms: dict[str, LatencyHistogram] = {}
+    for (_, name), item in stats.items():
+        histograms.setdefault(name, LatencyHistogram()).merge(item.histogram)
+
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    latency_series(histograms).save(file_path)
+
+
+def _stats_row(method: str, name: str, count: int, failures: int, content_size: int,
+               latency: LatencyHistogram, duration: float) -> list:
+    percentiles = latency.quantiles(_STATS_QUANTILES) / 1000
+
+    return [
+        method, name, count, failures,
+        percentiles[0], latency.mean() / 1000, latency.min() / 1000, latency.max() / 1000,
+        content_size / count if count else 0,
+        count / duration, failures / duration,
+        *percentiles
+    ]
@@ -0,0 +1,244 @@
+"""
+Module PairedCollect defines the PairedCollect class, which collects the data of two revisions of the rules
+(i.e., before and after a change) in the same run, so the comparison is not skewed by the drift of the host.
+"""
+import asyncio
+import os
+from bisect import bisect_right
+from contextlib import ExitStack
+from itertools import islice
+import shlex
+import shutil
+import subprocess
+import time
+from typing import Callable, List, Optional
+import docker
+import requests
+from src.type import State, UtilRole
+from src.utils import logger, JsonlSpool, iter_jsonl, to_epoch_seconds
+from .Util import Util, CollectCommandArg
+from .CollectScheduler import CollectScheduler
+
+
+class PairedCollect:
+    """
+    PairedCollect runs a WAF container per revision of the rules, and alternates the load between them
+    in blocks (i.e., before, after, before, after, ...), so a slow period of the host hits both revisions alike.
+
+    Each block runs the load generators with CollectScheduler against the WAF of its revision, with fresh util
+    instances. The samplers are started once for the whole run (e.g., cAdvisor takes about a minute to start)
+    and sample both WAF containers, their samples are split into the blocks afterwards (see `split_samples()`).
+    The raw data of a block is stored in `<raw_output>/<state>/block-<n>/`, `Util.parse_states()` merges
+    the blocks of each state for the report.
+
+    The rules of a revision are exported from the git repository of `rules_dir` (`git archive`),
+    and mounted read-only into its WAF container. The utils read the exported rules as `rules_dir`,
+    the WAF containers are not started if no util needs them (see `Util.needs_waf`).
+
+    Args:
+        - `create_utils` (Callable[[], List[Util]]): creates the utils of the run, and of each block
+        - `deadline` (Optional[float], optional): global deadline in seconds. Defaults to None (no deadline).
+    """
+    create_utils: Callable[[], List[Util]]
+    deadline: Optional[float]
+
+    waf_image: str = "owasp/modsecurity-crs:apache"
+    rules_mount: str = "/opt/owasp-crs/rules"
+    waf_container_port: str = "8080/tcp"
+    waf_ports: dict[State, int] = {State.BEFORE: 8081, State.AFTER: 8082}
+
+    # seconds to wait for a WAF to serve requests
+    waf_start_timeout: float = 60
+
+    # samples of a sampler read at a time when they are split into the blocks
+    split_batch_size: int = 4096
+
+    def __init__(self, create_utils: Callable[[], List[Util]], deadline: Optional[float] = None):
+        self.create_utils = create_utils
+        self.deadline = deadline
+
+    async def run(self, args: CollectCommandArg) -> bool:
+        """
+        run() starts the WAF of each revision, runs `args.blocks` blocks of each revision alternately
+        under the samplers, and stops the WAFs.
+
+        Args:
+            args (CollectCommandArg): collect command arg, `before` and `after` are the git revisions of the rules
+
+        Returns:
+            bool: False if the deadline is reached before all the blocks complete
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        revisions = {State.BEFORE: args.before, State.AFTER: args.after}
+        utils = self.create_utils()
+        needs_waf = not utils or any(util.needs_waf for util in utils)
+        rules_dirs = {state: os.path.join(args.tmp_dir, state.value, "rules") for state in revisions}
+        containers, samplers, windows = {}, [], []
+
+        async def loads() -> bool:
+            for block in range(args.blocks):
+                for state in revisions:
+                    block_args = args.block_args(state, block, self.waf_endpoint(state), rules_dirs[state])
+                    os.makedirs(block_args.raw_output, exist_ok=True)
+                    os.makedirs(block_args.tmp_dir, exist_ok=True)
+
+                    logger.info(f"Running block {block} of {state.value} ({revisions[state]})")
+                    # without load generators, go-ftw is run as the load of the block (see `CollectScheduler`)
+                    block_utils = [util for util in self.create_utils() if util.role == UtilRole.LOAD]
+                    start = time.time()
+                    try:
+                        completed = await CollectScheduler(block_utils).run(block_args)
+                    finally:
+                        windows.append((state, block, start, time.time()))
+                    if not completed:
+                        return False
+            return True
+
+        try:
+            for state, revision in revisions.items():
+                await asyncio.to_thread(self.export_rules, args.rules_dir, revision, rules_dirs[state])
+                if needs_waf:
+                    containers[state] = await asyncio.to_thread(self.start_waf, args, state, rules_dirs[state])
+
+            if containers:
+                samplers = [util for util in utils if util.role == UtilRole.SAMPLER]
+            for sampler in samplers:
+                sampler.waf_container_names = list(containers.values())
+
+            remaining = None if self.deadline is None else self.deadline - (loop.time() - started)
+            if remaining is not None and remaining <= 0:
+                logger.warning(f"Deadline ({self.deadline}s) reached, the blocks are skipped")
+                return False
+
+            completed = await CollectScheduler(samplers, remaining).run(args, loads)
+        finally:
+            for state, container in containers.items():
+                await asyncio.to_thread(self.stop_waf, container)
+
+        states = {container: state for state, container in containers.items()}
+        for sampler in samplers:
+            self.split_samples(args, sampler.raw_filename, states, windows)
+        return completed
+
+    def split_samples(self, args: CollectCommandArg, filename: str, states: dict[str, State],
+                      windows: List[tuple[State, int, float, float]]):
+        """
+        split_samples() splits the samples of a sampler (`<raw_output>/<filename>`, JSON Lines with
+        the `container` and the `timestamp` of each sample) into the blocks: a sample is stored in the block
+        of the state of its container whose load window contains it, the samples between the blocks are dropped.
+        The containers are labelled alike (`modsec_version`), so the states are compared container by container.
+
+        Args:
+            args (CollectCommandArg): collect command arg
+            filename (str): raw data file of the sampler, it is removed once split
+            states (dict[str, State]): state of each container
+            windows (List[tuple[State, int, float, float]]): state, block, start and end time (unix time in seconds)
+                of the load of each block
+        """
+        file_path = os.path.join(args.raw_output, filename)
+        if not os.path.exists(file_path):
+            return
+
+        # the blocks run one after another, the window of a sample is the last one started before it
+        windows = sorted(windows, key=lambda window: window[2])
+        starts = [start for _, _, start, _ in windows]
+
+        with ExitStack() as stack:
+            spools = [stack.enter_context(JsonlSpool(os.path.join(args.raw_output, state.value, f"block-{block}",
+                                                                  filename)))
+                      for state, block, _, _ in windows]
+            records = iter_jsonl(file_path)
+            # the samples are streamed in batches, their timestamps are parsed a batch at a time
+            while batch := list(islice(records, self.split_batch_size)):
+                times = to_epoch_seconds([record["timestamp"] for record in batch])
+                for record, timestamp in zip(batch, times.tolist()):
+                    idx = bisect_right(starts, timestamp) - 1
+                    if idx < 0:
+                        continue
+                    state, _, _, end = windows[idx]
+                    if timestamp <= end and states.get(record.get("container")) == state:
+                        spools[idx].append({**record, "container": args.modsec_version})
+        os.remove(file_path)
+
+    def waf_endpoint(self, state: State) -> str:
+        return f"http://localhost:{self.waf_ports[state]}"
+
+    def export_rules(self, rules_dir: str, revision: str, dest: str):
+        """
+        export_rules() exports the rules of a git revision into a directory.
+
+        Args:
+            rules_dir (str): directory of the rules, in a git repository
+            revision (str): git revision (e.g., a commit hash)
+            dest (str): destination directory, it is emptied first
+
+        Raises:
+            ValueError: if the revision of the rules cannot be exported
+        """
+        shutil.rmtree(dest, ignore_errors=True)
+        os.makedirs(dest)
+
+        try:
+            # root of the repository and path of rules_dir in it, the archive only contains the rules
+            root, prefix = subprocess.run(["git", "-C", rules_dir, "rev-parse", "--show-toplevel", "--show-prefix"],
+                                          capture_output=True, text=True, check=True).stdout.split("\n")[:2]
+            subprocess.run(f"git -C {shlex.quote(root)} archive --format=tar {shlex.quote(f'{revision}:{prefix}')}"
+                           f" | tar -x -C {shlex.quote(dest)}",
+                           shell=True, capture_output=True, check=True, executable="/bin/bash")
+        except subprocess.CalledProcessError as e:
+            raise ValueError(f"Failed to export the rules of {revision} from {rules_dir}: {e.stderr}") from e
+
+    def start_waf(self, args: CollectCommandArg, state: State, rules_dir: str) -> str:
+        """
+        start_waf() starts the WAF container of a state with its rules, and waits for it to serve requests.
+
+        Returns:
+            str: container name
+        """
+        name = f"{args.test_name}-{state.value}"
+        if not self.run_waf(name, self.waf_ports[state], rules_dir):
+            logger.critical(f"WAF of {state.value} is not up")
+            exit(1)
+        return name
+
+    def run_waf(self, name: str, port: int, rules_dir: str, cpuset_cpus: Optional[str] = None) -> bool:
+        """
+        run_waf() runs a WAF container with the rules of a directory, replacing the container of the same name,
+        and waits for it to serve requests.
+
+        Args:
+            name (str): container name
+            port (int): port of the host the WAF is published on
+            rules_dir (str): rules mounted into the container
+            cpuset_cpus (Optional[str], optional): CPUs the container is pinned to (e.g., `0-1`).
+                Defaults to None (any CPU).
+
+        Returns:
+            bool: False if the WAF does not serve requests within `waf_start_timeout`
+        """
+        client = docker.from_env()
+
+        try:
+            client.containers.get(name).remove(force=True)
+        except docker.errors.NotFound:
+            pass
+
+        client.containers.run(self.waf_image, name=name, detach=True, cpuset_cpus=cpuset_cpus,
+                              ports={self.waf_container_port: port},
+                              volumes={os.path.abspath(rules_dir): {"bind": self.rules_mount, "mode": "ro"}})
+
+        start = time.monotonic()
+        while time.monotonic() - start < self.waf_start_timeout:
+            try:
+                requests.get(f"http://localhost:{port}", timeout=5)
+                return True
+            except requests.exceptions.ConnectionError:
+                time.sleep(1)
+        return False
+
+    def stop_waf(self, name: str):
+        try:
+            docker.from_env().containers.get(name).remove(force=True)
+        except Exception as e:
+            logger.error(f"Failed to stop {name}: {e!r}")
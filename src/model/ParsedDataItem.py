@@ -0,0 +1,24 @@
+"""
+Module ParsedDataItem defines the ParsedDataItem class, a single data item parsed from raw data.
+"""
+from typing import List
+
+
+class ParsedDataItem:
+    """
+        ParsedDataItem is a class for representing a data item. It is used for generating reports.
+
+        Args:
+            - `key` (any): key is the identifier of the data item. Ideally, it will be the name of a matrix.
+            - `value` (any): value is the value of the data item.
+            - `labels` (List[str], optional): labels is useful when using Threshold. It can used for filter condition.
+                Defaults to [].
+        """
+    key: any
+    value: any
+    labels: set
+
+    def __init__(self, key: any, value: any, labels: List[str] = []):
+        self.key = key
+        self.value = value
+        self.labels = set(labels)
@@ -0,0 +1,280 @@
+"""
+Module RegexProfilerUtil defines the RegexProfilerUtil class, an offline profiler of the `@rx` operators
+of the rules in `rules_dir`. It needs no WAF container and no network.
+
+Usage:
+    ```sh
+    TEST_NAME=example
+    poetry run collect --test-name $TEST_NAME --utils regex --rules-dir ./rules
+    poetry run report --test-name $TEST_NAME --utils regex
+    ```
+"""
+import asyncio
+import csv
+import multiprocessing
+import os
+import re
+import time
+from functools import partial
+from typing import List, Optional
+import numpy as np
+from astropy.table import Table
+# `regex` is closer to PCRE than `re` (e.g., POSIX classes, `\Q...\E`, global flags in the middle of a pattern),
+# the patterns it cannot compile are reported as errors
+import regex as _engine
+from src.utils import logger
+from .ChangeImpact import read_rule_files, iter_rules
+from .FTWCorpusCache import FTWCorpusCache
+from .Util import ParsedDataItem, MetricSeries, Util, ReportCommandArg, CollectCommandArg, \
+    rule_id_of, rule_family_of
+
+# operator of a `SecRule VARIABLES "OPERATOR" "ACTIONS"` directive
+_OPERATOR = re.compile(rb"^\s*SecRule\s+(?:\"(?:[^\"\\]|\\.)*\"|\S+)\s+\"((?:[^\"\\]|\\.)*)\"", re.IGNORECASE)
+
+# `\Q...\E` of PCRE (the characters in between are literals, up to the end of the pattern without `\E`),
+# or any other escape, which is kept as is
+_QUOTED = re.compile(r"\\Q(.*?)(?:\\E|$)|\\.", re.DOTALL)
+
+_RAW_HEADER: List[str] = ["Rule ID", "Patterns", "Payloads", "Total Time", "Mean Time", "Max Time", "Error"]
+
+
+class RegexProfilerUtil(Util):
+    """
+    RegexProfilerUtil times the `@rx` patterns of each rule against the payloads of its go-ftw tests
+    (i.e., the URI, the body and the header values of each stage), in a pool of processes.
+
+    A rule is timed with all its patterns (including its chained rules), on the raw payloads,
+    without the transformations of the rule. A rule without tests is timed against the payloads of its family
+    (e.g., 920), a rule without any payload is skipped. The time of a payload is the fastest of `repeat` matches
+    (the slower ones are slowed down by the host, not by the pattern).
+
+    The matching time (in microseconds) of each rule is written to `regex_cost.csv`. A pattern which does not
+    compile (see `compile_pattern()`) is reported as an error of its rule.
+    """
+    raw_filename: str = "regex_cost.csv"
+    threshold_filename: str = "regex.threshold.json"
+    needs_waf: bool = False
+
+    # matches of each payload, number of processes (None is the number of CPUs), and rows in the text report
+    repeat: int = 20
+    processes: Optional[int] = None
+    report_limit: int = 20
+
+    def collect(self, args: CollectCommandArg):
+        asyncio.run(self.run(args, asyncio.Event()))
+
+    async def run(self, args: CollectCommandArg, stop: asyncio.Event):
+        patterns = rx_patterns(read_rule_files(args.rules_dir))
+        payloads = self.__payloads(args.test_cases_dir)
+
+        items, skipped = [], 0
+        for rule_id in sorted(patterns):
+            rule_payloads = payloads.get(rule_id) or payloads.get(rule_family_of(rule_id))
+            if not rule_payloads:
+                skipped += 1
+                continue
+            items.append((rule_id, patterns[rule_id], rule_payloads))
+
+        if skipped:
+            logger.info(f"{skipped} rules have no payload in {args.test_cases_dir}, they are not profiled")
+        if not items:
+            logger.error(f"No @rx rule with payloads found in {args.rules_dir}, the profile is skipped")
+            return
+
+        rows = await self.profile(items)
+        write_cost_csv(os.path.join(args.raw_output, self.raw_filename), rows)
+
+    async def profile(self, items: List[tuple[str, List[str], List[str]]]) -> List[tuple]:
+        """
+        profile() times the rules in a pool of processes. If the caller is cancelled (e.g., the deadline is
+        reached, or a pattern backtracks catastrophically), the processes are terminated.
+
+        Args:
+            items (List[tuple[str, List[str], List[str]]]): rule id, patterns and payloads of each rule
+
+        Returns:
+            List[tuple]: a row of `regex_cost.csv` for each rule, see `_profile_rule()`
+        """
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            # a rule per task, the cost of the patterns varies by orders of magnitude
+            result = pool.map_async(partial(_profile_rule, repeat=self.repeat), items, chunksize=1)
+            while not result.ready():
+                await asyncio.sleep(0.05)
+            return result.get()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def text_report(self, args: ReportCommandArg):
+        states = self.parse_states(args.raw_output)
+        if states:
+            self.paired_text_report(args, states)
+            return
+
+        data = self.parse_data(os.path.join(args.raw_output, self.raw_filename))
+
+        total = data["total_match_time"]
+        order = np.argsort(total.values)[::-1][:self.report_limit]
+        output = Table()
+        output["Rule ID"] = total.keys[order]
+        for name, title in [("payloads", "Payloads"), ("match_time", "Mean (us)"),
+                            ("max_match_time", "Max (us)"), ("total_match_time", "Total (us)")]:
+            output[title] = [f"{'{0:.4f}'.format(value)}" for value in data[name].values[order].astype(float)]
+
+        print(self.color_text(f"Costliest {len(order)} of {len(total)} rules ({_engine.__name__})", "white", True))
+        print(output)
+        errors = data["errors"]
+        for idx, rule_id in enumerate(errors.values):
+            logger.warning(f"Rule {rule_id} is not profiled: {errors.labels_of(idx)[0]}")
+
+        self._report_thresholds(args, None, data)
+
+    def figure_report(self, args: ReportCommandArg):
+        pass
+
+    def parse_data(self, file_path: str) -> dict[str, MetricSeries | ParsedDataItem]:
+        """
+        parse_data() parses `regex_cost.csv` into a MetricSeries per column, keyed by rule id
+        and labelled by rule id and family. The rules that failed to compile are in `errors`.
+
+        Args:
+            file_path (str): file path of the raw data
+
+        Returns:
+            dict[str, MetricSeries | ParsedDataItem]: data parsed from the file
+        """
+        rows, errors = [], []
+        with open(file_path, "r", newline="") as f:
+            for row in csv.DictReader(f):
+                (errors if row["Error"] else rows).append(row)
+        f.close()
+
+        rule_ids = [row["Rule ID"] for row in rows]
+        labels = [[rule_id, rule_family_of(rule_id)] for rule_id in rule_ids]
+
+        def column(name: str, dtype: type) -> MetricSeries:
+            return MetricSeries(rule_ids, np.array([row[name] for row in rows], dtype=dtype), labels)
+
+        return {
+            "patterns": column("Patterns", np.int64),
+            "payloads": column("Payloads", np.int64),
+            "match_time": column("Mean Time", np.float64),
+            "max_match_time": column("Max Time", np.float64),
+            "total_match_time": column("Total Time", np.float64),
+            "errors": MetricSeries(["ruleID"] * len(errors), [row["Rule ID"] for row in errors],
+                                   [[row["Error"]] for row in errors]),
+        }
+
+    def __payloads(self, test_cases_dir: str) -> dict[str, List[str]]:
+        """
+        __payloads() returns the payloads of the go-ftw tests, keyed by rule id and by rule family.
+        """
+        res: dict[str, List[str]] = {}
+        for tests in FTWCorpusCache().load(test_cases_dir).values():
+            for test_title, stages in tests:
+                rule_id = rule_id_of(str(test_title))
+                for stage in stages:
+                    values = payloads_of(stage)
+                    res.setdefault(rule_id, []).extend(values)
+                    res.setdefault(rule_family_of(rule_id), []).extend(values)
+        return res
+
+
+def rx_patterns(files: dict[str, bytes]) -> dict[str, List[str]]:
+    """
+    rx_patterns() extracts the `@rx` patterns of each rule, a `SecRule` without an operator name is a `@rx`.
+
+    Args:
+        files (dict[str, bytes]): files of the rules (see `read_rule_files()`)
+
+    Returns:
+        dict[str, List[str]]: patterns of each rule (and its chained rules), keyed by rule id
+    """
+    res: dict[str, List[str]] = {}
+    for rule_id, directive in iter_rules(files):
+        operator = _OPERATOR.match(directive)
+        if operator is None:
+            continue
+
+        operator = operator.group(1).replace(b"\\\"", b"\"").decode(errors="replace").removeprefix("!")
+        if operator.startswith("@"):
+            name, _, operator = operator.partition(" ")
+            if name.lower() != "@rx":
+                continue
+            operator = operator.lstrip()
+
+        res.setdefault(rule_id, []).append(operator)
+    return res
+
+
+def payloads_of(stage: dict) -> List[str]:
+    """
+    payloads_of() returns the inputs of a go-ftw stage matched by the rules: its URI, body and header values.
+    """
+    res = [str(stage.get("uri") or "/")]
+    if stage.get("data"):
+        res.append(stage["data"] if isinstance(stage["data"], str) else str(stage["data"]))
+    res += [str(value) for value in (stage.get("headers") or {}).values()]
+    return res
+
+
+def write_cost_csv(file_path: str, rows: List[tuple]):
+    """
+    write_cost_csv() writes a row per rule, the times are in microseconds.
+
+    Args:
+        file_path (str): path of the csv file
+        rows (List[tuple]): rows returned by `_profile_rule()`
+    """
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(_RAW_HEADER)
+        writer.writerows(rows)
+    f.close()
+
+
+def compile_pattern(pattern: str) -> any:
+    """
+    compile_pattern() compiles an `@rx` pattern with the PCRE syntax. `regex` supports most of it
+    (e.g., POSIX classes), `\\Q...\\E` is replaced by the escaped literals.
+
+    Raises:
+        regex.error: if the pattern does not compile
+    """
+    pattern = _QUOTED.sub(lambda match: _engine.escape(match.group(1)) if match.group(0)[1] == "Q" else match.group(0),
+                          pattern)
+    return _engine.compile(pattern)
+
+
+def match_time(compiled: List[any], payload: str, repeat: int) -> float:
+    """
+    match_time() returns the fastest of `repeat` searches of the compiled patterns in a payload, in microseconds.
+    """
+    fastest = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for pattern in compiled:
+            pattern.search(payload)
+        fastest = min(fastest, time.perf_counter() - start)
+    return fastest * 1e6
+
+
+def _profile_rule(item: tuple[str, List[str], List[str]], repeat: int) -> tuple:
+    """
+    _profile_rule() times the patterns of a rule against its payloads, in a process of the pool.
+
+    Returns:
+        tuple: rule id, number of patterns and payloads, total, mean and max time of a payload (in microseconds),
+            and the compile error (empty if the patterns compile)
+    """
+    rule_id, patterns, payloads = item
+    try:
+        compiled = [compile_pattern(pattern) for pattern in patterns]
+    except (_engine.error, ValueError) as e:
+        return rule_id, len(patterns), len(payloads), "", "", "", str(e) or type(e).__name__
+
+    costs = [match_time(compiled, payload, repeat) for payload in payloads]
+
+    return rule_id, len(patterns), len(payloads), sum(costs), sum(costs) / len(costs), max(costs), ""
@@ -1,7 +1,7 @@
 """
 Module ReportCommandArg is a class for representing the arguments for report command.
 """
-from typing import List
+from typing import List, Optional
 from src.type import UtilType, ReportFormat
 
 
@@ -16,6 +16,11 @@ class ReportCommandArg:
         - `output` (str): output directory. Default: ./report.
         - `threshold_conf` (str): threshold configuration directory. Default: None.
         - `report_format` (ReportFormat): report format. Default: ReportFormat.TEXT.
+        - `history` (str): path of the run history database (see `RunHistory`). Default: None.
+        - `ingest` (bool): add the data of the test to the run history. Default: False.
+        - `commit` (str): commit of the rules of the test, in the run history. Default: None.
+        - `branch` (str): branch of the commit, in the run history. Default: None.
+        - `trend` (str): metric whose trend across the runs of the test is printed. Default: None.
     """
     test_name: str
     utils: List[UtilType]
@@ -23,6 +28,11 @@ class ReportCommandArg:
     output: str
     threshold_conf: str
     report_format: ReportFormat
+    history: Optional[str]
+    ingest: bool
+    commit: Optional[str]
+    branch: Optional[str]
+    trend: Optional[str]
 
     def __init__(self,
                  test_name: str,
@@ -30,7 +40,12 @@ class ReportCommandArg:
                  raw_output: str,
                  output: str,
                  threshold_conf: str,
-                 report_format: ReportFormat
+                 report_format: ReportFormat,
+                 history: Optional[str] = None,
+                 ingest: Optional[bool] = None,
+                 commit: Optional[str] = None,
+                 branch: Optional[str] = None,
+                 trend: Optional[str] = None
                  ):
         self.test_name = test_name
         self.utils = utils
@@ -38,3 +53,8 @@ class ReportCommandArg:
         self.output = f"{output}/{self.test_name}" if output else f"./report/{self.test_name}"
         self.threshold_conf = threshold_conf if threshold_conf else None
         self.report_format = report_format if report_format else ReportFormat.TEXT
+        self.history = history
+        self.ingest = bool(ingest)
+        self.commit = commit
+        self.branch = branch
+        self.trend = trend
@@ -0,0 +1,199 @@
+"""
+Module ResultCache defines the ResultCache class, a local store of the raw data of collects keyed by the
+fingerprint of their inputs, so a baseline measured by a previous run is reused instead of collected again.
+"""
+import hashlib
+import json
+import os
+import platform
+import shutil
+import time
+from typing import List, Optional
+from src.utils import logger
+from .ChangeImpact import read_rule_files
+from .CollectCommandArg import CollectCommandArg
+from .Util import Util
+
+
+class ResultCache:
+    """
+    ResultCache stores the raw output directory of a collect under the fingerprint of its inputs:
+    the rules (of each revision in a paired collect), the test corpus, the WAF version and image,
+    the settings of the utils and of the collect, and a tag of the host class
+    (the same inputs measured on another kind of host are not the same baseline).
+
+    An entry is fresh for `max_age` seconds. On each `store()`, the stale entries are evicted,
+    then the least recently used entries until the store fits in `max_size` bytes.
+
+    Args:
+        - `cache_dir` (str, optional): directory of the store. Defaults to "./tmp/result_cache".
+        - `max_age` (float, optional): seconds an entry is reused. Defaults to 7 days.
+        - `max_size` (int, optional): max. total bytes of the entries. Defaults to 1 GiB.
+    """
+    cache_dir: str
+    max_age: float
+    max_size: int
+
+    __meta_filename: str = "meta.json"
+
+    def __init__(self, cache_dir: str = "./tmp/result_cache",
+                 max_age: float = 7 * 24 * 3600,
+                 max_size: int = 1 << 30):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.max_size = max_size
+
+    def fingerprint(self, args: CollectCommandArg, utils: List[Util],
+                    image_digest: Optional[str] = None, host_tag: Optional[str] = None) -> str:
+        """
+        fingerprint() returns the hash of the inputs of a collect.
+
+        Args:
+            args (CollectCommandArg): collect command arg
+            utils (List[Util]): utils of the collect
+            image_digest (Optional[str], optional): digest of the WAF image. Defaults to None.
+            host_tag (Optional[str], optional): class of the host. Defaults to None (see `host_tag()`).
+
+        Returns:
+            str: hex digest
+        """
+        revisions = [args.before, args.after] if args.paired else [None]
+        inputs = {
+            "rules": [_digest_files(read_rule_files(args.rules_dir, revision)) for revision in revisions],
+            "corpus": _digest_files(_read_files(args.test_cases_dir)),
+            "requests": None if args.request_table is None else _digest_files(_read_files(args.request_table)),
+            "waf": [[target.name for target in args.waf_targets], image_digest],
+            "utils": [[type(util).__name__, _settings_of(util)] for util in utils],
+            "collect": [args.mode if isinstance(args.mode, str) else args.mode.value, args.workers,
+                        len(args.worker_endpoints), args.blocks if args.paired else None, args.block_duration,
+                        args.attribution],
+            "host": host_tag or self.host_tag()
+        }
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+    def host_tag(self) -> str:
+        """
+        host_tag() returns the class of the host, `CRS_HOST_TAG` if it is set, otherwise its machine, OS and CPUs.
+        """
+        return os.environ.get("CRS_HOST_TAG") or f"{platform.machine()}-{platform.system()}-{os.cpu_count()}cpu"
+
+    def restore(self, fingerprint: str, raw_output: str) -> bool:
+        """
+        restore() copies the raw data of a fresh entry into the raw output directory.
+
+        Args:
+            fingerprint (str): fingerprint of the inputs
+            raw_output (str): raw output directory of the collect
+
+        Returns:
+            bool: True if a fresh entry was restored
+        """
+        entry = os.path.join(self.cache_dir, fingerprint)
+        meta = self.__read_meta(entry)
+        if meta is None or time.time() - meta["created"] > self.max_age:
+            return False
+
+        shutil.copytree(entry, raw_output, dirs_exist_ok=True, ignore=shutil.ignore_patterns(self.__meta_filename))
+        meta["used"] = time.time()
+        self.__write_meta(entry, meta)
+        return True
+
+    def store(self, fingerprint: str, raw_output: str):
+        """
+        store() copies the raw output directory of a collect into the store (atomically), then evicts entries.
+
+        Args:
+            fingerprint (str): fingerprint of the inputs
+            raw_output (str): raw output directory of the collect
+        """
+        entry = os.path.join(self.cache_dir, fingerprint)
+        tmp_entry = f"{entry}.{os.getpid()}.tmp"
+
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        shutil.copytree(raw_output, tmp_entry)
+        now = time.time()
+        self.__write_meta(tmp_entry, {"created": now, "used": now, "size": _size_of(tmp_entry)})
+
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp_entry, entry)
+        self.evict()
+
+    def evict(self) -> List[str]:
+        """
+        evict() removes the stale entries, then the least recently used entries until the store fits in `max_size`.
+
+        Returns:
+            List[str]: fingerprints of the removed entries
+        """
+        if not os.path.isdir(self.cache_dir):
+            return []
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            meta = self.__read_meta(os.path.join(self.cache_dir, name))
+            if meta is not None:
+                entries.append((meta["used"], meta["created"], meta["size"], name))
+
+        now, total, removed = time.time(), sum(entry[2] for entry in entries), []
+        for used, created, size, name in sorted(entries):
+            if now - created > self.max_age or total > self.max_size:
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+                total -= size
+                removed.append(name)
+
+        if removed:
+            logger.info(f"{len(removed)} entries are evicted from the result cache")
+        return removed
+
+    def __read_meta(self, entry: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(entry, self.__meta_filename), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def __write_meta(self, entry: str, meta: dict):
+        with open(os.path.join(entry, self.__meta_filename), "w") as f:
+            json.dump(meta, f)
+
+
+def _read_files(path: str) -> dict[str, bytes]:
+    """
+    _read_files() reads the files in a directory recursively (keyed by their relative path), or a file.
+    """
+    if os.path.isfile(path):
+        with open(path, "rb") as f:
+            return {os.path.basename(path): f.read()}
+    return read_rule_files(path) if os.path.isdir(path) else {}
+
+def _digest_files(files: dict[str, bytes]) -> str:
+    digest = hashlib.sha256()
+    for path in sorted(files):
+        digest.update(path.encode() + b"\0" + hashlib.sha256(files[path]).digest())
+    return digest.hexdigest()
+
+def _settings_of(util: Util) -> dict:
+    """
+    _settings_of() returns the plain settings of a util (e.g., `rate`, `sampling_interval`), i.e.,
+    its attributes holding numbers, strings, or lists and dicts of them.
+    """
+    res = {}
+    for name in dir(util):
+        if name.startswith("__"):
+            continue
+        value = getattr(util, name, None)
+        if not callable(value) and _is_plain(value):
+            res[name] = value if not isinstance(value, (tuple, set)) else sorted(value, key=str)
+    return res
+
+def _is_plain(value: any) -> bool:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return True
+    if isinstance(value, (list, tuple, set)):
+        return all(_is_plain(item) for item in value)
+    if isinstance(value, dict):
+        return all(isinstance(key, str) and _is_plain(item) for key, item in value.items())
+    return False
+
+def _size_of(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(directory) for name in files)
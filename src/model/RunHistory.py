@@ -0,0 +1,312 @@
+"""
+Module RunHistory defines the RunHistory class, a SQLite store of the parsed metrics of many runs,
+so trends across runs and baselines of several runs are queried without parsing the raw files again.
+"""
+import re
+import sqlite3
+import time
+from typing import List, Optional
+import numpy as np
+from src.utils import LatencyHistogram
+from .MetricSeries import MetricSeries
+from .HistogramSeries import HistogramSeries
+from .ParsedDataItem import ParsedDataItem
+
+# keys of the data of a rule, i.e., a go-ftw test id (e.g., `920170-1`) or a rule id (e.g., `920170`)
+_RULE_KEY = re.compile(r"^(\d{6})(?:-\d+)?$")
+
+# separator of the labels of an item, labels never contain it
+_LABEL_SEPARATOR = "\x1f"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    test_name TEXT NOT NULL,
+    commit_hash TEXT,
+    branch TEXT,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_test ON runs (test_name, branch, timestamp);
+CREATE INDEX IF NOT EXISTS runs_by_commit ON runs (commit_hash, timestamp);
+
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    util TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    rule_id TEXT,
+    key TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS samples_by_metric ON samples (util, metric, rule_id, run_id);
+CREATE INDEX IF NOT EXISTS samples_by_run ON samples (run_id);
+
+CREATE TABLE IF NOT EXISTS histograms (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    util TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    rule_id TEXT,
+    key TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    significant_digits INTEGER NOT NULL,
+    highest_value INTEGER NOT NULL,
+    bucket_indices BLOB NOT NULL,
+    bucket_counts BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS histograms_by_metric ON histograms (util, metric, rule_id, run_id);
+"""
+
+# aggregate of the samples of a run in `trend()`
+_AGGREGATES = {"mean": "AVG", "sum": "SUM", "min": "MIN", "max": "MAX", "count": "COUNT"}
+
+
+class RunHistory:
+    """
+    RunHistory stores the parsed data of runs in SQLite, a run is a collect of a test at a commit.
+    The numeric items of MetricSeries and ParsedDataItem are stored as samples, the histograms of
+    HistogramSeries are stored losslessly (their non-empty buckets). Each item keeps its key and labels,
+    and the rule id of its key (if it is a go-ftw test id or a rule id), so the data of a rule is indexed.
+
+    Usage:
+        ```python
+        with RunHistory("./data/history.sqlite") as history:
+            run_id = history.add_run("pipeline-test", commit="abc123", branch="main")
+            history.add_data(run_id, "FTWUtil", FTWUtil().parse_output("./data/pipeline-test"))
+            baseline = history.baseline("FTWUtil", "runtime", branch="main", runs=10)
+        ```
+
+    Args:
+        - `db_path` (str): path of the SQLite database, it is created if missing
+    """
+    db_path: str
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.__db = sqlite3.connect(db_path)
+        self.__db.execute("PRAGMA foreign_keys = ON")
+        self.__db.executescript(_SCHEMA)
+
+    def __enter__(self) -> 'RunHistory':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self.__db.close()
+
+    def add_run(self, test_name: str, commit: Optional[str] = None, branch: Optional[str] = None,
+                timestamp: Optional[float] = None) -> int:
+        """
+        add_run() adds a run, its data is added by `add_data()`.
+
+        Args:
+            test_name (str): name of the test
+            commit (Optional[str], optional): commit of the rules. Defaults to None.
+            branch (Optional[str], optional): branch of the commit (e.g., `main`). Defaults to None.
+            timestamp (Optional[float], optional): unix time of the run. Defaults to None (now).
+
+        Returns:
+            int: id of the run
+        """
+        with self.__db:
+            cursor = self.__db.execute("INSERT INTO runs (test_name, commit_hash, branch, timestamp) VALUES (?, ?, ?, ?)",
+                                       (test_name, commit, branch, time.time() if timestamp is None else timestamp))
+        return cursor.lastrowid
+
+    def add_data(self, run_id: int, util: str, data: dict[str, MetricSeries | ParsedDataItem]) -> int:
+        """
+        add_data() adds the parsed data of a util to a run, the items without a numeric value are skipped.
+
+        Args:
+            run_id (int): id of the run
+            util (str): name of the util (e.g., `FTWUtil`)
+            data (dict[str, MetricSeries | ParsedDataItem]): parsed data keyed by metric name
+
+        Returns:
+            int: number of items added
+        """
+        samples, histograms = [], []
+
+        for metric, series in data.items():
+            if isinstance(series, ParsedDataItem):
+                if isinstance(series.value, (int, float)) and not isinstance(series.value, bool):
+                    samples.append((run_id, util, metric, _rule_id_of(series.key), str(series.key),
+                                    _LABEL_SEPARATOR.join(sorted(series.labels)), float(series.value)))
+                continue
+
+            if isinstance(series, HistogramSeries):
+                for row, key in enumerate(series.keys):
+                    start, end = series.bucket_offsets[row], series.bucket_offsets[row + 1]
+                    histograms.append((run_id, util, metric, _rule_id_of(key), str(key),
+                                       _LABEL_SEPARATOR.join(series.labels_of(row)),
+                                       series.significant_digits, series.highest_value,
+                                       series.bucket_indices[start:end].tobytes(),
+                                       series.bucket_counts[start:end].tobytes()))
+                continue
+
+            if not isinstance(series, MetricSeries) or series.values.dtype.kind not in "iuf":
+                continue
+
+            keys = [str(key) for key in series.keys]
+            samples += zip([run_id] * len(keys), [util] * len(keys), [metric] * len(keys),
+                           [_rule_id_of(key) for key in keys], keys,
+                           [_LABEL_SEPARATOR.join(series.labels_of(idx)) for idx in range(len(keys))],
+                           series.values.astype(np.float64).tolist())
+
+        with self.__db:
+            self.__db.executemany("INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?)", samples)
+            self.__db.executemany("INSERT INTO histograms VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", histograms)
+        return len(samples) + len(histograms)
+
+    def runs(self, test_name: Optional[str] = None, branch: Optional[str] = None,
+             limit: Optional[int] = None) -> List[tuple[int, str, Optional[str], Optional[str], float]]:
+        """
+        runs() returns the most recent runs first, i.e., `(id, test_name, commit, branch, timestamp)`.
+
+        Args:
+            test_name (Optional[str], optional): only the runs of the test. Defaults to None (all the tests).
+            branch (Optional[str], optional): only the runs of the branch. Defaults to None (all the branches).
+            limit (Optional[int], optional): max. number of runs. Defaults to None (no limit).
+        """
+        conditions, params = _run_conditions(test_name, branch)
+        query = f"SELECT id, test_name, commit_hash, branch, timestamp FROM runs {conditions} " \
+                f"ORDER BY timestamp DESC, id DESC LIMIT ?"
+        return self.__db.execute(query, (*params, -1 if limit is None else limit)).fetchall()
+
+    def trend(self, util: str, metric: str,
+              test_name: Optional[str] = None,
+              rule_id: Optional[str] = None,
+              branch: Optional[str] = None,
+              statistic: str = "mean",
+              limit: Optional[int] = None) -> MetricSeries:
+        """
+        trend() returns a value per run of a metric, i.e., the aggregate of the samples of each run.
+
+        Args:
+            util (str): name of the util
+            metric (str): name of the metric
+            test_name (Optional[str], optional): only the runs of the test. Defaults to None (all the tests).
+            rule_id (Optional[str], optional): only the samples of the rule. Defaults to None (all the samples).
+            branch (Optional[str], optional): only the runs of the branch. Defaults to None (all the branches).
+            statistic (str, optional): `mean`, `sum`, `min`, `max` or `count`. Defaults to `mean`.
+            limit (Optional[int], optional): only the most recent runs. Defaults to None (all the runs).
+
+        Raises:
+            ValueError: if the statistic is unknown
+
+        Returns:
+            MetricSeries: oldest run first, keyed by the unix time of the run and labelled with its commit
+        """
+        if statistic not in _AGGREGATES:
+            raise ValueError(f"Invalid trend statistic: {statistic}")
+
+        run_ids = [run[0] for run in self.runs(test_name, branch, limit)]
+        rule_condition = "" if rule_id is None else "AND rule_id = ?"
+        rows = self.__db.execute(
+            f"SELECT runs.timestamp, runs.commit_hash, {_AGGREGATES[statistic]}(samples.value) "
+            f"FROM samples JOIN runs ON runs.id = samples.run_id "
+            f"WHERE util = ? AND metric = ? {rule_condition} AND run_id IN ({','.join('?' * len(run_ids))}) "
+            f"GROUP BY run_id ORDER BY runs.timestamp, run_id",
+            (util, metric, *([] if rule_id is None else [rule_id]), *run_ids)
+        ).fetchall()
+
+        return MetricSeries([row[0] for row in rows], [row[2] for row in rows],
+                            [[row[1]] if row[1] else [] for row in rows])
+
+    def baseline(self, util: str, metric: str,
+                 test_name: Optional[str] = None,
+                 branch: Optional[str] = None,
+                 runs: int = 10,
+                 statistic: str = "median") -> Optional[MetricSeries]:
+        """
+        baseline() returns a rolling baseline of a metric from the most recent runs (e.g., the median of
+        the last 10 runs of `main`), to be compared with a new run as the before-data of thresholds.
+        The samples are aggregated per key (`median` or `mean`), the histograms of each key are merged.
+
+        Args:
+            util (str): name of the util
+            metric (str): name of the metric
+            test_name (Optional[str], optional): only the runs of the test. Defaults to None (all the tests).
+            branch (Optional[str], optional): only the runs of the branch. Defaults to None (all the branches).
+            runs (int, optional): number of the most recent runs. Defaults to 10.
+            statistic (str, optional): `median` or `mean` of the samples of each key. Defaults to `median`.
+
+        Raises:
+            ValueError: if the statistic is unknown
+
+        Returns:
+            Optional[MetricSeries]: the baseline keyed as the runs, None if no run has the metric
+        """
+        if statistic not in ("median", "mean"):
+            raise ValueError(f"Invalid baseline statistic: {statistic}")
+
+        run_ids = [run[0] for run in self.runs(test_name, branch, runs)]
+        placeholders = ",".join("?" * len(run_ids))
+
+        histograms = self.__db.execute(
+            f"SELECT key, labels, significant_digits, highest_value, bucket_indices, bucket_counts FROM histograms "
+            f"WHERE util = ? AND metric = ? AND run_id IN ({placeholders}) ORDER BY run_id DESC",
+            (util, metric, *run_ids)
+        ).fetchall()
+        if histograms:
+            return _merge_histograms(histograms)
+
+        rows = self.__db.execute(
+            f"SELECT key, labels, value FROM samples "
+            f"WHERE util = ? AND metric = ? AND value IS NOT NULL AND run_id IN ({placeholders}) ORDER BY run_id DESC",
+            (util, metric, *run_ids)
+        ).fetchall()
+        if not rows:
+            return None
+
+        keys, groups = np.unique(np.array([row[0] for row in rows], dtype=str), return_inverse=True)
+        values = np.array([row[2] for row in rows], dtype=np.float64)
+        counts = np.bincount(groups, minlength=len(keys))
+
+        if statistic == "mean":
+            res = np.bincount(groups, weights=values, minlength=len(keys)) / counts
+        else:
+            # the values sorted within each key, the median is the middle of each group
+            ordered = values[np.lexsort((values, groups))]
+            starts = np.cumsum(counts) - counts
+            res = (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+
+        # the labels of a key are taken from its most recent run
+        labels = {}
+        for key, label_text, _ in rows:
+            labels.setdefault(key, label_text.split(_LABEL_SEPARATOR) if label_text else [])
+        return MetricSeries(keys.tolist(), res, [labels[key] for key in keys.tolist()])
+
+
+def _rule_id_of(key: any) -> Optional[str]:
+    match = _RULE_KEY.match(str(key))
+    return match.group(1) if match else None
+
+def _run_conditions(test_name: Optional[str], branch: Optional[str]) -> tuple[str, list]:
+    conditions, params = [], []
+    for column, value in (("test_name", test_name), ("branch", branch)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+def _merge_histograms(rows: list) -> HistogramSeries:
+    """
+    _merge_histograms() merges the histograms of each key, the labels are taken from its most recent run.
+    """
+    histograms: dict[str, LatencyHistogram] = {}
+    labels: dict[str, List[str]] = {}
+
+    for key, label_text, significant_digits, highest_value, indices, counts in rows:
+        histogram = LatencyHistogram.from_sparse(np.frombuffer(indices, dtype=np.int64),
+                                                 np.frombuffer(counts, dtype=np.int64),
+                                                 significant_digits, highest_value)
+        if key in histograms:
+            histograms[key].merge(histogram)
+        else:
+            histograms[key] = histogram
+            labels[key] = label_text.split(_LABEL_SEPARATOR) if label_text else []
+
+    keys = sorted(histograms)
+    return HistogramSeries(keys, [histograms[key] for key in keys], [labels[key] for key in keys])
@@ -0,0 +1,385 @@
+"""
+Module ScalingSweepUtil defines the ScalingSweepUtil and RegexScalingUtil classes, which grow the payloads of
+the go-ftw tests geometrically and fit how the cost of each rule grows with the size of its input,
+so the rules whose cost grows superlinearly (i.e., prone to ReDoS) are found before they are released.
+
+Usage:
+    ```sh
+    TEST_NAME=example
+    # latency of the WAF
+    poetry run collect --test-name $TEST_NAME --utils scaling
+    # matching time of the @rx patterns of the rules, without a WAF
+    poetry run collect --test-name $TEST_NAME --utils regexScaling --rules-dir ./rules
+    poetry run report --test-name $TEST_NAME --utils regexScaling --threshold-conf ./config
+    ```
+"""
+import asyncio
+import csv
+import os
+import time
+from typing import List, Optional
+import numpy as np
+from astropy.table import Table
+from src.utils import logger, AsyncHTTPClient
+from .ChangeImpact import read_rule_files
+from .FTWCorpusCache import FTWCorpusCache
+from .RegexProfilerUtil import RegexProfilerUtil, rx_patterns, payloads_of
+from .Util import ParsedDataItem, MetricSeries, Util, ReportCommandArg, CollectCommandArg, \
+    rule_id_of, rule_family_of, TEST_MARKER_HEADER
+
+# headers which are not grown: they route the request, or are computed by the http client
+_FIXED_HEADERS = {"host", "content-length", "transfer-encoding", "connection", TEST_MARKER_HEADER.lower()}
+
+_RAW_HEADER: List[str] = ["Rule ID", "Factor", "Size", "Time"]
+
+
+class ScalingSweepUtil(Util):
+    """
+    ScalingSweepUtil sends the stages of the go-ftw tests of each rule with their attack-relevant parts
+    (see `grow_stage()`) repeated 1, 2, 4, ... times, until the largest stage of the rule reaches `max_size` bytes,
+    and records the median latency (in microseconds) of `repeat` requests of each stage at each factor.
+    The requests are sent one by one, so they do not compete for the WAF. A rule is not grown further
+    once its time exceeds `max_time`, it has enough points to show its growth.
+
+    The report fits the exponent `k` of `time = c + a * size^k` of each rule (see `growth_exponent()`):
+    about 1 for a linear cost, 2 for a quadratic one. A rule with `k > superlinear_exponent` is superlinear.
+
+    The sizes and times of each rule and factor are written to `scaling_sweep.csv`.
+    """
+    raw_filename: str = "scaling_sweep.csv"
+    threshold_filename: str = "scaling.threshold.json"
+
+    # largest payload of a stage in bytes (Apache rejects a request line or a header over 8 KiB),
+    # largest factor, factors measured at least, and time of a rule (in microseconds) above which it is not grown
+    max_size: int = 8 * 1024
+    max_factor: int = 1024
+    min_factors: int = 3
+    max_time: float = 1e6
+
+    # measures of a stage at each factor, stages of a rule, and timeout of a request in seconds
+    repeat: int = 5
+    stages_per_rule: int = 4
+    timeout: float = 15
+
+    # exponent above which the cost of a rule grows superlinearly, and rows in the text report
+    superlinear_exponent: float = 1.5
+    report_limit: int = 20
+
+    def collect(self, args: CollectCommandArg):
+        asyncio.run(self.run(args, asyncio.Event()))
+
+    async def run(self, args: CollectCommandArg, stop: asyncio.Event):
+        stages = self.rule_stages(args)
+        if not stages:
+            logger.error(f"No test case found in {args.test_cases_dir}, the scaling sweep is skipped")
+            return
+
+        rows = await self.measure(args, stages)
+        write_sweep_csv(os.path.join(args.raw_output, self.raw_filename), rows)
+
+    def rule_stages(self, args: CollectCommandArg) -> dict[str, List[tuple[str, dict]]]:
+        """
+        rule_stages() returns the go-ftw stages of each rule (at most `stages_per_rule`), with their test ids.
+
+        Args:
+            args (CollectCommandArg): collect command arg
+
+        Returns:
+            dict[str, List[tuple[str, dict]]]: test id and stage input, keyed by rule id in sorted order
+        """
+        res: dict[str, List[tuple[str, dict]]] = {}
+        for tests in FTWCorpusCache().load(args.test_cases_dir).values():
+            for test_title, stages in tests:
+                rule_stages = res.setdefault(rule_id_of(str(test_title)), [])
+                rule_stages += [(str(test_title), stage) for stage in stages]
+        return {rule_id: res[rule_id][:self.stages_per_rule] for rule_id in sorted(res)}
+
+    def factors(self, base_size: int) -> List[int]:
+        """
+        factors() returns the growth factors of a rule whose largest stage has `base_size` bytes.
+        """
+        res = [1]
+        while res[-1] * 2 <= self.max_factor and (
+                len(res) < self.min_factors or base_size * res[-1] * 2 <= self.max_size):
+            res.append(res[-1] * 2)
+        return res
+
+    async def measure(self, args: CollectCommandArg, stages: dict[str, List[tuple[str, dict]]]) -> List[tuple]:
+        """
+        measure() measures the cost of each rule at each factor.
+
+        Args:
+            args (CollectCommandArg): collect command arg
+            stages (dict[str, List[tuple[str, dict]]]): stages of each rule, see `rule_stages()`
+
+        Returns:
+            List[tuple]: rule id, factor, total size of the payloads and total time (in microseconds)
+        """
+        endpoint, rows = args.waf_endpoint.rstrip("/"), []
+
+        async with AsyncHTTPClient(pool_size=1, timeout=self.timeout) as client:
+            # the connection is opened by a request which is not measured, or the first stage would pay for it
+            await self.__latency(client, endpoint, "warm-up", {"uri": "/"})
+            for rule_id, rule_stages in stages.items():
+                for factor in self.factors(max(payload_size(stage) for _, stage in rule_stages)):
+                    size, cost = 0, 0.0
+                    for test_title, stage in rule_stages:
+                        grown = grow_stage(stage, factor)
+                        size += payload_size(grown)
+                        cost += await self.__latency(client, endpoint, test_title, grown)
+                    rows.append((rule_id, factor, size, cost))
+                    if cost > self.max_time:
+                        break
+        return rows
+
+    async def __latency(self, client: AsyncHTTPClient, endpoint: str, test_title: str, stage: dict) -> float:
+        """
+        __latency() returns the median latency of a stage in microseconds, a failed request counts as the timeout.
+        """
+        headers = {str(k): str(v) for k, v in (stage.get("headers") or {}).items()
+                   if str(k).lower() not in _FIXED_HEADERS}
+        headers[TEST_MARKER_HEADER] = test_title
+        body = stage.get("data") or b""
+        body = body if isinstance(body, (bytes, str)) else str(body)
+
+        latencies = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            try:
+                await client.request(stage.get("method") or "GET", endpoint + str(stage.get("uri") or "/"),
+                                     headers, body)
+                latencies.append(time.perf_counter() - start)
+            except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                logger.debug(f"Request {test_title} failed: {e!r}")
+                latencies.append(self.timeout)
+        return float(np.median(latencies)) * 1e6
+
+    def text_report(self, args: ReportCommandArg):
+        states = self.parse_states(args.raw_output)
+        if states:
+            self.paired_text_report(args, states)
+            return
+
+        data = self.parse_data(os.path.join(args.raw_output, self.raw_filename))
+
+        exponents = data["growth_exponent"]
+        order = np.argsort(exponents.values)[::-1][:self.report_limit]
+        output = Table()
+        output["Rule ID"] = exponents.keys[order]
+        for name, title in [("growth_exponent", "Exponent"), ("min_size_time", "Time at 1x (us)"),
+                            ("max_size_time", "Time at max. (us)"), ("max_size", "Max. size (B)")]:
+            output[title] = [f"{'{0:.4f}'.format(value)}" for value in data[name].values[order].astype(float)]
+
+        superlinear = data["superlinear"]
+        print(self.color_text(f"{len(superlinear)} of {len(exponents)} rules grow superlinearly "
+                              f"(exponent > {self.superlinear_exponent})",
+                              "red" if len(superlinear) else "green", True))
+        print(output)
+
+        self._report_thresholds(args, None, data)
+
+    def figure_report(self, args: ReportCommandArg):
+        pass
+
+    def parse_data(self, file_path: str) -> dict[str, MetricSeries | ParsedDataItem]:
+        """
+        parse_data() parses the sweep into a MetricSeries per fitted value, keyed by rule id
+        and labelled by rule id and family: the growth exponent, the time at the smallest and the largest size,
+        and the largest size. The superlinear rules are in `superlinear`, labelled by their exponent.
+
+        Args:
+            file_path (str): file path of the raw data
+
+        Returns:
+            dict[str, MetricSeries | ParsedDataItem]: data parsed from the file
+        """
+        sweeps: dict[str, List[tuple[float, float]]] = {}
+        with open(file_path, "r", newline="") as f:
+            for row in csv.DictReader(f):
+                sweeps.setdefault(row["Rule ID"], []).append((float(row["Size"]), float(row["Time"])))
+        f.close()
+
+        rule_ids = list(sweeps)
+        labels = [[rule_id, rule_family_of(rule_id)] for rule_id in rule_ids]
+        sweeps = {rule_id: sorted(points) for rule_id, points in sweeps.items()}
+        exponents = [growth_exponent(*zip(*sweeps[rule_id])) for rule_id in rule_ids]
+        superlinear = [(rule_id, exponent) for rule_id, exponent in zip(rule_ids, exponents)
+                       if exponent > self.superlinear_exponent]
+
+        return {
+            "growth_exponent": MetricSeries(rule_ids, np.array(exponents, dtype=np.float64), labels),
+            "min_size_time": MetricSeries(rule_ids, [sweeps[rule_id][0][1] for rule_id in rule_ids], labels),
+            "max_size_time": MetricSeries(rule_ids, [sweeps[rule_id][-1][1] for rule_id in rule_ids], labels),
+            "max_size": MetricSeries(rule_ids, [sweeps[rule_id][-1][0] for rule_id in rule_ids], labels),
+            "superlinear": MetricSeries(["ruleID"] * len(superlinear), [rule_id for rule_id, _ in superlinear],
+                                        [[rule_id, f"{exponent:.2f}"] for rule_id, exponent in superlinear]),
+        }
+
+
+class RegexScalingUtil(ScalingSweepUtil):
+    """
+    RegexScalingUtil runs the sweep of ScalingSweepUtil against the `@rx` patterns of the rules in `rules_dir`
+    (see `RegexProfilerUtil`) instead of the WAF, so it needs no WAF container and no network.
+    The time of a rule is the matching time of its patterns on the payloads of its grown stages.
+    """
+    raw_filename: str = "regex_scaling.csv"
+    threshold_filename: str = "scaling.threshold.json"
+    needs_waf: bool = False
+
+    # largest payload of a stage in bytes, matches of each payload, and number of processes (None is the number of CPUs)
+    max_size: int = 64 * 1024
+    repeat: int = 20
+    processes: Optional[int] = None
+
+    # @rx patterns of each rule, read by `rule_stages()`
+    patterns: dict[str, List[str]]
+
+    def __init__(self):
+        self.patterns = {}
+
+    def rule_stages(self, args: CollectCommandArg) -> dict[str, List[tuple[str, dict]]]:
+        # a rule without tests is grown from the stages of its family, as in RegexProfilerUtil
+        stages = super().rule_stages(args)
+        families: dict[str, List[tuple[str, dict]]] = {}
+        for rule_id, rule_stages in stages.items():
+            families.setdefault(rule_family_of(rule_id), []).extend(rule_stages)
+
+        self.patterns = rx_patterns(read_rule_files(args.rules_dir))
+        res = {}
+        for rule_id in sorted(self.patterns):
+            rule_stages = stages.get(rule_id) or families.get(rule_family_of(rule_id), [])[:self.stages_per_rule]
+            if rule_stages:
+                res[rule_id] = rule_stages
+        return res
+
+    async def measure(self, args: CollectCommandArg, stages: dict[str, List[tuple[str, dict]]]) -> List[tuple]:
+        profiler = RegexProfilerUtil()
+        profiler.repeat, profiler.processes = self.repeat, self.processes
+
+        sweeps = {rule_id: self.factors(max(payload_size(stage) for _, stage in rule_stages))
+                  for rule_id, rule_stages in stages.items()}
+        rows, stopped = [], set()
+
+        # a pool per factor, so the rules of a factor are timed in parallel
+        for factor in sorted({factor for factors in sweeps.values() for factor in factors}):
+            items, sizes = [], {}
+            for rule_id, factors in sweeps.items():
+                if factor not in factors or rule_id in stopped:
+                    continue
+                grown = [grow_stage(stage, factor) for _, stage in stages[rule_id]]
+                payloads = [payload for stage in grown for payload in payloads_of(stage)]
+                items.append((rule_id, self.patterns[rule_id], payloads))
+                sizes[rule_id] = sum(len(payload) for payload in payloads)
+
+            for rule_id, _, _, total, _, _, error in await profiler.profile(items):
+                if error:
+                    logger.warning(f"Rule {rule_id} is not swept: {error}")
+                    stopped.add(rule_id)
+                    continue
+                rows.append((rule_id, factor, sizes[rule_id], total))
+                if total > self.max_time:
+                    stopped.add(rule_id)
+
+        return sorted(rows, key=lambda row: (row[0], row[1]))
+
+
+def grow_stage(stage: dict, factor: int) -> dict:
+    """
+    grow_stage() repeats the attack-relevant parts of a go-ftw stage `factor` times: the query string of the URI
+    (its path if it has no query string), the body, and the values of the headers other than the routing ones.
+
+    Args:
+        stage (dict): stage input
+        factor (int): number of repetitions
+
+    Returns:
+        dict: the grown stage input
+    """
+    if factor == 1:
+        return stage
+
+    res = dict(stage)
+    path, separator, query = str(stage.get("uri") or "/").partition("?")
+    res["uri"] = f"{path}?{query * factor}" if separator else "/" + path.lstrip("/") * factor
+
+    if stage.get("data"):
+        data = stage["data"]
+        res["data"] = (data if isinstance(data, (bytes, str)) else str(data)) * factor
+
+    res["headers"] = {
+        k: v if str(k).lower() in _FIXED_HEADERS else str(v) * factor
+        for k, v in (stage.get("headers") or {}).items()
+    }
+    return res
+
+
+def payload_size(stage: dict) -> int:
+    """
+    payload_size() returns the size of the inputs of a go-ftw stage matched by the rules, see `payloads_of()`.
+    """
+    return sum(len(payload) for payload in payloads_of(stage))
+
+
+def growth_exponent(sizes: List[float], times: List[float], min_growth: float = 0.2, min_fit: float = 0.8,
+                    max_exponent: float = 4, step: float = 0.01) -> float:
+    """
+    growth_exponent() fits the exponent `k` of `time = c + a * size^k` by least squares: for each `k` of a grid
+    (`step` to `max_exponent`), `c` and `a` are solved in closed form, and the `k` of the smallest residual is kept.
+    The constant cost `c` (e.g., the round trip to the WAF) is fitted with the growth, so it neither flattens
+    nor steepens the exponent. The residuals are relative to the time (the noise of a timing grows with it),
+    so every size weighs alike rather than the largest ones only. A cost which stays within `min_growth`
+    of the smallest size does not grow, nor does a cost whose growth the fit does not tell apart from the noise
+    (its coefficient of determination is below `min_fit`, e.g., a matching time of a microsecond).
+
+    Args:
+        sizes (List[float]): sizes of the payloads, in ascending order
+        times (List[float]): times at each size
+        min_growth (float, optional): relative growth of time over the smallest size, below which the time
+            does not grow. Defaults to 0.2.
+        min_fit (float, optional): coefficient of determination of the fit, below which the time
+            does not grow. Defaults to 0.8.
+        max_exponent (float, optional): largest exponent of the grid. Defaults to 4.
+        step (float, optional): step of the grid of exponents. Defaults to 0.01.
+
+    Returns:
+        float: the exponent, 0 if the cost does not grow with the size
+    """
+    sizes, times = np.asarray(sizes, dtype=np.float64), np.asarray(times, dtype=np.float64)
+    growing = times[1:] > times[0] * (1 + min_growth)
+    if growing.sum() < 2:
+        return 0.0
+
+    # the sizes are relative to the smallest one, so `size^k` does not overflow, one row per exponent
+    exponents = np.arange(1, round(max_exponent / step) + 1) * step
+    basis = (sizes / sizes[0])[np.newaxis, :] ** exponents[:, np.newaxis]
+    weights = 1 / np.maximum(times, np.finfo(np.float64).tiny) ** 2
+    weights /= weights.sum()
+
+    # weighted least squares of `time = c + a * basis`, centered on the weighted means
+    centered = basis - (basis @ weights)[:, np.newaxis]
+    deviations = times - times @ weights
+    slopes = (centered * weights) @ deviations / np.maximum((centered ** 2) @ weights, np.finfo(np.float64).tiny)
+    residuals = weights * (deviations[np.newaxis, :] - slopes[:, np.newaxis] * centered) ** 2
+
+    # a cost which decreases with the size is not a fit
+    residuals = np.where(slopes[:, np.newaxis] > 0, residuals, np.inf).sum(axis=1)
+    best = np.argmin(residuals)
+    if not np.isfinite(residuals[best]) or residuals[best] > (1 - min_fit) * (weights @ deviations ** 2):
+        return 0.0
+    return float(exponents[best])
+
+
+def write_sweep_csv(file_path: str, rows: List[tuple]):
+    """
+    write_sweep_csv() writes a row per rule and factor, the times are in microseconds.
+
+    Args:
+        file_path (str): path of the csv file
+        rows (List[tuple]): rule id, factor, total size of the payloads and total time
+    """
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(_RAW_HEADER)
+        writer.writerows(rows)
+    f.close()
@@ -0,0 +1,675 @@
+"""
+Module Threshold defines the Threshold class and its evaluation engine. A threshold compares the
+data of a metric after a change with the data before the change (or with a fixed value).
+
+The evaluation is columnar: the values of a metric are held in a MetricSeries, filtered by a label mask,
+so the aggregation (EACH, SUM, AVERAGE, COUNT, QUANTILE) and the comparison methods run as whole-array operations.
+Latency metrics stored as a HistogramSeries are compared per key, by any quantile (e.g., `p99.9`)
+or by their whole distribution. Time series of two runs can be aligned onto a common grid of elapsed time
+before they are compared point by point (see `TimeAlignment`).
+
+The statistical comparison methods (`bootstrapMedianLe`, `mannWhitney`, `effectSizeLe`) test the whole samples
+(e.g., every cAdvisor sample, go-ftw runtime or latency histogram), so a threshold only fails when
+a regression stands out from the run-to-run noise.
+All thresholds in a config file can be evaluated in one pass with `evaluate_thresholds()`,
+which returns a `ThresholdReport` instead of printing each failure.
+"""
+import re
+from enum import Enum
+from typing import List, Optional, Union
+import numpy as np
+from termcolor import colored
+from src.utils import logger, bootstrap_median_diff, mann_whitney_u, cliffs_delta
+from .ParsedDataItem import ParsedDataItem
+from .MetricSeries import MetricSeries
+from .HistogramSeries import HistogramSeries
+from .TimeAlignment import align_series
+
+
+class _ComparisonUnit(Enum):
+    """
+    comparison_unit is an enum for representing how the data will be compared between before and after.
+
+    Options:
+        - `EACH`: compare each data item in before and after
+        - `AVERAGE`: compare the average value of before and after
+        - `SUM`: compare the sum of before and after
+        - `COUNT`: compare the count of before and after
+        - `QUANTILE`: compare a quantile of before and after, written as `pXX` (e.g., `p99.9`)
+        - `DISTRIBUTION`: compare the Kolmogorov-Smirnov distance between before and after with the threshold
+    """
+    EACH = 1
+    AVERAGE = 2
+    SUM = 3
+    COUNT = 4
+    QUANTILE = 5
+    DISTRIBUTION = 6
+
+class _ComparisonMethod(Enum):
+    """
+    comparison_method is an enum for representing how the data will be compared between before and after.
+
+    Options:
+        - `EQ`: equal
+        - `NE`: not equal
+        - `GT`: greater than
+        - `LT`: less than
+        - `GE`: greater than or equal
+        - `LE`: less than or equal
+
+        @TODO: currently rate_fn only supports to compare with object before
+        - `RATIO_GT`: greater than (ratio)
+        - `RATIO_LT`: less than (ratio)
+        - `RATIO_GE`: greater than or equal (ratio)
+        - `RATIO_LE`: less than or equal (ratio)
+
+        statistical methods compare the samples of before and after (unit `each`, object `before`),
+        they test whether after is greater than before (i.e., a regression of a cost such as latency):
+        - `BOOTSTRAP_MEDIAN_LE`: the lower bound of the bootstrap confidence interval of
+          `median(after) - median(before)` is less than or equal to the threshold
+        - `MANN_WHITNEY`: the p-value of the one-sided Mann-Whitney U test is greater than or equal to
+          the threshold (i.e., the significance level, e.g., 0.05)
+        - `EFFECT_SIZE_LE`: Cliff's delta (in [-1, 1]) of after against before is less than or equal to the threshold
+    """
+    EQ = 'eq'
+    NE = 'ne'
+    GT = 'gt'
+    LT = 'lt'
+    GE = 'ge'
+    LE = 'le'
+
+    RATIO_GT = 'ratioGt'
+    RATIO_LT = 'ratioLt'
+    RATIO_GE = 'ratioGe'
+    RATIO_LE = 'ratioLe'
+
+    BOOTSTRAP_MEDIAN_LE = 'bootstrapMedianLe'
+    MANN_WHITNEY = 'mannWhitney'
+    EFFECT_SIZE_LE = 'effectSizeLe'
+
+# every function accepts scalars or arrays, and returns a (boolean) array for array inputs
+_data_processing_fn = {
+    _ComparisonMethod.EQ.value: np.equal,
+    _ComparisonMethod.NE.value: np.not_equal,
+    _ComparisonMethod.GT.value: np.greater,
+    _ComparisonMethod.LT.value: np.less,
+    _ComparisonMethod.GE.value: np.greater_equal,
+    _ComparisonMethod.LE.value: np.less_equal,
+    _ComparisonMethod.RATIO_GT.value: np.greater,
+    _ComparisonMethod.RATIO_LT.value: np.less,
+    _ComparisonMethod.RATIO_GE.value: np.greater_equal,
+    _ComparisonMethod.RATIO_LE.value: np.less_equal,
+    _ComparisonMethod.BOOTSTRAP_MEDIAN_LE.value: np.less_equal,
+    _ComparisonMethod.MANN_WHITNEY.value: np.greater_equal,
+    _ComparisonMethod.EFFECT_SIZE_LE.value: np.less_equal,
+}
+
+_RATIO_METHODS = {
+    _ComparisonMethod.RATIO_GT,
+    _ComparisonMethod.RATIO_LT,
+    _ComparisonMethod.RATIO_GE,
+    _ComparisonMethod.RATIO_LE
+}
+
+_STATISTICAL_METHODS = {
+    _ComparisonMethod.BOOTSTRAP_MEDIAN_LE,
+    _ComparisonMethod.MANN_WHITNEY,
+    _ComparisonMethod.EFFECT_SIZE_LE
+}
+
+class _ComparisonObject(Enum):
+    """
+    ComparisonObject is an enum for representing the object of comparison.
+    (i.e., who compares with after-data)
+    When the comparison_object is set to THRESHOLD, the comparison_method will be applied to the threshold value.
+    Specifically, some comparison_method (e.g., RATIO_GT) only support BEFORE object.
+
+    Options:
+        - `BEFORE`: compare the after-data with the before data
+        - `THRESHOLD`: compare the after-data with the threshold
+    """
+    THRESHOLD = 1
+    BEFORE = 2
+
+# aliases used in the threshold config files
+_COMPARISON_UNIT_ALIAS = {
+    "": _ComparisonUnit.EACH,
+    "cnt": _ComparisonUnit.COUNT,
+    "avg": _ComparisonUnit.AVERAGE,
+}
+
+# a quantile unit, e.g., p50, p99.9, p99.99
+_QUANTILE_UNIT = re.compile(r"^p(\d+(\.\d+)?)$")
+
+# keys of a time series, ISO 8601 timestamps (e.g., the samples of cAdvisor)
+_TIMESTAMP_KEY = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}")
+
+def _parse_enum(enum_cls: type[Enum], value: any, alias: dict = None) -> Enum:
+    """
+    _parse_enum() converts a value from a threshold config (e.g., "each", "ratioGt") to its enum.
+    The lookup accepts the enum itself, its value or its name (case-insensitive).
+
+    Raises:
+        ValueError: if the value does not match any option
+    """
+    if isinstance(value, enum_cls):
+        return value
+
+    if alias and value in alias:
+        return alias[value]
+
+    for option in enum_cls:
+        if value == option.value or str(value).upper() == option.name:
+            return option
+
+    raise ValueError(f"Invalid {enum_cls.__name__[1:]}: {value}")
+
+
+class ThresholdResult:
+    """
+    ThresholdResult is the outcome of evaluating a threshold.
+
+    Args:
+        - `threshold` (Threshold): the evaluated threshold
+        - `passed` (bool): whether the threshold is passed
+        - `failed_keys` (np.ndarray): keys of the (aggregated) data items which failed
+        - `before_values` (np.ndarray): before values (or threshold) of the failed items
+        - `after_values` (np.ndarray): after values (or ratios) of the failed items
+        - `error` (str, optional): the reason why the threshold cannot be evaluated
+    """
+    threshold: 'Threshold'
+    passed: bool
+    failed_keys: np.ndarray
+    before_values: np.ndarray
+    after_values: np.ndarray
+    error: Optional[str]
+
+    def __init__(self,
+                 threshold: 'Threshold',
+                 passed: bool,
+                 failed_keys: np.ndarray = None,
+                 before_values: np.ndarray = None,
+                 after_values: np.ndarray = None,
+                 error: Optional[str] = None
+                 ):
+        self.threshold = threshold
+        self.passed = passed
+        self.failed_keys = failed_keys if failed_keys is not None else np.array([], dtype=object)
+        self.before_values = before_values if before_values is not None else np.array([])
+        self.after_values = after_values if after_values is not None else np.array([])
+        self.error = error
+
+    @property
+    def failed_count(self) -> int:
+        return len(self.failed_keys)
+
+
+class ThresholdReport:
+    """
+    ThresholdReport is a collection of ThresholdResult, created by `evaluate_thresholds()`.
+    """
+    results: List[ThresholdResult]
+
+    def __init__(self, results: List[ThresholdResult]):
+        self.results = results
+
+    @property
+    def passed(self) -> bool:
+        return all(result.passed for result in self.results)
+
+    @property
+    def failed(self) -> List[ThresholdResult]:
+        return [result for result in self.results if not result.passed]
+
+    def print(self, max_failures: int = 10):
+        """
+        print() prints the summary of each threshold, followed by the details of the failures.
+
+        Args:
+            max_failures (int, optional): max. number of failed items printed per threshold. Defaults to 10.
+        """
+        for result in self.results:
+            result.threshold.print_result(result, max_failures)
+
+
+class Threshold:
+    """
+    Threshold is a class for representing a rule which inspects the data of a metric,
+    it is loaded from the threshold config file (e.g., `config/ftw.threshold.json`).
+
+    Args:
+        - `id` (int): id of the threshold
+        - `threshold_name` (str): name of the threshold
+        - `threshold_desc` (str): description of the threshold
+        - `comparison_unit` (_ComparisonUnit): how the data is aggregated, e.g., `each`, `cnt`, `p99.9`
+        - `comparison_method` (_ComparisonMethod): how the data is compared, e.g., `lt`, `ratioGt`
+        - `comparison_object` (_ComparisonObject): `before` or `threshold`
+        - `metric_name` (str): name of the metric, it is the key of the parsed data
+        - `threshold` (float): value used by the THRESHOLD object and the ratio methods
+        - `include_labels` (List[str]): only inspect the data with any of the labels
+        - `exclude_labels` (List[str]): skip the data with any of the labels
+        - `confidence` (float, optional): confidence level of `bootstrapMedianLe`. Defaults to 0.95.
+        - `alignment` (dict, optional): align the before and after time series before comparing them,
+          the options of `align_series()`, e.g., `{"step": 1, "method": "bucket", "warmup": 10, "cooldown": 5}`.
+          The series keyed by timestamps are aligned with the default options when the unit is `each`
+          and the object is `before` (except for the statistical methods, which compare the whole samples).
+        - `baseline` (dict, optional): compare with a rolling baseline of the run history instead of the before-data,
+          the options of `RunHistory.baseline()`, e.g., `{"branch": "main", "runs": 10, "statistic": "median"}`.
+          The runs are those of the reported test, unless `test_name` is given (null for the runs of all the tests).
+
+    A threshold is passed when `after <comparison_method> before` (or the threshold value) holds for
+    every aggregated item. Ratio methods are passed when `threshold <comparison_method> after / before` holds.
+
+    For a HistogramSeries (e.g., the latency of each request name), the unit is applied to each key
+    present in both before and after: `cnt`, `avg`, `pXX` and `distribution` are supported.
+    """
+    id: int
+    threshold_name: str
+    threshold_desc: str
+    comparison_unit: _ComparisonUnit
+    comparison_method: _ComparisonMethod
+    comparison_object: _ComparisonObject
+    metric_name: str
+    threshold: float
+
+    # quantile of the QUANTILE unit, e.g., 0.999 for p99.9
+    quantile: Optional[float]
+
+    # if include_labels is None, then include all labels
+    # if include_labels not None, then the threshold inspection only applies to
+    # the data with the labels in include_labels, it is a OR condition
+    include_labels: set
+    exclude_labels: set
+
+    # confidence level of the bootstrap confidence interval
+    confidence: float
+
+    # if alignment is not None, the series keyed by timestamps are resampled onto a common grid
+    alignment: Optional[dict]
+
+    # if baseline is not None, the before-data is a rolling baseline of the run history (when it is given)
+    baseline: Optional[dict]
+
+    def __init__(self,
+                 id: int,
+                 threshold_name: str,
+                 threshold_desc: str,
+                 comparison_unit: _ComparisonUnit,
+                 comparison_method: _ComparisonMethod,
+                 comparison_object: _ComparisonObject,
+                 metric_name: str,
+                 threshold: float,
+                 include_labels: List[str],
+                 exclude_labels: List[str],
+                 confidence: float = 0.95,
+                 alignment: Optional[dict] = None,
+                 baseline: Optional[dict] = None
+                 ):
+        self.id = id
+        self.threshold_name = threshold_name
+        self.threshold_desc = threshold_desc
+        quantile = _QUANTILE_UNIT.match(comparison_unit) if isinstance(comparison_unit, str) else None
+        self.quantile = float(quantile.group(1)) / 100 if quantile else None
+        if self.quantile is not None and self.quantile > 1:
+            raise ValueError(f"Invalid ComparisonUnit: {comparison_unit}")
+        self.comparison_unit = _ComparisonUnit.QUANTILE if quantile \
+            else _parse_enum(_ComparisonUnit, comparison_unit, _COMPARISON_UNIT_ALIAS)
+        self.comparison_method = _parse_enum(_ComparisonMethod, comparison_method)
+        self.comparison_object = _parse_enum(_ComparisonObject, comparison_object)
+        self.metric_name = metric_name
+        self.threshold = threshold
+        self.include_labels = set(include_labels) if include_labels else None
+        self.exclude_labels = set(exclude_labels) if exclude_labels else None
+        self.confidence = confidence
+        self.alignment = alignment
+        self.baseline = baseline
+
+    def inspect(self, before_data: List[ParsedDataItem], after_data: List[ParsedDataItem]):
+        self.print_result(self.evaluate(before_data, after_data))
+
+    def isPassed(self, before_data: List[ParsedDataItem], after_data: List[ParsedDataItem]) -> bool:
+        return self.evaluate(before_data, after_data).passed
+
+    def evaluate(self,
+                 before_data: Union[List[ParsedDataItem], MetricSeries, HistogramSeries],
+                 after_data: Union[List[ParsedDataItem], MetricSeries, HistogramSeries]
+                 ) -> ThresholdResult:
+        """
+        evaluate() inspects the after-data against the before-data (or the threshold value).
+
+        Args:
+            before_data (Union[List[ParsedDataItem], MetricSeries, HistogramSeries]): data before the change
+            after_data (Union[List[ParsedDataItem], MetricSeries, HistogramSeries]): data after the change
+
+        Returns:
+            ThresholdResult: the result, including the failed items
+        """
+        # a threshold compared with a fixed value does not need the before-data (e.g., a single run)
+        if before_data is None and self.comparison_object == _ComparisonObject.THRESHOLD \
+                and self.comparison_method not in _RATIO_METHODS \
+                and self.comparison_unit != _ComparisonUnit.DISTRIBUTION:
+            before_data = after_data
+
+        if before_data is None or after_data is None:
+            return self.__error("before_data or after_data is None")
+
+        before, after = _as_columns(before_data), _as_columns(after_data)
+
+        if len(before) == 0 or len(after) == 0:
+            return self.__error("before_data or after_data is empty")
+
+        is_distribution = self.comparison_unit == _ComparisonUnit.DISTRIBUTION
+
+        if is_distribution and self.comparison_object != _ComparisonObject.THRESHOLD:
+            return self.__error("distribution unit only support with object: threshold")
+
+        is_statistical = self.comparison_method in _STATISTICAL_METHODS
+
+        if is_statistical and (self.comparison_unit != _ComparisonUnit.EACH
+                               or self.comparison_object != _ComparisonObject.BEFORE):
+            return self.__error("statistical comparison method only support with unit: each, object: before")
+
+        if isinstance(before, HistogramSeries) != isinstance(after, HistogramSeries):
+            return self.__error("before_data and after_data have different type")
+
+        if isinstance(after, HistogramSeries):
+            # filter data, then compare the histograms key by key
+            before_keys, before_values, after_keys, after_values = \
+                self.__aggregate_histograms(self.__select(before), self.__select(after))
+
+            if after_values is None:
+                return self.__error("histogram data only support comparison unit: cnt, avg, pXX, distribution, "
+                                    "or each with a statistical comparison method")
+        else:
+            alignment = self.alignment
+            if alignment is None and self.comparison_unit == _ComparisonUnit.EACH \
+                    and self.comparison_object == _ComparisonObject.BEFORE and not is_statistical \
+                    and _is_time_series(before) and _is_time_series(after):
+                # the samples of two runs never share their timestamps, they are compared by elapsed time
+                alignment = {}
+
+            if alignment is not None:
+                # the data is filtered before the alignment, so the grid only covers the inspected containers
+                try:
+                    before, after = align_series(before.select(self.__label_filter(before)),
+                                                 after.select(self.__label_filter(after)), **alignment)
+                except (ValueError, TypeError) as e:
+                    return self.__error(f"cannot align before_data and after_data: {e}")
+
+            # filter data
+            before_keys, before_values = self.__filter(before)
+            after_keys, after_values = self.__filter(after)
+
+            # process value by comparison_unit
+            before_keys, before_values = self.__aggregate(before_keys, before_values)
+            after_keys, after_values = self.__aggregate(after_keys, after_values)
+
+            if before_values is None or after_values is None:
+                return self.__error("SUM/AVERAGE/QUANTILE/DISTRIBUTION only support numeric data")
+
+            if is_distribution and len(before_values) and len(after_values):
+                after_keys = np.array(["distribution"], dtype=object)
+                after_values = np.array([_ks_distance(before_values, after_values)])
+
+            if is_statistical and len(before_values) and len(after_values):
+                if _kind(before_values) != "numeric" or _kind(after_values) != "numeric":
+                    return self.__error("statistical comparison method only support numeric data")
+                # the whole samples are tested, the statistic is compared with the threshold
+                before_keys = after_keys = np.array([self.comparison_method.value], dtype=object)
+                before_values = after_values = np.array([self.__statistic(before_values, after_values)])
+
+        if len(before_values) == 0 or len(after_values) == 0:
+            return self.__error("before_data or after_data is empty after filtering by labels")
+
+        before_kind, after_kind = _kind(before_values), _kind(after_values)
+
+        if before_kind != after_kind:
+            return self.__error("before_data and after_data have different type")
+
+        if before_kind is None:
+            return self.__error("current support data type: int, float, bool, str")
+
+        if (before_kind in ["str", "bool"]) and self.comparison_method not in [_ComparisonMethod.EQ, _ComparisonMethod.NE]:
+            return self.__error("str/bool type only support comparison method: EQ, NE")
+
+        is_ratio = self.comparison_method in _RATIO_METHODS
+
+        if is_ratio and self.comparison_object == _ComparisonObject.THRESHOLD:
+            return self.__error("rate comparison method only support with object: before")
+
+        # evaluate the value, item by item
+        if (is_ratio or self.comparison_object == _ComparisonObject.BEFORE) and len(before_values) != len(after_values):
+            return self.__error("before_data and after_data have different length, "
+                                "set `alignment` to compare them on a common grid of elapsed time")
+
+        fn = _data_processing_fn[self.comparison_method.value]
+
+        if is_ratio:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                compared = after_values / before_values
+            passed = fn(self.threshold, compared)
+        elif is_statistical:
+            compared = after_values
+            before_values = np.full(len(after_values), self.threshold)
+            passed = fn(after_values, self.threshold)
+        elif self.comparison_object == _ComparisonObject.THRESHOLD:
+            compared = after_values
+            before_values = np.full(len(after_values), self.threshold)
+            passed = fn(after_values, self.threshold)
+        else:
+            compared = after_values
+            passed = fn(after_values, before_values)
+
+        failed = ~np.asarray(passed, dtype=bool)
+
+        return ThresholdResult(
+            self,
+            passed=not failed.any(),
+            failed_keys=after_keys[failed],
+            before_values=before_values[failed],
+            after_values=compared[failed]
+        )
+
+    def print_result(self, result: ThresholdResult, max_failures: int = 10):
+        """
+        print_result() prints the summary of a ThresholdResult and the details of the failures.
+
+        Args:
+            result (ThresholdResult): result of this threshold
+            max_failures (int, optional): max. number of failed items to print. Defaults to 10.
+        """
+        if result.passed:
+            print((f"Threshold: {self.threshold_name:24} {self.color_text('passed', 'green', True)}"))
+            return
+
+        print((f"Threshold: {self.threshold_name:24} {self.color_text('failed', 'red', True)}"))
+
+        if result.error:
+            print(self.color_text(f"  error: {result.error}", 'red'))
+            return
+
+        for idx in range(min(result.failed_count, max_failures)):
+            print(self.color_text((
+                f"\nThreshold {self.id} failed: \n"
+                f"threshold_name: {self.threshold_name}\n"
+                f"threshold_desc: {self.threshold_desc}\n"
+                f"           key: {result.failed_keys[idx]}\n"
+                f"        before: {result.before_values[idx]}\n"
+                f"         after: {result.after_values[idx]}\n"
+            ), 'red', True))
+
+        if result.failed_count > max_failures:
+            print(self.color_text(f"... and {result.failed_count - max_failures} more failed items\n", 'red'))
+
+    def color_text(self, text: str, color: str, bold: bool = False):
+        return colored(text, color, attrs=[] if not bold else ["bold"])
+
+    def __error(self, message: str) -> ThresholdResult:
+        logger.error(message)
+        return ThresholdResult(self, passed=False, error=message)
+
+    def __label_filter(self, data: MetricSeries) -> np.ndarray:
+        mask = np.ones(len(data), dtype=bool)
+
+        if self.include_labels:
+            mask &= data.label_mask(self.include_labels)
+
+        if self.exclude_labels:
+            mask &= ~data.label_mask(self.exclude_labels)
+
+        return mask
+
+    def __filter(self, data: MetricSeries) -> tuple[np.ndarray, np.ndarray]:
+        mask = self.__label_filter(data)
+        return data.keys[mask], data.values[mask]
+
+    def __select(self, data: HistogramSeries) -> HistogramSeries:
+        return data.select(self.__label_filter(data))
+
+    def __aggregate_histograms(self, before: HistogramSeries, after: HistogramSeries) \
+            -> tuple[np.ndarray, Optional[np.ndarray], np.ndarray, Optional[np.ndarray]]:
+        """
+        __aggregate_histograms() pairs the non-empty histograms of before and after by key (in the order of after),
+        and computes the statistic of the comparison unit for each pair.
+        """
+        before_rows = {str(key): row for row, key in enumerate(before.keys)}
+        after_rows = np.array([row for row, key in enumerate(after.keys) if str(key) in before_rows], dtype=np.int64)
+        before_rows = np.array([before_rows[str(key)] for key in after.keys[after_rows]], dtype=np.int64)
+
+        non_empty = (before.totals(before_rows) > 0) & (after.totals(after_rows) > 0)
+        before_rows, after_rows = before_rows[non_empty], after_rows[non_empty]
+        keys = after.keys[after_rows]
+        unit = self.comparison_unit
+
+        if self.comparison_method in _STATISTICAL_METHODS:
+            # each pair of histograms is tested on its buckets, weighted by their counts
+            statistics = np.empty(len(keys))
+            for idx, (before_row, after_row) in enumerate(zip(before_rows, after_rows)):
+                (before_values, before_weights), (after_values, after_weights) = \
+                    before.samples(before_row), after.samples(after_row)
+                statistics[idx] = self.__statistic(before_values, after_values, before_weights, after_weights)
+            return keys, statistics, keys, statistics
+
+        if unit == _ComparisonUnit.COUNT:
+            return keys, before.totals(before_rows), keys, after.totals(after_rows)
+
+        if unit == _ComparisonUnit.AVERAGE:
+            return keys, before.means(before_rows), keys, after.means(after_rows)
+
+        if unit == _ComparisonUnit.QUANTILE:
+            return keys, before.quantiles(self.quantile, before_rows), keys, after.quantiles(self.quantile, after_rows)
+
+        if unit == _ComparisonUnit.DISTRIBUTION:
+            distances = after.ks_distances(after_rows, before, before_rows)
+            return keys, distances, keys, distances
+
+        return keys, None, keys, None
+
+    def __statistic(self, before: np.ndarray, after: np.ndarray,
+                    before_weights: Optional[np.ndarray] = None, after_weights: Optional[np.ndarray] = None) -> float:
+        """
+        __statistic() computes the statistic of the statistical comparison method from the samples.
+        """
+        if self.comparison_method == _ComparisonMethod.BOOTSTRAP_MEDIAN_LE:
+            low, _ = bootstrap_median_diff(before, after, self.confidence,
+                                           before_weights=before_weights, after_weights=after_weights)
+            return low
+
+        if self.comparison_method == _ComparisonMethod.MANN_WHITNEY:
+            _, p_value = mann_whitney_u(before, after, before_weights, after_weights)
+            return p_value
+
+        return cliffs_delta(before, after, before_weights, after_weights)
+
+    def __aggregate(self, keys: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, Optional[np.ndarray]]:
+        unit = self.comparison_unit
+
+        if unit == _ComparisonUnit.EACH:
+            return keys, values
+
+        if unit == _ComparisonUnit.COUNT:
+            return np.array(["cnt"], dtype=object), np.array([len(values)])
+
+        if _kind(values) != "numeric":
+            return keys, None
+
+        if unit == _ComparisonUnit.SUM:
+            return np.array(["sum"], dtype=object), np.array([values.sum()])
+
+        # AVERAGE, QUANTILE and DISTRIBUTION of an empty selection stay empty
+        if len(values) == 0 or unit == _ComparisonUnit.DISTRIBUTION:
+            return keys, values
+
+        if unit == _ComparisonUnit.QUANTILE:
+            return np.array([f"p{self.quantile * 100:g}"], dtype=object), np.array([np.quantile(values, self.quantile)])
+
+        return np.array(["average"], dtype=object), np.array([values.mean()])
+
+
+def _as_columns(data: Union[List[ParsedDataItem], MetricSeries]) -> MetricSeries:
+    return data if isinstance(data, MetricSeries) else MetricSeries.from_items(data)
+
+def _ks_distance(before: np.ndarray, after: np.ndarray) -> float:
+    """
+    _ks_distance() returns the Kolmogorov-Smirnov distance between two samples,
+    i.e., the max. distance between their empirical CDFs.
+    """
+    before, after = np.sort(before), np.sort(after)
+    points = np.concatenate((before, after))
+    cdf_before = np.searchsorted(before, points, side="right") / len(before)
+    cdf_after = np.searchsorted(after, points, side="right") / len(after)
+    return float(np.abs(cdf_before - cdf_after).max())
+
+def _kind(values: np.ndarray) -> Optional[str]:
+    """
+    _kind() classifies the dtype of values into numeric, bool, str, or None for unsupported types.
+    """
+    if values.dtype.kind in "iuf":
+        return "numeric"
+    if values.dtype.kind == "b":
+        return "bool"
+    if values.dtype.kind == "U":
+        return "str"
+    return None
+
+def _is_time_series(data: MetricSeries) -> bool:
+    """
+    _is_time_series() tells if the numeric data is keyed by ISO 8601 timestamps (e.g., the samples of cAdvisor).
+    """
+    return len(data) > 0 and _kind(data.values) == "numeric" \
+        and all(isinstance(key, str) and _TIMESTAMP_KEY.match(key) for key in data.keys)
+
+def evaluate_thresholds(thresholds: List[Threshold],
+                        before_data: dict[str, Union[MetricSeries, List[ParsedDataItem]]],
+                        after_data: dict[str, Union[MetricSeries, List[ParsedDataItem]]]
+                        ) -> ThresholdReport:
+    """
+    evaluate_thresholds() evaluates all the thresholds (e.g., from a config file) in one pass.
+    The data of each metric is converted to the columnar form once and shared by its thresholds.
+
+    Args:
+        thresholds (List[Threshold]): thresholds to be evaluated
+        before_data (dict[str, MetricSeries]): parsed data before the change, keyed by metric name
+        after_data (dict[str, MetricSeries]): parsed data after the change, keyed by metric name
+
+    Returns:
+        ThresholdReport: the result of every threshold
+    """
+    cache: dict[tuple[str, str], Optional[MetricSeries]] = {}
+
+    def columns_of(state: str, data: dict, metric_name: str) -> Optional[MetricSeries]:
+        if (state, metric_name) not in cache:
+            metric = data.get(metric_name)
+            # single-item metrics (e.g., ftw `run`) are not stored in a list
+            if isinstance(metric, ParsedDataItem):
+                metric = [metric]
+            cache[(state, metric_name)] = None if metric is None else _as_columns(metric)
+        return cache[(state, metric_name)]
+
+    results = []
+    for threshold in thresholds:
+        before = columns_of("before", before_data, threshold.metric_name)
+        after = columns_of("after", after_data, threshold.metric_name)
+        results.append(threshold.evaluate(before, after))
+
+    return ThresholdReport(results)
@@ -0,0 +1,155 @@
+"""
+Module TimeAlignment aligns the time series of two runs (e.g., cAdvisor samples before and after a change),
+so they are compared point by point. The runs may start at different times, sample at different rates,
+or lose samples; comparing the i-th sample of both runs says little in those cases.
+
+The timestamps are converted to the time elapsed since the start of each run, then both runs are resampled
+onto a common grid, by linear interpolation or by averaging the samples in each grid bucket.
+The warm-up and the cool-down of the runs are trimmed off the grid.
+"""
+from typing import Optional
+import numpy as np
+from src.utils.timeseries import to_epoch_seconds
+from .MetricSeries import MetricSeries
+
+# resampling methods
+INTERPOLATE = "interpolate"
+BUCKET = "bucket"
+
+
+def align_series(before: MetricSeries,
+                 after: MetricSeries,
+                 step: Optional[float] = None,
+                 method: str = INTERPOLATE,
+                 warmup: float = 0,
+                 cooldown: float = 0,
+                 before_times: Optional[np.ndarray] = None,
+                 after_times: Optional[np.ndarray] = None
+                 ) -> tuple[MetricSeries, MetricSeries]:
+    """
+    align_series() resamples two series keyed by ISO 8601 timestamps onto a common grid of elapsed time.
+    Samples of different containers (i.e., different first label) are resampled separately,
+    only the containers present in both series are kept.
+
+    The grid covers the time where every container of both runs has samples, starting `warmup` seconds
+    after the start of the runs and ending `cooldown` seconds before the end of the shorter run.
+
+    Args:
+        before (MetricSeries): numeric series before the change
+        after (MetricSeries): numeric series after the change
+        step (Optional[float], optional): grid step in seconds. Defaults to None (the coarser sampling interval).
+        method (str, optional): `interpolate` or `bucket` (mean of the samples around each grid point).
+            Defaults to `interpolate`.
+        warmup (float, optional): seconds trimmed from the start of the runs. Defaults to 0.
+        cooldown (float, optional): seconds trimmed from the end of the runs. Defaults to 0.
+        before_times (Optional[np.ndarray], optional): unix time of the keys of before, if already computed.
+        after_times (Optional[np.ndarray], optional): unix time of the keys of after, if already computed.
+
+    Raises:
+        ValueError: if the method is unknown
+
+    Returns:
+        tuple[MetricSeries, MetricSeries]: aligned series keyed by elapsed seconds, with the same length
+    """
+    if method not in (INTERPOLATE, BUCKET):
+        raise ValueError(f"Invalid alignment method: {method}")
+
+    runs = []
+    for series, times in ((before, before_times), (after, after_times)):
+        times = to_epoch_seconds(series.keys) if times is None else np.asarray(times, dtype=np.float64)
+        elapsed = times - times.min() if len(times) else times
+        runs.append((series, elapsed, _groups_of(series)))
+
+    # containers present in both runs
+    groups = np.intersect1d(runs[0][2], runs[1][2])
+    if len(groups) == 0:
+        empty = np.array([], dtype=np.float64)
+        return tuple(_series(empty, empty, groups, empty.astype(np.int64)) for _ in runs)
+
+    samples = []
+    for series, elapsed, names in runs:
+        mask = np.isin(names, groups)
+        group, elapsed, values = np.searchsorted(groups, names[mask]), elapsed[mask], series.values[mask]
+        order = np.lexsort((elapsed, group))
+        samples.append((group[order], elapsed[order], values[order].astype(np.float64)))
+
+    # the grid lies within the samples of every container of both runs
+    lo, hi, intervals = warmup, np.inf, []
+    for group, elapsed, _ in samples:
+        first = np.minimum.reduceat(elapsed, _starts(group))
+        last = np.maximum.reduceat(elapsed, _starts(group))
+        lo = max(lo, first.max())
+        hi = min(hi, last.min(), elapsed.max() - cooldown)
+
+        gaps = np.diff(elapsed)[group[1:] == group[:-1]]
+        gaps = gaps[gaps > 0]
+        if len(gaps):
+            intervals.append(np.median(gaps))
+
+    step = step or (max(intervals) if intervals else 1.0)
+    grid = lo + step * np.arange(int(np.floor((hi - lo) / step)) + 1) if hi >= lo else np.array([])
+
+    resampled = [_resample(group, elapsed, values, len(groups), grid, step, method)
+                 for group, elapsed, values in samples]
+
+    # grid points without data on either side (e.g., an empty bucket) are dropped
+    valid = ~(np.isnan(resampled[0]) | np.isnan(resampled[1]))
+    codes = np.repeat(np.arange(len(groups)), len(grid))[valid.ravel()]
+    keys = np.tile(grid, len(groups))[valid.ravel()]
+
+    return tuple(_series(keys, values[valid], groups, codes) for values in resampled)
+
+
+def _groups_of(series: MetricSeries) -> np.ndarray:
+    """
+    _groups_of() returns the first label (i.e., container) of each item, or an empty string without labels.
+    """
+    has_label = np.diff(series.label_offsets) > 0
+    codes = np.full(len(series), len(series.label_vocab), dtype=np.int64)
+    codes[has_label] = series.label_codes[series.label_offsets[:-1][has_label]]
+    return np.array(list(series.label_vocab) + [""], dtype=str)[codes]
+
+def _starts(group: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.concatenate(([True], group[1:] != group[:-1])))
+
+def _resample(group: np.ndarray, elapsed: np.ndarray, values: np.ndarray,
+              group_count: int, grid: np.ndarray, step: float, method: str) -> np.ndarray:
+    """
+    _resample() resamples the samples (sorted by group and elapsed time) of every group onto the grid.
+
+    Returns:
+        np.ndarray: resampled values, a row per group, NaN where a group has no data
+    """
+    if method == INTERPOLATE:
+        # the groups are laid end to end on one axis, so a single np.interp resamples all of them,
+        # the grid of a group lies within its samples, so the values of the groups never mix
+        stride = elapsed.max() + step + 1
+        res = np.full((group_count, len(grid)), np.nan)
+        present = np.unique(group)
+        queries = (grid[None, :] + present[:, None] * stride).ravel()
+        res[present] = np.interp(queries, elapsed + group * stride, values).reshape(len(present), len(grid))
+        return res
+
+    # BUCKET: mean of the samples within half a step of each grid point
+    bucket = np.floor((elapsed - grid[0]) / step + 0.5).astype(np.int64) if len(grid) else elapsed.astype(np.int64)
+    inside = (bucket >= 0) & (bucket < len(grid))
+    flat = group[inside] * len(grid) + bucket[inside]
+    size = group_count * len(grid)
+    sums = np.bincount(flat, weights=values[inside], minlength=size)
+    counts = np.bincount(flat, minlength=size)
+    with np.errstate(invalid='ignore'):
+        return (sums / counts).reshape(group_count, len(grid))
+
+def _series(keys: np.ndarray, values: np.ndarray, groups: np.ndarray, codes: np.ndarray) -> MetricSeries:
+    """
+    _series() creates a MetricSeries labelled with the group of each item, without a python loop per item.
+    """
+    has_label = groups[codes] != "" if len(groups) else np.zeros(len(codes), dtype=bool)
+
+    res = MetricSeries.__new__(MetricSeries)
+    res.keys = keys
+    res.values = values
+    res.label_vocab = [str(group) for group in groups]
+    res.label_codes = codes[has_label].astype(np.int64)
+    res.label_offsets = np.concatenate(([0], np.cumsum(has_label))).astype(np.int64)
+    return res
@@ -4,279 +4,36 @@ Once the data is stored, it can be parsed and used for generating reports.
 extend this class to implement your own data collector.
 """
 from abc import ABC, abstractmethod
-from typing import List
-from enum import Enum
-import os
+from typing import List, Literal, Optional
+import asyncio
+import glob
 import json
+import os
 import shutil
-import yaml
+import numpy as np
 import asciichartpy as asciichart
-import dateutil.parser as date_parser
 from termcolor import colored
 from astropy.table import Table
-from src.utils import logger
+from src.type import State, UtilRole
+from src.utils import logger, to_epoch_seconds, TableRequest, write_request_table, read_request_table
 from .CollectCommandArg import CollectCommandArg
 from .ReportCommandArg  import ReportCommandArg
+from .ParsedDataItem import ParsedDataItem
+from .MetricSeries import MetricSeries
+from .HistogramSeries import HistogramSeries
+from .Threshold import Threshold, ThresholdReport, evaluate_thresholds
+from .FTWTestSchema import _FTWTestInput, _FTWTestSchema, load_ftw_tests, to_ftw_test_schemas
+from .FTWCorpusCache import FTWCorpusCache
+from .RunHistory import RunHistory
 
+# header carrying the go-ftw test id of a generated request, the same as `logmarkerheadername` of `.ftw.yaml`
+TEST_MARKER_HEADER = "X-CRS-TEST"
 
-class ParsedDataItem:
-    """
-        ParsedDataItem is a class for representing a data item. It is used for generating reports.
-
-        Args:
-            - `key` (any): key is the identifier of the data item. Ideally, it will be the name of a matrix.
-            - `value` (any): value is the value of the data item.
-            - `labels` (List[str], optional): labels is useful when using Threshold. It can used for filter condition.
-                Defaults to [].
-        """
-    key: any
-    value: any
-    labels: set
-
-    def __init__(self, key: any, value: any, labels: List[str] = []):
-        self.key = key
-        self.value = value
-        self.labels = set(labels)
-
-class _ComparisonUnit(Enum):
-    """
-    comparison_unit is an enum for representing how the data will be compared between before and after.
-    
-    Options:
-        - `EACH`: compare each data item in before and after
-        - `AVERAGE`: compare the average value of before and after
-        - `SUM`: compare the sum of before and after
-        - `COUNT`: compare the count of before and after
-    """
-    EACH = 1
-    AVERAGE = 2
-    SUM = 3
-    COUNT = 4
+# manifests of a leave-one-out attribution and of a WAF matrix in the raw output directory,
+# see `AttributionCollect` and `MatrixCollect`
+ATTRIBUTION_MANIFEST = "attribution.json"
+MATRIX_MANIFEST = "matrix.json"
 
-class _ComparisonMethod(Enum):
-    """
-    comparison_method is an enum for representing how the data will be compared between before and after.
-    
-    Options:
-        - `EQ`: equal
-        - `NE`: not equal
-        - `GT`: greater than
-        - `LT`: less than
-        - `GE`: greater than or equal
-        - `LE`: less than or equal
-        
-        @TODO: currently rate_fn only supports to compare with object before
-        - `RATIO_GT`: greater than (ratio)
-        - `RATIO_LT`: less than (ratio)
-        - `RATIO_GE`: greater than or equal (ratio)
-        - `RATIO_LE`: less than or equal (ratio)
-    """
-    EQ = 'eq'
-    NE = 'ne'
-    GT = 'gt'
-    LT = 'le'
-    GE = 'ge'
-    LE = 'le'
-
-    RATIO_GT = 'ratioGt'
-    RATIO_LT = 'ratioLt'
-    RATIO_GE = 'ratioGe'
-    RATIO_LE = 'ratioLe'
-
-_data_processing_fn = {
-    _ComparisonMethod.EQ.value: lambda a, b: a == b,
-    _ComparisonMethod.NE.value: lambda a, b: a != b,
-    _ComparisonMethod.GT.value: lambda a, b: a > b,
-    _ComparisonMethod.LT.value: lambda a, b: a < b,
-    _ComparisonMethod.GE.value: lambda a, b: a >= b,
-    _ComparisonMethod.LE.value: lambda a, b: a <= b,
-    _ComparisonMethod.RATIO_GT.value: lambda a, b: a > b,
-    _ComparisonMethod.RATIO_LT.value: lambda a, b: a < b,
-    _ComparisonMethod.RATIO_GE.value: lambda a, b: a >= b,
-    _ComparisonMethod.RATIO_LE.value: lambda a, b: a <= b,
-}
-
-class _ComparisonObject(Enum):
-    """
-    ComparisonObject is an enum for representing the object of comparison.
-    (i.e., who compares with after-data)
-    When the comparison_object is set to THRESHOLD, the comparison_method will be applied to the threshold value.
-    Specifically, some comparison_method (e.g., RATIO_GT) only support THRESHOLD object.
-    
-    Options:
-        - `BEFORE`: compare the after-data with the before data
-        - `THRESHOLD`: compare the after-data with the threshold
-    """
-    THRESHOLD = 1,
-    BEFORE = 2,
-
-class Threshold:
-    """@TODO: doc"""
-    id: int
-    threshold_name: str
-    threshold_desc: str
-    comparison_unit: _ComparisonUnit
-    comparison_method: _ComparisonMethod
-    comparison_object: _ComparisonObject
-    metric_name: str
-    threshold: float
-
-    # if include_labels is None, then include all labels
-    # if include_labels not None, then the threshold inspection only applies to
-    # the data with the labels in include_labels, it is a OR condition
-    include_labels: set
-    exclude_labels: set
-
-    def __init__(self,
-                 id: int,
-                 threshold_name: str,
-                 threshold_desc: str,
-                 comparison_unit: _ComparisonUnit,
-                 comparison_method: _ComparisonMethod,
-                 comparison_object: _ComparisonObject,
-                 metric_name: str,
-                 threshold: float,
-                 include_labels: List[str],
-                 exclude_labels: List[str]
-                 ):
-        self.id = id
-        self.threshold_name = threshold_name
-        self.threshold_desc = threshold_desc
-        self.comparison_unit = comparison_unit
-        self.comparison_method = comparison_method
-        self.comparison_object = comparison_object
-        self.metric_name = metric_name
-        self.threshold = threshold
-        self.include_labels = set(include_labels) if include_labels else None
-        self.exclude_labels = set(exclude_labels) if exclude_labels else None
-
-    def inspect(self, before_data: List[ParsedDataItem], after_data: List[ParsedDataItem]):
-        if not self.isPassed(before_data, after_data):
-            print((f"Threshold: {self.threshold_name:24} {self.color_text('failed', 'red', True)}"))
-        else:
-            print((f"Threshold: {self.threshold_name:24} {self.color_text('passed', 'green', True)}"))
-
-    def isPassed(self, before_data: List[ParsedDataItem], after_data: List[ParsedDataItem]) -> bool:
-        if before_data is None or after_data is None:
-            logger.error("before_data or after_data is None")
-            return False
-
-        if len(before_data) == 0 or len(after_data) == 0:
-            logger.error("before_data or after_data is empty")
-            return False
-
-        before_val_type, after_val_type = type(before_data[0].value), type(after_data[0].value)
-
-        if before_val_type != after_val_type:
-            logger.error("before_data and after_data have different type")
-            return False
-
-        if (before_val_type in [str, bool]) and self.comparison_method not in ['eq', 'ne']:
-            logger.error(f"str/bool type only support comparison method: EQ, NE")
-            return False
-
-        if not (before_val_type in [str, int, float, bool]):
-            logger.error("current support data type: int, float, bool, str")
-            return False
-
-        if self.comparison_method in [7, 8, 9, 10] and self.comparison_object == _ComparisonObject.THRESHOLD:
-            logger.error("rate comparison method only support with object: before")
-            return False
-
-        # filter data
-        before_data = [data for data in before_data if self.__filter_by_labels(data)]
-        after_data = [data for data in after_data if self.__filter_by_labels(data)]
-
-        # process value by comparison_unit
-        if self.comparison_unit == _ComparisonUnit.COUNT.name:
-            before_data = [ParsedDataItem("cnt", len(before_data), [])]
-            after_data = [ParsedDataItem("cnt", len(after_data), [])]
-        elif self.comparison_unit == _ComparisonUnit.SUM.name:
-            before_data = [ParsedDataItem("sum", sum([data.value for data in before_data]), [])]
-            after_data = [ParsedDataItem("sum", sum([data.value for data in after_data]), [])]
-        elif self.comparison_unit == _ComparisonUnit.AVERAGE.name:
-            before_data = [ParsedDataItem("average", sum([data.value for data in before_data]) / len(before_data), [])]
-            after_data = [ParsedDataItem("average", sum([data.value for data in after_data]) / len(after_data), [])]
-        elif self.comparison_unit == _ComparisonUnit.EACH.name:
-            pass
-
-        # evaluate the value
-        # @TODO: current only support same-length data
-        # impl a non-length-sensitive version (e.g., time)
-        if self.comparison_unit == _ComparisonUnit.EACH and len(before_data) != len(after_data):
-            raise Exception("before_data and after_data have different length")
-
-        passed, res = False, True
-        for idx in range(len(after_data)):
-            # @TODO: optimize enum issue
-            if self.comparison_method in [_ComparisonMethod.RATIO_GT.value, _ComparisonMethod.RATIO_LT.value, _ComparisonMethod.RATIO_GE.value, _ComparisonMethod.RATIO_LE.value]:
-                ratio = after_data[idx].value / before_data[idx].value
-                passed = _data_processing_fn[self.comparison_method](self.threshold, ratio)
-            else:
-                passed = _data_processing_fn[self.comparison_method](before_data[idx].value, after_data[idx].value)
-            
-            if not passed:
-                print(self.color_text((
-                    f"\nThreshold {self.id} failed: \n"
-                    f"threshold_name: {self.threshold_name}\n"
-                    f"threshold_desc: {self.threshold_desc}\n"
-                    f"        before: {before_data[idx].value}\n"
-                    f"         after: {after_data[idx].value}\n\n"
-                ), 'red', True))
-                res = False
-
-        return res
-
-    def __filter_by_labels(self, data: ParsedDataItem) -> bool:
-        # check include
-        res = True
-
-        if (self.include_labels is not None) and (len(self.include_labels) > 0):
-            for label in data.labels:
-                if label in self.include_labels:
-                    res = True
-
-        if not res: 
-            return False
-
-        # check exclude
-        if (self.exclude_labels is not None) and (len(self.exclude_labels) > 0):
-            for label in data.labels:
-                if label in self.exclude_labels:
-                    res = False
-
-        return res
-
-    def color_text(self, text: str, color: str, bold: bool = False):
-        return colored(text, color, attrs=[] if not bold else ["bold"])
-
-class _FTWTestInput:
-    """@TODO: doc"""
-    method: str = "GET"
-    port: int = 80
-    headers: dict = {}
-    data: str = ""
-    uri: str = "/"
-
-    def __init__(self, dict: dict):
-        for k, v in dict.items():
-            setattr(self, k, v)
-
-        HTTP_METHOD_LIST = ["GET", "HEAD", "POST", "PUT", "DELETE"
-                            , "OPTIONS", "TRACE", "PATCH"]
-
-        if self.method not in HTTP_METHOD_LIST:
-            logger.warning(f"Invalid method in go-ftw yaml. Testcase: {self.method}, replace for 'GET to bypass'")
-            self.method = "GET"
-
-class _FTWTestSchema:
-    """@TODO: doc"""
-    test_title: str
-    stages: List[_FTWTestInput]
-
-    def __init__(self, test_title: str, stages: List[_FTWTestInput]):
-        self.test_title = test_title
-        self.stages = stages
 
 class Util(ABC):
     """
@@ -289,7 +46,29 @@ class Util(ABC):
     
     Noted that read_data() and save_raw_data() are optional if the raw data sources
     are provided. In this case, the data can be parsed directly.
+
+    When multiple utils are collected together, they are run by `CollectScheduler`:
+    samplers (`role = UtilRole.SAMPLER`) run in the background while load generators
+    (`role = UtilRole.LOAD`) run, the load generators with the same `phase` run in parallel.
+
+    A util with `needs_waf = False` (e.g., an offline profiler of the rules) runs without a WAF container.
+
+    A paired collect (see `PairedCollect`) stores the raw data of each state in blocks, i.e.,
+    `<raw_output>/<state>/block-<n>/`; `parse_states()` merges the blocks of each state for the report.
+    A leave-one-out attribution (see `AttributionCollect`) stores the raw data of each variant of the rules,
+    `parse_variants()` pairs each variant with its baseline, and the targets are ranked by `comparison_metrics`.
+    A WAF matrix (see `MatrixCollect`) stores the raw data of the load against each WAF, `parse_targets()` reads them.
     """
+    role: UtilRole = UtilRole.LOAD
+    phase: int = 0
+    needs_waf: bool = True
+
+    # file name of the threshold config in `--threshold-conf`, None if the util has no thresholds
+    threshold_filename: Optional[str] = None
+
+    # metrics comparing the runs of a leave-one-out attribution or of a WAF matrix, a `throughput` is summed
+    # over its series (higher is better), a `latency` is averaged (lower is better)
+    comparison_metrics: dict[str, Literal["throughput", "latency"]] = {}
 
     @abstractmethod
     def collect(self, args: CollectCommandArg):
@@ -331,53 +110,358 @@ class Util(ABC):
         """
         raise NotImplementedError
 
-    def _parse_ftw_test_file(self, file_path: str, case_limit: int) -> List[_FTWTestSchema]:
+    async def prepare(self, args: CollectCommandArg):
+        """
+        prepare() sets up the util before any load is applied (e.g., starts cAdvisor).
+        It is called by CollectScheduler, the default implementation does nothing.
+
+        Args:
+            args (CollectCommandArg): the arguments for collecting data
+        """
+        pass
+
+    async def run(self, args: CollectCommandArg, stop: asyncio.Event):
+        """
+        run() collects data inside CollectScheduler. A load generator returns once the load is applied,
+        a sampler returns after `stop` is set (i.e., all the load generators complete or the deadline is reached).
+        The default implementation runs collect() in a thread.
+
+        Args:
+            args (CollectCommandArg): the arguments for collecting data
+            stop (asyncio.Event): event set when the load window ends
+        """
+        await asyncio.to_thread(self.collect, args)
+
+    def parse_output(self, raw_output: str) -> dict[str, MetricSeries | ParsedDataItem]:
+        """
+        parse_output() parses the raw data of a run (i.e., the files in a raw output directory).
+        The default implementation parses `raw_filename` with `parse_data()`.
+
+        Args:
+            raw_output (str): raw output directory of the run
+
+        Returns:
+            dict[str, MetricSeries | ParsedDataItem]: data keyed by metric name
+        """
+        return self.parse_data(os.path.join(raw_output, self.raw_filename))
+
+    def parse_states(self, raw_output: str) -> dict[State, dict[str, MetricSeries | ParsedDataItem]]:
+        """
+        parse_states() parses the data of a paired collect, the blocks of each state are merged:
+        MetricSeries are concatenated, HistogramSeries are merged, and numeric ParsedDataItem are summed.
+
+        Args:
+            raw_output (str): raw output directory of the test
+
+        Returns:
+            dict[State, dict[str, MetricSeries | ParsedDataItem]]: data of each state, empty if the test is not paired
+        """
+        res = {}
+        for state in State:
+            blocks = sorted(glob.glob(os.path.join(raw_output, state.value, "block-*")),
+                            key=lambda path: int(path.rsplit("-", 1)[1]))
+            if not blocks:
+                return {}
+            res[state] = _merge_parsed([self.parse_output(block) for block in blocks])
+        return res
+
+    def paired_text_report(self, args: ReportCommandArg, states: dict[State, dict]):
+        """
+        paired_text_report() prints the median of each numeric metric before and after, and evaluates the thresholds.
+
+        Args:
+            args (ReportCommandArg): the arguments for creating report
+            states (dict[State, dict]): data of each state, see `parse_states()`
+        """
+        before, after = states[State.BEFORE], states[State.AFTER]
+        names = [name for name, series in after.items()
+                 if isinstance(series, MetricSeries) and not isinstance(series, HistogramSeries)
+                 and isinstance(before.get(name), MetricSeries) and series.values.dtype.kind in "iuf"]
+
+        if names:
+            medians = {
+                state.value: MetricSeries(names, [np.median(data[name].values) if len(data[name]) else np.nan
+                                                  for name in names])
+                for state, data in states.items()
+            }
+            print(self.create_data_terminal_table(medians, names))
+
+        self._report_thresholds(args, before, after)
+
+    def parse_variants(self, raw_output: str) -> dict[str, tuple[dict, dict]]:
+        """
+        parse_variants() parses the data of a leave-one-out attribution (see `AttributionCollect`),
+        a variant without the data of the util (e.g., the util did not run) is skipped.
+
+        Args:
+            raw_output (str): raw output directory of the test
+
+        Returns:
+            dict[str, tuple[dict, dict]]: data of the baseline of its round and data of the variant, keyed by
+                the target left out, empty if the test is not an attribution
+        """
+        manifest_path = os.path.join(raw_output, ATTRIBUTION_MANIFEST)
+        if not os.path.exists(manifest_path):
+            return {}
+
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+
+        res, baselines = {}, {}
+        for target, variant in manifest["variants"].items():
+            try:
+                if variant["round"] not in baselines:
+                    baselines[variant["round"]] = self.parse_output(
+                        os.path.join(raw_output, manifest["baselines"][variant["round"]]))
+                data = self.parse_output(os.path.join(raw_output, variant["raw_output"]))
+                if data:
+                    res[target] = (baselines[variant["round"]], data)
+            except (OSError, ValueError) as e:
+                logger.warning(f"No data of {type(self).__name__} without {target}: {e!r}")
+        return res
+
+    def attribution_text_report(self, args: ReportCommandArg, variants: dict[str, tuple[dict, dict]]):
+        """
+        attribution_text_report() prints the cost of each target left out, in percent of its baseline:
+        the throughput gained without the target, and the latency saved without it. The targets are ranked
+        by the first of `comparison_metrics`.
+
+        Args:
+            args (ReportCommandArg): the arguments for creating report
+            variants (dict[str, tuple[dict, dict]]): data of each target, see `parse_variants()`
+        """
+        if not self.comparison_metrics:
+            logger.warning(f"{type(self).__name__} has no metric to attribute the cost of the rules")
+            return
+
+        targets = list(variants)
+        costs = {}
+        for name, kind in self.comparison_metrics.items():
+            summaries = [[_summarize(data.get(name), kind) for data in variants[target]] for target in targets]
+            baseline, variant = np.array(summaries, dtype=np.float64).reshape(-1, 2).T
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cost = (variant - baseline) / baseline if kind == "throughput" else (baseline - variant) / baseline
+            costs[f"{name} cost (%)"] = cost * 100
+
+        # the costliest first, the targets without data last
+        first = next(iter(costs.values()))
+        order = sorted(range(len(targets)), key=lambda idx: (np.isnan(first[idx]), -np.nan_to_num(first[idx])))
+        print(self.color_text(f"Cost of the {len(targets)} rules left out ({type(self).__name__})", "white", True))
+        print(self.create_data_terminal_table(
+            {title: MetricSeries([targets[idx] for idx in order], cost[order]) for title, cost in costs.items()},
+            [targets[idx] for idx in order]
+        ))
+
+    def parse_targets(self, raw_output: str) -> dict[str, dict]:
+        """
+        parse_targets() parses the data of each WAF of a matrix (see `MatrixCollect`),
+        a WAF without the data of the util (e.g., a sampler, whose data covers all the WAFs) is skipped.
+
+        Args:
+            raw_output (str): raw output directory of the test
+
+        Returns:
+            dict[str, dict]: data of each WAF, keyed by container in the order of the targets,
+                empty if the test is not a matrix
+        """
+        manifest_path = os.path.join(raw_output, MATRIX_MANIFEST)
+        if not os.path.exists(manifest_path):
+            return {}
+
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+
+        res = {}
+        for target in manifest["targets"]:
+            try:
+                data = self.parse_output(os.path.join(raw_output, target["raw_output"]))
+            except (OSError, ValueError) as e:
+                logger.warning(f"No data of {type(self).__name__} of {target['name']}: {e!r}")
+                continue
+            if data:
+                res[target["name"]] = data
+        return res
+
+    def matrix_text_report(self, args: ReportCommandArg, targets: dict[str, dict]):
+        """
+        matrix_text_report() prints the `comparison_metrics` of each WAF of a matrix, and their difference
+        in percent of the first WAF (e.g., +20 is a throughput 20% higher, or a latency 20% higher).
+
+        Args:
+            args (ReportCommandArg): the arguments for creating report
+            targets (dict[str, dict]): data of each WAF, see `parse_targets()`
+        """
+        if not self.comparison_metrics:
+            logger.warning(f"{type(self).__name__} has no metric to compare the WAFs")
+            return
+
+        names = list(targets)
+        columns = {}
+        for name, kind in self.comparison_metrics.items():
+            values = np.array([_summarize(targets[target].get(name), kind) for target in names], dtype=np.float64)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                columns[name] = MetricSeries(names, values)
+                columns[f"{name} vs. {names[0]} (%)"] = MetricSeries(names, (values / values[0] - 1) * 100)
+
+        print(self.color_text(f"Comparison of {len(names)} WAFs ({type(self).__name__})", "white", True))
+        print(self.create_data_terminal_table(columns, names))
+
+    def _report_thresholds(self, args: ReportCommandArg,
+                           before_data: Optional[dict[str, MetricSeries]],
+                           after_data: dict[str, MetricSeries]):
+        """
+        _report_thresholds() evaluates the thresholds of the util (if `--threshold-conf` is given) and prints them.
+        Without before-data (i.e., a single run), only the thresholds against a fixed value can pass.
+        """
+        if not args.threshold_conf or self.threshold_filename is None:
+            return
+
+        thresholds = self._get_threshold(os.path.join(args.threshold_conf, self.threshold_filename))
+        if args.history is None or all(threshold.baseline is None for threshold in thresholds):
+            evaluate_thresholds(thresholds, before_data or {}, after_data).print()
+            return
+
+        # the thresholds with a baseline are compared with the runs of the same test in the history,
+        # unless the baseline gives its own `test_name` (null for the runs of all the tests)
+        results = []
+        with RunHistory(args.history) as history:
+            for threshold in thresholds:
+                before = before_data or {}
+                if threshold.baseline is not None:
+                    baseline = history.baseline(type(self).__name__, threshold.metric_name,
+                                                **{"test_name": args.test_name, **threshold.baseline})
+                    before = {} if baseline is None else {threshold.metric_name: baseline}
+                results += evaluate_thresholds([threshold], before, after_data).results
+        ThresholdReport(results).print()
+
+    async def _run_command(self, command: str, stdout: any = asyncio.subprocess.DEVNULL) -> int:
+        """
+        _run_command() runs a shell command as a subprocess. If the caller is cancelled
+        (e.g., the deadline is reached), the subprocess is killed.
+
+        Args:
+            command (str): shell command
+            stdout (any, optional): stdout of the subprocess. Defaults to asyncio.subprocess.DEVNULL.
+
+        Returns:
+            int: return code of the command
+        """
+        proc = await asyncio.create_subprocess_shell(command, stdout=stdout, stderr=asyncio.subprocess.PIPE)
+        try:
+            _, stderr = await proc.communicate()
+        except asyncio.CancelledError:
+            proc.kill()
+            await proc.wait()
+            raise
+
+        if proc.returncode != 0:
+            logger.error(f"Command failed ({proc.returncode}): {command}\n{stderr.decode(errors='replace')}")
+        return proc.returncode
+
+    def _parse_ftw_test_file(self, file_path: str, case_limit: int,
+                             cache: Optional[FTWCorpusCache] = None,
+                             total_case_limit: Optional[int] = None) -> List[_FTWTestSchema]:
+        """
+        _parse_ftw_test_file() parses every go-ftw YAML file in a directory, at most `case_limit` stages per file.
+        The parsed files are cached (see `FTWCorpusCache`), only the files that changed are parsed again,
+        in parallel. The files are merged in sorted order, so the cases kept by the limits are deterministic.
+
+        Args:
+            file_path (str): directory of the go-ftw YAML files
+            case_limit (int): maximum number of stages per file
+            cache (Optional[FTWCorpusCache], optional): cache of the parsed files. Defaults to FTWCorpusCache().
+            total_case_limit (Optional[int], optional): maximum number of stages in the whole corpus.
+                Defaults to None (no limit).
+
+        Returns:
+            List[_FTWTestSchema]: the test cases
+        """
         if file_path is None:
             raise LookupError("file_path is None")
 
+        cache = cache or FTWCorpusCache()
         data: List[_FTWTestSchema] = []
+        remaining = 1e10 if total_case_limit is None else total_case_limit
+
+        for tests in cache.load(file_path).values():
+            if remaining <= 0:
+                break
+            schemas = to_ftw_test_schemas(tests, min(case_limit, remaining))
+            remaining -= sum(len(schema.stages) for schema in schemas)
+            data += schemas
 
-        # find filename which match the rule id
-        for root, _, files in os.walk(file_path):
-            for file_name in files:
-                data += self.parse_go_ftw_yaml(os.path.join(root, file_name), case_limit)
+        slowest = sorted(cache.parse_timings.items(), key=lambda item: item[1], reverse=True)[:5]
+        logger.debug("Slowest go-ftw files to parse: " +
+                     ", ".join(f"{path} ({seconds * 1000:.1f} ms)" for path, seconds in slowest))
 
         return data
 
+    def _create_request_table(self, args: CollectCommandArg, file_path: str) -> int:
+        """
+        _create_request_table() builds a request table (see `src.utils.request_table`) for load generators,
+        one request per stage of every test in the corpus. A request is named after its go-ftw test id
+        (e.g., `920170-1`), which is sent in the `X-CRS-TEST` header as well, so the stats are kept per test.
+        With `--request-table` (e.g., a corpus generated by `FuzzUtil`), the given table is used instead.
+        @TODO: currently, it cannot detect whether the website should block (e.g., 405) or not,
+        because the origin implementation of go-ftw validate the TP/TN by checking logs
+        ideally, this should be validated using outputs
+
+        Args:
+            args (CollectCommandArg): collect command arg
+            file_path (str): path of the request table
+
+        Returns:
+            int: number of requests in the table
+        """
+        if args.request_table is not None:
+            shutil.copyfile(args.request_table, file_path)
+            return len(read_request_table(file_path))
+
+        data = self._parse_ftw_test_file(args.test_cases_dir, 1e10)
+        return write_request_table(file_path, (
+            table_request_of(d.test_title, stage)
+            for d in data
+            for stage in d.stages
+        ))
+
     def parse_go_ftw_yaml(self, file_path: str, case_limit: int = 1e10) -> List[_FTWTestSchema]:
-        """_summary_
-        @TODO: documentation
+        """
+        parse_go_ftw_yaml() parses a go-ftw YAML file, without the cache.
+
         Args:
-            file_path (str): _description_
+            file_path (str): path of the YAML file
+            case_limit (int, optional): maximum number of stages. Defaults to 1e10.
 
         Returns:
-            List[_FTWTestSchema]: _description_
+            List[_FTWTestSchema]: the test cases
         """
         with open(file_path, 'r') as file:
-            data = yaml.safe_load(file)
+            tests = load_ftw_tests(file)
         file.close()
 
-        res, cnt = [], 0
-
-        for data in data["tests"]:
-            test_title = data['test_title']
-            inputs: List[_FTWTestInput] = []
-            for stage in data['stages']:
-                inputs.append(_FTWTestInput(stage["stage"]["input"]))
-                cnt += 1
-                if cnt >= case_limit:
-                    break
-            test = _FTWTestSchema(test_title, inputs)
-            res.append(test)
-            if cnt >= case_limit:
-                break
+        return to_ftw_test_schemas(tests, case_limit)
 
-        return res
     def _get_threshold(self, file_path: str) -> List[Threshold]:
         with open(file_path, 'r') as f:
             raw_data = json.load(f)
             return [Threshold(**data) for data in raw_data["thresholds"]]
 
+    def _evaluate_thresholds(self, file_path: str,
+                             before_data: dict[str, MetricSeries],
+                             after_data: dict[str, MetricSeries]) -> ThresholdReport:
+        """
+        _evaluate_thresholds() loads the thresholds from a config file and evaluates them in one pass.
+
+        Args:
+            file_path (str): path of the threshold config file
+            before_data (dict[str, MetricSeries]): parsed data before the change
+            after_data (dict[str, MetricSeries]): parsed data after the change
+
+        Returns:
+            ThresholdReport: the result of every threshold in the file
+        """
+        return evaluate_thresholds(self._get_threshold(file_path), before_data, after_data)
+
     def create_colored_text_by_value(self, value: any) -> str:
         """_summary_
 
@@ -410,14 +494,14 @@ class Util(ABC):
     def create_time_series_terminal_plot(
         self,
         title: str,
-        data: List[ParsedDataItem]) -> str:
+        data: MetricSeries) -> str:
 
         """
         Create a time series terminal plot for a single dataset
 
         Args:
             title (str): title of the plot
-            data (List[ParsedDataItem]): data to plot
+            data (MetricSeries): data to plot, the keys are ISO timestamps
 
         Raises:
             Exception: if terminal size is too small
@@ -436,30 +520,18 @@ class Util(ABC):
             "colors": [asciichart.blue],
             "height": line - 7
         }
-        def iso_time_str_to_unix_time(iso_time_str: str) -> float:
-            return date_parser.parse(iso_time_str).timestamp()
-
-        # flatten time series
-        def flatten(list: List[ParsedDataItem]) -> list:
-            start_time = iso_time_str_to_unix_time(list[0].key)
-            end_time = iso_time_str_to_unix_time(list[-1].key)
-
-            for data in list:
-                compressed_time = (iso_time_str_to_unix_time(data.key) - start_time) / (end_time - start_time)
-                data.key = round(compressed_time * 100)
-
-            arr, cur = [], 0
-
-            # filled
-            for i in range(100):
-                if cur >= len(list):
-                    arr.append(arr[-1])
-                if list[cur].key == i:
-                    arr.append(list[cur].value)
-                    cur += 1
-                else:
-                    arr.append(arr[-1])
-            return arr
+        # flatten time series into 100 points,
+        # each point takes the latest value sampled at or before it
+        def flatten(series: MetricSeries) -> list:
+            times = to_epoch_seconds(series.keys)
+            duration = times[-1] - times[0]
+            compressed_time = np.round((times - times[0]) / duration * 100) if duration > 0 else np.zeros(len(times))
+
+            idx = np.searchsorted(compressed_time, np.arange(100), side="right") - 1
+            return series.values[np.maximum(idx, 0)].tolist()
+
+        if not isinstance(data, MetricSeries):
+            data = MetricSeries.from_items(data)
 
         f_data = flatten(data)
 
@@ -474,13 +546,13 @@ class Util(ABC):
             asciichart.plot([f_data], config)
         )
 
-    def create_data_terminal_table(self, data: dict[str, List[ParsedDataItem]],
+    def create_data_terminal_table(self, data: dict[str, MetricSeries],
                                     row: List[str]) -> Table:
         """
         Create a terminal table for displaying data without comparison
 
         Args:
-            data (dict[str, List[ParsedDataItem]]): data to display
+            data (dict[str, MetricSeries]): data to display, each series is a column
             row (List[str]): row headers
 
         Returns:
@@ -490,16 +562,12 @@ class Util(ABC):
         output['Matrix'] = row
 
         for key in data.keys():
-            cur_output = []
-            for i in range(len(data[key][0].value)):
-                out = f"{'{0:.4f}'.format(float(data[key][0].value[i]))}"
-                cur_output.append(out)
-            output[key] = cur_output
+            output[key] = [f"{'{0:.4f}'.format(value)}" for value in data[key].values.astype(float)]
         return output
 
     # @TODO: make it generic
-    def create_data_diff_terminal_table(self, before_data: dict[str, List[ParsedDataItem]],
-                                        after_data: dict[str, List[ParsedDataItem]],
+    def create_data_diff_terminal_table(self, before_data: dict[str, MetricSeries],
+                                        after_data: dict[str, MetricSeries],
                                         row: List[str]) -> Table:
 
         key_set = set(before_data.keys())
@@ -512,18 +580,15 @@ class Util(ABC):
         output['Matrix'] = row
 
         for key in key_set:
-            before, after, cur_output = before_data[key], after_data[key], []
-            if len(before[0].value) != len(after[0].value):
+            before, after = before_data[key].values.astype(float), after_data[key].values.astype(float)
+            if len(before) != len(after):
                 raise ValueError("The before and after data must have the same length")
 
-            for i in range(len(before[0].value)):
-                diff = round(float(before[0].value[i]) - float(after[0].value[i]), 4)
-                out = (
-                    f"{'{0:.4f}'.format(float(before[0].value[i]))}" +
-                    f" ({self.create_colored_text_by_value(diff)})"
-                )
-                cur_output.append(out)
-            output[key] = cur_output
+            diff = np.round(before - after, 4)
+            output[key] = [
+                f"{'{0:.4f}'.format(before[i])}" + f" ({self.create_colored_text_by_value(float(diff[i]))})"
+                for i in range(len(before))
+            ]
         return output
 
     def color_text(self, text: str, color: str, bold: bool = False) -> str:
@@ -539,3 +604,77 @@ class Util(ABC):
             str: the colored text
         """
         return colored(text, color, attrs=[] if not bold else ["bold"])
+
+
+def rule_id_of(test_id: str) -> str:
+    """
+    rule_id_of() returns the rule id of a go-ftw test id (e.g., `920170` of `920170-1`).
+    """
+    return test_id.split("-", 1)[0]
+
+def rule_family_of(test_id: str) -> str:
+    """
+    rule_family_of() returns the rule family of a go-ftw test id, i.e., the first 3 digits of its rule id,
+    which number the rule file (e.g., `920` of `920170-1`, in `REQUEST-920-PROTOCOL-ENFORCEMENT.conf`).
+    """
+    return rule_id_of(test_id)[:3]
+
+def test_labels_of(test_id: str) -> List[str]:
+    """
+    test_labels_of() returns the labels of the data of a go-ftw test: its test id, rule id and rule family.
+    """
+    return [test_id, rule_id_of(test_id), rule_family_of(test_id)]
+
+def table_request_of(test_title: str, stage: _FTWTestInput) -> TableRequest:
+    """
+    table_request_of() builds the request of a go-ftw stage, named after its test id, which is sent
+    in the `X-CRS-TEST` header as well.
+    """
+    return TableRequest(
+        name=test_title,
+        method=stage.method,
+        uri=stage.uri or "/",
+        headers={**{str(k): str(v) for k, v in (stage.headers or {}).items()}, TEST_MARKER_HEADER: test_title},
+        body=_to_bytes(stage.data)
+    )
+
+def _merge_parsed(items: List[dict[str, MetricSeries | ParsedDataItem]]) -> dict[str, MetricSeries | ParsedDataItem]:
+    """
+    _merge_parsed() merges the parsed data of several runs (e.g., the blocks of a paired collect), metric by metric.
+    """
+    res = {}
+    for name in dict.fromkeys(name for item in items for name in item):
+        values = [item[name] for item in items if item.get(name) is not None]
+        first = values[0] if values else None
+
+        if isinstance(first, HistogramSeries):
+            merged = first
+            for series in values[1:]:
+                merged = merged.merge(series)
+            res[name] = merged
+        elif isinstance(first, MetricSeries):
+            res[name] = MetricSeries.concat(values)
+        elif isinstance(first, ParsedDataItem) and all(isinstance(item.value, (int, float)) for item in values):
+            res[name] = ParsedDataItem(first.key, sum(item.value for item in values), first.labels)
+        else:
+            res[name] = values[-1] if values else None
+    return res
+
+def _summarize(series: Optional[MetricSeries], kind: str) -> float:
+    """
+    _summarize() reduces a metric of a run to a value, a throughput is summed and a latency is averaged.
+    """
+    if not isinstance(series, MetricSeries) or len(series) == 0:
+        return np.nan
+    values = series.values.astype(np.float64)
+    return float(np.nansum(values) if kind == "throughput" else np.nanmean(values))
+
+def _to_bytes(data: any) -> bytes:
+    """
+    _to_bytes() converts the data of a go-ftw stage to a request body
+    """
+    if data is None:
+        return b""
+    if isinstance(data, bytes):
+        return data
+    return str(data).encode()
@@ -0,0 +1,58 @@
+"""
+Module WafTarget defines the WafTarget class, a WAF under test: its container and its endpoint.
+"""
+from typing import List
+from urllib.parse import urlsplit
+
+# container of the WAF when no target is given, a service of `tests/docker-compose.yml`
+DEFAULT_WAF_CONTAINER = "modsec2-apache"
+
+
+class WafTarget:
+    """
+    WafTarget is a WAF under test, e.g., ModSecurity 2 with Apache, ModSecurity 3 with nginx, or Coraza.
+
+    Args:
+        - `name` (str): name of the container (i.e., its service in `tests/docker-compose.yml`),
+          which names the raw output directory of the target and labels its samples
+        - `endpoint` (str): endpoint of the WAF, e.g., http://localhost:80
+    """
+    name: str
+    endpoint: str
+
+    def __init__(self, name: str, endpoint: str):
+        self.name = name
+        self.endpoint = endpoint
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, WafTarget) and vars(self) == vars(other)
+
+    def __repr__(self) -> str:
+        return f"WafTarget({self.name!r}, {self.endpoint!r})"
+
+
+def parse_waf_targets(value: str) -> List[WafTarget]:
+    """
+    parse_waf_targets() parses a comma-separated list of `<container>=<endpoint>`,
+    e.g., `modsec2-apache=http://localhost:80,coraza-caddy=http://localhost:8083`.
+
+    Args:
+        value (str): WAF targets
+
+    Raises:
+        ValueError: if a target is not `<container>=<endpoint>`, its endpoint is not an http(s) url,
+            or a container is listed twice
+
+    Returns:
+        List[WafTarget]: the targets, in the given order
+    """
+    res: List[WafTarget] = []
+    for item in value.split(","):
+        name, separator, endpoint = item.strip().partition("=")
+        url = urlsplit(endpoint)
+        if not separator or not name or "/" in name or url.scheme not in ("http", "https") or not url.netloc:
+            raise ValueError(f"Invalid WAF target, expected <container>=<endpoint>: {item!r}")
+        if any(target.name == name for target in res):
+            raise ValueError(f"WAF target {name} is listed twice")
+        res.append(WafTarget(name, endpoint))
+    return res
@@ -2,34 +2,93 @@
 Model package defines all the classes that are used to represent the data. Specifically,
 following classes are defined:
 - `ParsedDataItem`: a class that represents a single data item when generating a report.
+- `MetricSeries`: a class that represents the columnar data of a metric when generating a report.
+- `HistogramSeries`: a class that represents the latency histograms of a metric (e.g., per request name).
 - `Threshold`: a class that represents a threshold when generating a report.
+- `ThresholdResult`: a class that represents the result of evaluating a threshold.
+- `ThresholdReport`: a class that represents the results of evaluating all the thresholds in a config.
 - `Util`: a class that represents a utility. It is the base class for all the utilities.
 - `CollectCommandArg`: a class that represents the arguments for collect command.
 - `ReportCommandArg`: a class that represents the arguments for report command.
+- `RegexProfilerUtil`: a class that times the `@rx` operators of the rules against the go-ftw payloads offline.
+- `ScalingSweepUtil`: a class that grows the go-ftw payloads and fits how the cost of each rule scales.
+- `RegexScalingUtil`: a class that runs the scaling sweep against the `@rx` operators of the rules offline.
+- `FuzzUtil`: a class that mutates the go-ftw payloads into a worst-case corpus for the `@rx` operators of the rules.
+- `CollectScheduler`: a class that runs the utils of a collect command concurrently.
+- `PairedCollect`: a class that collects two revisions of the rules in interleaved blocks.
+- `AttributionCollect`: a class that ranks the rules by the cost of the WAF they take, leaving them out one at a time.
+- `MatrixCollect`: a class that sends the same load to several WAFs side by side, each pinned to its own CPUs.
+- `WafTarget`: a class that represents a WAF under test, i.e., its container and endpoint.
+- `FTWCorpusCache`: a class that caches the parsed go-ftw YAML files of a test corpus.
+- `ChangeImpactIndex`: a class that maps the rule ids to the go-ftw test files exercising them.
+- `ResultCache`: a class that stores the raw data of collects keyed by the fingerprint of their inputs.
+- `RunHistory`: a class that stores the parsed metrics of many runs in SQLite.
 - `UtilMapper`: a dictionary that maps the UtilType to the Util class.
 """
 from src.type import UtilType
-from .Util import ParsedDataItem, Threshold, Util
+from .ParsedDataItem import ParsedDataItem
+from .MetricSeries import MetricSeries
+from .HistogramSeries import HistogramSeries
+from .Threshold import Threshold, ThresholdResult, ThresholdReport, evaluate_thresholds
+from .FTWCorpusCache import FTWCorpusCache
+from .Util import Util
+from .WafTarget import WafTarget, parse_waf_targets
 from .CollectCommandArg import CollectCommandArg
 from .ReportCommandArg import ReportCommandArg
 from .FTWUtil import FTWUtil
 from .LocustUtil import LocustUtil
 from .CAdvisorUtil import CAdvisorUtil
+from .CgroupUtil import CgroupUtil
+from .OpenLoopUtil import OpenLoopUtil
+from .RegexProfilerUtil import RegexProfilerUtil
+from .ScalingSweepUtil import ScalingSweepUtil, RegexScalingUtil
+from .FuzzUtil import FuzzUtil
+from .CollectScheduler import CollectScheduler
+from .PairedCollect import PairedCollect
+from .AttributionCollect import AttributionCollect
+from .MatrixCollect import MatrixCollect
+from .ChangeImpact import ChangeImpactIndex, read_rule_files, rule_digests, changed_rules
+from .ResultCache import ResultCache
+from .RunHistory import RunHistory
 
 
 # UtilMapper is a dictionary that maps the UtilType to the Util class
 UtilMapper: dict[UtilType, Util] = {
     UtilType.FTW: FTWUtil,
     UtilType.CADVISOR: CAdvisorUtil,
-    UtilType.LOCUST: LocustUtil
+    UtilType.CGROUP: CgroupUtil,
+    UtilType.LOCUST: LocustUtil,
+    UtilType.OPENLOOP: OpenLoopUtil,
+    UtilType.REGEX: RegexProfilerUtil,
+    UtilType.SCALING: ScalingSweepUtil,
+    UtilType.REGEXSCALING: RegexScalingUtil,
+    UtilType.FUZZ: FuzzUtil
 }
 
 
 __all__ = [
     "ParsedDataItem",
+    "MetricSeries",
+    "HistogramSeries",
     "Threshold",
+    "ThresholdResult",
+    "ThresholdReport",
+    "evaluate_thresholds",
     "Util",
     "CollectCommandArg",
     "ReportCommandArg",
+    "CollectScheduler",
+    "PairedCollect",
+    "AttributionCollect",
+    "MatrixCollect",
+    "WafTarget",
+    "parse_waf_targets",
+    "FTWCorpusCache",
+    "ChangeImpactIndex",
+    "read_rule_files",
+    "rule_digests",
+    "changed_rules",
+    "ResultCache",
+    "RunHistory",
     "UtilMapper"
 ]
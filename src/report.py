@@ -11,12 +11,20 @@ Usage:
     
     # using with threshold
     poetry run report --test-name $TEST_NAME --utils cAdvisor --threshold-conf "./config"
+
+    # add the data to the run history, and print the trend of a metric across the runs
+    poetry run report --test-name $TEST_NAME --utils ftw --history ./data/history.sqlite --ingest --commit $COMMIT --branch main
+    poetry run report --test-name $TEST_NAME --utils ftw --history ./data/history.sqlite --trend runtime
+
+    # compare the WAFs of a matrix (collected with --waf-targets), or rank the rules of a leave-one-out attribution
+    poetry run report --test-name $TEST_NAME --utils locust
 """
 import argparse
+import datetime
 import os
 import sys
-from src.model import ReportCommandArg, UtilMapper
-from src.type import ReportFormat, UtilType
+from src.model import ReportCommandArg, RunHistory, Util, UtilMapper
+from src.type import ReportFormat, State, UtilType
 from src.utils import logger
 
 
@@ -34,6 +42,11 @@ def get_summary_command_arg(args: any) -> ReportCommandArg:
     parser.add_argument('--raw-output', type=str, help='raw output')
     parser.add_argument('--threshold-conf', type=str, help='threshold conf')
     parser.add_argument('--format', type=str, help='output')
+    parser.add_argument('--history', type=str, help='path of the run history database')
+    parser.add_argument('--ingest', action='store_true', help='add the data of the test to the run history')
+    parser.add_argument('--commit', type=str, help='commit of the rules, in the run history')
+    parser.add_argument('--branch', type=str, help='branch of the commit, in the run history')
+    parser.add_argument('--trend', type=str, help='print the trend of a metric across the runs of the test')
     parsed_args = parser.parse_args(args)
 
     # @TODO: default with all utils
@@ -43,7 +56,12 @@ def get_summary_command_arg(args: any) -> ReportCommandArg:
         output=parsed_args.output,
         raw_output=parsed_args.raw_output,
         threshold_conf=parsed_args.threshold_conf,
-        report_format=parsed_args.format
+        report_format=parsed_args.format,
+        history=parsed_args.history,
+        ingest=parsed_args.ingest,
+        commit=parsed_args.commit,
+        branch=parsed_args.branch,
+        trend=parsed_args.trend
     )
 
 def init(args: ReportCommandArg):
@@ -52,6 +70,56 @@ def init(args: ReportCommandArg):
     """
     os.makedirs(args.output, exist_ok=True)
 
+def ingest(args: ReportCommandArg, utils: list[Util]) -> int:
+    """
+    add the data of the test to the run history, as a run. The data after the change is added for a paired test.
+
+    Args:
+        args (ReportCommandArg): report command arg
+        utils (list[Util]): utils whose data is added
+
+    Returns:
+        int: id of the run
+    """
+    with RunHistory(args.history) as history:
+        run_id = history.add_run(args.test_name, args.commit, args.branch)
+
+        for util in utils:
+            try:
+                states = util.parse_states(args.raw_output)
+                data = states[State.AFTER] if states else util.parse_output(args.raw_output)
+            except (OSError, ValueError) as e:
+                logger.warning(f"No data of {type(util).__name__} is added to the run history: {e!r}")
+                continue
+
+            count = history.add_data(run_id, type(util).__name__, data)
+            logger.info(f"{count} items of {type(util).__name__} are added to the run history")
+
+    return run_id
+
+def print_trend(args: ReportCommandArg, util: Util):
+    """
+    print the trend of a metric across the runs of the test (and of the branch, if given) in the run history.
+
+    Args:
+        args (ReportCommandArg): report command arg
+        util (Util): util of the metric
+    """
+    with RunHistory(args.history) as history:
+        trend = history.trend(type(util).__name__, args.trend, args.test_name, branch=args.branch)
+
+    if len(trend) == 0:
+        logger.warning(f"No run of {args.test_name} has {type(util).__name__} {args.trend}")
+        return
+
+    # a row per run, i.e., its time and commit
+    rows = [
+        f"{datetime.datetime.fromtimestamp(float(key), datetime.timezone.utc).isoformat(timespec='seconds')} "
+        f"{(trend.labels_of(idx) or [''])[0][:12]}".strip()
+        for idx, key in enumerate(trend.keys)
+    ]
+    print(util.create_data_terminal_table({args.trend: trend}, rows))
+
 def main(args: any = None):
     """
     script entrypoint of report.py
@@ -66,14 +134,33 @@ def main(args: any = None):
     # create folder
     init(command_args)
 
+    utils = [UtilMapper.get(UtilType(UtilType[util.upper()]))() for util in command_args.utils]
+
+    if command_args.history and command_args.trend:
+        for util in utils:
+            print_trend(command_args, util)
+        return
+
     # build the report
-    for util in command_args.utils:
-        if command_args.report_format == ReportFormat.TEXT:
-            UtilMapper.get(UtilType(UtilType[util.upper()]))().text_report(command_args)
+    for util in utils:
+        variants = util.parse_variants(command_args.raw_output)
+        targets = util.parse_targets(command_args.raw_output)
+        if variants and command_args.report_format == ReportFormat.TEXT:
+            util.attribution_text_report(command_args, variants)
+
+        elif targets and command_args.report_format == ReportFormat.TEXT:
+            util.matrix_text_report(command_args, targets)
+
+        elif command_args.report_format == ReportFormat.TEXT:
+            util.text_report(command_args)
 
         elif command_args.report_format == ReportFormat.IMG:
-            UtilMapper.get(UtilType(UtilType[util.upper()]))().figure_report(command_args)
+            util.figure_report(command_args)
 
         else:
             logger.critical("--format support text or img")
             exit(1)
+
+    # the run history is updated after the report, so the baselines of the thresholds do not include this run
+    if command_args.history and command_args.ingest:
+        ingest(command_args, utils)
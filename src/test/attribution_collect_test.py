@@ -0,0 +1,149 @@
+"""
+Unit tests for the leave-one-out attribution.
+These tests verify that a variant of the rules is generated for each target, the variants run in parallel rounds
+next to a baseline, and the report ranks the targets by the cost they take.
+"""
+import asyncio
+import csv
+import json
+import os
+import pytest
+from src.collect import get_test_command_arg
+from src.model import AttributionCollect, CollectCommandArg
+from src.model.AttributionCollect import leave_out_targets
+from src.report import main as report_main
+from src.type import UtilRole
+from conftest import FakeUtil
+
+RULES = (
+    'SecRule ARGS "@rx a" "id:920170,phase:1,block"\n'
+    'SecRule ARGS "@rx b" "id:942100,phase:2,block"\n'
+    'SecRule ARGS "@rx c" "id:942190,phase:2,block"\n'
+)
+
+RULE_FILES = {"REQUEST-942-APPLICATION-ATTACK-SQLI.conf": RULES}
+
+
+class SlotUtil(FakeUtil):
+    """Records the endpoint and the raw output of each run, the runs of a round overlap"""
+
+    def __init__(self, runs: list, active: list, role: UtilRole = UtilRole.LOAD):
+        super().__init__(runs, role)
+        self.active = active
+
+    async def run(self, args, stop):
+        if self.role == UtilRole.SAMPLER:
+            await stop.wait()
+            self.runs.append(("sampler", self.waf_container_names, self.container_labels))
+            return
+        self.active.append(args.raw_output)
+        self.runs.append((args.waf_endpoint, os.path.relpath(args.raw_output, "./data/attribution"),
+                          len(self.active), args.workers))
+        await asyncio.sleep(0.05)
+        self.active.remove(args.raw_output)
+
+
+class FakeAttributionCollect(AttributionCollect):
+    """Runs without docker, the exclusions and the CPUs of each WAF are recorded"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wafs = []
+
+    def run_waf(self, name, port, rules_dir, cpuset_cpus=None):
+        exclusion = [path for path in os.listdir(rules_dir) if path.startswith("ZZZ")]
+        removed = open(os.path.join(rules_dir, exclusion[0])).read() if exclusion else None
+        self.wafs.append((name, port, cpuset_cpus, removed))
+        return True
+
+    def stop_waf(self, name):
+        self.wafs.append((name, "stopped"))
+
+
+def write_stats(raw_output: str, rates: dict[str, float], latency: float):
+    """writes locust stats with a row per test id, and the aggregated row"""
+    os.makedirs(raw_output, exist_ok=True)
+    with open(os.path.join(raw_output, "locust_stats.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Type", "Name"] + [f"c{idx}" for idx in range(20)])
+        for name, rate in rates.items():
+            writer.writerow(["GET", name, 10, 0, latency, latency, 1, 100, 10, rate, 0] + [latency] * 11)
+        writer.writerow(["", "Aggregated"] + [0] * 20)
+
+
+def test_leave_out_targets():
+    """Test that a rule id is removed by itself, a family by the range of its ids, and a missing target is skipped"""
+    rule_ids = {"920170", "942100", "942190"}
+
+    assert leave_out_targets(["942100", "920", "949", "942100", "949110"], rule_ids) == {
+        "942100": "942100",
+        "920": "920000-920999",
+    }
+    with pytest.raises(ValueError):
+        leave_out_targets(["942100;SecRuleEngine Off"], rule_ids)
+
+    args = get_test_command_arg(["--test-name", "attribution", "--attribution", "942100,920"])
+    assert args.attribution == ["942100", "920"]
+
+
+def test_attribution_runs_rounds_in_parallel(rules_workspace, monkeypatch):
+    """Test that each round runs the baseline and the variants in parallel, on distinct ports and CPUs"""
+    monkeypatch.setattr(os, "cpu_count", lambda: 6)
+    runs, active = [], []
+    args = CollectCommandArg("attribution", ["locust"], None, None, None, None, "rules", None,
+                             attribution=["942100", "942190", "920"])
+    attribution = FakeAttributionCollect(lambda: [SlotUtil(runs, active), SlotUtil(runs, active, UtilRole.SAMPLER)])
+
+    assert asyncio.run(attribution.run(args))
+
+    # 6 CPUs are 3 slots: the baseline and 2 variants per round
+    started = sorted(waf for waf in attribution.wafs if waf[1] != "stopped")
+    assert started == [
+        ("attribution-slot-0", 8090, "0", None),
+        ("attribution-slot-0", 8090, "0", None),
+        ("attribution-slot-1", 8091, "1", "SecRuleRemoveById 920000-920999\n"),
+        ("attribution-slot-1", 8091, "1", "SecRuleRemoveById 942100\n"),
+        ("attribution-slot-2", 8092, "2", "SecRuleRemoveById 942190\n"),
+    ]
+    assert len(attribution.wafs) == 2 * len(started)
+
+    loads = sorted(run for run in runs if run[0] != "sampler")
+    assert [(endpoint, raw_output) for endpoint, raw_output, _, _ in loads] == [
+        ("http://localhost:8090", "baseline/round-0"),
+        ("http://localhost:8090", "baseline/round-1"),
+        ("http://localhost:8091", "without-920"),
+        ("http://localhost:8091", "without-942100"),
+        ("http://localhost:8092", "without-942190"),
+    ]
+    # the variants of a round run in parallel, each with a single locust worker
+    assert max(parallel for _, _, parallel, _ in loads) == 3
+    assert {workers for _, _, _, workers in loads} == {1}
+
+    samplers = [run for run in runs if run[0] == "sampler"]
+    assert ("sampler", ["attribution-slot-2"], {"attribution-slot-2": "without-942190"}) in samplers
+
+    with open("data/attribution/attribution.json") as f:
+        manifest = json.load(f)
+    assert manifest["baselines"] == ["baseline/round-0", "baseline/round-1"]
+    assert manifest["variants"]["920"] == {"round": 1, "raw_output": "without-920", "removed": "920000-920999"}
+
+
+def test_attribution_report_ranks_rules(rules_workspace, capsys):
+    """Test that the targets are ranked by the throughput gained without them"""
+    write_stats("data/attribution/baseline/round-0", {"942100-1": 50, "920170-1": 50}, 20)
+    write_stats("data/attribution/without-942100", {"942100-1": 75, "920170-1": 75}, 10)
+    write_stats("data/attribution/without-920", {"942100-1": 55, "920170-1": 55}, 18)
+    with open("data/attribution/attribution.json", "w") as f:
+        json.dump({"baselines": ["baseline/round-0"], "variants": {
+            "920": {"round": 0, "raw_output": "without-920", "removed": "920000-920999"},
+            "942100": {"round": 0, "raw_output": "without-942100", "removed": "942100"},
+            "942190": {"round": 0, "raw_output": "without-942190", "removed": "942190"},
+        }}, f)
+
+    report_main(["--test-name", "attribution", "--utils", "locust"])
+    out = capsys.readouterr().out
+
+    # 942190 has no data, it is not ranked
+    assert "Cost of the 2 rules left out (LocustUtil)" in out
+    rows = [line.split() for line in out.splitlines() if line.split()[:1] in (["942100"], ["920"])]
+    assert rows == [["942100", "50.0000", "50.0000"], ["920", "10.0000", "10.0000"]]
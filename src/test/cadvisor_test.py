@@ -0,0 +1,114 @@
+"""
+Unit tests for the cAdvisor sampler.
+These tests verify the polling cadence and the connection reuse against a fake cAdvisor API.
+"""
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src.model import CAdvisorUtil
+from src.utils import JsonlSpool, ticks
+
+
+class _FakeCAdvisorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    polls: list = []
+    connections: set = set()
+
+    def do_POST(self):
+        container = self.path.rsplit("/", 1)[-1]
+        _FakeCAdvisorHandler.polls.append(container)
+        _FakeCAdvisorHandler.connections.add(self.client_address)
+
+        # like cAdvisor, every poll returns the recent samples
+        n = len(_FakeCAdvisorHandler.polls)
+        stats = [
+            {
+                "timestamp": f"2023-07-01T00:00:{i:02}Z",
+                "cpu": {"usage": {"total": i, "user": i, "system": i}},
+                "memory": {"usage": i, "cache": i}
+            }
+            for i in range(max(0, n - 3), n)
+        ]
+        body = json.dumps([{"stats": stats}]).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
+
+
+@pytest.fixture
+def fake_cadvisor():
+    """Start a fake cAdvisor API on a random port"""
+    _FakeCAdvisorHandler.polls, _FakeCAdvisorHandler.connections = [], set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeCAdvisorHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api/v1.1/subcontainers/docker/"
+    server.shutdown()
+
+
+@pytest.fixture
+def temp_data_dir():
+    temp_dir = tempfile.mkdtemp()
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+def test_ticks_keep_fixed_cadence():
+    """Test that the time spent by the caller does not delay the next tick"""
+    async def run() -> list:
+        loop, res = asyncio.get_running_loop(), []
+        async for tick in ticks(0.05):
+            res.append(loop.time())
+            await asyncio.sleep(0.03)
+            if tick == 4:
+                return res
+
+    times = asyncio.run(run())
+    assert times[-1] - times[0] == pytest.approx(0.2, abs=0.04)
+
+
+def test_cadvisor_sample_polls_containers_until_stopped(fake_cadvisor, temp_data_dir):
+    """Test that every container is polled with reused connections until the load stops"""
+    util = CAdvisorUtil()
+    util.sampling_interval = 0.05
+    urls = {"waf-a": f"{fake_cadvisor}a", "waf-b": f"{fake_cadvisor}b"}
+    file_path = os.path.join(temp_data_dir, "cAdvisor.jsonl")
+
+    async def run():
+        stop = asyncio.Event()
+        asyncio.get_running_loop().call_later(0.3, stop.set)
+        with JsonlSpool(file_path) as spool:
+            await util.sample(spool, urls, stop)
+
+    asyncio.run(run())
+
+    polls = _FakeCAdvisorHandler.polls
+    assert polls.count("a") == polls.count("b") >= 5
+    # one keep-alive connection per container
+    assert len(_FakeCAdvisorHandler.connections) == 2
+
+    # samples re-sent by later polls are not duplicated
+    series = util.parse_data(file_path)["cpu_total"]
+    samples = [(item.key, tuple(item.labels)) for item in series]
+    assert len(samples) == len(set(samples))
+    assert 0 < series.label_mask(["waf-a"]).sum() < len(series)
+
+
+def test_cadvisor_containers_are_per_instance():
+    """Test that the containers and labels of a sampler are not shared with the other samplers"""
+    first, second = CAdvisorUtil(), CAdvisorUtil()
+    first.waf_container_names.append("paired-before")
+    first.container_labels["paired-before"] = "modsec2-apache"
+
+    assert second.waf_container_names == [] and second.container_labels == {}
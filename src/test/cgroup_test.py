@@ -0,0 +1,81 @@
+"""
+Unit tests for the cgroup util.
+These tests verify that samples read from a fake cgroup v2 tree match the metrics of cAdvisor.
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import pytest
+from src.model import CgroupUtil
+from src.model.CgroupUtil import find_container_cgroup, read_cgroup_stats
+from src.utils import JsonlSpool
+
+CONTAINER_ID = "0123456789abcdef"
+
+
+def write_cgroup_files(cgroup_dir: str, usage_usec: int):
+    files = {
+        "cpu.stat": f"usage_usec {usage_usec}\nuser_usec {usage_usec - 10}\nsystem_usec 10\nnr_periods 0\n",
+        "memory.current": "4096\n",
+        "memory.stat": "anon 1024\nfile 2048\n",
+        "io.stat": "8:0 rbytes=100 wbytes=200 rios=1 wios=2 dbytes=0 dios=0\n"
+                   "8:16 rbytes=1 wbytes=2 rios=1 wios=1 dbytes=0 dios=0\n",
+    }
+    for name, content in files.items():
+        with open(os.path.join(cgroup_dir, name), "w") as f:
+            f.write(content)
+
+
+@pytest.fixture
+def fake_cgroup_root():
+    """Create a fake cgroup v2 tree using the systemd driver layout"""
+    root = tempfile.mkdtemp()
+    cgroup_dir = os.path.join(root, "system.slice", f"docker-{CONTAINER_ID}.scope")
+    os.makedirs(cgroup_dir)
+    write_cgroup_files(cgroup_dir, 1000)
+    yield root, cgroup_dir
+    shutil.rmtree(root)
+
+
+def test_find_container_cgroup(fake_cgroup_root):
+    """Test that the cgroup directory of a container is found"""
+    root, cgroup_dir = fake_cgroup_root
+
+    assert find_container_cgroup(CONTAINER_ID, root) == cgroup_dir
+    assert find_container_cgroup("unknown", root) is None
+
+
+def test_read_cgroup_stats(fake_cgroup_root):
+    """Test that cgroup files are converted to the layout of cAdvisor API"""
+    _, cgroup_dir = fake_cgroup_root
+    sample = read_cgroup_stats(cgroup_dir, "modsec2-apache")
+
+    assert sample["cpu"]["usage"] == {"total": 1000000, "user": 990000, "system": 10000}
+    assert sample["memory"] == {"usage": 4096, "cache": 2048}
+    assert sample["diskio"]["io_service_bytes"][1] == {"device": "8:16", "stats": {"Read": 1, "Write": 2}}
+    assert sample["network"] == {"rx_bytes": 0, "tx_bytes": 0}
+    assert sample["container"] == "modsec2-apache"
+
+
+def test_cgroup_sample_and_parse(fake_cgroup_root):
+    """Test sampling at sub-second intervals and parsing into the cAdvisor metric names"""
+    root, cgroup_dir = fake_cgroup_root
+    util = CgroupUtil()
+    util.sampling_interval = 0.02
+    file_path = os.path.join(root, "cgroup.jsonl")
+
+    async def run():
+        stop = asyncio.Event()
+        asyncio.get_running_loop().call_later(0.05, write_cgroup_files, cgroup_dir, 5000)
+        asyncio.get_running_loop().call_later(0.2, stop.set)
+        with JsonlSpool(file_path) as spool:
+            await util.sample(spool, {"modsec2-apache": cgroup_dir}, stop)
+
+    asyncio.run(run())
+    data = util.parse_data(file_path)
+
+    assert {"cpu_total", "cpu_user", "cpu_system", "memory_usage", "memory_cache", "io_read_bytes"} <= set(data)
+    assert len(data["cpu_total"]) >= 5
+    assert data["cpu_total"].values[0] == 1000000
+    assert data["cpu_total"].values[-1] == 5000000
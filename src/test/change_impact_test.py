@@ -0,0 +1,127 @@
+"""
+Unit tests for the change impact index.
+These tests verify that the changed rules are detected, and only the tests of the changed rules are selected.
+"""
+import os
+import subprocess
+import tempfile
+import pytest
+from src.collect import get_test_command_arg, select_changed_tests
+from src.model import ChangeImpactIndex, read_rule_files, rule_digests, changed_rules
+
+RULES = {
+    "REQUEST-920-PROTOCOL-ENFORCEMENT.conf": (
+        '# SecRule ARGS "@rx commented" "id:920000"\n'
+        'SecRule REQUEST_HEADERS:Content-Length "!@rx ^\\d+$" \\\n'
+        '    "id:920160,phase:1,deny,t:none"\n'
+        'SecRule REQUEST_METHOD "@rx ^(?:GET|HEAD)$" "id:920170,phase:1,chain"\n'
+        '    SecRule REQUEST_HEADERS:Content-Length "!@rx ^0?$" "t:none"\n'
+    ),
+    "REQUEST-942-APPLICATION-ATTACK-SQLI.conf": (
+        'SecRule ARGS "@pmFromFile sql-errors.data" "id:942100,phase:2,block"\n'
+        'SecRule ARGS "@rx union" "id:942190,phase:2,block"\n'
+    ),
+    "sql-errors.data": "syntax error\n",
+}
+
+TESTS = {
+    "REQUEST-920-PROTOCOL-ENFORCEMENT/920160.yaml": ["920160-1", "920160-2"],
+    "REQUEST-920-PROTOCOL-ENFORCEMENT/920170.yaml": ["920170-1"],
+    "REQUEST-942-APPLICATION-ATTACK-SQLI/942100.yaml": ["942100-1"],
+    "REQUEST-942-APPLICATION-ATTACK-SQLI/942190.yaml": ["942190-1"],
+}
+
+
+def write_files(root: str, files: dict[str, str]):
+    for path, content in files.items():
+        os.makedirs(os.path.dirname(os.path.join(root, path)), exist_ok=True)
+        with open(os.path.join(root, path), "w") as f:
+            f.write(content)
+
+
+def write_tests(root: str):
+    write_files(root, {
+        path: "tests:\n" + "".join(
+            f"  - test_title: {title}\n    stages:\n      - stage:\n          input:\n            uri: /{title}\n"
+            for title in titles)
+        for path, titles in TESTS.items()
+    })
+
+
+def change(content: str, old: str, new: str) -> str:
+    assert old in content
+    return content.replace(old, new)
+
+
+@pytest.fixture
+def workspace(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.chdir(tmp)
+        write_files("rules", RULES)
+        write_tests("tests")
+        yield tmp
+
+
+def test_rule_digests_follow_chains_and_data_files(workspace):
+    """Test that the chained rules and the data files are part of a rule"""
+    digests = rule_digests(read_rule_files("rules"))
+    assert sorted(digests) == ["920160", "920170", "942100", "942190"]
+
+    rules = dict(RULES)
+    rules["REQUEST-920-PROTOCOL-ENFORCEMENT.conf"] = change(rules["REQUEST-920-PROTOCOL-ENFORCEMENT.conf"],
+                                                            "^0?$", "^0$")
+    rules["sql-errors.data"] = "syntax error\nunterminated\n"
+    rules["REQUEST-900-EXCLUSION.conf"] = 'SecRuleUpdateTargetById 942190 "!ARGS:foo"\n'
+    write_files("changed", rules)
+
+    assert changed_rules(digests, rule_digests(read_rule_files("changed"))) == ["920170", "942100", "942190"]
+
+
+def test_changed_rules_between_git_revisions(workspace):
+    """Test that the rules of a git revision are compared with the rules in the directory"""
+    def git(*args: str) -> str:
+        return subprocess.run(["git", "-C", "rules", "-c", "user.name=test", "-c", "user.email=test@example.com",
+                               *args], capture_output=True, text=True, check=True).stdout.strip()
+
+    git("init", "-q")
+    git("add", "-A")
+    git("commit", "-q", "-m", "init")
+
+    write_files("rules", {"REQUEST-942-APPLICATION-ATTACK-SQLI.conf": RULES["REQUEST-942-APPLICATION-ATTACK-SQLI.conf"]
+                          + 'SecRule ARGS "@rx sleep" "id:942200,phase:2,block"\n'})
+
+    assert changed_rules(rule_digests(read_rule_files("rules", "HEAD")), rule_digests(read_rule_files("rules"))) \
+        == ["942200"]
+    with pytest.raises(ValueError):
+        read_rule_files("rules", "unknown")
+
+
+def test_change_impact_index_writes_corpus(workspace):
+    """Test that the corpus only contains the tests of the changed rules, or of their family without tests"""
+    index = ChangeImpactIndex("tests")
+    assert index.test_files["920160"] == ["tests/REQUEST-920-PROTOCOL-ENFORCEMENT/920160.yaml"]
+    assert index.family_dirs["942"] == ["tests/REQUEST-942-APPLICATION-ATTACK-SQLI"]
+
+    assert index.write_corpus(["920170"], "corpus") == 1
+    assert os.listdir("corpus/REQUEST-920-PROTOCOL-ENFORCEMENT") == ["920170.yaml"]
+
+    # a new rule without tests runs the tests of its family
+    assert index.write_corpus(["942200"], "corpus") == 2
+    assert sorted(os.listdir("corpus/REQUEST-942-APPLICATION-ATTACK-SQLI")) == ["942100.yaml", "942190.yaml"]
+    assert not os.path.exists("corpus/REQUEST-920-PROTOCOL-ENFORCEMENT")
+
+
+def test_select_changed_tests_replaces_test_cases(workspace):
+    """Test that an incremental collect runs the corpus of the changed rules"""
+    rules = dict(RULES)
+    rules["REQUEST-942-APPLICATION-ATTACK-SQLI.conf"] = change(rules["REQUEST-942-APPLICATION-ATTACK-SQLI.conf"],
+                                                               "@rx union", "@rx union\\s+select")
+    write_files("base", RULES)
+    write_files("rules", rules)
+
+    args = get_test_command_arg(["--test-name", "incremental", "--rules-dir", "rules", "--test-cases-dir", "tests",
+                                 "--incremental", "base"])
+
+    assert select_changed_tests(args) == 1
+    assert args.test_cases_dir == os.path.join(args.tmp_dir, "incremental_tests")
+    assert os.listdir(os.path.join(args.test_cases_dir, "REQUEST-942-APPLICATION-ATTACK-SQLI")) == ["942190.yaml"]
@@ -0,0 +1,81 @@
+"""
+Unit tests for the collect scheduler.
+These tests verify that samplers cover the load window, and load generators run by phase under the deadline.
+"""
+import asyncio
+import time
+from src.model import CollectCommandArg, CollectScheduler
+from src.type import UtilRole
+from conftest import FakeUtil
+
+
+class TimedUtil(FakeUtil):
+    """Records the start and end time of run()"""
+
+    def __init__(self, events: list, name: str, duration: float = 0.0,
+                 role: UtilRole = UtilRole.LOAD, phase: int = 0):
+        super().__init__(events, role, phase)
+        self.name = name
+        self.duration = duration
+
+    async def run(self, args, stop):
+        self.runs.append((self.name, "start", time.monotonic()))
+        try:
+            if self.role == UtilRole.SAMPLER:
+                await stop.wait()
+            else:
+                await asyncio.sleep(self.duration)
+        finally:
+            self.runs.append((self.name, "end", time.monotonic()))
+
+
+def event_time(events: list, name: str, kind: str) -> float:
+    return next(t for n, k, t in events if n == name and k == kind)
+
+
+def get_args() -> CollectCommandArg:
+    return CollectCommandArg("scheduler-test", ["ftw"], None, None, None, None, None, None)
+
+
+def test_samplers_cover_the_load_window():
+    """Test that samplers start before the load generators and stop after them"""
+    events = []
+    utils = [
+        TimedUtil(events, "load", 0.05),
+        TimedUtil(events, "sampler", role=UtilRole.SAMPLER),
+    ]
+
+    assert asyncio.run(CollectScheduler(utils).run(get_args()))
+    assert event_time(events, "sampler", "start") <= event_time(events, "load", "start")
+    assert event_time(events, "sampler", "end") >= event_time(events, "load", "end")
+
+
+def test_phases_run_sequentially():
+    """Test that load generators of the same phase overlap, and phases do not"""
+    events = []
+    utils = [
+        TimedUtil(events, "phase-1", 0.05, phase=1),
+        TimedUtil(events, "phase-0-a", 0.1),
+        TimedUtil(events, "phase-0-b", 0.1),
+    ]
+    scheduler = CollectScheduler(utils)
+
+    assert [[util.name for util in phase] for phase in scheduler.phases] == [["phase-0-a", "phase-0-b"], ["phase-1"]]
+    assert asyncio.run(scheduler.run(get_args()))
+    assert event_time(events, "phase-0-b", "start") < event_time(events, "phase-0-a", "end")
+    assert event_time(events, "phase-1", "start") >= event_time(events, "phase-0-b", "end")
+
+
+def test_deadline_cancels_the_load():
+    """Test that the deadline cancels the running load generators, and samplers still stop as usual"""
+    events = []
+    utils = [
+        TimedUtil(events, "load", 10),
+        TimedUtil(events, "sampler", role=UtilRole.SAMPLER),
+    ]
+
+    start = time.monotonic()
+    assert not asyncio.run(CollectScheduler(utils, deadline=0.1).run(get_args()))
+    assert time.monotonic() - start < 5
+    assert ("load", "end") in [(n, k) for n, k, _ in events]
+    assert ("sampler", "end") in [(n, k) for n, k, _ in events]
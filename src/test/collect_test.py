@@ -48,8 +48,8 @@ def test_collect_command_arg_defaults():
     args = ["--test-name", "defaults-test"]
     command_args = get_test_command_arg(args)
 
-    # Should default to all utilities (ftw, locust, cAdvisor, eBPF)
-    assert len(command_args.utils) >= 3  # At least ftw, locust, cAdvisor
+    # Should default to the online utilities, the offline utils and the sweeps are opt-in
+    assert command_args.utils == [UtilType.FTW, UtilType.LOCUST, UtilType.CADVISOR]
     assert command_args.waf_endpoint == "http://localhost:80"
     assert command_args.rules_dir == "./rules"
     assert command_args.test_cases_dir == "./tests/regression/tests"
@@ -0,0 +1,64 @@
+"""
+Shared helpers of the unit tests: a fake util for the tests of the collect schedulers, and a temporary workspace
+with rules and go-ftw tests for the tests of the offline utils.
+"""
+import os
+import tempfile
+import pytest
+import yaml
+from src.model import Util
+from src.type import UtilRole
+
+
+class FakeUtil(Util):
+    """
+    FakeUtil collects nothing, a sampler runs until the load completes. The tests override run()
+    to record what the util is run with in `runs`.
+
+    Args:
+        - `runs` (list): records of the runs
+        - `role` (UtilRole, optional): role of the util. Defaults to load.
+        - `phase` (int, optional): phase of a load generator. Defaults to 0.
+    """
+
+    def __init__(self, runs: list, role: UtilRole = UtilRole.LOAD, phase: int = 0):
+        self.runs = runs
+        self.role = role
+        self.phase = phase
+
+    def collect(self, args):
+        pass
+
+    async def run(self, args, stop):
+        if self.role == UtilRole.SAMPLER:
+            await stop.wait()
+
+    def text_report(self, args):
+        pass
+
+    def figure_report(self, args):
+        pass
+
+
+def write_test(path: str, test_title: str, stage_input: dict):
+    """writes a go-ftw YAML file with a test of a single stage"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        yaml.safe_dump({"tests": [{"test_title": test_title, "stages": [{"stage": {"input": stage_input}}]}]}, f)
+
+
+@pytest.fixture
+def rules_workspace(request, monkeypatch):
+    """
+    A temporary working directory with the rules of the test module in rules/ (`RULE_FILES`, content by file name),
+    and its go-ftw tests in tests/ (`FTW_TESTS`, file name, test id and stage input of each test).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.chdir(tmp)
+        os.makedirs("rules")
+        for name, content in request.module.RULE_FILES.items():
+            with open(os.path.join("rules", name), "w") as f:
+                f.write(content)
+        for name, test_title, stage_input in getattr(request.module, "FTW_TESTS", []):
+            write_test(os.path.join("tests", name), test_title, stage_input)
+        yield tmp
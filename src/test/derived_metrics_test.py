@@ -0,0 +1,48 @@
+"""
+Unit tests for the derived metrics.
+These tests verify that cumulative counters are converted into rates per interval.
+"""
+import numpy as np
+import pytest
+from src.model import MetricSeries
+from src.model.DerivedMetrics import derive_rate, derive_resource_metrics
+from src.utils.timeseries import to_epoch_seconds
+
+
+def test_to_epoch_seconds():
+    """Test ISO 8601 timestamps of different formats"""
+    seconds = to_epoch_seconds(["2023-07-01T00:00:00Z", "2023-07-01T00:00:01.5+00:00", "2023-07-01T00:00:02.25"])
+    assert (seconds - seconds[0]).tolist() == [0, 1.5, 2.25]
+
+    seconds = to_epoch_seconds(["2023-07-01T00:00:00Z", "2023-07-01T02:00:01+02:00"])
+    assert (seconds - seconds[0]).tolist() == [0, 1]
+
+
+def test_derive_rate_per_container():
+    """Test that samples of different containers are differentiated separately"""
+    series = MetricSeries(
+        ["2023-07-01T00:00:00Z", "2023-07-01T00:00:00Z", "2023-07-01T00:00:02Z",
+         "2023-07-01T00:00:02Z", "2023-07-01T00:00:03Z"],
+        [0, 100, 2e9, 100 + 4e9, 3e9],
+        [["a"], ["b"], ["a"], ["b"], ["a"]]
+    )
+    rate = derive_rate(series, 1e-9)
+
+    assert rate.values.tolist() == pytest.approx([1, 2, 1])
+    assert [item.labels for item in rate] == [{"a"}, {"b"}, {"a"}]
+
+
+def test_derive_resource_metrics():
+    """Test derived metrics of cAdvisor data, including the CPU cost per request"""
+    timestamps = [f"2023-07-01T00:00:{i:02}Z" for i in range(5)]
+    data = {
+        "cpu_total": MetricSeries(timestamps, np.arange(5) * 5e8),
+        "memory_usage": MetricSeries(timestamps, [100, 100, 150, 150, 300]),
+    }
+    res = derive_resource_metrics(data, request_count=500)
+
+    assert res["cpu_total_cores"].values.tolist() == [0.5] * 4
+    assert res["memory_usage_rate"].values.tolist() == [0, 50, 0, 150]
+    assert "network_rx_rate" not in res
+    # 2 CPU seconds for 500 requests
+    assert res["cpu_seconds_per_1k_requests"].values[0] == pytest.approx(4)
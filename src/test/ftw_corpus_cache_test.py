@@ -0,0 +1,153 @@
+"""
+Unit tests for the go-ftw corpus cache.
+These tests verify that only the files which changed are parsed again, and the parsed tests match the YAML files.
+"""
+import os
+import shutil
+import tempfile
+import pytest
+from src.model import FTWCorpusCache, LocustUtil
+from src.model.FTWCorpusCache import parse_in_parallel
+from src.model.FTWTestSchema import load_ftw_tests
+
+FTW_YAML = """
+meta:
+  author: test
+tests:
+  - test_title: {rule}-1
+    stages:
+      - stage:
+          input:
+            method: POST
+            headers:
+              Host: localhost
+            data: "a=1"
+          output:
+            status: 200
+      - stage:
+          input:
+            uri: /?b=2
+          output:
+            status: 403
+"""
+
+
+def write_test_file(corpus_dir: str, rule: str, subdir: str = "") -> str:
+    os.makedirs(os.path.join(corpus_dir, subdir), exist_ok=True)
+    file_path = os.path.join(corpus_dir, subdir, f"{rule}.yaml")
+    with open(file_path, "w") as f:
+        f.write(FTW_YAML.format(rule=rule))
+    return file_path
+
+
+@pytest.fixture
+def corpus():
+    """Create a corpus of go-ftw YAML files and an empty cache directory"""
+    root = tempfile.mkdtemp()
+    corpus_dir = os.path.join(root, "tests")
+    write_test_file(corpus_dir, "920100", "REQUEST-920")
+    write_test_file(corpus_dir, "942100", "REQUEST-942")
+    yield corpus_dir, os.path.join(root, "cache")
+    shutil.rmtree(root)
+
+
+class CountingParser:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, content):
+        self.calls += 1
+        return load_ftw_tests(content)
+
+
+def test_cache_parses_changed_files_only(corpus):
+    """Test that a warm load parses nothing, and a modified file is parsed again"""
+    corpus_dir, cache_dir = corpus
+    parser = CountingParser()
+
+    cold = FTWCorpusCache(cache_dir).load(corpus_dir, parser)
+    assert parser.calls == 2
+    assert [os.path.basename(path) for path in cold] == ["920100.yaml", "942100.yaml"]
+
+    warm = FTWCorpusCache(cache_dir).load(corpus_dir, parser)
+    assert parser.calls == 2
+    assert warm == cold
+
+    file_path = write_test_file(corpus_dir, "942100", "REQUEST-942")
+    with open(file_path, "a") as f:
+        f.write("# changed\n")
+    FTWCorpusCache(cache_dir).load(corpus_dir, parser)
+    assert parser.calls == 3
+
+
+def test_cache_reuses_known_content(corpus):
+    """Test that a touched file with the same content is not parsed again"""
+    corpus_dir, cache_dir = corpus
+    parser = CountingParser()
+    FTWCorpusCache(cache_dir).load(corpus_dir, parser)
+
+    file_path = os.path.join(corpus_dir, "REQUEST-920", "920100.yaml")
+    os.utime(file_path, ns=(0, 0))
+    res = FTWCorpusCache(cache_dir).load(corpus_dir, parser)
+
+    assert parser.calls == 2
+    assert res[file_path][0][0] == "920100-1"
+
+
+def test_cache_discards_invalid_file(corpus):
+    """Test that a corrupted cache file is discarded"""
+    corpus_dir, cache_dir = corpus
+    cache = FTWCorpusCache(cache_dir)
+    os.makedirs(cache_dir)
+    with open(cache.cache_path(corpus_dir), "wb") as f:
+        f.write(b"not a cache")
+
+    assert len(cache.load(corpus_dir)) == 2
+
+
+def test_parse_ftw_test_file_with_cache(corpus):
+    """Test that the test cases built from the cache match the YAML files, with the case limit per file"""
+    corpus_dir, cache_dir = corpus
+    util = LocustUtil()
+
+    tests = util._parse_ftw_test_file(corpus_dir, 1, FTWCorpusCache(cache_dir))
+    assert [test.test_title for test in tests] == ["920100-1", "942100-1"]
+    assert [len(test.stages) for test in tests] == [1, 1]
+    assert tests[0].stages[0].method == "POST"
+
+    tests = util._parse_ftw_test_file(corpus_dir, 10, FTWCorpusCache(cache_dir))
+    assert tests[0].stages[1].uri == "/?b=2"
+    assert tests[0].stages[1].method == "GET"
+    assert [vars(stage) for stage in tests[1].stages] == \
+        [vars(stage) for test in util.parse_go_ftw_yaml(os.path.join(corpus_dir, "REQUEST-942", "942100.yaml"))
+         for stage in test.stages]
+
+
+def test_parse_in_parallel_keeps_order():
+    """Test that the contents parsed by a pool of processes are merged in the input order"""
+    contents = [FTW_YAML.format(rule=f"9{i:05d}").encode() for i in range(40)]
+
+    res = parse_in_parallel(contents, processes=2)
+
+    assert [tests for tests, _ in res] == [load_ftw_tests(content) for content in contents]
+    assert all(seconds >= 0 for _, seconds in res)
+
+
+def test_parse_timings_are_cached(corpus):
+    """Test that the parse time of every file is reported, also for the cached files"""
+    corpus_dir, cache_dir = corpus
+    cold = FTWCorpusCache(cache_dir)
+    cold.load(corpus_dir)
+    warm = FTWCorpusCache(cache_dir)
+    warm.load(corpus_dir)
+
+    assert len(warm.parse_timings) == 2
+    assert warm.parse_timings == cold.parse_timings
+
+
+def test_parse_ftw_test_file_total_case_limit(corpus):
+    """Test that the total case limit applies across the files, in sorted order"""
+    corpus_dir, cache_dir = corpus
+    tests = LocustUtil()._parse_ftw_test_file(corpus_dir, 10, FTWCorpusCache(cache_dir), total_case_limit=3)
+
+    assert [(test.test_title, len(test.stages)) for test in tests] == [("920100-1", 2), ("942100-1", 1)]
@@ -0,0 +1,58 @@
+"""
+Unit tests for go-ftw.
+These tests verify that go-ftw sends the tests to the WAF endpoint of the run (e.g., a block of a paired collect).
+"""
+import asyncio
+import os
+import tempfile
+import pytest
+import yaml
+from src.model import CollectCommandArg, FTWUtil
+
+
+class FakeFTWUtil(FTWUtil):
+    """Records the commands instead of running go-ftw"""
+    spin_up_time = 0
+
+    def __init__(self):
+        self.commands = []
+
+    async def _run_command(self, command, stdout=asyncio.subprocess.DEVNULL):
+        self.commands.append(command)
+        return 0
+
+
+@pytest.fixture
+def workspace(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.chdir(tmp)
+        with open(".ftw.yaml", "w") as f:
+            f.write("logfile: ./tests/logs/modsec2-apache/error.log\nlogmarkerheadername: X-CRS-TEST\ntestoverride:\n")
+        yield tmp
+
+
+def test_ftw_is_sent_to_the_waf_endpoint(workspace):
+    """Test that the config of the run overrides the destination of the tests, and keeps the rest of .ftw.yaml"""
+    util = FakeFTWUtil()
+    util.save_output = False
+    args = CollectCommandArg("ftw", ["ftw"], None, None, None, None, None, None)
+    args = args.variant_args("block-0", "http://127.0.0.1:8081", args.rules_dir)
+
+    asyncio.run(util.run(args, asyncio.Event()))
+
+    config_path = os.path.join(args.tmp_dir, "ftw.yaml")
+    assert util.commands == [f'go-ftw run --config "{config_path}" -d "{args.test_cases_dir}" -o json']
+    with open(config_path) as f:
+        config = yaml.safe_load(f)
+    assert config["logmarkerheadername"] == "X-CRS-TEST"
+    assert config["testoverride"]["input"] == {"dest_addr": "127.0.0.1", "port": 8081, "protocol": "http"}
+
+
+def test_ftw_default_port(workspace):
+    """Test that the port defaults to the port of the scheme, without a go-ftw config"""
+    os.remove(".ftw.yaml")
+    args = CollectCommandArg("ftw", ["ftw"], None, None, "https://waf.example", None, None, None)
+
+    with open(FTWUtil().write_config(args)) as f:
+        assert yaml.safe_load(f) == {"testoverride": {"input": {"dest_addr": "waf.example", "port": 443,
+                                                                "protocol": "https"}}}
@@ -0,0 +1,87 @@
+"""
+Unit tests for the worst-case corpus generator.
+These tests verify that the go-ftw stages are mutated within their fields, the search finds variants costlier
+than the seeds, and the corpus is replayed by the load generators with --request-table.
+"""
+import os
+import random
+import re
+import shutil
+from src.collect import main
+from src.model import FuzzUtil, LocustUtil, CollectCommandArg
+from src.model.FuzzUtil import mutate_stage
+from src.report import get_summary_command_arg
+from src.utils import read_request_table
+from conftest import write_test
+
+RULE_FILES = {"REQUEST-942-APPLICATION-ATTACK-SQLI.conf": 'SecRule ARGS "@rx (\\w+)\\d" "id:942100,phase:2,block"\n'
+                                                         'SecRule ARGS "@rx (unbalanced" "id:942200,phase:2,block"\n'}
+
+FTW_TESTS = [("942100.yaml", "942100-1", {"uri": "/?q=abc1", "headers": {"Host": "localhost"}})]
+
+
+def test_mutate_stage():
+    """Test that a mutation changes a single field, and keeps the path and the routing headers"""
+    stage = {"method": "GET", "uri": "/a?q=union", "data": "x=1", "headers": {"Host": "localhost", "User-Agent": "u"}}
+    compiled = [re.compile(r"union\s+select")]
+    rng = random.Random(0)
+
+    for _ in range(200):
+        variant = mutate_stage(stage, compiled, rng)
+        changed = [key for key in stage if variant[key] != stage[key]]
+        assert len(changed) <= 1
+        assert variant["uri"].startswith("/a?") and variant["method"] == "GET"
+        assert variant["headers"]["Host"] == "localhost"
+        assert " " not in variant["uri"] and "\n" not in variant["headers"]["User-Agent"]
+    assert stage["uri"] == "/a?q=union"
+
+
+def test_fuzz_without_waf(rules_workspace, monkeypatch, capsys):
+    """Test that the search finds variants costlier than the seed, and writes them as a request table"""
+    monkeypatch.setattr(FuzzUtil, "processes", 2)
+    monkeypatch.setattr(FuzzUtil, "repeat", 2)
+    main(["--test-name", "fuzz", "--utils", "fuzz", "--rules-dir", "rules", "--test-cases-dir", "tests",
+          "--block-duration", "2"])
+
+    data = FuzzUtil().parse_data("data/fuzz/fuzz_cost.csv")
+    # 942200 has no test, it is mutated from the stages of its family, but its pattern does not compile
+    assert data["worst_cost"].keys.tolist() == ["942100"]
+    assert data["amplification"].values[0] > 1
+    assert data["worst_cost"].labels_of(0) == ["942100", "942"]
+
+    requests = read_request_table("data/fuzz/fuzz_requests.bin")
+    assert [request.name for request in requests] == ["942100-1-fuzz0", "942100-1-fuzz1", "942100-1-fuzz2"]
+    assert all(request.headers["X-CRS-TEST"] == request.name for request in requests)
+
+    shutil.copytree(os.path.join(os.path.dirname(__file__), "../../config"), "config")
+    FuzzUtil().text_report(get_summary_command_arg(["--test-name", "fuzz", "--utils", "fuzz",
+                                                    "--threshold-conf", "config"]))
+    out = capsys.readouterr().out
+    assert "Most amplified 1 of 1 rules" in out and "worst_cost_le_10000us" in out
+
+    # the corpus is replayed by the load generators instead of the test cases
+    args = CollectCommandArg("replay", ["locust"], None, None, None, None, None, "tests",
+                             request_table="data/fuzz/fuzz_requests.bin")
+    assert LocustUtil()._create_request_table(args, "replay.bin") == 3
+    assert read_request_table("replay.bin") == requests
+
+
+def test_fuzz_seed_over_max_size(rules_workspace, monkeypatch, capsys):
+    """Test that a rule whose seeds are over max_size has the seed cost as its worst cost, and is reported"""
+    monkeypatch.setattr(FuzzUtil, "processes", 1)
+    monkeypatch.setattr(FuzzUtil, "repeat", 1)
+    write_test("tests/942100.yaml", "942100-1", {"uri": "/", "data": "q=" + "a" * 5000,
+                                                 "headers": {"Host": "localhost"}})
+    main(["--test-name", "fuzz", "--utils", "fuzz", "--rules-dir", "rules", "--test-cases-dir", "tests",
+          "--block-duration", "0.5"])
+
+    data = FuzzUtil().parse_data("data/fuzz/fuzz_cost.csv")
+    assert data["worst_cost"].values.tolist() == data["seed_cost"].values.tolist()
+    assert data["amplification"].values.tolist() == [1]
+    assert read_request_table("data/fuzz/fuzz_requests.bin") == []
+
+    # a row without cost (e.g., written before the seed cost was kept) is skipped
+    with open("data/fuzz/fuzz_cost.csv", "a") as f:
+        f.write("942300,,,0,3,\n")
+    FuzzUtil().text_report(get_summary_command_arg(["--test-name", "fuzz", "--utils", "fuzz"]))
+    assert "Most amplified 1 of 1 rules" in capsys.readouterr().out
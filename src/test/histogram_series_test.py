@@ -0,0 +1,148 @@
+"""
+Unit tests for the histogram series.
+These tests verify that the latency histograms are stored and merged losslessly, and that
+thresholds compare them by any quantile or by their whole distribution.
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+import pytest
+from src.model import HistogramSeries, MetricSeries, Threshold
+from src.utils import LatencyHistogram
+
+
+def create_histogram(values: np.ndarray) -> LatencyHistogram:
+    histogram = LatencyHistogram()
+    histogram.record(values)
+    return histogram
+
+
+def create_series(shifts: dict[str, float], seed: int = 0, size: int = 5000) -> HistogramSeries:
+    """Create a histogram per request name, with latency drawn from a log-normal distribution"""
+    rng = np.random.default_rng(seed)
+    names = list(shifts)
+    histograms = [create_histogram(rng.lognormal(8 + shifts[name], 1, size).astype(np.int64)) for name in names]
+    return HistogramSeries(names, histograms, [[name.split("-")[0]] for name in names])
+
+
+def create_threshold(**kwargs) -> Threshold:
+    conf = {
+        "id": 1,
+        "threshold_name": "unit-test",
+        "threshold_desc": "unit test threshold",
+        "metric_name": "latency",
+        "comparison_unit": "p99.9",
+        "comparison_method": "ratioGe",
+        "comparison_object": "before",
+        "threshold": 1.5,
+        "include_labels": None,
+        "exclude_labels": None
+    }
+    conf.update(kwargs)
+    return Threshold(**conf)
+
+
+def test_histogram_series_statistics():
+    """Test that the statistics of all the rows match the histogram of each row"""
+    series = HistogramSeries(["a", "empty", "b"], [
+        create_histogram(np.arange(1, 10001)), LatencyHistogram(), create_histogram(np.full(7, 123456))])
+
+    assert series.totals().tolist() == [10000, 0, 7]
+    for q in [0.5, 0.999, 0.9999]:
+        expected = [series.histogram(row).quantile(q) for row in range(3)]
+        assert series.quantiles(q) == pytest.approx(expected, nan_ok=True)
+    assert series.means() == pytest.approx([series.histogram(row).mean() for row in range(3)], nan_ok=True)
+
+
+def test_histogram_series_save_and_merge():
+    """Test that a saved series is loaded as is, and merging two runs equals recording both"""
+    rng = np.random.default_rng(1)
+    first, second = rng.lognormal(8, 1, 3000).astype(np.int64), rng.lognormal(9, 1, 3000).astype(np.int64)
+    series = HistogramSeries(["920100-1-0", "942100-1-0"], [create_histogram(first), create_histogram(second)],
+                             [["920100"], ["942100"]])
+
+    root = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(root, "latency.npz")
+        series.save(file_path)
+        loaded = HistogramSeries.load(file_path)
+    finally:
+        shutil.rmtree(root)
+
+    assert loaded.keys.tolist() == series.keys.tolist()
+    assert loaded.labels_of(1) == ["942100"]
+    assert (loaded.histogram(0).counts == series.histogram(0).counts).all()
+
+    other = HistogramSeries(["942100-1-0", "949110-1-0"], [create_histogram(first), create_histogram(second)])
+    merged = series.merge(other)
+    assert merged.keys.tolist() == ["920100-1-0", "942100-1-0", "949110-1-0"]
+    assert (merged.histogram(1).counts == create_histogram(np.concatenate((second, first))).counts).all()
+
+
+def test_histogram_series_rollup():
+    """Test that the histograms are merged by rule id"""
+    series = create_series({"920100-1-0": 0, "920100-2-0": 1, "942100-1-0": 0})
+    by_rule = series.rollup(lambda name: name.split("-")[0])
+
+    assert by_rule.keys.tolist() == ["920100", "942100"]
+    assert by_rule.totals().tolist() == [10000, 5000]
+    expected = series.histogram(0).merge(series.histogram(1))
+    assert (by_rule.histogram(0).counts == expected.counts).all()
+    assert by_rule.label_mask(["942100"]).tolist() == [False, True]
+
+
+def test_histogram_series_ks_distances():
+    """Test that the KS distance matches the distance of the dense CDFs"""
+    before = create_series({"a": 0, "b": 0, "c": 0}, seed=2)
+    after = create_series({"a": 0, "b": 0.3, "c": 1}, seed=3)
+
+    expected = []
+    for row in range(3):
+        left, right = before.histogram(row).counts, after.histogram(row).counts
+        expected.append(np.abs(np.cumsum(left) / left.sum() - np.cumsum(right) / right.sum()).max())
+
+    distances = before.ks_distances(np.arange(3), after, np.arange(3))
+    assert distances == pytest.approx(expected)
+    assert distances[0] < distances[1] < distances[2]
+
+
+def test_threshold_histogram_quantile_and_distribution():
+    """Test that histograms are compared key by key, by a quantile or by their distribution"""
+    before = create_series({"920100-1-0": 0, "942100-1-0": 0, "949110-1-0": 0}, seed=4)
+    after = create_series({"920100-1-0": 0, "942100-1-0": 1, "913100-1-0": 0}, seed=5)
+
+    result = create_threshold().evaluate(before, after)
+    assert not result.passed
+    assert result.failed_keys.tolist() == ["942100-1-0"]
+    assert result.after_values[0] > 2
+
+    assert create_threshold(exclude_labels=["942100"]).evaluate(before, after).passed
+
+    result = create_threshold(comparison_unit="distribution", comparison_method="le",
+                              comparison_object="threshold", threshold=0.1).evaluate(before, after)
+    assert result.failed_keys.tolist() == ["942100-1-0"]
+
+    result = create_threshold(comparison_unit="each").evaluate(before, after)
+    assert result.error is not None
+
+
+def test_threshold_quantile_unit_on_raw_values():
+    """Test that a quantile and the distribution are computed from the raw values of a metric"""
+    rng = np.random.default_rng(6)
+    before = rng.normal(10, 1, 2000)
+    after = np.concatenate((before[:1990], np.full(10, 100.0)))
+
+    def to_series(values: np.ndarray) -> MetricSeries:
+        return MetricSeries(np.arange(len(values)).astype(str), values)
+
+    assert create_threshold(comparison_unit="p99").evaluate(to_series(before), to_series(after)).passed
+    assert not create_threshold(comparison_unit="p99.9").evaluate(to_series(before), to_series(after)).passed
+
+    result = create_threshold(comparison_unit="distribution", comparison_method="le",
+                              comparison_object="threshold", threshold=0.01).evaluate(to_series(before),
+                                                                                       to_series(after))
+    assert result.passed
+
+    result = create_threshold(comparison_unit="distribution").evaluate(to_series(before), to_series(after))
+    assert result.error is not None
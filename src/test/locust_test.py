@@ -0,0 +1,181 @@
+"""
+Unit tests for the locust util.
+These tests verify that locust runs as a master and its workers, local or remote, using stand-ins of
+locust, ssh and scp which record how they are called.
+"""
+import glob
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import pytest
+from src.model import CollectCommandArg, LocustUtil, ReportCommandArg
+from src.type import ReportFormat
+
+FTW_YAML = """
+tests:
+  - test_title: 920100-1
+    stages:
+      - stage:
+          input:
+            uri: /
+"""
+
+# records its role and arguments, a master waits for the expected workers, then writes the stats
+FAKE_LOCUST = """
+import json, os, sys, time
+args = sys.argv[1:]
+log_dir = os.environ["FAKE_LOCUST_DIR"]
+role = "master" if "--master" in args else "worker" if "--worker" in args else "standalone"
+with open(os.path.join(log_dir, f"{role}-{os.getpid()}.json"), "w") as f:
+    json.dump({"args": args, "table": os.environ["CRS_REQUEST_TABLE"]}, f)
+
+if role == "worker":
+    while not os.path.exists(os.path.join(log_dir, "done")):
+        time.sleep(0.01)
+    sys.exit(0)
+
+if role == "master":
+    expected = int(args[args.index("--expect-workers") + 1])
+    while len([name for name in os.listdir(log_dir) if name.startswith("worker-")]) < expected:
+        time.sleep(0.01)
+
+prefix = next(arg for arg in args if arg.startswith("--csv="))[len("--csv="):]
+with open(prefix + "_stats.csv", "w") as f:
+    f.write("Type,Name,Request Count\\n")
+    f.write("GET,920100-1," + ",".join(["4"] + ["1"] * 19) + "\\n")
+    f.write("POST,942100-2," + ",".join(["3"] + ["2"] * 19) + "\\n")
+    f.write(",Aggregated," + ",".join(["7"] + ["1"] * 19) + "\\n")
+open(os.path.join(log_dir, "done"), "w").close()
+"""
+
+# runs the remote command on this host, as if the connection came from 127.0.0.1
+FAKE_SSH = """#!/bin/sh
+shift 3
+SSH_CLIENT="127.0.0.1 50000 22" exec sh -c "$1"
+"""
+
+FAKE_SCP = """#!/bin/sh
+shift 3
+dst="${2#*:}"
+[ "$1" = "$dst" ] || cp "$1" "$dst"
+"""
+
+
+def write_executable(file_path: str, content: str):
+    with open(file_path, "w") as f:
+        f.write(content)
+    os.chmod(file_path, os.stat(file_path).st_mode | stat.S_IXUSR)
+
+
+@pytest.fixture
+def fake_env(monkeypatch):
+    """Create a corpus, and stand-ins of locust, ssh and scp"""
+    root = tempfile.mkdtemp()
+    monkeypatch.chdir(root)
+
+    corpus_dir, bin_dir, log_dir = [os.path.join(root, name) for name in ("tests", "bin", "log")]
+    for path in (corpus_dir, bin_dir, log_dir):
+        os.makedirs(path)
+    with open(os.path.join(corpus_dir, "920100.yaml"), "w") as f:
+        f.write(FTW_YAML)
+
+    write_executable(os.path.join(bin_dir, "fake_locust.py"), FAKE_LOCUST)
+    write_executable(os.path.join(bin_dir, "ssh"), FAKE_SSH)
+    write_executable(os.path.join(bin_dir, "scp"), FAKE_SCP)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_LOCUST_DIR", log_dir)
+
+    util = LocustUtil()
+    util.locust_bin = f"{sys.executable} {os.path.join(bin_dir, 'fake_locust.py')}"
+
+    yield util, corpus_dir, log_dir
+    shutil.rmtree(root)
+
+
+def get_args(corpus_dir: str, workers: int, worker_endpoints=None) -> CollectCommandArg:
+    args = CollectCommandArg("locust-test", ["locust"], None, None, None, None, None, corpus_dir,
+                             workers=workers, worker_endpoints=worker_endpoints)
+    for path in (args.raw_output, args.tmp_dir):
+        os.makedirs(path)
+    return args
+
+
+def read_logs(log_dir: str, role: str) -> list[dict]:
+    res = []
+    for file_path in glob.glob(os.path.join(log_dir, f"{role}-*.json")):
+        with open(file_path) as f:
+            res.append(json.load(f))
+    return res
+
+
+def test_locust_distributed_with_remote_worker(fake_env):
+    """Test that the master expects the local and the remote workers, and writes the merged stats"""
+    util, corpus_dir, log_dir = fake_env
+    args = get_args(corpus_dir, 2, ["ssh://tester@127.0.0.1:2222"])
+
+    util.collect(args)
+
+    master, = read_logs(log_dir, "master")
+    assert master["args"][master["args"].index("--expect-workers") + 1] == "3"
+    assert master["args"][master["args"].index("-u") + 1] == "300"
+
+    workers = read_logs(log_dir, "worker")
+    assert len(workers) == 3
+    assert all(worker["table"] == os.path.join(args.tmp_dir, "requests.bin") for worker in workers)
+    assert all(worker["args"][worker["args"].index("--master-host") + 1] == "127.0.0.1" for worker in workers)
+
+    assert util.get_request_count(args.raw_output) == 7
+
+
+def test_locust_standalone(fake_env):
+    """Test that locust runs standalone without workers"""
+    util, corpus_dir, log_dir = fake_env
+    args = get_args(corpus_dir, 0)
+
+    util.collect(args)
+
+    assert len(read_logs(log_dir, "standalone")) == 1
+    assert read_logs(log_dir, "worker") == []
+    assert util.get_request_count(args.raw_output) == 7
+
+
+def test_locust_stats_per_test_id(fake_env):
+    """Test that the stats are keyed by go-ftw test id, and labelled with the rule id and rule family"""
+    util, corpus_dir, _ = fake_env
+    args = get_args(corpus_dir, 0)
+
+    util.collect(args)
+    stats = util.parse_request_stats(args.raw_output)
+
+    assert stats["req_cnt"].keys.tolist() == ["920100-1", "942100-2"]
+    assert stats["req_cnt"].values.tolist() == [4, 3]
+    assert stats["p99"].select(stats["p99"].label_mask(["942"])).values.tolist() == [2]
+    assert stats["p99"].labels_of(0) == ["920100-1", "920100", "920"]
+
+
+def test_locust_invalid_worker_endpoint():
+    """Test that an unknown worker endpoint is rejected"""
+    with pytest.raises(ValueError):
+        LocustUtil()._worker_command("http://127.0.0.1:5557")
+
+
+def test_locust_text_report_per_test_id(capsys):
+    """Test that the text report has a row per go-ftw test id, the requests with the same method included"""
+    with tempfile.TemporaryDirectory() as tmp:
+        args = ReportCommandArg("locust", ["locust"], tmp, tmp, None, ReportFormat.TEXT)
+        os.makedirs(args.raw_output)
+        with open(os.path.join(args.raw_output, LocustUtil.raw_filename), "w") as f:
+            f.write("Type,Name,Request Count\n")
+            f.write("GET,920100-1," + ",".join(["4"] + ["1"] * 19) + "\n")
+            f.write("GET,942100-2," + ",".join(["3"] + ["2"] * 19) + "\n")
+            f.write(",Aggregated," + ",".join(["7"] + ["1"] * 19) + "\n")
+
+        util = LocustUtil()
+        util.text_report(args)
+        assert util.get_request_count(args.raw_output) == 7
+
+    output = capsys.readouterr().out
+    assert "920100-1" in output and "942100-2" in output and "GET" not in output
@@ -0,0 +1,122 @@
+"""
+Unit tests for the WAF matrix.
+These tests verify that the WAF targets are parsed, the same load is sent to every WAF in parallel
+with the CPUs shared out between them, and the report compares the WAFs.
+"""
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import yaml
+from src.collect import get_test_command_arg
+from src.model import MatrixCollect, OpenLoopUtil, WafTarget, parse_waf_targets
+from src.report import main as report_main
+from src.type import UtilRole
+from conftest import FakeUtil
+
+
+class _DummyWAFHandler(BaseHTTPRequestHandler):
+    """a WAF stand-in, the WAF on the port in `slow_ports` takes 20 ms per request"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    slow_ports: set = set()
+
+    def do_GET(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.server.server_address[1] in _DummyWAFHandler.slow_ports:
+            time.sleep(0.02)
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *_):
+        pass
+
+
+class FakeSampler(FakeUtil):
+    """Records the containers it samples"""
+
+    async def run(self, args, stop):
+        await super().run(args, stop)
+        self.runs.append(self.waf_container_names)
+
+
+class FakeMatrixCollect(MatrixCollect):
+    """Runs without docker, the CPUs of each WAF are recorded"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cpus = {}
+
+    def isolate(self, name, cpuset):
+        self.cpus[name] = cpuset
+
+
+@pytest.fixture
+def wafs(monkeypatch):
+    servers = [ThreadingHTTPServer(("127.0.0.1", 0), _DummyWAFHandler) for _ in range(2)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(_DummyWAFHandler, "slow_ports", {servers[1].server_address[1]})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.chdir(tmp)
+        os.makedirs("tests")
+        with open("tests/920100.yaml", "w") as f:
+            yaml.safe_dump({"tests": [{"test_title": "920100-1", "stages": [{"stage": {"input": {"uri": "/"}}}]}]}, f)
+        yield [f"http://127.0.0.1:{server.server_address[1]}" for server in servers]
+
+    for server in servers:
+        server.shutdown()
+
+
+def test_parse_waf_targets():
+    """Test that the targets are parsed in order, and the default target is the modsec2-apache container"""
+    assert parse_waf_targets("modsec2-apache=http://localhost:80, coraza-caddy=http://localhost:8083") == [
+        WafTarget("modsec2-apache", "http://localhost:80"), WafTarget("coraza-caddy", "http://localhost:8083")]
+    for value in ["modsec2-apache", "a=localhost:80", "=http://localhost", "a=http://x,a=http://y"]:
+        with pytest.raises(ValueError):
+            parse_waf_targets(value)
+
+    args = get_test_command_arg(["--test-name", "matrix", "--waf-targets", "a=http://localhost:81,b=http://localhost:82"])
+    assert args.matrix and args.modsec_version == "a" and args.waf_endpoint == "http://localhost:81"
+
+    args = get_test_command_arg(["--test-name", "single", "--waf-endpoint", "http://localhost:8080"])
+    assert not args.matrix
+    assert args.waf_targets == [WafTarget("modsec2-apache", "http://localhost:8080")]
+
+
+def test_matrix_against_dummy_wafs(wafs, monkeypatch, capsys):
+    """Test that the same load is sent to both WAFs in parallel, and the slower WAF is reported slower"""
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+    monkeypatch.setattr(OpenLoopUtil, "rate", 50)
+    monkeypatch.setattr(OpenLoopUtil, "duration", 1)
+    runs = []
+    args = get_test_command_arg(["--test-name", "matrix", "--utils", "openLoop", "--test-cases-dir", "tests",
+                                 "--waf-targets", f"fast={wafs[0]},slow={wafs[1]}"])
+    os.makedirs(args.raw_output)
+    matrix = FakeMatrixCollect(lambda: [OpenLoopUtil(), FakeSampler(runs, UtilRole.SAMPLER)])
+
+    start = time.monotonic()
+    assert asyncio.run(matrix.run(args))
+    # the WAFs are loaded in parallel, not one after the other
+    assert time.monotonic() - start < 1.9
+
+    # 8 CPUs, the load generators keep 1 CPU per WAF
+    assert matrix.cpus == {"fast": "0-2", "slow": "3-5"}
+    assert runs == [["fast", "slow"]]
+    assert os.path.exists("data/matrix/fast/openloop_stats.csv")
+    assert os.path.exists("data/matrix/slow/openloop_stats.csv")
+
+    report_main(["--test-name", "matrix", "--utils", "openLoop"])
+    out = capsys.readouterr().out
+    assert "Comparison of 2 WAFs (OpenLoopUtil)" in out
+
+    rows = {line.split()[0]: line.split()[1:] for line in out.splitlines() if line.split()[:1] in (["fast"], ["slow"])}
+    # columns: req/sec, vs. fast, avg_resp_time, vs. fast
+    assert float(rows["fast"][1]) == 0
+    assert float(rows["slow"][2]) > float(rows["fast"][2]) + 10
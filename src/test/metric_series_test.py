@@ -0,0 +1,49 @@
+"""
+Unit tests for the MetricSeries class.
+These tests verify the columnar storage, label encoding and the ParsedDataItem compatibility view.
+"""
+import numpy as np
+from src.model import MetricSeries, ParsedDataItem
+
+
+def test_metric_series_from_items_round_trip():
+    """Test that items converted to a series can be iterated back"""
+    items = [
+        ParsedDataItem("920170-1", 0.1, ["920170-1", "920170"]),
+        ParsedDataItem("920170-2", 0.2, ["920170-2", "920170"]),
+        ParsedDataItem("942100-1", 0.3, ["942100-1", "942100"]),
+    ]
+    series = MetricSeries.from_items(items)
+
+    assert len(series) == 3
+    assert series.values.dtype == np.float64
+    # the shared family label is stored once
+    assert series.label_vocab.count("920170") == 1
+
+    for original, item in zip(items, series):
+        assert item.key == original.key
+        assert item.value == original.value
+        assert item.labels == original.labels
+
+    assert series[-1].key == "942100-1"
+
+
+def test_metric_series_label_mask_and_select():
+    """Test label filtering on the dictionary-encoded labels"""
+    series = MetricSeries(["a", "b", "c", "d"], [1, 2, 3, 4], [["x"], [], ["y", "x"], ["z"]])
+
+    mask = series.label_mask(["x", "unknown"])
+    assert mask.tolist() == [True, False, True, False]
+
+    selected = series.select(mask)
+    assert selected.values.tolist() == [1, 3]
+    assert selected[1].labels == {"x", "y"}
+    assert series[1:].keys.tolist() == ["b", "c", "d"]
+
+
+def test_metric_series_without_labels():
+    """Test a series without labels, e.g., cAdvisor samples"""
+    series = MetricSeries(["t1", "t2"], [10, 20])
+
+    assert series.label_mask(["x"]).tolist() == [False, False]
+    assert series[0].labels == set()
@@ -0,0 +1,153 @@
+"""
+Unit tests for the open-loop load generator, its http client and the latency histogram.
+These tests verify that requests are sent on a fixed schedule even when the WAF slows down,
+and that the latency is measured from the intended send time.
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pytest
+from src.model import OpenLoopUtil
+from src.model.OpenLoopUtil import RequestStats, write_stats_csv
+from src.utils import AsyncHTTPClient, LatencyHistogram, RequestTable, TableRequest, write_request_table
+
+
+class _SlowWAFHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay: float = 0.0
+    # Host headers of each request
+    hosts: list
+
+    def do_GET(self):
+        # the body is read, so the next request on the connection is parsed correctly
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        _SlowWAFHandler.hosts.append(self.headers.get_all("Host"))
+        time.sleep(_SlowWAFHandler.delay)
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    do_POST = do_GET
+
+    def log_message(self, *_):
+        pass
+
+
+@pytest.fixture
+def slow_waf():
+    """Start a WAF stand-in which takes `delay` seconds per request"""
+    _SlowWAFHandler.delay = 0.0
+    _SlowWAFHandler.hosts = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowWAFHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def table():
+    root = tempfile.mkdtemp()
+    file_path = os.path.join(root, "requests.bin")
+    write_request_table(file_path, [
+        TableRequest("920100-1-0", "GET", "/", {"Host": "localhost", "Content-Length": "99"}, b""),
+        TableRequest("942100-1-0", "POST", "/?q=1", {}, b"a=1"),
+    ])
+    table = RequestTable(file_path)
+    yield table
+    table.close()
+    shutil.rmtree(root)
+
+
+def test_latency_histogram_quantiles():
+    """Test that quantiles are within the precision of the histogram, and merging is lossless"""
+    values = np.random.default_rng(0).lognormal(8, 1, 20000).astype(np.int64)
+    histogram, left, right = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    histogram.record(values)
+    left.record(values[:5000])
+    for value in values[5000:6000]:
+        right.record(int(value))
+    right.record(values[6000:])
+
+    qs = [0.5, 0.9, 0.99, 0.999, 0.9999]
+    assert histogram.quantiles(qs) == pytest.approx(np.quantile(values, qs, method="inverted_cdf"), rel=1e-3)
+    assert histogram.mean() == pytest.approx(values.mean(), rel=1e-3)
+    assert histogram.max() == pytest.approx(values.max(), rel=1e-3)
+    assert (left.merge(right).counts == histogram.counts).all()
+    assert np.isnan(LatencyHistogram().quantile(0.5))
+
+
+def test_latency_histogram_is_sparse():
+    """Test that only the non-empty buckets are stored, and the dense counts are built from them"""
+    histogram = LatencyHistogram()
+    for value in [1200, 1250, 1200, 90000]:
+        histogram.record(value)
+
+    indices, counts = histogram.to_sparse()
+    assert len(indices) == 3 and counts.tolist() == [2, 1, 1]
+    assert histogram.counts.shape == (histogram.bucket_count,) and histogram.counts.sum() == 4
+    assert (LatencyHistogram.from_sparse(indices, counts).counts == histogram.counts).all()
+    assert (histogram.min(), histogram.total) == (1200, 4)
+
+
+def test_open_loop_keeps_the_arrival_rate(slow_waf, table):
+    """Test that the arrival rate does not drop when the WAF slows down, and the queueing time is measured"""
+    _SlowWAFHandler.delay = 0.05
+    util = OpenLoopUtil()
+    util.rate, util.duration, util.pool_size = 100, 0.5, 1
+
+    start = time.monotonic()
+    stats = asyncio.run(util.send_requests(table, slow_waf))
+
+    # requests are sent on schedule, but a single connection serves them one by one
+    assert sum(item.count for item in stats.values()) == 50
+    assert sum(item.failures for item in stats.values()) == 0
+    assert time.monotonic() - start >= 50 * 0.05 * 0.9
+
+    latency = LatencyHistogram()
+    for item in stats.values():
+        latency.merge(item.histogram)
+    # the last request waits for the 49 requests before it
+    assert latency.max() / 1e6 >= 49 * 0.05 - 0.5
+    assert latency.quantile(0.5) / 1e6 > 0.5
+
+
+def test_open_loop_stats_fit_locust_report(slow_waf, table):
+    """Test that the stats are parsed as locust stats"""
+    util = OpenLoopUtil()
+    util.rate, util.duration = 200, 0.25
+    stats = asyncio.run(util.send_requests(table, slow_waf))
+
+    raw_output = tempfile.mkdtemp()
+    try:
+        write_stats_csv(os.path.join(raw_output, util.raw_filename), stats, util.duration)
+        assert util.get_request_count(raw_output) == 50
+    finally:
+        shutil.rmtree(raw_output)
+
+
+def test_request_stats_histogram():
+    """Test that the latency is recorded in microseconds"""
+    stats = RequestStats()
+    stats.record(0.0015, 10, False)
+    stats.record(0.0025, 0, True)
+
+    assert (stats.count, stats.failures, stats.content_size) == (2, 1, 10)
+    assert stats.histogram.quantiles([0.5, 1.0]) == pytest.approx([1500, 2500], rel=1e-3)
+
+
+def test_http_client_headers_are_case_insensitive(slow_waf):
+    """Test that a header of the caller replaces the default header of any case, instead of being sent twice"""
+    async def send():
+        async with AsyncHTTPClient(pool_size=1) as client:
+            await client.request("GET", slow_waf + "/", {"host": "example.org"})
+            await client.request("GET", slow_waf + "/")
+
+    asyncio.run(send())
+    assert _SlowWAFHandler.hosts == [["example.org"], [slow_waf[len("http://"):]]]
@@ -0,0 +1,135 @@
+"""
+Unit tests for the paired collect.
+These tests verify that the revisions of the rules are exported, and the blocks alternate between the WAFs.
+"""
+import asyncio
+import os
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+import pytest
+from src.collect import get_test_command_arg
+from src.model import CollectCommandArg, PairedCollect
+from src.type import State, UtilRole
+from src.utils import JsonlSpool, iter_jsonl
+from conftest import FakeUtil
+
+
+class BlockUtil(FakeUtil):
+    """Records the endpoint and the raw output of each run, a sampler samples its containers every 2 ms"""
+    raw_filename = "fake.jsonl"
+
+    async def run(self, args, stop):
+        if self.role == UtilRole.SAMPLER:
+            self.runs.append(("sampler", self.waf_container_names))
+            with JsonlSpool(os.path.join(args.raw_output, self.raw_filename)) as spool:
+                while not stop.is_set():
+                    for name in self.waf_container_names:
+                        spool.append({"timestamp": datetime.now(timezone.utc).isoformat(), "container": name,
+                                      "source": name})
+                    await asyncio.sleep(0.002)
+            return
+        self.runs.append((args.waf_endpoint, os.path.relpath(args.raw_output, "./data/paired")))
+        await asyncio.sleep(0.05)
+
+
+class FakePairedCollect(PairedCollect):
+    """Runs without docker, the rules of each WAF are recorded"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wafs = {}
+
+    def start_waf(self, args, state, rules_dir):
+        self.wafs[state] = sorted(os.listdir(rules_dir))
+        return f"{args.test_name}-{state.value}"
+
+    def stop_waf(self, name):
+        self.wafs[name] = "stopped"
+
+
+def git(repo: str, *args: str) -> str:
+    return subprocess.run(["git", "-C", repo, "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                          capture_output=True, text=True, check=True).stdout.strip()
+
+
+@pytest.fixture
+def rules_repo():
+    """A git repository with two revisions of the rules in a sub-directory"""
+    with tempfile.TemporaryDirectory() as repo:
+        git(repo, "init", "-q")
+        rules_dir = os.path.join(repo, "rules")
+        os.makedirs(rules_dir)
+
+        revisions = []
+        for name in ["REQUEST-920.conf", "REQUEST-942.conf"]:
+            with open(os.path.join(rules_dir, name), "w") as f:
+                f.write('SecRule ARGS "@rx a" "id:1"\n')
+            git(repo, "add", "-A")
+            git(repo, "commit", "-q", "-m", name)
+            revisions.append(git(repo, "rev-parse", "HEAD"))
+
+        yield rules_dir, revisions
+
+
+def test_paired_collect_args_parsing():
+    """Test that the revisions and the blocks are parsed"""
+    args = get_test_command_arg(["--test-name", "paired", "--before", "abc", "--after", "def", "--blocks", "2"])
+
+    assert args.paired
+    assert (args.before, args.after, args.blocks, args.block_duration) == ("abc", "def", 2, None)
+    assert not get_test_command_arg(["--test-name", "single", "--before", "abc"]).paired
+
+
+def test_paired_collect_alternates_blocks(rules_repo, monkeypatch):
+    """Test that the blocks alternate between the WAFs and store their data by state"""
+    rules_dir, (before, after) = rules_repo
+    runs = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.chdir(tmp)
+        args = CollectCommandArg("paired", ["ftw"], None, None, None, None, rules_dir, None,
+                                 before=before, after=after, blocks=2)
+        paired = FakePairedCollect(lambda: [BlockUtil(runs), BlockUtil(runs, UtilRole.SAMPLER)])
+        # the samples are split a few at a time
+        paired.split_batch_size = 3
+
+        assert asyncio.run(paired.run(args))
+
+        assert paired.wafs[State.BEFORE] == ["REQUEST-920.conf"]
+        assert paired.wafs[State.AFTER] == ["REQUEST-920.conf", "REQUEST-942.conf"]
+        assert paired.wafs["paired-before"] == paired.wafs["paired-after"] == "stopped"
+
+        loads = [run for run in runs if run[0] != "sampler"]
+        assert loads == [
+            ("http://localhost:8081", "before/block-0"),
+            ("http://localhost:8082", "after/block-0"),
+            ("http://localhost:8081", "before/block-1"),
+            ("http://localhost:8082", "after/block-1"),
+        ]
+        assert os.path.isdir("./data/paired/after/block-1")
+
+        # the samplers are started once for both WAFs, their samples are split into the blocks and labelled alike
+        assert [run for run in runs if run[0] == "sampler"] == [("sampler", ["paired-before", "paired-after"])]
+        assert not os.path.exists("./data/paired/fake.jsonl")
+        for state in ["before", "after"]:
+            for block in range(2):
+                samples = list(iter_jsonl(f"./data/paired/{state}/block-{block}/fake.jsonl"))
+                assert samples
+                assert {(sample["container"], sample["source"]) for sample in samples} == \
+                    {(args.modsec_version, f"paired-{state}")}
+
+
+def test_paired_collect_invalid_revision(rules_repo, monkeypatch):
+    """Test that an unknown revision is reported and no WAF is left running"""
+    rules_dir, (before, _) = rules_repo
+
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.chdir(tmp)
+        args = CollectCommandArg("paired", ["ftw"], None, None, None, None, rules_dir, None,
+                                 before=before, after="unknown", blocks=1)
+        paired = FakePairedCollect(lambda: [])
+
+        with pytest.raises(ValueError):
+            asyncio.run(paired.run(args))
+        assert paired.wafs["paired-before"] == "stopped"
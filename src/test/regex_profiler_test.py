@@ -0,0 +1,85 @@
+"""
+Unit tests for the regex profiler.
+These tests verify that the @rx patterns are extracted from the rules, and timed against the go-ftw payloads
+without a WAF.
+"""
+import os
+import shutil
+from src.collect import main
+from src.model import RegexProfilerUtil
+from src.model.RegexProfilerUtil import rx_patterns, payloads_of, _profile_rule
+from src.report import get_summary_command_arg
+from conftest import write_test
+
+RULES = (
+    '# SecRule ARGS "@rx commented" "id:920000"\n'
+    'SecRule REQUEST_HEADERS:Content-Length "!@rx ^\\d+$" \\\n'
+    '    "id:920160,phase:1,deny,t:none"\n'
+    'SecRule REQUEST_METHOD "^(?:GET|HEAD)$" "id:920170,phase:1,chain"\n'
+    '    SecRule REQUEST_HEADERS:Content-Length "!@rx ^0?$" "t:none"\n'
+    'SecRule ARGS "@pm union select" "id:942100,phase:2,block"\n'
+    'SecRule "ARGS|REQUEST_URI" "@rx (?:\\"|\')\\s*union(?:\\s+all)?\\s+select" "id:942190,phase:2,block"\n'
+    'SecRule ARGS "@rx (unbalanced" "id:942200,phase:2,block"\n'
+)
+
+RULE_FILES = {"REQUEST-920-PROTOCOL-ENFORCEMENT.conf": RULES}
+
+FTW_TESTS = [
+    ("920160.yaml", "920160-1", {"uri": "/", "headers": {"Content-Length": "abc"}}),
+    ("920170.yaml", "920170-1", {"method": "GET", "uri": "/?a=1", "data": "x=1"}),
+    ("942190.yaml", "942190-1", {"uri": "/?q=' union all select 1"}),
+]
+
+
+def test_rx_patterns():
+    """Test that the @rx (and implicit) patterns of each rule and its chained rules are extracted"""
+    patterns = rx_patterns({"rules.conf": RULES.encode()})
+
+    assert patterns == {
+        "920160": ["^\\d+$"],
+        "920170": ["^(?:GET|HEAD)$", "^0?$"],
+        "942190": ["(?:\"|')\\s*union(?:\\s+all)?\\s+select"],
+        "942200": ["(unbalanced"],
+    }
+    assert payloads_of({"uri": "/a", "data": "b=1", "headers": {"Host": "localhost"}}) == ["/a", "b=1", "localhost"]
+
+
+def test_pcre_syntax():
+    """Test that the PCRE syntax of the CRS patterns (POSIX classes, quoting, global flags) compiles as in PCRE"""
+    patterns = [r"^[[:alpha:]]+$", r"\Q.*\E", r"a(?i)b"]
+    rule_id, _, _, total, _, _, error = _profile_rule(("942100", patterns, ["abc", ".*", "aB"]), 1)
+    assert (rule_id, error) == ("942100", "") and total > 0
+
+
+def test_collect_without_waf(rules_workspace, monkeypatch, capsys):
+    """Test that the regex util collects without a WAF, and reports the cost and the errors of each rule"""
+    monkeypatch.setattr(RegexProfilerUtil, "processes", 2)
+    main(["--test-name", "regex", "--utils", "regex", "--rules-dir", "rules", "--test-cases-dir", "tests"])
+
+    data = RegexProfilerUtil().parse_data("data/regex/regex_cost.csv")
+    # 942200 has no test, it is matched with the payloads of its family, but its pattern does not compile
+    assert data["match_time"].keys.tolist() == ["920160", "920170", "942190"]
+    assert data["payloads"].values.tolist() == [2, 2, 1]
+    assert data["patterns"].values.tolist() == [1, 2, 1]
+    assert (data["max_match_time"].values >= data["match_time"].values).all()
+    assert data["match_time"].labels_of(2) == ["942190", "942"]
+    assert data["errors"].values.tolist() == ["942200"]
+
+    shutil.copytree(os.path.join(os.path.dirname(__file__), "../../config"), "config")
+    RegexProfilerUtil().text_report(get_summary_command_arg(["--test-name", "regex", "--utils", "regex",
+                                                             "--threshold-conf", "config"]))
+    out = capsys.readouterr().out
+    assert "Costliest 3 of 3 rules" in out and "942190" in out
+    assert "max_match_time_le_1000us" in out
+
+
+def test_profile_is_cancelled(rules_workspace, monkeypatch):
+    """Test that a catastrophic pattern is cancelled by the deadline, and no data is written"""
+    monkeypatch.setattr(RegexProfilerUtil, "processes", 1)
+    with open("rules/REQUEST-920-PROTOCOL-ENFORCEMENT.conf", "w") as f:
+        f.write('SecRule ARGS "@rx ^(a|a)*$" "id:920160"\n')
+    write_test("tests/920160.yaml", "920160-1", {"uri": "a" * 40 + "!"})
+    main(["--test-name", "slow", "--utils", "regex", "--rules-dir", "rules", "--test-cases-dir", "tests",
+          "--deadline", "1"])
+
+    assert not os.path.exists("data/slow/regex_cost.csv")
@@ -7,8 +7,9 @@ import json
 import os
 import tempfile
 import shutil
-from src.model import FTWUtil, ReportCommandArg
-from src.type import ReportFormat
+from src.model import FTWUtil, CAdvisorUtil, ReportCommandArg
+from src.type import ReportFormat, State
+from src.utils import JsonlSpool, iter_jsonl
 
 
 @pytest.fixture
@@ -102,3 +103,114 @@ def test_ftw_text_report_generates_output(ftw_test_data, capsys):
     assert "Run:" in captured.out
     assert "Success:" in captured.out
     assert "Failed:" in captured.out
+
+
+def test_cadvisor_util_parse_data(temp_data_dir):
+    """Test cAdvisor utility parses every metric into a series keyed by timestamp"""
+    stats = [
+        {
+            "timestamp": f"2023-07-01T00:00:0{i}Z",
+            "cpu": {"usage": {"total": 100 * i, "user": 60 * i, "system": 40 * i}},
+            "memory": {"usage": 1000 + i, "cache": 10 + i}
+        }
+        for i in range(3)
+    ]
+    file_path = os.path.join(temp_data_dir, "cAdvisor.json")
+    with open(file_path, 'w') as f:
+        json.dump(stats, f)
+
+    data = CAdvisorUtil().parse_data(file_path)
+
+    assert {"cpu_total", "cpu_user", "cpu_system", "memory_usage", "memory_cache"} <= set(data.keys())
+    assert data["cpu_total"].values.tolist() == [0, 100, 200]
+    assert data["memory_cache"][2].key == "2023-07-01T00:00:02Z"
+
+
+def test_cadvisor_spool_streams_deduplicated_samples(temp_data_dir):
+    """Test that polled samples are de-duplicated, appended and parsed back from JSON Lines"""
+    def sample(i: int) -> dict:
+        return {
+            "timestamp": f"2023-07-01T00:00:{i:02}Z",
+            "cpu": {"usage": {"total": i, "user": i, "system": i}},
+            "memory": {"usage": i, "cache": i}
+        }
+
+    file_path = os.path.join(temp_data_dir, "cAdvisor.jsonl")
+    with JsonlSpool(file_path, window=4) as spool:
+        # every poll re-sends the recent samples
+        for poll in [range(0, 3), range(1, 5), range(3, 6)]:
+            for i in poll:
+                spool.append(sample(i), key=sample(i)["timestamp"])
+            spool.flush()
+
+    assert spool.count == 6
+    assert len(list(iter_jsonl(file_path))) == 6
+
+    data = CAdvisorUtil().parse_data(file_path)
+    assert data["cpu_total"].values.tolist() == [0, 1, 2, 3, 4, 5]
+
+
+def write_ftw_block(data_dir: str, state: str, block: int, runtime: dict):
+    block_dir = os.path.join(data_dir, state, f"block-{block}")
+    os.makedirs(block_dir)
+    with open(os.path.join(block_dir, "ftw.json"), 'w') as f:
+        json.dump({"run": len(runtime), "success": list(runtime), "failed": [], "skipped": [],
+                   "runtime": runtime, "TotalTime": sum(runtime.values())}, f)
+
+
+def write_threshold_conf(conf_dir: str, filename: str, thresholds: list):
+    with open(os.path.join(conf_dir, filename), 'w') as f:
+        json.dump({"util_name": "test", "threshold_version": "0.0.1", "thresholds": thresholds}, f)
+
+
+def test_ftw_parse_states_merges_blocks(temp_data_dir):
+    """Test that the blocks of a paired collect are merged per state"""
+    data_dir = os.path.join(temp_data_dir, "paired")
+    for block in range(2):
+        write_ftw_block(data_dir, "before", block, {f"920170-{block}": 0.1})
+        write_ftw_block(data_dir, "after", block, {f"920170-{block}": 0.3, "942100-1": 0.2})
+
+    states = FTWUtil().parse_states(data_dir)
+
+    assert states[State.BEFORE]["run"].value == 2
+    assert states[State.AFTER]["run"].value == 4
+    assert states[State.AFTER]["runtime"].keys.tolist() == ["920170-0", "942100-1", "920170-1", "942100-1"]
+    assert states[State.AFTER]["runtime"].labels_of(1) == ["942100-1", "942100", "942"]
+    assert FTWUtil().parse_states(os.path.join(temp_data_dir, "missing")) == {}
+
+
+def test_ftw_paired_text_report_evaluates_thresholds(temp_data_dir, capsys):
+    """Test that the paired report compares the merged states with the thresholds"""
+    data_dir = os.path.join(temp_data_dir, "paired")
+    for block in range(2):
+        write_ftw_block(data_dir, "before", block, {"920170-1": 0.1})
+        write_ftw_block(data_dir, "after", block, {"920170-1": 0.1 if block else 0.4})
+
+    write_threshold_conf(temp_data_dir, "ftw.threshold.json", [{
+        "id": 1, "threshold_name": "runtime_ratio", "threshold_desc": "runtime is at most 2x of before",
+        "metric_name": "runtime", "comparison_unit": "each", "comparison_method": "ratioGe",
+        "comparison_object": "before", "threshold": 2, "include_labels": None, "exclude_labels": None
+    }])
+
+    args = ReportCommandArg("paired", ["ftw"], temp_data_dir, temp_data_dir, temp_data_dir, ReportFormat.TEXT)
+    report = FTWUtil()._evaluate_thresholds(os.path.join(temp_data_dir, "ftw.threshold.json"),
+                                            *FTWUtil().parse_states(args.raw_output).values())
+    FTWUtil().text_report(args)
+
+    assert not report.passed
+    assert "runtime_ratio" in capsys.readouterr().out
+
+
+def test_ftw_text_report_evaluates_fixed_thresholds(ftw_test_data, capsys):
+    """Test that a single run is checked against the thresholds with a fixed value"""
+    temp_dir, test_name = ftw_test_data
+    write_threshold_conf(temp_dir, "ftw.threshold.json", [{
+        "id": 1, "threshold_name": "runtime_le_1s", "threshold_desc": "each test runs within 1s",
+        "metric_name": "runtime", "comparison_unit": "each", "comparison_method": "le",
+        "comparison_object": "threshold", "threshold": 1, "include_labels": None, "exclude_labels": None
+    }])
+
+    args = ReportCommandArg(test_name, ["ftw"], temp_dir, temp_dir, temp_dir, ReportFormat.TEXT)
+    FTWUtil().text_report(args)
+
+    assert "runtime_le_1s" in capsys.readouterr().out
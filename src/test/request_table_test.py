@@ -0,0 +1,107 @@
+"""
+Unit tests for the request table.
+These tests verify that requests built from go-ftw test cases round-trip through the binary table,
+and that they are picked proportionally to their weights.
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+import pytest
+from src.model import CollectCommandArg, LocustUtil
+from src.utils import RequestTable, TableRequest, write_request_table, read_request_table
+
+FTW_YAML = """
+tests:
+  - test_title: 942100-1
+    stages:
+      - stage:
+          input:
+            method: POST
+            uri: /login
+            headers:
+              Host: localhost
+              Content-Length: 42
+            data: "q=''' OR 1=1 --"
+      - stage:
+          input:
+            headers:
+              Host: localhost
+"""
+
+
+@pytest.fixture
+def tmp_dir():
+    path = tempfile.mkdtemp()
+    yield path
+    shutil.rmtree(path)
+
+
+def test_request_table_round_trip(tmp_dir):
+    """Test that the requests are read back as written, including bodies that break generated code"""
+    requests = [
+        TableRequest("a", "POST", "/?x=1", {"Host": "localhost", "X-Empty": ""}, b"'''\0\xff", 2.0),
+        TableRequest("b", "GET", "/", {}, b""),
+    ]
+    file_path = os.path.join(tmp_dir, "requests.bin")
+
+    assert write_request_table(file_path, requests) == 2
+    assert read_request_table(file_path) == requests
+
+    table = RequestTable(file_path)
+    assert len(table) == 2
+    assert table[-1] == requests[1]
+    with pytest.raises(IndexError):
+        table[2]
+    table.close()
+
+
+def test_request_table_sample_by_weight(tmp_dir):
+    """Test that the requests are picked proportionally to their weights, zero weights are never picked"""
+    file_path = os.path.join(tmp_dir, "requests.bin")
+    write_request_table(file_path, [
+        TableRequest(str(i), "GET", "/", {}, b"", weight) for i, weight in enumerate([1.0, 0.0, 3.0])
+    ])
+    table = RequestTable(file_path)
+
+    picks = table.sample(40000, np.random.default_rng(0))
+    counts = np.bincount(picks, minlength=3)
+
+    assert counts[1] == 0
+    assert counts[2] / counts[0] == pytest.approx(3, rel=0.1)
+    table.close()
+
+
+def test_request_table_rejects_other_files(tmp_dir):
+    """Test that a file which is not a request table is rejected"""
+    file_path = os.path.join(tmp_dir, "exec.py")
+    with open(file_path, "wb") as f:
+        f.write(b"from locust import HttpUser, task\n")
+
+    with pytest.raises(ValueError):
+        RequestTable(file_path)
+
+
+def test_locust_request_table_from_corpus(tmp_dir, monkeypatch):
+    """Test that LocustUtil builds one request per stage of the corpus, tagged with its go-ftw test id"""
+    # the corpus cache is created in the working directory
+    monkeypatch.chdir(tmp_dir)
+    corpus_dir = os.path.join(tmp_dir, "tests")
+    os.makedirs(corpus_dir)
+    with open(os.path.join(corpus_dir, "942100.yaml"), "w") as f:
+        f.write(FTW_YAML)
+
+    args = CollectCommandArg("request-table-test", ["locust"], None, None, None, None, None, corpus_dir)
+    args.tmp_dir = tmp_dir
+    util = LocustUtil()
+
+    assert util._create_request_table(args, os.path.join(tmp_dir, "requests.bin")) == 2
+    requests = read_request_table(os.path.join(tmp_dir, "requests.bin"))
+
+    assert [request.name for request in requests] == ["942100-1", "942100-1"]
+    assert requests[0].method == "POST"
+    assert requests[0].uri == "/login"
+    assert requests[0].headers == {"Host": "localhost", "Content-Length": "42", "X-CRS-TEST": "942100-1"}
+    assert requests[1].headers == {"Host": "localhost", "X-CRS-TEST": "942100-1"}
+    assert requests[0].body == b"q=''' OR 1=1 --"
+    assert (requests[1].method, requests[1].uri, requests[1].body) == ("GET", "/", b"")
@@ -0,0 +1,138 @@
+"""
+Unit tests for the result cache.
+These tests verify that the fingerprint covers the inputs of a collect, and entries are reused and evicted.
+"""
+import os
+import tempfile
+import time
+import pytest
+from src import collect
+from src.collect import get_test_command_arg, run_with_cache, compose_image
+from src.model import ResultCache, OpenLoopUtil
+
+
+def write_file(path: str, content: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+@pytest.fixture
+def workspace(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.chdir(tmp)
+        write_file("rules/REQUEST-920.conf", 'SecRule ARGS "@rx a" "id:920100"\n')
+        write_file("tests/920100.yaml", "tests: []\n")
+        yield tmp
+
+
+def get_args(*extra: str):
+    return get_test_command_arg(["--test-name", "cache-test", "--rules-dir", "rules", "--test-cases-dir", "tests",
+                                 "--result-cache", *extra])
+
+
+def test_fingerprint_covers_the_inputs(workspace):
+    """Test that the fingerprint changes with the rules, the corpus, the image, the utils and the host"""
+    cache = ResultCache()
+    args = get_args()
+
+    def fingerprint(**kwargs) -> str:
+        return cache.fingerprint(args, [kwargs.pop("util", OpenLoopUtil())], **{"host_tag": "ci", **kwargs})
+
+    base = fingerprint()
+    assert fingerprint() == base
+
+    util = OpenLoopUtil()
+    util.rate = 500
+    assert fingerprint(util=util) != base
+    assert fingerprint(image_digest="sha256:1") != base
+    assert fingerprint(host_tag="laptop") != base
+
+    write_file("tests/920100.yaml", "tests: [] # changed\n")
+    corpus_changed = fingerprint()
+    assert corpus_changed != base
+
+    write_file("rules/REQUEST-920.conf", 'SecRule ARGS "@rx b" "id:920100"\n')
+    assert fingerprint() not in (base, corpus_changed)
+
+
+def test_store_and_restore(workspace):
+    """Test that a fresh entry is restored into the raw output, and a stale one is not"""
+    write_file("data/run/ftw.json", "{}")
+    cache = ResultCache(max_age=60)
+    cache.store("abc", "data/run")
+
+    assert cache.restore("abc", "data/restored")
+    assert os.listdir("data/restored") == ["ftw.json"]
+    assert not cache.restore("missing", "data/restored")
+
+    assert not ResultCache(max_age=0).restore("abc", "data/stale")
+    assert not os.path.exists("data/stale")
+
+
+def test_evict_by_age_and_size(workspace, monkeypatch):
+    """Test that the stale entries and then the least recently used ones are evicted"""
+    clock = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+
+    for name in ["old", "lru", "mru"]:
+        write_file(f"data/{name}/stats.csv", "x" * 100)
+        ResultCache().store(name, f"data/{name}")
+        clock[0] += 10
+
+    ResultCache().restore("lru", "data/tmp")
+    clock[0] += 10
+    ResultCache().restore("mru", "data/tmp")
+
+    size = sum(os.path.getsize(os.path.join("tmp/result_cache/mru", name))
+               for name in os.listdir("tmp/result_cache/mru"))
+
+    # the entry stored first is stale, then the least recently used entry does not fit
+    assert ResultCache(max_age=35).evict() == ["old"]
+    assert ResultCache(max_size=size + 1).evict() == ["lru"]
+    assert os.listdir("tmp/result_cache") == ["mru"]
+
+
+def test_run_with_cache_reuses_the_baseline(workspace):
+    """Test that a completed collect is stored, and the next collect with the same inputs is not run"""
+    args = get_args("--host-tag", "ci")
+    runs = []
+
+    def run() -> bool:
+        runs.append(1)
+        write_file(os.path.join(args.raw_output, "ftw.json"), "{}")
+        return True
+
+    run_with_cache(args, "missing-image", run)
+    os.remove(os.path.join(args.raw_output, "ftw.json"))
+    run_with_cache(args, "missing-image", run)
+
+    assert len(runs) == 1
+    assert os.path.exists(os.path.join(args.raw_output, "ftw.json"))
+
+
+def test_cache_hit_does_not_start_the_waf(workspace, monkeypatch):
+    """Test that the cache is looked up with the image of the docker-compose file, before the WAF is started"""
+    write_file("tests/docker-compose.yml", "services:\n  modsec2-apache:\n    container_name: modsec2-apache\n"
+                                           "    image: owasp/modsecurity-crs:apache\n")
+    commands, images = [], []
+    monkeypatch.setattr(collect.subprocess, "run", lambda cmd, **_: commands.append(cmd))
+    monkeypatch.setattr(collect, "waf_server_is_up", lambda *_: True)
+    monkeypatch.setattr(collect, "waf_image_digest", lambda image: images.append(image) or "sha256:1")
+
+    def single_runner(args) -> bool:
+        write_file(os.path.join(args.raw_output, "ftw.json"), "{}")
+        return True
+
+    monkeypatch.setattr(collect, "single_runner", single_runner)
+    assert compose_image("modsec2-apache") == "owasp/modsecurity-crs:apache"
+
+    args = get_args("--utils", "ftw")
+    collect.runner(args)
+    assert len(commands) == 2 and "up -d modsec2-apache" in commands[0]
+
+    os.remove(os.path.join(args.raw_output, "ftw.json"))
+    collect.runner(args)
+    assert len(commands) == 2
+    assert images == ["owasp/modsecurity-crs:apache"] * 2
+    assert os.path.exists(os.path.join(args.raw_output, "ftw.json"))
@@ -0,0 +1,143 @@
+"""
+Unit tests for the run history.
+These tests verify that parsed data is stored, and trends and rolling baselines are queried from the runs.
+"""
+import json
+import os
+import tempfile
+import pytest
+from src.model import RunHistory, MetricSeries, HistogramSeries, ParsedDataItem, FTWUtil
+from src.report import get_summary_command_arg, main
+from src.utils import LatencyHistogram
+
+
+def runtime(values: dict[str, float]) -> MetricSeries:
+    return MetricSeries(list(values), list(values.values()), [[key, key.split("-")[0]] for key in values])
+
+
+def latency(values: list[int]) -> HistogramSeries:
+    histogram = LatencyHistogram()
+    histogram.record(values)
+    return HistogramSeries(["920170-1"], [histogram], [["920170-1", "920170", "920"]])
+
+
+@pytest.fixture
+def history():
+    with tempfile.TemporaryDirectory() as tmp:
+        with RunHistory(os.path.join(tmp, "history.sqlite")) as history:
+            yield history
+
+
+def test_add_data_skips_non_numeric_items(history):
+    """Test that the numeric items and the histograms are stored, other items are skipped"""
+    run_id = history.add_run("test", "abc", "main", timestamp=1)
+    count = history.add_data(run_id, "FTWUtil", {
+        "run": ParsedDataItem("run", 3, []),
+        "success": MetricSeries(["caseID"] * 2, ["920170-1", "920170-2"]),
+        "runtime": runtime({"920170-1": 0.1, "942100-1": 0.2}),
+        "latency": latency([100, 200]),
+    })
+
+    assert count == 4
+    assert history.runs() == [(run_id, "test", "abc", "main", 1)]
+
+
+def test_trend_by_rule_and_branch(history):
+    """Test that the trend aggregates the samples of each run, oldest run first"""
+    for timestamp, branch, value in [(1, "main", 0.1), (2, "pr", 0.9), (3, "main", 0.3)]:
+        run_id = history.add_run("test", f"commit-{timestamp}", branch, timestamp)
+        history.add_data(run_id, "FTWUtil", {"runtime": runtime({"920170-1": value, "942100-1": 1.0})})
+
+    trend = history.trend("FTWUtil", "runtime", "test", rule_id="920170", branch="main")
+    assert trend.keys.tolist() == [1, 3]
+    assert trend.values.tolist() == pytest.approx([0.1, 0.3])
+    assert trend.labels_of(1) == ["commit-3"]
+
+    assert history.trend("FTWUtil", "runtime", statistic="max", limit=2).values.tolist() == [1.0, 1.0]
+    with pytest.raises(ValueError):
+        history.trend("FTWUtil", "runtime", statistic="p99")
+
+
+def test_rolling_baseline(history):
+    """Test that the baseline is the median of each key over the last runs, and merges the histograms"""
+    for timestamp in range(12):
+        run_id = history.add_run("test", f"commit-{timestamp}", "main", timestamp)
+        history.add_data(run_id, "LocustUtil", {
+            "avg_resp_time": runtime({"920170-1": timestamp, "942100-1": 100 * (timestamp % 2)}),
+            "latency": latency([1000 * (timestamp + 1)]),
+        })
+
+    baseline = history.baseline("LocustUtil", "avg_resp_time", "test", "main", runs=10)
+    assert baseline.keys.tolist() == ["920170-1", "942100-1"]
+    # the last 10 runs are 2...11
+    assert baseline.values.tolist() == [6.5, 50]
+    assert baseline.labels_of(0) == ["920170-1", "920170"]
+    assert history.baseline("LocustUtil", "avg_resp_time", runs=4, statistic="mean").values.tolist() == [9.5, 50]
+
+    histograms = history.baseline("LocustUtil", "latency", runs=3)
+    assert isinstance(histograms, HistogramSeries)
+    assert histograms.totals().tolist() == [3]
+    assert histograms.labels_of(0) == ["920170-1", "920170", "920"]
+
+    assert history.baseline("LocustUtil", "missing") is None
+
+
+def test_report_compares_with_the_rolling_baseline(monkeypatch, capsys):
+    """Test that the report ingests the runs, and a threshold with a baseline compares with them"""
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.chdir(tmp)
+        os.makedirs("config")
+        with open("config/ftw.threshold.json", "w") as f:
+            json.dump({"util_name": "ftw", "threshold_version": "0.0.1", "thresholds": [{
+                "id": 1, "threshold_name": "runtime_vs_main", "threshold_desc": "at most 2x of the main runs",
+                "metric_name": "runtime", "comparison_unit": "each", "comparison_method": "ratioGe",
+                "comparison_object": "before", "threshold": 2, "include_labels": None, "exclude_labels": None,
+                "baseline": {"branch": "main", "runs": 10}
+            }]}, f)
+
+        def collect(test_name: str, value: float):
+            os.makedirs(f"data/{test_name}", exist_ok=True)
+            with open(f"data/{test_name}/ftw.json", "w") as f:
+                json.dump({"run": 1, "success": ["920170-1"], "failed": [], "skipped": [],
+                           "runtime": {"920170-1": value}, "TotalTime": value}, f)
+
+        for idx, value in enumerate([0.1, 0.2, 0.1]):
+            collect("pipeline", value)
+            main(["--test-name", "pipeline", "--utils", "ftw", "--history", "history.sqlite",
+                  "--ingest", "--commit", f"c{idx}", "--branch", "main"])
+        # the most recent main run is of another test
+        collect("other", 5)
+        main(["--test-name", "other", "--utils", "ftw", "--history", "history.sqlite",
+              "--ingest", "--commit", "c3", "--branch", "main"])
+
+        collect("pipeline", 0.5)
+        args = get_summary_command_arg(["--test-name", "pipeline", "--utils", "ftw", "--threshold-conf", "config",
+                                        "--history", "history.sqlite"])
+        with RunHistory("history.sqlite") as history:
+            baseline = history.baseline("FTWUtil", "runtime", "pipeline", branch="main")
+            assert history.baseline("FTWUtil", "runtime", branch="main", runs=1).values.tolist() == [5]
+        assert baseline.values.tolist() == [0.1]
+
+        report = FTWUtil()._evaluate_thresholds("config/ftw.threshold.json", {"runtime": baseline},
+                                                FTWUtil().parse_output(args.raw_output))
+        assert not report.passed
+
+        # the baseline of the report is the main runs of the same test (0.5 vs. 0.1), not of the other test
+        capsys.readouterr()
+        main(["--test-name", "pipeline", "--utils", "ftw", "--threshold-conf", "config", "--history", "history.sqlite"])
+        out = capsys.readouterr().out
+        assert "runtime_vs_main" in out and "failed" in out
+
+        # the baseline gives the runs of another test (0.5 vs. 5)
+        with open("config/ftw.threshold.json") as f:
+            config = json.load(f)
+        config["thresholds"][0]["baseline"]["test_name"] = "other"
+        with open("config/ftw.threshold.json", "w") as f:
+            json.dump(config, f)
+        main(["--test-name", "pipeline", "--utils", "ftw", "--threshold-conf", "config", "--history", "history.sqlite"])
+        out = capsys.readouterr().out
+        assert "runtime_vs_main" in out and "passed" in out
+
+        main(["--test-name", "pipeline", "--utils", "ftw", "--history", "history.sqlite", "--trend", "runtime"])
+        out = capsys.readouterr().out
+        assert "c0" in out and "0.1000" in out
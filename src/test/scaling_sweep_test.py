@@ -0,0 +1,117 @@
+"""
+Unit tests for the input-size scaling sweep.
+These tests verify that the payloads are grown geometrically, and the rules whose cost grows superlinearly
+are found against the WAF and against the @rx patterns of the rules.
+"""
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pytest
+from src.collect import main, get_test_command_arg
+from src.model import ScalingSweepUtil, RegexScalingUtil
+from src.model.ScalingSweepUtil import grow_stage, growth_exponent
+
+
+class _QuadraticWAFHandler(BaseHTTPRequestHandler):
+    """
+    a WAF stand-in whose latency grows with the square of the URI of the rule 942100, and linearly with the URI
+    of the rule 942190. Both take a fraction of a second at the largest size, so they stand out of the noise
+    of a loaded host.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("X-CRS-TEST", "").startswith("942100"):
+            time.sleep((len(self.path) / 1000) ** 2 * 0.03)
+        elif self.headers.get("X-CRS-TEST", "").startswith("942190"):
+            time.sleep(len(self.path) / 1000 * 0.1)
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *_):
+        pass
+
+
+RULE_FILES = {"REQUEST-942-APPLICATION-ATTACK-SQLI.conf": 'SecRule ARGS "@rx (\\w+)\\d" "id:942100,phase:2,block"\n'
+                                                         'SecRule ARGS "@rx union" "id:942190,phase:2,block"\n'}
+
+FTW_TESTS = [
+    ("942100.yaml", "942100-1", {"uri": "/?aaaaaaaa"}),
+    ("942190.yaml", "942190-1", {"uri": "/?q=union-aaa"}),
+]
+
+
+def test_grow_stage():
+    """Test that the query (or path), the body and the header values are repeated, but the routing headers"""
+    stage = {"method": "POST", "uri": "/a?x=1", "data": "b=2", "headers": {"Host": "localhost", "User-Agent": "u"}}
+
+    assert grow_stage(stage, 1) is stage
+    assert grow_stage(stage, 3) == {"method": "POST", "uri": "/a?x=1x=1x=1", "data": "b=2b=2b=2",
+                                    "headers": {"Host": "localhost", "User-Agent": "uuu"}}
+    assert grow_stage({"uri": "/ab"}, 2)["uri"] == "/abab"
+
+
+def test_growth_exponent():
+    """Test that the exponent ignores the constant cost, and a constant cost does not grow"""
+    sizes = 10 * 2 ** np.arange(8)
+
+    assert growth_exponent(sizes, 1000 + 2 * sizes) == pytest.approx(1, abs=0.05)
+    assert growth_exponent(sizes, 1000 + 0.5 * sizes ** 2) == pytest.approx(2, abs=0.05)
+    assert growth_exponent(sizes, 1000 + np.tile([1, -1], 4)) == 0
+
+    # the three factors of a large stage, a linear cost is not superlinear
+    assert growth_exponent([100, 200, 400], [150, 250, 450]) == pytest.approx(1, abs=0.05)
+    assert growth_exponent([100, 200, 400], [150, 450, 1650]) == pytest.approx(2, abs=0.05)
+
+    # the noise of the small sizes does not bend the fit of a quadratic cost
+    noise = np.random.default_rng(0).normal(0, 20, len(sizes))
+    assert growth_exponent(sizes, 300 + 0.05 * sizes ** 2 + noise) == pytest.approx(2, abs=0.1)
+
+    # recorded matching times (in microseconds) of a quadratic pattern on a loaded host, and of a literal
+    sizes = [10, 18, 34, 66, 130, 258, 514, 1026, 2050, 4098]
+    assert growth_exponent(sizes, [4.5, 9.6, 25.3, 77.9, 250.7, 787.2, 2860.9, 31859.5, 58698.4, 175825.8]) > 1.8
+    assert growth_exponent(sizes, [1.04, 1.43, 1.1, 1.23, 1.21, 1.26, 1.07, 1.25, 1.45, 1.1]) == 0
+
+    util = ScalingSweepUtil()
+    assert util.factors(10) == [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+    assert util.factors(10000) == [1, 2, 4]
+
+
+def test_regex_scaling_without_waf(rules_workspace, monkeypatch, capsys):
+    """Test that a pattern searched in quadratic time is superlinear, and a literal is not"""
+    monkeypatch.setattr(RegexScalingUtil, "max_size", 4096)
+    monkeypatch.setattr(RegexScalingUtil, "repeat", 5)
+    monkeypatch.setattr(RegexScalingUtil, "processes", 2)
+    main(["--test-name", "scaling", "--utils", "regexScaling", "--rules-dir", "rules", "--test-cases-dir", "tests"])
+
+    data = RegexScalingUtil().parse_data("data/scaling/regex_scaling.csv")
+    assert data["growth_exponent"].keys.tolist() == ["942100", "942190"]
+    assert data["growth_exponent"].values[0] > 1.5
+    assert data["superlinear"].values.tolist() == ["942100"]
+    assert data["max_size"].values.tolist() == [2 + 8 * 256, 2 + 11 * 256]
+
+
+def test_scaling_sweep_against_waf(rules_workspace, monkeypatch):
+    """Test that the latency of the WAF is swept, and the quadratic rule is superlinear but not the linear one"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _QuadraticWAFHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(ScalingSweepUtil, "max_size", 4096)
+    monkeypatch.setattr(ScalingSweepUtil, "repeat", 3)
+
+    try:
+        args = get_test_command_arg(["--test-name", "waf", "--test-cases-dir", "tests",
+                                     "--waf-endpoint", f"http://127.0.0.1:{server.server_address[1]}"])
+        os.makedirs(args.raw_output)
+        ScalingSweepUtil().collect(args)
+    finally:
+        server.shutdown()
+
+    data = ScalingSweepUtil().parse_data("data/waf/scaling_sweep.csv")
+    assert data["superlinear"].values.tolist() == ["942100"]
+    assert data["superlinear"].labels_of(0)[0] == "942100"
@@ -0,0 +1,92 @@
+"""
+Unit tests for the statistical comparison of before/after samples.
+These tests verify the statistics against brute-force computations, and that thresholds only fail
+when a regression stands out from the noise.
+"""
+import numpy as np
+import pytest
+from src.model import HistogramSeries, MetricSeries, Threshold
+from src.utils import LatencyHistogram, bootstrap_median_diff, mann_whitney_u, cliffs_delta
+
+
+def create_threshold(**kwargs) -> Threshold:
+    conf = {
+        "id": 1,
+        "threshold_name": "unit-test",
+        "threshold_desc": "unit test threshold",
+        "metric_name": "cpu_total_cores",
+        "comparison_unit": "each",
+        "comparison_method": "mannWhitney",
+        "comparison_object": "before",
+        "threshold": 0.01,
+        "include_labels": None,
+        "exclude_labels": None
+    }
+    conf.update(kwargs)
+    return Threshold(**conf)
+
+
+def test_bootstrap_median_diff_matches_resampling():
+    """Test that the interval matches the bootstrap of resampled medians"""
+    rng = np.random.default_rng(0)
+    before, after = rng.lognormal(0, 1, 301), rng.lognormal(0.2, 1, 201)
+
+    picks_before = rng.integers(0, len(before), (20000, len(before)))
+    picks_after = rng.integers(0, len(after), (20000, len(after)))
+    diffs = np.median(after[picks_after], axis=1) - np.median(before[picks_before], axis=1)
+
+    assert bootstrap_median_diff(before, after) == pytest.approx(np.quantile(diffs, [0.025, 0.975]), abs=0.03)
+    # weighted samples are the same as the repeated values
+    values, weights = np.array([1.0, 2.0, 5.0]), np.array([10, 3, 8])
+    assert bootstrap_median_diff(np.repeat(values, weights), after) == \
+        pytest.approx(bootstrap_median_diff(values, after, before_weights=weights))
+
+
+def test_mann_whitney_u_and_cliffs_delta():
+    """Test the rank statistics with ties, and their weighted form"""
+    assert mann_whitney_u([1, 2, 3], [4, 5, 6]) == pytest.approx((9, 0.0404), abs=1e-4)
+    assert cliffs_delta([1, 2, 3], [4, 5, 6]) == 1
+    assert cliffs_delta([1, 2, 3], [1, 2, 3]) == 0
+
+    before, after = np.array([1, 1, 2, 3, 3, 3]), np.array([2, 3, 3, 4])
+    u, _ = mann_whitney_u(before, after)
+    # brute force: each pair counts 1 if after is greater, 0.5 if tied
+    assert u == np.sum((after[:, None] > before[None, :]) + 0.5 * (after[:, None] == before[None, :]))
+    assert mann_whitney_u([1, 2, 3], after, before_weights=[2, 1, 3]) == pytest.approx(mann_whitney_u(before, after))
+
+
+@pytest.mark.parametrize("method, threshold", [
+    ("mannWhitney", 0.01), ("bootstrapMedianLe", 0.05), ("effectSizeLe", 0.2)
+])
+def test_threshold_fails_only_on_real_regressions(method, threshold):
+    """Test that noise passes, and a shift of the whole distribution fails"""
+    rng = np.random.default_rng(1)
+    keys = np.arange(500).astype(str)
+    before = MetricSeries(keys, rng.normal(1.0, 0.2, 500))
+    noise = MetricSeries(keys[:400], rng.normal(1.0, 0.2, 400))
+    regression = MetricSeries(keys, rng.normal(1.2, 0.2, 500))
+
+    assert create_threshold(comparison_method=method, threshold=threshold).evaluate(before, noise).passed
+
+    result = create_threshold(comparison_method=method, threshold=threshold).evaluate(before, regression)
+    assert not result.passed
+    assert result.failed_keys.tolist() == [method]
+
+
+def test_threshold_statistical_method_on_histograms():
+    """Test that each pair of latency histograms is tested on its buckets"""
+    rng = np.random.default_rng(3)
+
+    def create_series(shifts: list[float]) -> HistogramSeries:
+        histograms = []
+        for shift in shifts:
+            histogram = LatencyHistogram()
+            histogram.record(rng.lognormal(8 + shift, 0.5, 3000).astype(np.int64))
+            histograms.append(histogram)
+        return HistogramSeries(["920100-1", "942100-1"], histograms)
+
+    result = create_threshold().evaluate(create_series([0, 0]), create_series([0, 0.2]))
+    assert result.failed_keys.tolist() == ["942100-1"]
+
+    assert create_threshold(comparison_unit="avg").evaluate(create_series([0, 0]), create_series([0, 0])).error \
+        is not None
@@ -0,0 +1,108 @@
+"""
+Unit tests for the threshold module.
+These tests verify that thresholds are evaluated correctly on columnar data.
+"""
+import pytest
+from src.model import ParsedDataItem, Threshold, evaluate_thresholds
+
+
+def create_threshold(**kwargs) -> Threshold:
+    conf = {
+        "id": 1,
+        "threshold_name": "unit-test",
+        "threshold_desc": "unit test threshold",
+        "metric_name": "runtime",
+        "comparison_unit": "each",
+        "comparison_method": "le",
+        "comparison_object": "before",
+        "threshold": 0,
+        "include_labels": None,
+        "exclude_labels": None
+    }
+    conf.update(kwargs)
+    return Threshold(**conf)
+
+
+@pytest.fixture
+def runtime_data():
+    """Create before/after runtimes labelled with test id and rule id"""
+    def create(values: dict) -> list:
+        return [ParsedDataItem(rule, value, [rule, rule.split("-")[0]]) for rule, value in values.items()]
+
+    before = create({"920170-1": 0.1, "920170-2": 0.2, "942100-1": 0.3})
+    after = create({"920170-1": 0.1, "920170-2": 1.5, "942100-1": 0.2})
+    return before, after
+
+
+def test_threshold_each_collects_failures(runtime_data):
+    """Test that EACH comparison reports every failed item"""
+    before, after = runtime_data
+    result = create_threshold().evaluate(before, after)
+
+    assert not result.passed
+    assert result.failed_count == 1
+    assert result.failed_keys[0] == "920170-2"
+    assert result.before_values[0] == 0.2
+    assert result.after_values[0] == 1.5
+
+
+def test_threshold_include_and_exclude_labels(runtime_data):
+    """Test that labels filter the data before the comparison"""
+    before, after = runtime_data
+
+    assert create_threshold(include_labels=["942100"]).isPassed(before, after)
+    assert create_threshold(exclude_labels=["920170"]).isPassed(before, after)
+    assert not create_threshold(include_labels=["920170"]).isPassed(before, after)
+
+
+@pytest.mark.parametrize("unit, method, passed", [
+    ("cnt", "eq", True),
+    ("sum", "gt", True),
+    ("average", "lt", False),
+    ("each", "ne", False),
+])
+def test_threshold_comparison_unit(runtime_data, unit, method, passed):
+    """Test aggregation by comparison unit"""
+    before, after = runtime_data
+    assert create_threshold(comparison_unit=unit, comparison_method=method).isPassed(before, after) == passed
+
+
+def test_threshold_ratio_and_threshold_object(runtime_data):
+    """Test ratio methods and comparison with the threshold value"""
+    before, after = runtime_data
+
+    ratio = create_threshold(comparison_unit="", comparison_method="ratioGt", threshold=10)
+    assert ratio.isPassed(before, after)
+    assert not create_threshold(comparison_method="ratioGt", threshold=5).isPassed(before, after)
+
+    assert create_threshold(comparison_method="lt", comparison_object="threshold", threshold=2).isPassed(before, after)
+    assert not create_threshold(comparison_method="lt", comparison_object="threshold", threshold=1).isPassed(before, after)
+
+
+def test_threshold_invalid_input_is_reported(runtime_data):
+    """Test that invalid comparisons are reported in the result instead of raised"""
+    before, after = runtime_data
+
+    result = create_threshold().evaluate(before, after[:2])
+    assert not result.passed
+    assert "different length" in result.error
+
+    strings = [ParsedDataItem("caseID", "920170-1", [])]
+    result = create_threshold(comparison_method="gt").evaluate(strings, strings)
+    assert not result.passed
+    assert result.error is not None
+
+
+def test_evaluate_thresholds_in_one_pass(runtime_data):
+    """Test that all thresholds of a config are evaluated into one report"""
+    before, after = runtime_data
+    thresholds = [
+        create_threshold(id=1, comparison_unit="cnt", comparison_method="eq"),
+        create_threshold(id=2),
+        create_threshold(id=3, metric_name="missing"),
+    ]
+    report = evaluate_thresholds(thresholds, {"runtime": before}, {"runtime": after})
+
+    assert [result.passed for result in report.results] == [True, False, False]
+    assert not report.passed
+    assert len(report.failed) == 2
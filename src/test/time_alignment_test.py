@@ -0,0 +1,88 @@
+"""
+Unit tests for the time alignment of before/after series.
+These tests verify that runs with different start times and sampling rates are compared on a common grid.
+"""
+import numpy as np
+import pytest
+from src.model import MetricSeries, Threshold
+from src.model.TimeAlignment import align_series
+
+
+def create_series(start: float, interval: float, values: dict[str, np.ndarray]) -> MetricSeries:
+    """Create a series of each container, sampled every `interval` seconds from `start` (unix time)"""
+    keys, all_values, labels = [], [], []
+    for container, container_values in values.items():
+        times = start + interval * np.arange(len(container_values))
+        keys.append(np.datetime_as_string((times * 1e9).astype("datetime64[ns]"), unit="ms", timezone="UTC"))
+        all_values.append(container_values)
+        labels += [[container]] * len(container_values)
+    return MetricSeries(np.concatenate(keys), np.concatenate(all_values), labels)
+
+
+def create_threshold(**kwargs) -> Threshold:
+    conf = {
+        "id": 1,
+        "threshold_name": "unit-test",
+        "threshold_desc": "unit test threshold",
+        "metric_name": "cpu_total_cores",
+        "comparison_unit": "each",
+        "comparison_method": "le",
+        "comparison_object": "before",
+        "threshold": 0,
+        "include_labels": None,
+        "exclude_labels": None
+    }
+    conf.update(kwargs)
+    return Threshold(**conf)
+
+
+def test_align_series_interpolates_different_rates():
+    """Test that runs started at different times and sampled at different rates are resampled by elapsed time"""
+    before = create_series(1_700_000_000, 1.0, {"waf": np.arange(60) * 2.0})
+    after = create_series(1_700_086_400.5, 0.25, {"waf": np.arange(200) * 0.5})
+
+    aligned_before, aligned_after = align_series(before, after, warmup=5, cooldown=2)
+
+    # the grid follows the coarser rate, and stops at the end of the shorter run
+    assert aligned_before.keys.tolist() == [float(t) for t in range(5, 48)]
+    assert aligned_before.values == pytest.approx(aligned_before.keys * 2)
+    assert aligned_after.values == pytest.approx(aligned_after.keys * 2)
+    assert aligned_after.labels_of(0) == ["waf"]
+
+
+def test_align_series_buckets_and_common_containers():
+    """Test that the bucket method averages the samples of each grid point, and skips empty buckets"""
+    values = np.arange(40, dtype=np.float64)
+    before = create_series(1_700_000_000, 0.5, {"waf": values, "backend": values})
+    after = create_series(1_700_000_100, 0.5, {"waf": values, "other": values})
+    after = after.select(np.delete(np.arange(len(after)), [9, 10]))
+
+    aligned_before, aligned_after = align_series(before, after, step=1.0, method="bucket")
+
+    assert set(aligned_before.label_vocab) == {"waf"}
+    # the samples at 4.5s and 5s are lost, the bucket of 5s (i.e., [4.5s, 5.5s)) is empty
+    assert 5.0 not in aligned_after.keys.tolist()
+    assert len(aligned_before) == len(aligned_after)
+    assert aligned_before.values[:3] == pytest.approx([0, 1.5, 3.5])
+
+
+def test_threshold_compares_aligned_series():
+    """Test that an EACH threshold compares runs of different lengths once they are aligned"""
+    before = create_series(1_700_000_000, 1.0, {"waf": np.full(30, 2.0), "backend": np.full(30, 1.0)})
+    after = create_series(1_700_000_050, 0.5, {"waf": np.r_[np.full(50, 2.0), np.full(10, 3.0)],
+                                                "backend": np.full(60, 1.0)})
+
+    # series keyed by timestamps are aligned by default
+    result = create_threshold().evaluate(before, after)
+    assert result.error is None and not result.passed
+
+    result = create_threshold(alignment={"method": "bucket"}).evaluate(before, after)
+    assert not result.passed
+    assert result.failed_keys.tolist() == [25.0, 26.0, 27.0, 28.0, 29.0]
+
+    # series keyed otherwise are compared item by item
+    other = MetricSeries(np.arange(len(after)), after.values)
+    assert "set `alignment`" in create_threshold().evaluate(before, other).error
+
+    assert create_threshold(alignment={"cooldown": 5}, include_labels=["waf"]).evaluate(before, after).passed
+    assert create_threshold(alignment={"method": "nearest"}).evaluate(before, after).error is not None
@@ -0,0 +1,18 @@
+"""
+Module UtilRole is an enum for representing the role of a util when collecting data.
+"""
+from enum import Enum
+
+
+class UtilRole(Enum):
+    """
+    UtilRole is an enum for representing the role of a util when collecting data.
+    Samplers are started before load generators, and are stopped after all the load generators complete,
+    so the collected resource data covers the whole load window.
+
+    Options:
+        - `sampler`: records the resource usage of the WAF (e.g., cAdvisor)
+        - `load`: applies load to the WAF (e.g., go-ftw, locust)
+    """
+    SAMPLER = "sampler"
+    LOAD = "load"
@@ -12,11 +12,23 @@ class UtilType(Enum):
         - `ftw`: go-ftw
         - `locust`: locust
         - `cAdvisor`: cAdvisor
+        - `cgroup`: cgroup v2 files of the WAF container
+        - `openLoop`: open-loop load generator at a constant arrival rate
+        - `regex`: offline profiler of the `@rx` operators of the rules (no WAF)
+        - `scaling`: input-size scaling sweep of the rules against the WAF
+        - `regexScaling`: input-size scaling sweep of the `@rx` operators of the rules (no WAF)
+        - `fuzz`: worst-case corpus generator for the `@rx` operators of the rules (no WAF)
         - `eBFF`: eBFF
     """
     FTW = "ftw",
     LOCUST = "locust",
     CADVISOR = "cAdvisor",
+    CGROUP = "cgroup",
+    OPENLOOP = "openLoop",
+    REGEX = "regex",
+    SCALING = "scaling",
+    REGEXSCALING = "regexScaling",
+    FUZZ = "fuzz",
 
     # @TODO: impl
     EBPF = "eBFF"
@@ -5,6 +5,7 @@ from .Mode import Mode
 from .ReportFormat import ReportFormat
 from .State import State
 from .UtilType import UtilType
+from .UtilRole import UtilRole
 
 
 __all__ = [
@@ -12,4 +13,5 @@ __all__ = [
     "ReportFormat",
     "State",
     "UtilType",
+    "UtilRole",
 ]
@@ -2,6 +2,15 @@
 Package for utility functions.
 """
 from .logger import logger
+from .spool import JsonlSpool, iter_jsonl
+from .http import AsyncHTTPClient, HTTPResponse
+from .clock import ticks
+from .timeseries import to_epoch_seconds
+from .histogram import LatencyHistogram
+from .significance import bootstrap_median_diff, mann_whitney_u, cliffs_delta
+from .request_table import RequestTable, TableRequest, write_request_table, read_request_table
 
 
-__all__ = ["logger"]
+__all__ = ["logger", "JsonlSpool", "iter_jsonl", "AsyncHTTPClient", "HTTPResponse", "ticks", "to_epoch_seconds",
+           "LatencyHistogram", "bootstrap_median_diff", "mann_whitney_u", "cliffs_delta",
+           "RequestTable", "TableRequest", "write_request_table", "read_request_table"]
@@ -0,0 +1,40 @@
+"""
+Module clock provides a fixed-rate ticker for asyncio.
+"""
+import asyncio
+from typing import AsyncIterator, Optional
+
+
+async def ticks(interval: float, stop: Optional[asyncio.Event] = None) -> AsyncIterator[int]:
+    """
+    ticks() yields at a fixed rate, the n-th tick is scheduled at `start + n * interval`.
+    Unlike sleeping for `interval` after each iteration, the time spent by the caller does not
+    add up to the cadence (i.e., no drift). Ticks that are missed because the caller overran are skipped.
+
+    Args:
+        interval (float): interval between ticks in seconds
+        stop (Optional[asyncio.Event], optional): stops the ticker once it is set. Defaults to None.
+
+    Yields:
+        int: index of the tick
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    tick = 0
+
+    while stop is None or not stop.is_set():
+        yield tick
+
+        now = loop.time()
+        tick = max(tick + 1, int((now - start) // interval) + 1)
+        delay = start + tick * interval - now
+
+        if stop is None:
+            await asyncio.sleep(delay)
+            continue
+
+        try:
+            # wake up immediately when stopped
+            await asyncio.wait_for(stop.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,178 @@
+"""
+Module histogram provides a log-bucketed latency histogram in the layout of HdrHistogram.
+Values are bucketed with a bounded relative error (e.g., 0.1% with 3 significant digits),
+so any quantile can be read from the histogram, and histograms are merged by adding their counts.
+"""
+import math
+from typing import Iterable
+import numpy as np
+
+
+class LatencyHistogram:
+    """
+    LatencyHistogram counts integer values (e.g., latency in microseconds) in log-linear buckets:
+    values below `2 * 10^significant_digits` (rounded up to a power of 2) have their own bucket,
+    above it each power of 2 is split into the same number of linear sub-buckets.
+    Values above `highest_value` are counted as `highest_value`.
+
+    Only the non-empty buckets are stored (latency spans a few dozen buckets out of ~23k), so a histogram
+    per request name stays small. The dense array of all the buckets is built on demand (see `counts`).
+
+    Args:
+        - `significant_digits` (int, optional): precision of the values. Defaults to 3.
+        - `highest_value` (int, optional): highest trackable value. Defaults to 3600000000 (1 hour in us).
+    """
+    significant_digits: int
+    highest_value: int
+
+    def __init__(self, significant_digits: int = 3, highest_value: int = 3_600_000_000):
+        self.significant_digits = significant_digits
+        self.highest_value = highest_value
+
+        sub_bucket_count = 1 << math.ceil(math.log2(2 * 10 ** significant_digits))
+        self.__sub_bits = sub_bucket_count.bit_length() - 1
+        self.__half = sub_bucket_count // 2
+        # count of each non-empty bucket, keyed by bucket index
+        self.__buckets: dict[int, int] = {}
+
+    @classmethod
+    def from_sparse(cls, indices: np.ndarray, counts: np.ndarray,
+                    significant_digits: int = 3, highest_value: int = 3_600_000_000) -> 'LatencyHistogram':
+        """
+        from_sparse() creates a histogram from the counts of its non-empty buckets (see `to_sparse()`).
+        """
+        histogram = cls(significant_digits, highest_value)
+        histogram.__buckets = {int(index): int(count) for index, count in zip(indices, counts) if count}
+        return histogram
+
+    def to_sparse(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        to_sparse() returns the indices and the counts of the non-empty buckets, in ascending index.
+        """
+        indices = np.fromiter(sorted(self.__buckets), dtype=np.int64, count=len(self.__buckets))
+        counts = np.fromiter((self.__buckets[index] for index in indices.tolist()), dtype=np.int64,
+                             count=len(indices))
+        return indices, counts
+
+    @property
+    def bucket_count(self) -> int:
+        return int(self.index_of(self.highest_value)) + 1
+
+    @property
+    def counts(self) -> np.ndarray:
+        """
+        counts is the dense array of the counts of all the buckets, built from the non-empty buckets.
+        """
+        res = np.zeros(self.bucket_count, dtype=np.int64)
+        indices, counts = self.to_sparse()
+        res[indices] = counts
+        return res
+
+    @property
+    def total(self) -> int:
+        return sum(self.__buckets.values())
+
+    def index_of(self, values: int | np.ndarray) -> np.ndarray:
+        """
+        index_of() returns the bucket index of each value.
+        """
+        values = np.clip(np.asarray(values, dtype=np.int64), 0, self.highest_value)
+        # the exponent of frexp is the bit length of the value, exact below 2^53
+        shift = np.maximum(np.frexp(values.astype(np.float64))[1] - self.__sub_bits, 0)
+        return (shift * self.__half) + (values >> shift)
+
+    def lowest_value_of(self, indices: np.ndarray) -> np.ndarray:
+        """
+        lowest_value_of() returns the lowest value counted in each bucket.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        shift = np.maximum(indices // self.__half - 1, 0)
+        return (indices - shift * self.__half) << shift
+
+    def highest_value_of(self, indices: np.ndarray) -> np.ndarray:
+        """
+        highest_value_of() returns the highest value counted in each bucket.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        shift = np.maximum(indices // self.__half - 1, 0)
+        return ((indices - shift * self.__half + 1) << shift) - 1
+
+    def record(self, values: int | Iterable[int], count: int = 1):
+        """
+        record() counts values.
+
+        Args:
+            values (int | Iterable[int]): one or more values
+            count (int, optional): number of times each value is counted. Defaults to 1.
+        """
+        buckets = self.__buckets
+        if np.isscalar(values):
+            # per-request path, without allocating arrays
+            value = min(max(int(values), 0), self.highest_value)
+            shift = max(value.bit_length() - self.__sub_bits, 0)
+            index = shift * self.__half + (value >> shift)
+            buckets[index] = buckets.get(index, 0) + count
+            return
+
+        indices, counts = np.unique(self.index_of(np.fromiter(values, dtype=np.int64)), return_counts=True)
+        for index, bucket_count in zip(indices.tolist(), (counts * count).tolist()):
+            buckets[index] = buckets.get(index, 0) + bucket_count
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        """
+        merge() adds the counts of another histogram with the same layout, in place.
+
+        Raises:
+            ValueError: if the layouts are different
+
+        Returns:
+            LatencyHistogram: self
+        """
+        if (other.significant_digits, other.highest_value) != (self.significant_digits, self.highest_value):
+            raise ValueError("histograms with different layouts cannot be merged")
+        buckets = self.__buckets
+        for index, count in other.__buckets.items():
+            buckets[index] = buckets.get(index, 0) + count
+        return self
+
+    def quantiles(self, qs: float | Iterable[float]) -> np.ndarray:
+        """
+        quantiles() returns the value at each quantile (e.g., 0.999 for p99.9), i.e., the highest value of
+        the bucket where the quantile falls. NaN is returned for an empty histogram.
+
+        Args:
+            qs (float | Iterable[float]): quantiles in [0, 1]
+
+        Returns:
+            np.ndarray: value at each quantile
+        """
+        qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+        indices, counts = self.to_sparse()
+        total = int(counts.sum())
+        if total == 0:
+            return np.full(len(qs), np.nan)
+
+        ranks = np.maximum(np.ceil(qs * total), 1)
+        positions = np.minimum(np.searchsorted(np.cumsum(counts), ranks), len(indices) - 1)
+        return self.highest_value_of(indices[positions]).astype(np.float64)
+
+    def quantile(self, q: float) -> float:
+        return float(self.quantiles(q)[0])
+
+    def mean(self) -> float:
+        """
+        mean() returns the mean of the values, each value is taken at the middle of its bucket.
+        """
+        indices, counts = self.to_sparse()
+        total = int(counts.sum())
+        if total == 0:
+            return math.nan
+
+        middles = (self.lowest_value_of(indices) + self.highest_value_of(indices)) / 2
+        return float(np.dot(counts, middles) / total)
+
+    def min(self) -> float:
+        return float(self.lowest_value_of(min(self.__buckets))) if self.__buckets else math.nan
+
+    def max(self) -> float:
+        return float(self.highest_value_of(max(self.__buckets))) if self.__buckets else math.nan
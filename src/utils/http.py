@@ -0,0 +1,207 @@
+"""
+Module http provides a minimal asyncio HTTP/1.1 client with a keep-alive connection pool.
+It is used by the samplers and load generators which issue many requests from one event loop.
+"""
+import asyncio
+import json
+import ssl
+from typing import Optional
+from urllib.parse import urlsplit
+
+
+class HTTPResponse:
+    """
+    HTTPResponse is a response read by AsyncHTTPClient.
+
+    Args:
+        - `status` (int): status code
+        - `headers` (dict[str, str]): response headers, the names are lower-cased
+        - `body` (bytes): response body
+    """
+    status: int
+    headers: dict[str, str]
+    body: bytes
+
+    def __init__(self, status: int, headers: dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> any:
+        return json.loads(self.body)
+
+
+class _Connection:
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncHTTPClient:
+    """
+    AsyncHTTPClient is a minimal HTTP/1.1 client for asyncio. Connections are kept alive and reused,
+    at most `pool_size` connections are opened per host.
+
+    Usage:
+        ```python
+        async with AsyncHTTPClient(pool_size=4) as client:
+            response = await client.request("POST", "http://127.0.0.1:8080/api/v1.1/subcontainers/docker/")
+        ```
+
+    Args:
+        - `pool_size` (int, optional): max. number of connections per host. Defaults to 10.
+        - `timeout` (float, optional): timeout of a request in seconds. Defaults to 15.
+    """
+    pool_size: int
+    timeout: float
+
+    def __init__(self, pool_size: int = 10, timeout: float = 15):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.__idle: dict[tuple, list[_Connection]] = {}
+        self.__slots: dict[tuple, asyncio.Semaphore] = {}
+
+    async def __aenter__(self) -> 'AsyncHTTPClient':
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    async def close(self):
+        """
+        close() closes all the idle connections.
+        """
+        for connections in self.__idle.values():
+            for connection in connections:
+                connection.close()
+        self.__idle.clear()
+
+    async def request(self,
+                      method: str,
+                      url: str,
+                      headers: Optional[dict[str, str]] = None,
+                      body: bytes | str = b""
+                      ) -> HTTPResponse:
+        """
+        request() sends a request and reads the whole response.
+
+        Args:
+            method (str): HTTP method
+            url (str): absolute url, e.g., http://localhost:80/
+            headers (Optional[dict[str, str]], optional): request headers. Defaults to None.
+            body (bytes | str, optional): request body. Defaults to b"".
+
+        Raises:
+            asyncio.TimeoutError: if the request exceeds the timeout
+            ConnectionError: if the connection is closed unexpectedly
+
+        Returns:
+            HTTPResponse: the response
+        """
+        parsed = urlsplit(url)
+        secure = parsed.scheme == "https"
+        host = parsed.hostname
+        port = parsed.port or (443 if secure else 80)
+        target = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+        key = (host, port, secure)
+
+        if isinstance(body, str):
+            body = body.encode()
+
+        # the header names are case-insensitive, a header of the caller (e.g., `host`) replaces the default one
+        request_headers: dict[str, tuple[str, str]] = {}
+        for name, value in [("Host", parsed.netloc), ("Connection", "keep-alive"),
+                            ("Content-Length", str(len(body))), *(headers or {}).items()]:
+            request_headers[name.lower()] = (name, value)
+        payload = (
+            f"{method} {target} HTTP/1.1\r\n" +
+            "".join(f"{name}: {value}\r\n" for name, value in request_headers.values()) +
+            "\r\n"
+        ).encode("latin-1") + body
+
+        slots = self.__slots.setdefault(key, asyncio.Semaphore(self.pool_size))
+        async with slots:
+            return await asyncio.wait_for(self.__send(key, method, payload), self.timeout)
+
+    async def __send(self, key: tuple, method: str, payload: bytes) -> HTTPResponse:
+        idle = self.__idle.setdefault(key, [])
+
+        # a reused connection might be closed by the server, retry once with a new connection
+        for reused in ([True, False] if idle else [False]):
+            connection = idle.pop() if reused else await self.__connect(key)
+            try:
+                connection.writer.write(payload)
+                await connection.writer.drain()
+                response, keep_alive = await _read_response(connection.reader, method)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                connection.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                connection.close()
+                raise
+
+            if keep_alive:
+                idle.append(connection)
+            else:
+                connection.close()
+            return response
+
+    async def __connect(self, key: tuple) -> _Connection:
+        host, port, secure = key
+        reader, writer = await asyncio.open_connection(host, port, ssl=ssl.create_default_context() if secure else None)
+        return _Connection(reader, writer)
+
+
+async def _read_response(reader: asyncio.StreamReader, method: str) -> tuple[HTTPResponse, bool]:
+    """
+    _read_response() reads a response, and tells whether the connection can be reused.
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed by the server")
+
+    version, status = status_line.decode("latin-1").split(" ", 2)[:2]
+    headers: dict[str, str] = {}
+
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    status = int(status)
+    keep_alive = headers.get("connection", "").lower() != "close" and version != "HTTP/1.0"
+
+    if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+        body = b""
+    elif headers.get("transfer-encoding", "").lower() == "chunked":
+        body = await _read_chunked(reader)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        body = await reader.read()
+        keep_alive = False
+
+    return HTTPResponse(status, headers, body), keep_alive
+
+
+async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+    chunks = []
+    while True:
+        size = int((await reader.readline()).split(b";")[0].strip(), 16)
+        if size == 0:
+            # skip trailers
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            return b"".join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)
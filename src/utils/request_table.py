@@ -0,0 +1,177 @@
+"""
+Module request_table provides a compact binary table of HTTP requests, which is memory-mapped by load generators.
+The table is built once from the test corpus, every load generator process maps the same file,
+so the startup is fast and the pages are shared between the processes.
+
+Layout (little-endian):
+- header: magic (8 bytes), number of requests `n` (uint64)
+- weights: float64[n]
+- offsets: uint64[n + 1], offset of each record in the records section
+- records: 5 field lengths (uint32) followed by the fields, i.e., name, method, uri, headers and body.
+  Headers are encoded as `name\\0value\\0...`.
+"""
+import mmap
+import os
+import struct
+from typing import Iterable, Iterator, List, Optional
+import numpy as np
+
+_MAGIC = b"CRSRQT01"
+_HEADER = struct.Struct("<8sQ")
+_RECORD_HEADER = struct.Struct("<5I")
+
+
+class TableRequest:
+    """
+    TableRequest is a request of a RequestTable.
+
+    Args:
+        - `name` (str): name of the request in the stats (e.g., test id)
+        - `method` (str): HTTP method
+        - `uri` (str): request uri
+        - `headers` (dict[str, str]): request headers
+        - `body` (bytes): request body
+        - `weight` (float, optional): relative probability to be picked. Defaults to 1.0.
+    """
+    name: str
+    method: str
+    uri: str
+    headers: dict[str, str]
+    body: bytes
+    weight: float
+
+    def __init__(self, name: str, method: str, uri: str, headers: dict[str, str], body: bytes,
+                 weight: float = 1.0):
+        self.name = name
+        self.method = method
+        self.uri = uri
+        self.headers = headers
+        self.body = body
+        self.weight = weight
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, TableRequest) and vars(self) == vars(other)
+
+    def __repr__(self) -> str:
+        return f"TableRequest({self.name!r}, {self.method!r}, {self.uri!r})"
+
+
+def write_request_table(file_path: str, requests: Iterable[TableRequest]) -> int:
+    """
+    write_request_table() writes requests to a table file, the file is replaced atomically.
+
+    Args:
+        file_path (str): path of the table
+        requests (Iterable[TableRequest]): requests to write
+
+    Returns:
+        int: number of requests written
+    """
+    weights, offsets, records, size = [], [0], [], 0
+
+    for request in requests:
+        headers = b"\0".join(f"{k}\0{v}".encode() for k, v in request.headers.items())
+        fields = [request.name.encode(), request.method.encode(), request.uri.encode(), headers, request.body]
+        record = _RECORD_HEADER.pack(*map(len, fields)) + b"".join(fields)
+
+        weights.append(request.weight)
+        records.append(record)
+        size += len(record)
+        offsets.append(size)
+
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(weights)))
+        f.write(np.asarray(weights, dtype="<f8").tobytes())
+        f.write(np.asarray(offsets, dtype="<u8").tobytes())
+        f.writelines(records)
+    os.replace(tmp_path, file_path)
+
+    return len(weights)
+
+
+class RequestTable:
+    """
+    RequestTable is a read-only, memory-mapped view of a table file (see `write_request_table()`).
+    Only the weights and the offsets are read eagerly, a request is decoded when it is accessed.
+
+    Args:
+        - `file_path` (str): path of the table
+    """
+    file_path: str
+    weights: np.ndarray
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+        with open(file_path, "rb") as f:
+            self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count = _HEADER.unpack_from(self.__mmap)
+        if magic != _MAGIC:
+            raise ValueError(f"{file_path} is not a request table")
+
+        self.weights = np.frombuffer(self.__mmap, dtype="<f8", count=count, offset=_HEADER.size)
+        self.__offsets = np.frombuffer(self.__mmap, dtype="<u8", count=count + 1,
+                                       offset=_HEADER.size + count * 8)
+        self.__records_start = _HEADER.size + count * 8 + (count + 1) * 8
+        self.__cum_weights: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def __getitem__(self, idx: int) -> TableRequest:
+        if not -len(self) <= idx < len(self):
+            raise IndexError(idx)
+        idx %= len(self)
+
+        start = self.__records_start + int(self.__offsets[idx])
+        lengths = _RECORD_HEADER.unpack_from(self.__mmap, start)
+        fields, pos = [], start + _RECORD_HEADER.size
+        for length in lengths:
+            fields.append(self.__mmap[pos:pos + length])
+            pos += length
+
+        name, method, uri, headers, body = fields
+        headers = headers.decode().split("\0") if headers else []
+        return TableRequest(name.decode(), method.decode(), uri.decode(),
+                            dict(zip(headers[::2], headers[1::2])), body, float(self.weights[idx]))
+
+    def __iter__(self) -> Iterator[TableRequest]:
+        return (self[idx] for idx in range(len(self)))
+
+    def sample(self, size: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """
+        sample() picks the indices of `size` requests at random, proportionally to their weights.
+
+        Args:
+            size (int): number of indices
+            rng (Optional[np.random.Generator], optional): random generator. Defaults to None (new generator).
+
+        Returns:
+            np.ndarray: indices of the requests
+        """
+        if self.__cum_weights is None:
+            self.__cum_weights = np.cumsum(self.weights)
+
+        rng = rng or np.random.default_rng()
+        picks = rng.random(size) * self.__cum_weights[-1]
+        return np.searchsorted(self.__cum_weights, picks, side="right")
+
+    def close(self):
+        # the arrays are views of the mapping, they must be released first
+        self.weights = self.__offsets = self.__cum_weights = None
+        self.__mmap.close()
+
+
+def read_request_table(file_path: str) -> List[TableRequest]:
+    """
+    read_request_table() reads all the requests of a table file.
+    """
+    table = RequestTable(file_path)
+    try:
+        return list(table)
+    finally:
+        table.close()
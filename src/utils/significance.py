@@ -0,0 +1,141 @@
+"""
+Module significance provides vectorized tests of whether a sample (after a change) is significantly greater
+than another (before the change), so run-to-run noise is not reported as a regression.
+
+Every test accepts raw samples or weighted samples (e.g., the buckets of a latency histogram with their counts):
+- `bootstrap_median_diff()`: bootstrap confidence interval of the difference of medians
+- `mann_whitney_u()`: Mann-Whitney U test, with the normal approximation and the tie correction
+- `cliffs_delta()`: Cliff's delta effect size, i.e., `P(after > before) - P(after < before)`
+"""
+import math
+from typing import Optional
+import numpy as np
+
+
+def bootstrap_median_diff(before: np.ndarray,
+                          after: np.ndarray,
+                          confidence: float = 0.95,
+                          resamples: int = 10000,
+                          before_weights: Optional[np.ndarray] = None,
+                          after_weights: Optional[np.ndarray] = None,
+                          rng: Optional[np.random.Generator] = None
+                          ) -> tuple[float, float]:
+    """
+    bootstrap_median_diff() returns the bootstrap confidence interval of `median(after) - median(before)`.
+
+    The median of a resample of size n is its m-th order statistic (m = (n + 1) // 2), whose quantile in the
+    empirical distribution follows Beta(m, n + 1 - m). So each resampled median is drawn from the Beta
+    distribution and looked up in the sorted sample, in O(log n) instead of resampling n values.
+
+    Args:
+        before (np.ndarray): sample before the change
+        after (np.ndarray): sample after the change
+        confidence (float, optional): confidence level of the interval. Defaults to 0.95.
+        resamples (int, optional): number of bootstrap resamples. Defaults to 10000.
+        before_weights (Optional[np.ndarray], optional): count of each value of before. Defaults to None (1 each).
+        after_weights (Optional[np.ndarray], optional): count of each value of after. Defaults to None (1 each).
+        rng (Optional[np.random.Generator], optional): random generator. Defaults to None (seeded, reproducible).
+
+    Returns:
+        tuple[float, float]: lower and upper bounds of the interval, NaN if either sample is empty
+    """
+    rng = np.random.default_rng(0) if rng is None else rng
+    medians = []
+
+    for values, weights in ((before, before_weights), (after, after_weights)):
+        values, cumsum = _sorted_cumsum(values, weights)
+        n = int(cumsum[-1]) if len(cumsum) else 0
+        if n == 0:
+            return math.nan, math.nan
+
+        m = (n + 1) // 2
+        ranks = np.ceil(rng.beta(m, n + 1 - m, resamples) * n)
+        medians.append(values[np.searchsorted(cumsum, np.clip(ranks, 1, n))])
+
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(medians[1] - medians[0], [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+def mann_whitney_u(before: np.ndarray,
+                   after: np.ndarray,
+                   before_weights: Optional[np.ndarray] = None,
+                   after_weights: Optional[np.ndarray] = None
+                   ) -> tuple[float, float]:
+    """
+    mann_whitney_u() runs the one-sided Mann-Whitney U test of whether after is stochastically greater than before.
+    Ties get the average of their ranks, the p-value is approximated by the normal distribution with
+    the tie correction and the continuity correction (accurate for samples larger than ~20).
+
+    Args:
+        before (np.ndarray): sample before the change
+        after (np.ndarray): sample after the change
+        before_weights (Optional[np.ndarray], optional): count of each value of before. Defaults to None (1 each).
+        after_weights (Optional[np.ndarray], optional): count of each value of after. Defaults to None (1 each).
+
+    Returns:
+        tuple[float, float]: U of after, and the p-value; NaN if either sample is empty
+    """
+    u, n_before, n_after, ties = _rank_sum(before, after, before_weights, after_weights)
+    if n_before == 0 or n_after == 0:
+        return math.nan, math.nan
+
+    n = n_before + n_after
+    mean = n_before * n_after / 2
+    variance = n_before * n_after / 12 * ((n + 1) - ties / (n * (n - 1))) if n > 1 else 0
+    if variance <= 0:
+        # all the values are tied
+        return u, 1.0
+
+    z = (u - mean - 0.5) / math.sqrt(variance)
+    return u, 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def cliffs_delta(before: np.ndarray,
+                 after: np.ndarray,
+                 before_weights: Optional[np.ndarray] = None,
+                 after_weights: Optional[np.ndarray] = None
+                 ) -> float:
+    """
+    cliffs_delta() returns Cliff's delta of after against before, i.e., `P(after > before) - P(after < before)`.
+    It is in [-1, 1], |delta| of 0.147, 0.33 and 0.474 are the usual bounds of a small, medium and large effect.
+
+    Returns:
+        float: the effect size, NaN if either sample is empty
+    """
+    u, n_before, n_after, _ = _rank_sum(before, after, before_weights, after_weights)
+    if n_before == 0 or n_after == 0:
+        return math.nan
+    return 2 * u / (n_before * n_after) - 1
+
+
+def _sorted_cumsum(values: np.ndarray, weights: Optional[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=np.float64)
+    order = np.argsort(values, kind="stable")
+    return values[order], np.cumsum(weights[order])
+
+def _rank_sum(before: np.ndarray, after: np.ndarray,
+              before_weights: Optional[np.ndarray], after_weights: Optional[np.ndarray]
+              ) -> tuple[float, float, float, float]:
+    """
+    _rank_sum() ranks the pooled samples with the average rank for ties.
+
+    Returns:
+        tuple[float, float, float, float]: U of after, size of before, size of after, and `sum(t^3 - t)` of the ties
+    """
+    before, after = np.asarray(before, dtype=np.float64), np.asarray(after, dtype=np.float64)
+    before_weights = np.ones(len(before)) if before_weights is None else np.asarray(before_weights, dtype=np.float64)
+    after_weights = np.ones(len(after)) if after_weights is None else np.asarray(after_weights, dtype=np.float64)
+
+    # count of each distinct value in each sample
+    distinct, inverse = np.unique(np.concatenate((before, after)), return_inverse=True)
+    count_before = np.bincount(inverse[:len(before)], weights=before_weights, minlength=len(distinct))
+    count_after = np.bincount(inverse[len(before):], weights=after_weights, minlength=len(distinct))
+    count = count_before + count_after
+
+    # a tie of t values at ranks (r + 1)...(r + t) gets the rank r + (t + 1) / 2
+    ranks = np.cumsum(count) - count + (count + 1) / 2
+    n_before, n_after = count_before.sum(), count_after.sum()
+    u = float(np.dot(count_after, ranks) - n_after * (n_after + 1) / 2)
+    return u, float(n_before), float(n_after), float(np.sum(count ** 3 - count))
@@ -0,0 +1,105 @@
+"""
+Module spool provides an append-only JSON Lines file for streaming samples to the disk.
+"""
+import json
+import os
+from collections import deque
+from typing import Hashable, Iterator, Optional
+
+
+class JsonlSpool:
+    """
+    JsonlSpool appends records to a JSON Lines file as soon as they are collected,
+    so the memory stays bounded and a crash only loses the records that are not flushed yet.
+
+    Duplicated records are dropped by their key (e.g., timestamp). Only the most recent `window` keys
+    are remembered, which is enough when the source re-sends a bounded number of recent records
+    (e.g., cAdvisor API always returns the last 60 samples).
+
+    Args:
+        - `file_path` (str): path of the JSON Lines file
+        - `window` (int, optional): number of recent keys used for de-duplication. Defaults to 256.
+    """
+    file_path: str
+    window: int
+    count: int
+
+    def __init__(self, file_path: str, window: int = 256):
+        self.file_path = file_path
+        self.window = window
+        self.count = 0
+        self.__recent_keys: deque = deque(maxlen=window)
+        self.__recent_key_set: set = set()
+        self.__file = None
+
+    def __enter__(self) -> 'JsonlSpool':
+        self.open()
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def open(self):
+        """
+        open() creates (or truncates) the file for appending records.
+        """
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+        self.__file = open(self.file_path, "w")
+
+    def close(self):
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def append(self, record: any, key: Optional[Hashable] = None) -> bool:
+        """
+        append() writes a record as a line, unless its key is in the recent window.
+
+        Args:
+            record (any): JSON-serializable record
+            key (Optional[Hashable], optional): key for de-duplication. Defaults to None (always written).
+
+        Returns:
+            bool: True if the record is written
+        """
+        if key is not None:
+            if key in self.__recent_key_set:
+                return False
+
+            if len(self.__recent_keys) == self.window:
+                self.__recent_key_set.discard(self.__recent_keys[0])
+            self.__recent_keys.append(key)
+            self.__recent_key_set.add(key)
+
+        self.__file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.count += 1
+        return True
+
+    def flush(self):
+        """
+        flush() makes the appended records durable, it is called after each batch (e.g., a poll).
+        """
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+
+
+def iter_jsonl(file_path: str) -> Iterator[any]:
+    """
+    iter_jsonl() streams the records of a JSON Lines file one by one.
+    A truncated last line (e.g., the collector crashed while writing) is skipped.
+
+    Args:
+        file_path (str): path of the JSON Lines file
+
+    Yields:
+        any: the parsed record
+    """
+    with open(file_path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
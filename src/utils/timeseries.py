@@ -0,0 +1,36 @@
+"""
+Module timeseries provides vectorized helpers for time series keyed by ISO 8601 timestamps.
+"""
+import warnings
+from typing import Iterable
+import numpy as np
+import dateutil.parser as date_parser
+
+
+def to_epoch_seconds(timestamps: Iterable[str]) -> np.ndarray:
+    """
+    to_epoch_seconds() converts ISO 8601 timestamps (e.g., from cAdvisor API) to unix time in seconds.
+    UTC timestamps (i.e., suffix `Z` or `+00:00`) are parsed by NumPy in one pass,
+    other timezones fall back to dateutil.
+
+    Args:
+        timestamps (Iterable[str]): ISO 8601 timestamps
+
+    Returns:
+        np.ndarray: unix time (float64) of each timestamp
+    """
+    timestamps = np.asarray(timestamps).astype(str)
+    if len(timestamps) == 0:
+        return np.array([], dtype=np.float64)
+
+    utc = np.char.replace(np.char.replace(timestamps, "Z", ""), "+00:00", "")
+
+    try:
+        with warnings.catch_warnings():
+            # NumPy warns when a timestamp carries a timezone it cannot represent
+            warnings.simplefilter("error")
+            nanoseconds = utc.astype("datetime64[ns]").astype(np.int64)
+        # split seconds and the fraction to keep the sub-microsecond precision
+        return (nanoseconds // 10**9) + (nanoseconds % 10**9) / 1e9
+    except (ValueError, UserWarning, DeprecationWarning):
+        return np.array([date_parser.parse(timestamp).timestamp() for timestamp in timestamps])